@@ -0,0 +1,127 @@
+'''
+python -m benchmarks.bench_encoders \
+    --work_dir bench/encoders \
+    --resolutions 1280x720 1920x1080 \
+    --output_json bench/encoders.json
+'''
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+from time import time as timer
+
+from benchmarks.synthetic import make_fake_tubes, make_synthetic_video
+from talkinghead.pipeline_metrics import children_cpu_seconds
+from talkinghead.crop import trim_and_crop_min_size
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--work_dir', type=str, default='bench/encoders',
+                    help='Directory for synthetic sources and cropped outputs.')
+parser.add_argument('--resolutions', type=str, nargs='+', default=['1280x720', '1920x1080'],
+                    help='Source resolutions as WxH.')
+parser.add_argument('--pattern', type=str, default='testsrc2',
+                    help='lavfi source pattern for synthetic videos (testsrc, testsrc2, mandelbrot, ...).')
+parser.add_argument('--num_tubes', type=int, default=4,
+                    help='Number of fake tubes per source.')
+parser.add_argument('--crop_size', type=int, default=512,
+                    help='Crop size of the fake tubes in pixels.')
+parser.add_argument('--configs', type=str, nargs='+', default=None,
+                    help='Subset of encoder configs to run (names from ENCODER_CONFIGS). Default: all.')
+parser.add_argument('--rate_control', type=str, default='source',
+                    help='Rate control policy used for every config (see talkinghead/rate_control.py).')
+parser.add_argument('--output_json', type=str, default=None,
+                    help='Optional path to write the results as JSON.')
+
+# 비교할 인코더 설정 목록이다
+# source_vcodec: 합성 원본을 만들 때 사용하는 인코더 (원본 코덱에 따라 크롭 경로의 분기가 달라진다)
+# vcodec: 크롭 시 사용할 출력 인코더 (None이면 실제 파이프라인과 같이 원본 코덱에 따라 선택된다)
+# preset: 출력 인코더 preset
+ENCODER_CONFIGS = {
+    'libopenh264': {'source_vcodec': 'libx264', 'vcodec': 'libopenh264', 'preset': None},
+    'libx264-ultrafast': {'source_vcodec': 'libx264', 'vcodec': 'libx264', 'preset': 'ultrafast'},
+    'libx264-veryfast': {'source_vcodec': 'libx264', 'vcodec': 'libx264', 'preset': 'veryfast'},
+    'libx264-medium': {'source_vcodec': 'libx264', 'vcodec': 'libx264', 'preset': 'medium'},
+    # hevc 원본은 원본 코덱 그대로 인코딩하는 분기(passthrough)를 탄다
+    'hevc-passthrough': {'source_vcodec': 'libx265', 'vcodec': None, 'preset': None},
+}
+
+
+def compute_psnr(distorted_path, reference_path):
+    # ffmpeg psnr 필터로 두 클립의 평균 PSNR(dB)을 계산하는 함수
+    result = subprocess.run([
+        'ffmpeg', '-hide_banner', '-nostats',
+        '-i', distorted_path, '-i', reference_path,
+        '-lavfi', '[0:v][1:v]psnr', '-f', 'null', '-',
+    ], capture_output=True, text=True)
+    match = re.search(r'average:([0-9.]+|inf)', result.stderr)
+    return float(match.group(1)) if match else None
+
+
+def crop_all(source_dir, output_dir, tubes, **crop_kwargs):
+    # 모든 tube를 실제 크롭 경로(trim_and_crop_min_size)로 인코딩하는 함수
+    # 반환값: (record 리스트, 경과 시간(초), 자식 프로세스 CPU 시간(초))
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+    records = []
+    cpu_start = children_cpu_seconds()
+    start = timer()
+    for tube in tubes:
+        records.append(trim_and_crop_min_size(source_dir, output_dir, tube, min_crop_width=0, min_crop_height=0, **crop_kwargs))
+    return records, timer() - start, children_cpu_seconds() - cpu_start
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    config_names = args.configs if args.configs else list(ENCODER_CONFIGS)
+    source_dir = os.path.join(args.work_dir, 'sources')
+    os.makedirs(source_dir, exist_ok=True)
+
+    results = []
+    for resolution in args.resolutions:
+        width, height = map(int, resolution.split('x'))
+        tubes_by_source = {}
+        for source_vcodec in sorted(set(ENCODER_CONFIGS[name]['source_vcodec'] for name in config_names)):
+            video_name = 'synth%dp%s_0000' % (height, source_vcodec.replace('lib', ''))
+            make_synthetic_video(os.path.join(source_dir, video_name + '.mp4'), width=width, height=height,
+                                 pattern=args.pattern, vcodec=source_vcodec)
+            tubes = make_fake_tubes(video_name, height, width, num_tubes=args.num_tubes, crop_size=args.crop_size)
+            # 같은 크롭 경로를 무손실(libx264 CRF 0)로 인코딩해서 PSNR 기준 클립으로 사용한다
+            reference_dir = os.path.join(args.work_dir, 'reference', resolution, source_vcodec)
+            references, _, _ = crop_all(source_dir, reference_dir, tubes, vcodec='libx264', preset='ultrafast',
+                                        rate_control='quality', quality=0)
+            tubes_by_source[source_vcodec] = (tubes, references)
+
+        for name in config_names:
+            config = ENCODER_CONFIGS[name]
+            tubes, references = tubes_by_source[config['source_vcodec']]
+            output_dir = os.path.join(args.work_dir, 'outputs', resolution, name)
+            records, elapsed, cpu_seconds = crop_all(source_dir, output_dir, tubes, vcodec=config['vcodec'],
+                                                     preset=config['preset'], rate_control=args.rate_control)
+            frames = sum(record['frames'] for record in records)
+            output_bytes = sum(os.path.getsize(record['output_filepath']) for record in records)
+            psnrs = [compute_psnr(record['output_filepath'], reference['output_filepath'])
+                     for record, reference in zip(records, references)]
+            psnrs = [psnr for psnr in psnrs if psnr is not None]
+            result = {
+                'resolution': resolution,
+                'config': name,
+                'clips': len(records),
+                'frames': frames,
+                'encode_fps': frames / elapsed,
+                'cpu_seconds_per_frame': cpu_seconds / frames,
+                'output_bytes': output_bytes,
+                'psnr': sum(psnrs) / len(psnrs) if psnrs else None,
+            }
+            results.append(result)
+            print('%-10s %-18s %8.1f fps %8.2f ms cpu/frame %12d bytes  PSNR %s' % (
+                resolution, name, result['encode_fps'], result['cpu_seconds_per_frame'] * 1000.0,
+                output_bytes, '%.2f dB' % result['psnr'] if result['psnr'] is not None else 'n/a'))
+
+    if args.output_json:
+        with open(args.output_json, 'w') as fout:
+            json.dump(results, fout, indent=2)
+        print('Results saved to: %s' % (args.output_json))
@@ -0,0 +1,146 @@
+'''
+python -m benchmarks.bench_frame_reader \
+    --work_dir bench/frame_reader \
+    --num_clips 4 \
+    --clip_duration 10 \
+    --gop 30 \
+    --num_pairs 50 \
+    --output_json bench/frame_reader.json
+'''
+
+import argparse
+import bisect
+import json
+import os
+import random
+from time import time as timer
+
+import numpy as np
+
+from benchmarks.synthetic import make_synthetic_video
+from talkinghead.ffmpeg_runner import run_ffmpeg_capture
+from talkinghead.frame_reader import FrameReader, get_clip_url
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--work_dir', type=str, default='bench/frame_reader',
+                    help='Directory for synthetic clips and the keyframe index.')
+parser.add_argument('--clips_dir', type=str, default=None,
+                    help='Read these cropped clips (output dir of videos_crop.py) instead of synthetic clips.')
+parser.add_argument('--num_clips', type=int, default=4,
+                    help='Number of synthetic clips.')
+parser.add_argument('--clip_duration', type=float, default=10.0,
+                    help='Length of each synthetic clip in seconds.')
+parser.add_argument('--clip_size', type=int, default=256,
+                    help='Width and height of the synthetic clips.')
+parser.add_argument('--gop', type=int, default=0,
+                    help='Keyframe interval of the synthetic clips in frames (0: encoder default, 250 for libx264). The random-access gain grows as the GOP shrinks.')
+parser.add_argument('--num_pairs', type=int, default=50,
+                    help='Number of random (source, driving) frame pairs to read.')
+parser.add_argument('--seed', type=int, default=0,
+                    help='Random seed for the frame pairs.')
+parser.add_argument('--verify', type=int, default=5,
+                    help='Check that this many pairs match sequential decode exactly.')
+parser.add_argument('--output_json', type=str, default=None,
+                    help='Optional path to write the results as JSON.')
+
+
+def read_pair_sequential(reader, key, source_index, driving_index):
+    # 비교 기준: 클립의 처음부터 두 프레임 중 뒤의 프레임까지 디코딩해서 두 프레임을 고르는 방식
+    # 반환값: (source 프레임, driving 프레임, 디코딩한 프레임 수)
+    import ffmpeg
+
+    index = reader.clip_index(key)
+    count = max(source_index, driving_index) + 1
+    stream = ffmpeg.input(get_clip_url(reader.clips_dir, reader.clips[key]))['v:0']
+    stream = stream.output('pipe:', format='rawvideo', pix_fmt='rgb24', fps_mode='passthrough', **{'frames:v': count})
+    frames = np.frombuffer(run_ffmpeg_capture(stream), dtype=np.uint8).reshape(-1, index['height'], index['width'], 3)
+    return frames[source_index], frames[driving_index], count
+
+
+def get_decoded_frames(index, frame_indices):
+    # FrameReader.get_frames()가 디코딩하는 프레임 수 (프레임마다 이전 keyframe부터, 같은 keyframe이면 한 번)
+    keyframes = index['keyframes'] or [0]
+    runs = {}
+    for frame_index in frame_indices:
+        keyframe = keyframes[max(0, bisect.bisect_right(keyframes, frame_index) - 1)]
+        runs[keyframe] = max(runs.get(keyframe, 0), frame_index - keyframe + 1)
+    return sum(runs.values())
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    clips_dir = args.clips_dir
+    if clips_dir is None:
+        clips_dir = os.path.join(args.work_dir, 'clips')
+        os.makedirs(clips_dir, exist_ok=True)
+        for i in range(args.num_clips):
+            make_synthetic_video(os.path.join(clips_dir, 'synth_clip_%04d.mp4' % (i)), width=args.clip_size,
+                                 height=args.clip_size, duration=args.clip_duration, pattern='testsrc2', gop=args.gop)
+    os.makedirs(args.work_dir, exist_ok=True)
+    index_path = os.path.join(args.work_dir, 'keyframe_index.jsonl')
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+    # 1. keyframe 인덱스를 처음 만드는 시간 (클립마다 한 번, 이후에는 인덱스 파일에서 읽는다)
+    reader = FrameReader(clips_dir, index_path=index_path)
+    start = timer()
+    reader.build_index()
+    index_seconds = timer() - start
+    keys = reader.keys()
+    print('Indexed %d clips in %.2f seconds (%.1f ms/clip)' % (len(keys), index_seconds, 1000 * index_seconds / len(keys)))
+
+    rng = random.Random(args.seed)
+    pairs = []
+    for _ in range(args.num_pairs):
+        key = rng.choice(keys)
+        num_frames = reader.num_frames(key)
+        pairs.append((key, rng.randrange(num_frames), rng.randrange(num_frames)))
+
+    # 2. 처음부터 디코딩하는 방식
+    sequential_decoded = 0
+    start = timer()
+    sequential = []
+    for key, source_index, driving_index in pairs:
+        source, driving, decoded = read_pair_sequential(reader, key, source_index, driving_index)
+        sequential_decoded += decoded
+        if len(sequential) < args.verify:
+            sequential.append((source, driving))
+    sequential_seconds = timer() - start
+
+    # 3. keyframe 인덱스로 읽는 방식 (인덱스 파일을 다시 읽는 새 reader)
+    reader = FrameReader(clips_dir, index_path=index_path)
+    indexed_decoded = 0
+    start = timer()
+    indexed = []
+    for key, source_index, driving_index in pairs:
+        source, driving = reader.get_pair(key, source_index, driving_index)
+        indexed_decoded += get_decoded_frames(reader.clip_index(key), [source_index, driving_index])
+        if len(indexed) < args.verify:
+            indexed.append((source, driving))
+    indexed_seconds = timer() - start
+
+    matches = all(np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1]) for a, b in zip(sequential, indexed))
+    results = {
+        'clips': len(keys),
+        'pairs': len(pairs),
+        'mean_keyframe_interval': float(np.mean([reader.num_frames(key) / max(1, len(reader.clip_index(key)['keyframes']))
+                                                 for key in keys])),
+        'index_seconds': index_seconds,
+        'sequential': {'seconds': sequential_seconds, 'frames_per_second': 2 * len(pairs) / sequential_seconds,
+                       'decoded_frames_per_pair': sequential_decoded / len(pairs)},
+        'indexed': {'seconds': indexed_seconds, 'frames_per_second': 2 * len(pairs) / indexed_seconds,
+                    'decoded_frames_per_pair': indexed_decoded / len(pairs)},
+        'speedup': sequential_seconds / indexed_seconds,
+        'verified': matches,
+    }
+    print('%-12s %10s %12s %16s' % ('reader', 'seconds', 'frames/s', 'decoded/pair'))
+    for name in ['sequential', 'indexed']:
+        print('%-12s %10.2f %12.1f %16.1f' % (name, results[name]['seconds'], results[name]['frames_per_second'],
+                                              results[name]['decoded_frames_per_pair']))
+    print('Speedup: %.2fx (mean keyframe interval %.0f frames), first %d pairs identical: %s' % (
+        results['speedup'], results['mean_keyframe_interval'], min(args.verify, len(pairs)), matches))
+
+    if args.output_json:
+        with open(args.output_json, 'w') as fout:
+            json.dump(results, fout, indent=2)
+        print('Results saved to: %s' % (args.output_json))
@@ -0,0 +1,157 @@
+'''
+python -m benchmarks.bench_pipeline \
+    --work_dir bench/pipeline \
+    --num_videos 4 \
+    --video_duration 150 \
+    --tubes_per_segment 4 \
+    --num_workers 8
+'''
+
+import argparse
+import json
+import math
+import os
+import shutil
+from functools import partial
+from time import time as timer
+
+from benchmarks.synthetic import make_fake_tubes, make_synthetic_video
+from videos_process_train import build_parser as build_pipeline_parser
+from talkinghead.temp_space import DownloadPrefetcher
+from talkinghead.probe import ProbeCache
+from videos_process_train import create_admission, create_scheduler, create_temp_space, fetch_video, process_video
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--work_dir', type=str, default='bench/pipeline',
+                    help='Directory for synthetic sources, lists and pipeline outputs.')
+parser.add_argument('--num_videos', type=int, default=4,
+                    help='Number of synthetic videos.')
+parser.add_argument('--video_duration', type=float, default=150.0,
+                    help='Duration of each synthetic video in seconds (split into 1-min segments by the pipeline).')
+parser.add_argument('--resolution', type=str, default='1280x720',
+                    help='Source resolution as WxH.')
+parser.add_argument('--fps', type=int, default=30,
+                    help='Source frame rate.')
+parser.add_argument('--pattern', type=str, default='testsrc2',
+                    help='lavfi source pattern for synthetic videos.')
+parser.add_argument('--tubes_per_segment', type=int, default=4,
+                    help='Number of fake tubes per 1-min segment.')
+parser.add_argument('--tube_frames', type=int, default=360,
+                    help='Length of each fake tube in frames.')
+parser.add_argument('--crop_size', type=int, default=512,
+                    help='Crop size of the fake tubes in pixels.')
+parser.add_argument('--num_workers', type=int, default=8,
+                    help='Crop pool size passed to the pipeline.')
+parser.add_argument('--pipeline_args', type=str, nargs=argparse.REMAINDER, default=[],
+                    help='Extra arguments forwarded to videos_process_train.py (e.g. --pipeline_args --vcodec libx264).')
+parser.add_argument('--output_json', type=str, default=None,
+                    help='Optional path to write per-video stage timings and the summary as JSON.')
+
+STAGES = ['download', 'split', 'probe', 'crop', 'cleanup']
+
+
+def generate_dataset(work_dir, num_videos, video_duration, width, height, fps, pattern, tubes_per_segment,
+                     tube_frames, crop_size):
+    # 벤치마크용 합성 데이터셋을 만드는 함수
+    # - sources/{video_id}.mp4 : 로컬 "다운로더"가 복사해 갈 원본 비디오
+    # - video_ids.txt          : 비디오 ID 목록
+    # - video_tubes.txt        : 1분 세그먼트별 가짜 tube 목록 (실제 tubes 파일과 같은 형식)
+    # 반환값: (source_dir, video_ids_file, tubes_file)
+    source_dir = os.path.join(work_dir, 'sources')
+    os.makedirs(source_dir, exist_ok=True)
+    video_ids_file = os.path.join(work_dir, 'video_ids.txt')
+    tubes_file = os.path.join(work_dir, 'video_tubes.txt')
+
+    num_segments = int(math.ceil(video_duration / 60.0))
+    with open(video_ids_file, 'w') as fids, open(tubes_file, 'w') as ftubes:
+        for i in range(num_videos):
+            video_id = 'synth%05d' % (i)
+            make_synthetic_video(os.path.join(source_dir, video_id + '.mp4'), width=width, height=height, fps=fps,
+                                 duration=video_duration, pattern=pattern)
+            fids.write(video_id + '\n')
+            for k in range(num_segments):
+                # 마지막 세그먼트는 60초보다 짧을 수 있으므로 여유를 두고 프레임 수를 잡는다
+                segment_seconds = min(60.0, video_duration - 60.0 * k) - 2.0
+                num_frames = max(1, int(segment_seconds * fps))
+                tubes = make_fake_tubes('%s_%04d' % (video_id, k), height, width, num_tubes=tubes_per_segment,
+                                        num_frames=num_frames, tube_frames=min(tube_frames, num_frames),
+                                        crop_size=crop_size, seed=i * 1000 + k)
+                for tube in tubes:
+                    ftubes.write(tube + '\n')
+    return source_dir, video_ids_file, tubes_file
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    width, height = map(int, args.resolution.split('x'))
+    source_dir, video_ids_file, tubes_file = generate_dataset(
+        args.work_dir, args.num_videos, args.video_duration, width, height, args.fps, args.pattern,
+        args.tubes_per_segment, args.tube_frames, args.crop_size)
+
+    # 매 실행마다 출력과 임시 디렉토리를 비워서 같은 조건에서 측정한다
+    run_dir = os.path.join(args.work_dir, 'run')
+    if os.path.exists(run_dir):
+        shutil.rmtree(run_dir)
+    pipeline_args = build_pipeline_parser().parse_args([
+        '--video_ids_file', video_ids_file,
+        '--tubes_file', tubes_file,
+        '--output_dir', os.path.join(run_dir, 'cropped_clips'),
+        '--temp_raw_dir', os.path.join(run_dir, 'temp_raw_videos'),
+        '--temp_split_dir', os.path.join(run_dir, 'temp_1min_clips'),
+        '--min_crop_width', '0',
+        '--min_crop_height', '0',
+        '--num_workers', str(args.num_workers),
+        '--downloader', 'local',
+        '--local_source_dir', source_dir,
+    ] + args.pipeline_args)
+    for d in [pipeline_args.output_dir, pipeline_args.temp_raw_dir, pipeline_args.temp_split_dir]:
+        os.makedirs(d, exist_ok=True)
+
+    with open(video_ids_file) as fin:
+        video_ids = [line.strip() for line in fin if line.strip()]
+
+    # --pipeline_args로 --schedule heuristic/auto를 주면 모든 비디오에 걸쳐 같은 scheduler를 사용한다
+    scheduler = create_scheduler(pipeline_args)
+    admission = create_admission(pipeline_args)
+    temp_space = create_temp_space(pipeline_args)
+    # --pipeline_args로 --plan on을 주면 모든 비디오에 걸쳐 같은 probe 캐시를 사용한다 (--probe_cache가 있으면 파일에 남는다)
+    probe_cache = ProbeCache(pipeline_args.probe_cache) if pipeline_args.plan == 'on' else None
+    all_stats = []
+    start = timer()
+    # --pipeline_args로 --prefetch_videos를 주면 다운로드(복사)가 분할/크롭과 겹쳐서 실행된다
+    prefetcher = None
+    if pipeline_args.prefetch_videos > 0:
+        prefetcher = DownloadPrefetcher(video_ids, partial(fetch_video, pipeline_args), temp_space,
+                                        max_ahead=pipeline_args.prefetch_videos)
+    for video_id in video_ids:
+        all_stats.append(process_video(video_id, pipeline_args, pipeline_args.output_dir, scheduler=scheduler,
+                                      admission=admission, temp_space=temp_space, prefetcher=prefetcher,
+                                      probe_cache=probe_cache))
+        temp_space.release(video_id)
+    if prefetcher is not None:
+        prefetcher.close()
+    elapsed = timer() - start
+
+    totals = {stage: sum(stats[stage] for stats in all_stats) for stage in STAGES}
+    tube_frames = sum(stats['tube_frames'] for stats in all_stats)
+    summary = {
+        'videos': len(all_stats),
+        'clips': sum(stats['clips'] for stats in all_stats),
+        'tube_frames': tube_frames,
+        'elapsed': elapsed,
+        'videos_per_hour': len(all_stats) / elapsed * 3600.0,
+        'tube_frames_per_sec': tube_frames / elapsed,
+        'stage_seconds': totals,
+    }
+
+    print('\n=== Pipeline benchmark ===')
+    for stage in STAGES:
+        # probe는 워커 시간의 합이고 crop 벽시계 시간에 포함되어 있다
+        print('%-10s %10.2f s' % (stage, totals[stage]))
+    print('%d videos, %d clips in %.2f seconds' % (summary['videos'], summary['clips'], elapsed))
+    print('%.1f videos/hour, %.1f tube-frames/sec' % (summary['videos_per_hour'], summary['tube_frames_per_sec']))
+
+    if args.output_json:
+        with open(args.output_json, 'w') as fout:
+            json.dump({'summary': summary, 'videos': all_stats}, fout, indent=2)
+        print('Results saved to: %s' % (args.output_json))
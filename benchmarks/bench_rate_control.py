@@ -0,0 +1,83 @@
+'''
+python -m benchmarks.bench_rate_control \
+    --work_dir bench/rate_control \
+    --resolutions 1280x720 1920x1080 \
+    --num_tubes 4 \
+    --output_json bench/rate_control.json
+'''
+
+import argparse
+import json
+import os
+import shutil
+from time import time as timer
+
+from benchmarks.synthetic import make_fake_tubes, make_synthetic_video
+from talkinghead.rate_control import RATE_CONTROL_POLICIES
+from talkinghead.crop import trim_and_crop_min_size
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--work_dir', type=str, default='bench/rate_control',
+                    help='Directory for synthetic sources and cropped outputs.')
+parser.add_argument('--resolutions', type=str, nargs='+', default=['1280x720', '1920x1080'],
+                    help='Source resolutions as WxH.')
+parser.add_argument('--pattern', type=str, default='testsrc2',
+                    help='lavfi source pattern for synthetic videos (testsrc, testsrc2, mandelbrot, ...).')
+parser.add_argument('--source_vcodec', type=str, default='libx264',
+                    help='Encoder for the synthetic sources. libx264 sources are cropped with libopenh264, as in the real pipeline.')
+parser.add_argument('--num_tubes', type=int, default=4,
+                    help='Number of fake tubes per source.')
+parser.add_argument('--crop_size', type=int, default=384,
+                    help='Crop size of the fake tubes in pixels.')
+parser.add_argument('--policies', type=str, nargs='+', default=RATE_CONTROL_POLICIES, choices=RATE_CONTROL_POLICIES,
+                    help='Rate control policies to compare.')
+parser.add_argument('--output_json', type=str, default=None,
+                    help='Optional path to write the results as JSON.')
+
+
+def run_policy(source_dir, output_dir, tubes, rate_control):
+    # 하나의 rate control 정책으로 모든 tube를 크롭하고 결과를 집계하는 함수
+    # 반환값: 클립당 평균 바이트, 인코딩 fps 등을 담은 딕셔너리
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+    total_frames = 0
+    total_bytes = 0
+    start = timer()
+    for tube in tubes:
+        record = trim_and_crop_min_size(source_dir, output_dir, tube, min_crop_width=0, min_crop_height=0,
+                                        rate_control=rate_control)
+        total_frames += record['frames']
+        total_bytes += os.path.getsize(record['output_filepath'])
+    elapsed = timer() - start
+    return {
+        'rate_control': rate_control,
+        'clips': len(tubes),
+        'bytes_per_clip': total_bytes / len(tubes),
+        'encode_fps': total_frames / elapsed,
+        'elapsed': elapsed,
+    }
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    source_dir = os.path.join(args.work_dir, 'sources')
+    os.makedirs(source_dir, exist_ok=True)
+
+    results = []
+    for resolution in args.resolutions:
+        width, height = map(int, resolution.split('x'))
+        video_name = 'synth%dp_0000' % (height)
+        make_synthetic_video(os.path.join(source_dir, video_name + '.mp4'), width=width, height=height,
+                             pattern=args.pattern, vcodec=args.source_vcodec)
+        tubes = make_fake_tubes(video_name, height, width, num_tubes=args.num_tubes, crop_size=args.crop_size)
+        for policy in args.policies:
+            result = run_policy(source_dir, os.path.join(args.work_dir, 'outputs', policy), tubes, policy)
+            result['resolution'] = resolution
+            results.append(result)
+            print('%-10s %-8s %12.0f bytes/clip %8.1f fps' % (resolution, policy, result['bytes_per_clip'], result['encode_fps']))
+
+    if args.output_json:
+        with open(args.output_json, 'w') as fout:
+            json.dump(results, fout, indent=2)
+        print('Results saved to: %s' % (args.output_json))
@@ -0,0 +1,91 @@
+'''
+python -m benchmarks.bench_startup \
+    --num_workers 8 \
+    --repeats 5 \
+    --output_json bench/startup.json
+'''
+
+import argparse
+import importlib
+import json
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+from time import time as timer
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--modules', type=str, nargs='+',
+                    default=['talkinghead', 'talkinghead.plan', 'talkinghead.crop', 'videos_crop', 'videos_process_train'],
+                    help='Modules to time in a fresh interpreter.')
+parser.add_argument('--worker_module', type=str, default='talkinghead.crop',
+                    help='Module each spawned pool worker imports before reporting ready (the module that holds the crop worker function).')
+parser.add_argument('--num_workers', type=int, default=8,
+                    help='Pool size for the worker spawn measurement.')
+parser.add_argument('--start_methods', type=str, nargs='+', default=['spawn', 'forkserver', 'fork'],
+                    help='multiprocessing start methods to measure.')
+parser.add_argument('--repeats', type=int, default=5,
+                    help='Repeat each measurement this many times and report the median.')
+parser.add_argument('--output_json', type=str, default=None,
+                    help='Optional path to write the results as JSON.')
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def time_import(module_name):
+    # 새 Python 인터프리터에서 모듈 하나를 import하는 데 걸리는 시간(초)을 측정하는 함수
+    # 인터프리터 자체의 시작 시간은 빼기 위해 같은 방식으로 아무것도 import하지 않는 경우를 함께 측정한다
+    code = 'import time; start = time.perf_counter(); import %s; print(time.perf_counter() - start)' % (module_name)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+
+def import_worker_module(module_name):
+    # 풀 워커에서 실행하는 작업: 크롭 워커 함수가 있는 모듈을 import하고 PID를 반환한다
+    # (실제 크롭에서도 워커는 첫 tube를 받을 때 pickle된 함수를 찾기 위해 이 모듈을 import한다)
+    importlib.import_module(module_name)
+    return os.getpid()
+
+
+def time_pool_start(start_method, num_workers, module_name):
+    # start_method로 num_workers개의 워커를 띄우고, 모든 워커가 모듈을 import해서 첫 작업을 끝낼 때까지의 시간(초)을 측정하는 함수
+    # 워커마다 작업 하나씩 돌아가도록 같은 워커가 두 번 받으면 다시 보낸다
+    context = mp.get_context(start_method)
+    start = timer()
+    with context.Pool(processes=num_workers) as pool:
+        ready = set()
+        while len(ready) < num_workers:
+            ready.update(pool.map(import_worker_module, [module_name] * num_workers, chunksize=1))
+        elapsed = timer() - start
+    return elapsed
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    results = {'imports': {}, 'pool_start': {}}
+
+    print('=== Import time in a fresh interpreter (median of %d) ===' % (args.repeats))
+    for module_name in args.modules:
+        seconds = median([time_import(module_name) for _ in range(args.repeats)])
+        results['imports'][module_name] = seconds
+        print('%-24s %8.1f ms' % (module_name, seconds * 1000.0))
+
+    print('\n=== Pool start-up: %d workers importing %s (median of %d) ===' % (
+        args.num_workers, args.worker_module, args.repeats))
+    for start_method in args.start_methods:
+        if start_method not in mp.get_all_start_methods():
+            print('%-12s not available on this platform' % (start_method))
+            continue
+        seconds = median([time_pool_start(start_method, args.num_workers, args.worker_module)
+                          for _ in range(args.repeats)])
+        results['pool_start'][start_method] = seconds
+        print('%-12s %8.1f ms (%.1f ms per worker)' % (start_method, seconds * 1000.0, seconds * 1000.0 / args.num_workers))
+
+    if args.output_json:
+        os.makedirs(os.path.dirname(args.output_json) or '.', exist_ok=True)
+        with open(args.output_json, 'w') as fout:
+            json.dump(results, fout, indent=2)
+        print('Results saved to: %s' % (args.output_json))
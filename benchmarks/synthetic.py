@@ -0,0 +1,49 @@
+import os
+import random
+import subprocess
+
+
+def make_synthetic_video(output_path, width=1280, height=720, fps=30, duration=60.0, pattern='testsrc',
+                         vcodec='libx264', with_audio=True, gop=None):
+    # ffmpeg의 lavfi 소스로 합성 비디오를 만드는 함수 (YouTube 없이 로컬에서 벤치마크를 돌리기 위해 사용한다)
+    # output_path: 저장할 mp4 경로
+    # width, height: 해상도 (예: 1280x720, 1920x1080)
+    # fps: 초당 프레임 수
+    # duration: 길이(초), 기본값은 1분 세그먼트와 같은 60초이다
+    # pattern: lavfi 비디오 소스 이름 ('testsrc', 'testsrc2', 'mandelbrot' 등)
+    # vcodec: 원본 인코더, 'libx264'이면 크롭 시 원본 코덱이 'h264'로 인식된다
+    # with_audio: True이면 사인파 오디오 트랙을 추가한다
+    # gop: keyframe 간격(프레임 수, -g), None이면 인코더 기본값
+    # 반환값: output_path
+    if os.path.exists(output_path):
+        return output_path
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', '%s=size=%dx%d:rate=%d:duration=%s' % (pattern, width, height, fps, duration),
+    ]
+    if with_audio:
+        cmd += ['-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=44100:duration=%s' % (duration)]
+    cmd += ['-c:v', vcodec, '-pix_fmt', 'yuv420p']
+    if gop:
+        cmd += ['-g', str(gop)]
+    if with_audio:
+        cmd += ['-c:a', 'aac', '-shortest']
+    cmd.append(output_path)
+    subprocess.run(cmd, check=True)
+    return output_path
+
+
+def make_fake_tubes(video_name, height, width, num_tubes=4, num_frames=1800, tube_frames=360, crop_size=512, seed=0):
+    # 합성 비디오에 대한 가짜 tube 정보를 만드는 함수
+    # 반환값: tubes 파일과 같은 형식의 문자열 리스트
+    #         예) ['synth_0000, 720, 1280, 0, 359, 384, 104, 896, 616', ...]
+    rng = random.Random(seed)
+    crop_size = min(crop_size, height, width)
+    tubes = []
+    for _ in range(num_tubes):
+        S = rng.randint(0, max(0, num_frames - tube_frames))
+        E = min(num_frames - 1, S + tube_frames - 1)
+        L = rng.randint(0, width - crop_size)
+        T = rng.randint(0, height - crop_size)
+        tubes.append('%s, %d, %d, %d, %d, %d, %d, %d, %d' % (video_name, height, width, S, E, L, T, L + crop_size, T + crop_size))
+    return tubes
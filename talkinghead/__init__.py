@@ -0,0 +1,94 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+# TalkingHead-1KH 전처리 단계를 라이브러리로 사용하기 위한 패키지
+#   talkinghead.probe   : ffprobe로 비디오 정보(해상도, fps, 코덱, 비트레이트)를 읽는다
+#   talkinghead.plan    : tube 정보로 출력 파일명, crop 좌표, ffmpeg 출력 스트림을 정한다 (전체 tube의 plan 파일도 만든다)
+#   talkinghead.estimate: 세그먼트를 받지 않고 실행 전체의 작업량, 출력 크기, 임시 공간, 시간을 추정한다 (--dry_run)
+#   talkinghead.crop    : tube를 trim/crop해서 클립으로 인코딩한다 (단일 tube, asyncio 버전, 풀)
+#   talkinghead.quality : 크롭하는 필터 그래프에서 프레임 품질(밝기, 흐림, 움직임)을 분석해서 클립별로 요약한다
+#   talkinghead.audio   : 세그먼트의 tube들에서 오디오만 잘라서 wav/flac로 저장한다 (비디오는 디코딩하지 않는다)
+#   talkinghead.frame_store: 클립을 한 번 디코딩해서 고정 크기 uint8 프레임 배열로 저장하고 memmap으로 읽는다 (학습용)
+#   talkinghead.frame_reader: 클립별 keyframe 인덱스로 임의의 프레임을 가장 가까운 keyframe부터만 디코딩해서 읽는다 (학습용)
+#   talkinghead.split   : 원본 비디오를 1분 단위 세그먼트로 분할한다
+#   talkinghead.watch   : 다른 프로세스가 쓰고 있는 디렉토리에서 완성된 파일을 찾아서 도착하는 대로 처리한다 (--watch)
+#   talkinghead.download: yt-dlp 또는 로컬 디렉토리에서 원본 비디오를 받는다
+# 위 단계들이 함께 사용하는 모듈
+#   talkinghead.ffmpeg_runner : ffmpeg/ffprobe 실행(제한 시간, -progress 진행 상황, asyncio 버전)과 전체 진행률 표시
+#   talkinghead.rate_control  : 출력 비트레이트/품질 정책과 코덱별 인코더 옵션
+#   talkinghead.clip_output   : 출력 디렉토리 구조, 임시 파일, manifest, tar shard
+#   talkinghead.scheduler     : 크롭 풀의 워커 수와 ffmpeg 스레드 수 (auto 측정 포함)
+#   talkinghead.admission     : 메모리와 load를 보고 tube를 풀에 넣는 시점을 정한다
+#   talkinghead.affinity      : 같은 세그먼트의 tube를 묶어서 한 워커에 보내고 다음 세그먼트를 미리 읽는다
+#   talkinghead.async_executor: 하나의 asyncio 이벤트 루프에서 ffprobe/ffmpeg를 실행하는 executor
+#   talkinghead.temp_space    : 임시 파일 예산, 다운로드 prefetch, 세그먼트 staging 디렉토리
+#   talkinghead.pipeline_metrics: 단계별 시간, CPU 시간, 메모리 메트릭 기록
+# videos_crop.py, videos_split.py, videos_process_train.py, videos_export_frames.py는 명령줄 인자를 읽어서 이 함수들을 호출한다
+#
+# 패키지를 import해도 하위 모듈은 읽지 않고, 아래 이름을 처음 사용할 때 해당 모듈만 import한다
+# 예) from talkinghead import trim_and_crop_min_size  # talkinghead.crop과 그 의존 모듈만 import한다
+
+import importlib
+
+# 패키지에서 바로 가져올 수 있는 이름 -> 하위 모듈 이름
+_EXPORTS = {
+    'get_h_w': 'probe',
+    'get_fps': 'probe',
+    'get_video_codec': 'probe',
+    'get_video_bitrate': 'probe',
+    'get_video_info': 'probe',
+    'probe_video': 'probe',
+    'probe_video_async': 'probe',
+    'ProbeCache': 'probe',
+    'get_output_filename': 'plan',
+    'get_tube_frames': 'plan',
+    'get_tube_key': 'plan',
+    'get_chunks': 'plan',
+    'parse_output_size': 'plan',
+    'get_tube_timeout': 'plan',
+    'new_tube_record': 'plan',
+    'precheck_tube': 'plan',
+    'plan_tube': 'plan',
+    'resolve_tube': 'plan',
+    'build_tube_stream': 'plan',
+    'build_plan': 'plan',
+    'summarize_plan': 'plan',
+    'write_plan': 'plan',
+    'read_plan': 'plan',
+    'load_throughput_profile': 'estimate',
+    'estimate_tube': 'estimate',
+    'estimate_run': 'estimate',
+    'trim_and_crop_min_size': 'crop',
+    'trim_and_crop_async': 'crop',
+    'run_plan_row': 'crop',
+    'run_plan_row_async': 'crop',
+    'run_crop_pool': 'crop',
+    'read_frame_stats': 'quality',
+    'summarize_frame_stats': 'quality',
+    'DirectoryWatcher': 'watch',
+    'iter_arrived_tubes': 'watch',
+    'extract_audio_group': 'audio',
+    'extract_audio_group_async': 'audio',
+    'decode_clip': 'frame_store',
+    'FrameStore': 'frame_store',
+    'build_keyframe_index': 'frame_reader',
+    'KeyframeIndex': 'frame_reader',
+    'FrameReader': 'frame_reader',
+    'split_video': 'split',
+    'download_video': 'download',
+    'copy_local_video': 'download',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    # 모듈 속성을 찾지 못했을 때 호출된다 (PEP 562), 하위 모듈을 import해서 같은 이름을 반환한다
+    if name not in _EXPORTS:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    return getattr(importlib.import_module('%s.%s' % (__name__, _EXPORTS[name])), name)
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,203 @@
+import collections
+import os
+import queue
+
+from talkinghead.affinity import get_group_tubes
+from talkinghead.plan import get_clip_params
+
+
+# tube 하나를 처리하는 ffmpeg의 메모리 사용량 모델:
+#   기본 사용량 + 원본 픽셀당 바이트 수 x 원본 H x W + 프레임당 바이트 수 x tube 프레임 수
+# 디코더는 참조 프레임과 스레드별 프레임을 원본 해상도로 들고 있으므로 crop 크기가 아니라 원본 해상도에 비례한다
+# 긴 tube는 muxer의 패킷 인덱스와 오디오 버퍼가 프레임 수에 비례해서 늘어난다
+# 픽셀당 바이트 수는 처음에는 아래 기본값을 사용하고, 끝난 tube의 실제 최대 RSS(peak_rss_bytes)를 보고 늘린다
+# 예) 1080p 300프레임: 64MB + 48 x 1920 x 1080 + 16KB x 300 = 약 165MB, 4K: 64MB + 48 x 3840 x 2160 + 5MB = 약 465MB
+FFMPEG_BASE_RSS = 64 * 1024 * 1024
+DEFAULT_BYTES_PER_PIXEL = 48.0
+BYTES_PER_FRAME = 16 * 1024
+# 자손 프로세스 중 메모리를 예측하는 대상 (풀 워커는 tube와 관계없이 일정한 메모리를 쓰므로 제외한다)
+ENCODER_PROCESS_NAMES = ('ffmpeg', 'ffprobe')
+
+
+def read_meminfo():
+    # /proc/meminfo를 읽어서 {'MemTotal': 바이트, 'MemAvailable': 바이트, ...}를 반환하는 함수
+    # Linux가 아니라서 /proc/meminfo가 없으면 빈 딕셔너리를 반환한다
+    meminfo = {}
+    try:
+        with open('/proc/meminfo') as fin:
+            for line in fin:
+                key, _, value = line.partition(':')
+                fields = value.split()
+                if fields:
+                    # 값은 kB 단위이다 (예: 'MemAvailable:   12345678 kB')
+                    meminfo[key] = int(fields[0]) * 1024
+    except OSError:
+        pass
+    return meminfo
+
+
+def get_available_memory():
+    # 새 프로세스가 스왑 없이 사용할 수 있는 메모리(MemAvailable, 바이트)를 반환하는 함수, 알 수 없으면 None
+    return read_meminfo().get('MemAvailable')
+
+
+def get_children_rss(names=ENCODER_PROCESS_NAMES):
+    # 이 프로세스의 자손 프로세스 중 이름이 names에 있는 프로세스(워커가 실행한 ffmpeg/ffprobe)의 RSS 합(바이트)을 반환하는 함수
+    # 풀 워커(Python)는 실행 중인 tube와 관계없이 메모리를 쓰므로 포함하면 tube의 예상 RSS가 이미 반영된 것처럼 보인다
+    # names: 포함할 프로세스 이름 (/proc/<pid>/stat의 두 번째 필드), None이면 모든 자손
+    # /proc/<pid>/stat에서 부모 PID를 읽어서 프로세스 트리를 만든 후, 자손의 /proc/<pid>/statm에서 RSS를 읽는다
+    # /proc이 없으면 0을 반환한다
+    parents = {}
+    process_names = {}
+    try:
+        pids = [int(name) for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return 0
+    for pid in pids:
+        try:
+            with open('/proc/%d/stat' % (pid)) as fin:
+                # 두 번째 필드(프로세스 이름)에 공백이나 괄호가 들어갈 수 있으므로 마지막 ')' 뒤부터 나눈다
+                head, _, tail = fin.read().rpartition(')')
+        except OSError:
+            # 읽는 도중에 종료된 프로세스이다
+            continue
+        fields = tail.split()
+        parents.setdefault(int(fields[1]), []).append(pid)
+        process_names[pid] = head.partition('(')[2]
+
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    stack = list(parents.get(os.getpid(), []))
+    while stack:
+        pid = stack.pop()
+        stack.extend(parents.get(pid, []))
+        if names is not None and process_names.get(pid) not in names:
+            continue
+        try:
+            with open('/proc/%d/statm' % (pid)) as fin:
+                total += int(fin.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def get_tube_cost(clip_params):
+    # tube 하나의 예상 처리 비용(원본 H x W x 프레임 수)을 반환하는 함수
+    # 크롭 작업은 원본 전체 프레임을 디코딩하므로 crop 크기가 아니라 원본 해상도에 비례한다
+    # clip_params: tube 정보 문자열 또는 plan row
+    fields = get_clip_params(clip_params).split(',')
+    return int(fields[1]) * int(fields[2]) * (int(fields[4]) - int(fields[3]) + 1)
+
+
+class AdmissionController:
+    # 메모리와 CPU 여유가 있을 때만 새 tube를 풀에 넣는 클래스
+    # 풀 크기(max_workers)는 동시에 실행할 수 있는 tube 수의 상한이고, 실제 동시 실행 수는 아래 조건으로 정해진다
+    #   - 메모리: MemAvailable - memory_reserve - (실행 중인 tube의 예상 RSS 중 아직 자손 RSS에 반영되지 않은 부분) >= 새 tube의 예상 RSS
+    #   - CPU: 1분 평균 load가 max_load 미만
+    # 실행 중인 tube가 없으면 조건과 관계없이 하나는 넣는다 (항상 진행되도록)
+    # 작업 단위는 tube 하나 또는 affinity.TubeGroup(같은 세그먼트의 tube 묶음, 같은 원본 해상도)이다
+    #
+    # 사용 예)
+    #   admission = AdmissionController(max_workers=32)
+    #   for tube in admission.order(tubes):       # 비용이 큰 tube부터
+    #       while not admission.admit(tube): ...  # 실행 중인 tube가 끝나기를 기다린다
+    #       ... 풀에 tube를 넣는다 ...
+    #   admission.release(tube, record)           # tube가 끝나면 호출한다
+
+    def __init__(self, max_workers, memory_reserve=1024 * 1024 * 1024, max_load=None):
+        # max_workers: 동시에 실행할 tube 수의 상한 (풀 크기)
+        # memory_reserve: 항상 남겨둘 메모리(바이트), 운영체제와 다른 프로세스를 위한 여유분
+        # max_load: 1분 평균 load의 상한, None이면 사용할 수 있는 CPU 수
+        self.max_workers = max_workers
+        self.memory_reserve = memory_reserve
+        if max_load is None:
+            try:
+                max_load = len(os.sched_getaffinity(0))
+            except AttributeError:
+                max_load = os.cpu_count() or 1
+        self.max_load = max_load
+        self.bytes_per_pixel = DEFAULT_BYTES_PER_PIXEL
+        # 실행 중인 작업의 (작업, 예상 RSS) 목록 (tubes 파일에 같은 줄이 여러 번 있을 수 있으므로 리스트로 관리한다)
+        self.running = []
+        # 메모리/CPU 여유가 없어서 대기한 횟수 (통계용)
+        self.memory_waits = 0
+        self.load_waits = 0
+
+    def order(self, items):
+        # 비용(원본 H x W x 프레임 수)이 큰 작업부터 처리하도록 정렬한다
+        # 큰 작업을 나중에 처리하면 마지막에 큰 작업 하나만 남아서 나머지 워커가 노는 시간이 길어진다
+        return sorted(items, key=lambda item: sum(get_tube_cost(tube) for tube in get_group_tubes(item)), reverse=True)
+
+    def estimate_rss(self, item):
+        # 작업을 처리하는 ffmpeg의 예상 최대 RSS(바이트)를 반환한다 (원본 해상도와 tube 프레임 수로 계산한다)
+        # TubeGroup은 tube를 하나씩 차례대로 처리하므로 ffmpeg도 한 번에 하나만 실행된다 (가장 큰 tube 기준)
+        return max(self.estimate_tube_rss(tube) for tube in get_group_tubes(item))
+
+    def estimate_tube_rss(self, tube):
+        fields = get_clip_params(tube).split(',')
+        frames = int(fields[4]) - int(fields[3]) + 1
+        return FFMPEG_BASE_RSS + self.bytes_per_pixel * int(fields[1]) * int(fields[2]) + BYTES_PER_FRAME * frames
+
+    def admit(self, item):
+        # 지금 작업을 풀에 넣어도 되는지 확인하고, 넣어도 되면 실행 중으로 기록한 후 True를 반환한다
+        if len(self.running) >= self.max_workers:
+            return False
+        estimate = self.estimate_rss(item)
+        if self.running:
+            available = get_available_memory()
+            if available is not None:
+                # 방금 시작한 ffmpeg는 아직 메모리를 다 쓰지 않았으므로, 예상 RSS 중 자손 RSS에 반영되지 않은 만큼을 빼고 계산한다
+                pending = max(0, sum(rss for _, rss in self.running) - get_children_rss())
+                if available - self.memory_reserve - pending < estimate:
+                    self.memory_waits += 1
+                    return False
+            if os.getloadavg()[0] >= self.max_load:
+                self.load_waits += 1
+                return False
+        self.running.append((item, estimate))
+        return True
+
+    def release(self, item, result=None):
+        # 작업이 끝났을 때 호출한다
+        # item: admit()에 넘긴 작업
+        # result: 작업의 결과 (trim_and_crop_min_size()가 반환한 record 또는 TubeGroup의 record 리스트, 실패하면 None)
+        #         peak_rss_bytes가 있으면 실제 사용량으로 픽셀당 바이트 수를 갱신한다 (지금까지 본 것 중 최댓값)
+        for i, (running_item, _) in enumerate(self.running):
+            if running_item == item:
+                del self.running[i]
+                break
+        records = result if isinstance(result, list) else [result] if isinstance(result, dict) else []
+        for record in records:
+            # 기본 사용량과 프레임 수에 비례하는 부분을 뺀 나머지를 원본 해상도에 비례하는 부분으로 본다
+            fixed_rss = FFMPEG_BASE_RSS + BYTES_PER_FRAME * record['frames']
+            peak_rss = record['peak_rss_bytes']
+            if peak_rss > fixed_rss:
+                pixels = record['H'] * record['W']
+                self.bytes_per_pixel = max(self.bytes_per_pixel, (peak_rss - fixed_rss) / float(pixels))
+
+
+def imap_admitted(pool, func, items, admission, poll_interval=0.2):
+    # pool.imap_unordered(func, items)와 같지만 admission이 허락할 때만 작업을 풀에 넣는 제너레이터
+    # pool: mp.Pool (크기는 admission.max_workers 이상이어야 한다)
+    # func: 작업(tube 정보 문자열 또는 TubeGroup) 하나를 받는 함수 (trim_and_crop_min_size 또는 crop_tube_group의 partial)
+    # admission: AdmissionController
+    # poll_interval: 여유가 없어서 기다릴 때 메모리와 load를 다시 확인하는 간격(초)
+    # 반환값: 끝난 순서대로 func의 결과를 하나씩 돌려준다
+    results = queue.Queue()
+    pending = collections.deque(admission.order(items))
+    running = 0
+    while pending or running:
+        while pending and admission.admit(pending[0]):
+            item = pending.popleft()
+            pool.apply_async(func, (item,), callback=lambda result, item=item: results.put((item, result)),
+                             error_callback=lambda error, item=item: results.put((item, error)))
+            running += 1
+        try:
+            item, result = results.get(timeout=poll_interval)
+        except queue.Empty:
+            continue
+        running -= 1
+        if isinstance(result, BaseException):
+            raise result
+        admission.release(item, result)
+        yield result
@@ -0,0 +1,84 @@
+import collections
+import os
+
+from talkinghead.plan import get_clip_params
+
+
+# 같은 1분 세그먼트의 tube 묶음이다
+# tubes: 세그먼트 안에서 시작 프레임(S) 순서로 정렬한 tube 정보 문자열 리스트
+# prefetch_filepath: 이 묶음을 시작할 때 미리 읽기를 요청할 세그먼트 파일 경로 (뒤에 남은 묶음이 없으면 None)
+TubeGroup = collections.namedtuple('TubeGroup', ['tubes', 'prefetch_filepath'])
+
+
+def group_tubes_by_segment(tubes, input_dir, order=None, num_workers=1):
+    # tube들을 세그먼트(video_name)별로 묶는 함수
+    # 같은 세그먼트의 tube가 한 워커에서 연달아 처리되므로 세그먼트 파일을 한 번만 디스크에서 읽고 나머지는 page cache에서 읽는다
+    # (파일 순서대로 나눠주면 여러 워커가 같은 세그먼트를 서로 다른 시점에 읽어서 서로의 캐시를 밀어낸다)
+    # tubes: tube 정보 문자열 리스트 또는 plan row 리스트
+    # input_dir: 세그먼트 파일('{video_name}.mp4')이 있는 디렉토리 (plan row는 row의 input_filepath를 사용한다)
+    # order: 묶음 리스트를 받아서 처리 순서대로 정렬해 반환하는 함수 (예: AdmissionController.order), None이면 세그먼트가 처음 나온 순서
+    # num_workers: 묶음을 동시에 처리하는 워커 수 (풀 크기)
+    # 반환값: TubeGroup 리스트 (묶음 안에서는 시작 프레임 순서)
+    #         각 묶음의 prefetch_filepath는 처리 순서상 num_workers개 뒤의 묶음의 세그먼트 파일이다
+    #         묶음 i를 시작할 때 i+1 ~ i+num_workers-1번째 묶음은 이미 다른 워커가 읽고 있으므로,
+    #         그 다음에 워커에 들어갈 묶음을 미리 읽어야 실제로 디스크 읽기가 앞당겨진다
+    segments = collections.OrderedDict()
+    for tube in tubes:
+        segments.setdefault(get_clip_params(tube).split(',')[0].strip(), []).append(tube)
+    groups = [TubeGroup(sorted(segment_tubes, key=lambda tube: int(get_clip_params(tube).split(',')[3])), None)
+              for segment_tubes in segments.values()]
+    if order is not None:
+        groups = order(groups)
+    linked = []
+    for i, group in enumerate(groups):
+        prefetch_filepath = None
+        if i + num_workers < len(groups):
+            next_tube = groups[i + num_workers].tubes[0]
+            if isinstance(next_tube, dict):
+                prefetch_filepath = next_tube['input_filepath']
+            else:
+                prefetch_filepath = os.path.join(input_dir, next_tube.split(',')[0].strip() + '.mp4')
+        linked.append(TubeGroup(group.tubes, prefetch_filepath))
+    return linked
+
+
+def prefetch_file(filepath):
+    # 파일을 page cache로 미리 읽어 오도록 커널에 요청하는 함수 (posix_fadvise WILLNEED)
+    # 읽기는 커널이 백그라운드에서 수행하므로 바로 반환되고, 파일을 닫아도 요청은 유지된다
+    # 반환값: 요청했으면 True, 파일이 없거나 지원하지 않는 플랫폼이면 False
+    try:
+        fd = os.open(filepath, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        return True
+    except (AttributeError, OSError):
+        return False
+    finally:
+        os.close(fd)
+
+
+def get_group_tubes(item):
+    # 작업 단위(tube 하나 또는 TubeGroup)에 들어 있는 tube(정보 문자열 또는 plan row) 리스트를 반환하는 함수
+    return list(item.tubes) if isinstance(item, TubeGroup) else [item]
+
+
+def crop_tube_group(worker, group):
+    # TubeGroup의 tube들을 한 워커에서 차례대로 처리하는 함수 (mp.Pool 워커에서 실행된다)
+    # worker: trim_and_crop_min_size의 partial
+    # 첫 tube를 인코딩하는 동안 다음 세그먼트를 미리 읽어 둔다
+    # 반환값: record 리스트
+    if group.prefetch_filepath is not None:
+        prefetch_file(group.prefetch_filepath)
+    return [worker(tube) for tube in group.tubes]
+
+
+async def crop_tube_group_async(worker, group):
+    # crop_tube_group()의 asyncio 버전 (worker: trim_and_crop_async의 partial)
+    if group.prefetch_filepath is not None:
+        prefetch_file(group.prefetch_filepath)
+    records = []
+    for tube in group.tubes:
+        records.append(await worker(tube))
+    return records
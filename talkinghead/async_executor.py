@@ -0,0 +1,115 @@
+import asyncio
+import queue
+import threading
+
+
+# 이벤트 루프 스레드가 모든 작업을 끝냈다는 표시이다
+_DONE = object()
+
+
+class AsyncExecutor:
+    # 하나의 asyncio 이벤트 루프에서 ffprobe/ffmpeg 같은 자식 프로세스를 직접 실행하는 executor
+    # mp.Pool은 워커마다 Python 인터프리터(수십 MB)를 띄우고 워커는 ffmpeg가 끝나기를 기다리기만 한다
+    # 이 executor는 메인 프로세스의 스레드 하나에서 이벤트 루프를 돌리고, 세마포어로 동시에 실행하는 작업 수를 제한한다
+    # tube 계획(crop 좌표, 인코더 옵션 계산)은 메인 프로세스 안에서 수행하고 ffprobe/ffmpeg만 자식 프로세스로 실행된다
+    #
+    # 사용 예)
+    #   executor = AsyncExecutor(concurrency=32)
+    #   for record in executor.imap_unordered(trim_and_crop_async_partial, tubes):
+    #       ...
+
+    def __init__(self, concurrency):
+        # concurrency: 동시에 실행할 작업(tube) 수
+        self.concurrency = concurrency
+
+    def imap_unordered(self, func, items, admission=None, poll_interval=0.2):
+        # mp.Pool.imap_unordered()처럼 끝난 순서대로 결과를 하나씩 돌려주는 제너레이터
+        # func: item 하나를 받는 async 함수 (예: trim_and_crop_async의 partial)
+        # items: 작업 목록 또는 작업을 차례로 돌려주는 iterable (watch 모드처럼 다음 작업을 기다리는 제너레이터도 된다)
+        #        리스트가 아니면 이벤트 루프가 멈추지 않도록 다음 작업을 별도 스레드에서 꺼낸다 (admission은 리스트에서만 사용한다)
+        # admission: AdmissionController이면 메모리/CPU 여유가 있을 때만 작업을 시작한다 (admission.imap_admitted()와 같다)
+        # poll_interval: admission이 허락하지 않을 때 다시 확인하는 간격(초)
+        # 작업에서 예외가 발생하면 남은 작업을 모두 취소하고(실행 중인 ffprobe/ffmpeg는 kill된다) 호출한 쪽에서 같은 예외를 발생시킨다
+        # 호출한 쪽이 중간에 루프를 빠져나가도(제너레이터가 닫혀도) 같은 방법으로 남은 작업을 정리한다
+        results = queue.Queue()
+        # 이벤트 루프 스레드의 루프와 run_all() 작업 (다른 스레드에서 취소할 때 사용한다)
+        runner = {}
+        if admission is not None:
+            items = admission.order(items)
+        streaming = not isinstance(items, list)
+        iterator = iter(items)
+        # 남은 작업을 모두 끝내거나 취소한 후에 설정된다
+        stopped = threading.Event()
+
+        async def run_one(semaphore, item):
+            try:
+                result = await func(item)
+            except Exception as e:
+                result = e
+            finally:
+                semaphore.release()
+            # admission은 이벤트 루프 스레드에서만 사용한다 (admit()과 release()가 동시에 실행되지 않도록)
+            if admission is not None:
+                admission.release(item, result)
+            results.put(result)
+
+        async def run_all():
+            # 세마포어를 먼저 얻은 후에 작업을 만들므로, 작업이 많아도 동시에 존재하는 작업은 concurrency개 이하이다
+            semaphore = asyncio.Semaphore(self.concurrency)
+            loop = asyncio.get_running_loop()
+            runner['loop'] = loop
+            runner['task'] = asyncio.current_task()
+            tasks = set()
+            try:
+                while True:
+                    await semaphore.acquire()
+                    if streaming:
+                        item = await loop.run_in_executor(None, next, iterator, _DONE)
+                    else:
+                        item = next(iterator, _DONE)
+                    if item is _DONE:
+                        semaphore.release()
+                        break
+                    if admission is not None:
+                        while not admission.admit(item):
+                            await asyncio.sleep(poll_interval)
+                    task = asyncio.ensure_future(run_one(semaphore, item))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                if tasks:
+                    await asyncio.wait(tasks)
+            except asyncio.CancelledError:
+                # 실행 중인 작업을 취소하고 끝날 때까지 기다린다 (작업이 자식 프로세스를 kill하고 기다린다)
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            finally:
+                stopped.set()
+
+        def run_loop():
+            try:
+                asyncio.run(run_all())
+            finally:
+                stopped.set()
+                results.put(_DONE)
+
+        def cancel():
+            # 이벤트 루프 스레드에 취소를 요청하고 남은 작업이 정리될 때까지 기다린다
+            # (watch 모드에서 다음 작업을 기다리는 스레드는 기다리지 않는다)
+            if 'task' in runner and not stopped.is_set():
+                runner['loop'].call_soon_threadsafe(runner['task'].cancel)
+            stopped.wait()
+
+        thread = threading.Thread(target=run_loop, daemon=True)
+        thread.start()
+        try:
+            while True:
+                result = results.get()
+                if result is _DONE:
+                    break
+                if isinstance(result, BaseException):
+                    raise result
+                yield result
+        finally:
+            cancel()
+        thread.join()
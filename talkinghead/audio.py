@@ -0,0 +1,228 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import os
+from time import time as timer
+
+from talkinghead.clip_output import get_temp_filepath
+from talkinghead.ffmpeg_runner import FFmpegTimeout, get_error_message, run_ffmpeg, run_ffmpeg_async
+from talkinghead.pipeline_metrics import children_cpu_seconds
+from talkinghead.affinity import TubeGroup, get_group_tubes, prefetch_file
+from talkinghead.crop import commit_outputs, remove_temp_outputs
+from talkinghead.plan import get_tube_timeout, new_tube_record, precheck_tube
+from talkinghead.probe import probe_video, probe_video_async
+
+# --audio_only 출력 형식 -> ffmpeg 오디오 인코더
+AUDIO_CODECS = {'wav': 'pcm_s16le', 'flac': 'flac'}
+
+
+def new_audio_record(output_dir, clip_params, output_layout='flat', audio_format='wav'):
+    # tube의 오디오 출력 record를 만드는 함수 (new_tube_record()와 같고 출력 파일의 확장자만 오디오 형식이다)
+    # 예) '--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.wav'
+    record = new_tube_record(output_dir, clip_params, output_layout)
+    record['output_filepath'] = os.path.splitext(record['output_filepath'])[0] + '.' + audio_format
+    return record
+
+
+def resolve_audio(record, video_info, min_duration=0.0, audio_format='wav', sample_rate=16000, audio_channels=1):
+    # probe 결과로 tube의 오디오 구간을 정해서 record에 채우는 함수 (resolve_tube()의 오디오 버전)
+    # 시작 시각은 S / fps, 길이는 (E - S + 1) / fps로 trim_and_crop_min_size의 atrim과 같다
+    # 반환값: 건너뛴 사유 ('too_short', 'no_audio'), 처리해야 하면 None
+    video_name, S, E = record['video_name'], record['S'], record['E']
+    fps = video_info['fps']
+    record['fps'] = fps
+    duration = (E - S + 1) / fps
+    if min_duration > 0.0 and duration < min_duration:
+        print('Skipping %s: video duration (%.2f seconds) is shorter than %.2f seconds' % (video_name, duration, min_duration))
+        return 'too_short'
+    if not video_info.get('has_audio', True):
+        print('Skipping %s: no audio stream' % (video_name))
+        return 'no_audio'
+    # 오디오 출력에는 crop이 없다 (manifest의 params에는 None으로 기록된다)
+    record['crop'] = None
+    record['duration'] = duration
+    record['seek'] = S / fps
+    record['has_audio'] = True
+    record['audio_format'] = audio_format
+    record['sample_rate'] = sample_rate
+    record['audio_channels'] = audio_channels or None
+    return None
+
+
+def build_audio_stream(records, input_filepath, threads=0, filter_threads=0):
+    # 같은 세그먼트의 tube들을 ffmpeg 한 번으로 오디오 파일로 자르는 출력 스트림을 만드는 함수
+    # -vn 입력 옵션으로 비디오 스트림을 연결하지 않으므로 비디오는 demux만 하고 디코딩하지 않는다
+    # -t로 마지막 tube가 끝나는 시각까지만 읽고, a:0을 asplit으로 tube 수만큼 나눠서 tube마다 atrim한다
+    # records: resolve_audio()로 채운 record 리스트 (같은 input_filepath)
+    import ffmpeg
+
+    input_kwargs = {'vn': None, 't': max(record['seek'] + record['duration'] for record in records)}
+    if threads:
+        input_kwargs['threads'] = threads
+    audio = ffmpeg.input(input_filepath, **input_kwargs)['a:0']
+    audios = audio.filter_multi_output('asplit', len(records)) if len(records) > 1 else [audio]
+    outputs = []
+    for i, record in enumerate(records):
+        trimmed = audios[i].filter('atrim', start=record['seek'], duration=record['duration']).filter('asetpts', 'PTS-STARTPTS')
+        output_kwargs = {'acodec': AUDIO_CODECS[record['audio_format']], 'ar': record['sample_rate']}
+        if record['audio_channels']:
+            output_kwargs['ac'] = record['audio_channels']
+        outputs.append(ffmpeg.output(trimmed, get_temp_filepath(record['output_filepath']), **output_kwargs))
+    stream = ffmpeg.merge_outputs(*outputs)
+    if filter_threads:
+        stream = stream.global_args('-filter_threads', str(filter_threads), '-filter_complex_threads', str(filter_threads))
+    return stream
+
+
+def start_audio_group(input_dir, output_dir, group, output_layout='flat', check_exists=True, audio_format='wav'):
+    # 세그먼트 하나의 tube들로 record를 만들고 파일 존재 여부로 건너뛸 tube를 걸러내는 함수
+    # 다음 세그먼트가 있으면(affinity.TubeGroup) 미리 읽기 시작한다
+    # 반환값: (모든 record, 처리할 record, 세그먼트 파일 경로 - 처리할 record가 없으면 None)
+    #         건너뛴 tube의 precheck_tube()는 경로로 None을 반환하므로 처리할 첫 record의 경로를 사용한다
+    if isinstance(group, TubeGroup) and group.prefetch_filepath is not None:
+        prefetch_file(group.prefetch_filepath)
+    records = [new_audio_record(output_dir, tube, output_layout, audio_format) for tube in get_group_tubes(group)]
+    pending = []
+    input_filepath = None
+    for record in records:
+        record_filepath, reason = precheck_tube(record, input_dir, check_exists)
+        record['reason'] = reason
+        if reason is None:
+            pending.append(record)
+            if input_filepath is None:
+                input_filepath = record_filepath
+    return records, pending, input_filepath
+
+
+def finish_audio_group(records, status, reason=None, error=None):
+    # record들에 같은 처리 결과를 채우는 함수 (세그먼트 하나를 ffmpeg 한 번으로 처리하므로 결과도 같다)
+    for record in records:
+        record['status'] = status
+        record['reason'] = reason
+        record['error'] = error
+
+
+def share_audio_seconds(records, probe_seconds, encode_seconds, cpu_seconds, wall_seconds):
+    # 세그먼트 하나에 걸린 시간을 tube들에 나눠서 기록하는 함수 (합계가 실제 시간과 같도록)
+    for record in records:
+        record['probe_seconds'] = probe_seconds / len(records)
+        record['encode_seconds'] = encode_seconds / len(records)
+        record['cpu_seconds'] = cpu_seconds / len(records)
+        record['wall_seconds'] = wall_seconds / len(records)
+    if probe_seconds:
+        records[0]['probe_count'] = 1
+
+
+def extract_audio_group(input_dir, output_dir, group, audio_format='wav', sample_rate=16000, audio_channels=1,
+                        min_duration=0.0, output_layout='flat', check_exists=True, tube_timeout=120.0,
+                        tube_timeout_per_frame=0.5, threads=0, filter_threads=0):
+    # 같은 세그먼트의 tube들에서 오디오(a:0)만 잘라서 tube마다 wav/flac 파일로 저장하는 함수 (--audio_only)
+    # 세그먼트마다 ffprobe와 ffmpeg를 한 번씩만 실행하고, 비디오 프레임은 디코딩하지 않는다
+    # group: 같은 세그먼트의 tube 정보 문자열 리스트 또는 affinity.TubeGroup (run_crop_pool에서 affinity로 묶어서 넘긴다)
+    # audio_format: 'wav'(16비트 PCM) 또는 'flac'
+    # sample_rate: 출력 샘플레이트(Hz), audio_channels: 출력 채널 수 (0이면 원본 그대로)
+    # 나머지 인자는 trim_and_crop_min_size와 같다 (제한 시간은 세그먼트의 tube 프레임 수 합계로 계산한다)
+    # 반환값: tube 순서대로 record 리스트 (trim_and_crop_min_size의 반환값과 같은 항목)
+    #         건너뛴 사유에 'no_audio'(오디오 스트림이 없는 세그먼트)가 추가된다
+    start = timer()
+    cpu_start = children_cpu_seconds()
+    records, pending, input_filepath = start_audio_group(input_dir, output_dir, group, output_layout, check_exists,
+                                                         audio_format)
+    for record in records:
+        if record['reason'] is not None:
+            finish_audio_group([record], 'skipped', record['reason'])
+    probe_seconds = encode_seconds = 0.0
+    if pending:
+        probe_start = timer()
+        try:
+            video_info = probe_video(input_filepath,
+                                     timeout=get_tube_timeout(0, tube_timeout, tube_timeout_per_frame))
+        except Exception as e:
+            timeout = isinstance(e, FFmpegTimeout)
+            print('%s %s: %s' % ('Timeout' if timeout else 'Failed', input_filepath, get_error_message(e)))
+            finish_audio_group(pending, 'timeout' if timeout else 'failed', 'probe', None if timeout else get_error_message(e))
+            pending = []
+        probe_seconds = timer() - probe_start
+    runnable = []
+    for record in pending:
+        reason = resolve_audio(record, video_info, min_duration, audio_format, sample_rate, audio_channels)
+        if reason is not None:
+            finish_audio_group([record], 'skipped', reason)
+        else:
+            runnable.append(record)
+    if runnable:
+        stream = build_audio_stream(runnable, input_filepath, threads=threads, filter_threads=filter_threads)
+        encode_start = timer()
+        try:
+            run_ffmpeg(stream, overwrite_output=True,
+                       timeout=get_tube_timeout(sum(record['frames'] for record in runnable), tube_timeout,
+                                                tube_timeout_per_frame))
+            for record in runnable:
+                commit_outputs(record)
+            finish_audio_group(runnable, 'ok')
+        except Exception as e:
+            for record in runnable:
+                remove_temp_outputs(record)
+            if isinstance(e, FFmpegTimeout):
+                print('Timeout %s: %s' % (input_filepath, e))
+                finish_audio_group(runnable, 'timeout', 'encode')
+            else:
+                finish_audio_group(runnable, 'failed', 'encode', get_error_message(e))
+        encode_seconds = timer() - encode_start
+    share_audio_seconds(records, probe_seconds, encode_seconds, children_cpu_seconds() - cpu_start, timer() - start)
+    return records
+
+
+async def extract_audio_group_async(input_dir, output_dir, group, audio_format='wav', sample_rate=16000,
+                                    audio_channels=1, min_duration=0.0, output_layout='flat', check_exists=True,
+                                    tube_timeout=120.0, tube_timeout_per_frame=0.5, threads=0, filter_threads=0):
+    # extract_audio_group()의 asyncio 버전 (인자와 반환값이 같다, cpu_seconds는 ffmpeg 프로세스의 CPU 시간)
+    start = timer()
+    records, pending, input_filepath = start_audio_group(input_dir, output_dir, group, output_layout, check_exists,
+                                                         audio_format)
+    for record in records:
+        if record['reason'] is not None:
+            finish_audio_group([record], 'skipped', record['reason'])
+    probe_seconds = encode_seconds = cpu_seconds = 0.0
+    if pending:
+        probe_start = timer()
+        try:
+            video_info = await probe_video_async(input_filepath,
+                                                 timeout=get_tube_timeout(0, tube_timeout, tube_timeout_per_frame))
+        except Exception as e:
+            timeout = isinstance(e, FFmpegTimeout)
+            print('%s %s: %s' % ('Timeout' if timeout else 'Failed', input_filepath, get_error_message(e)))
+            finish_audio_group(pending, 'timeout' if timeout else 'failed', 'probe', None if timeout else get_error_message(e))
+            pending = []
+        probe_seconds = timer() - probe_start
+    runnable = []
+    for record in pending:
+        reason = resolve_audio(record, video_info, min_duration, audio_format, sample_rate, audio_channels)
+        if reason is not None:
+            finish_audio_group([record], 'skipped', reason)
+        else:
+            runnable.append(record)
+    if runnable:
+        stream = build_audio_stream(runnable, input_filepath, threads=threads, filter_threads=filter_threads)
+        encode_start = timer()
+        try:
+            result = await run_ffmpeg_async(stream, overwrite_output=True,
+                                            timeout=get_tube_timeout(sum(record['frames'] for record in runnable),
+                                                                     tube_timeout, tube_timeout_per_frame))
+            for record in runnable:
+                commit_outputs(record)
+            finish_audio_group(runnable, 'ok')
+            cpu_seconds = result['cpu_seconds']
+        except Exception as e:
+            for record in runnable:
+                remove_temp_outputs(record)
+            if isinstance(e, FFmpegTimeout):
+                print('Timeout %s: %s' % (input_filepath, e))
+                finish_audio_group(runnable, 'timeout', 'encode')
+            else:
+                finish_audio_group(runnable, 'failed', 'encode', get_error_message(e))
+        encode_seconds = timer() - encode_start
+    share_audio_seconds(records, probe_seconds, encode_seconds, cpu_seconds, timer() - start)
+    return records
+
@@ -0,0 +1,357 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+import time
+
+
+# sidecar JSON과 manifest의 params에 저장하는 tube 파라미터 항목이다
+# trim_and_crop_min_size()가 반환하는 record에서 이 항목들만 골라서 저장한다 (타이밍 등 실행 통계는 제외)
+TUBE_PARAM_KEYS = ('video_name', 'H', 'W', 'S', 'E', 'L', 'T', 'R', 'B', 'crop', 'fps')
+# 출력 manifest 파일 이름이다. output_dir 바로 아래에 JSONL 형식으로 저장된다.
+MANIFEST_FILENAME = 'manifest.jsonl'
+# ffmpeg가 인코딩 중인 임시 파일의 접미사이다.
+# 인코딩이 끝나면 최종 파일명으로 rename되므로, 이 접미사를 가진 파일은 항상 미완성 파일이다.
+TEMP_SUFFIX = '.part.mp4'
+# 임시 파일명에서 확장자 앞에 붙는 표시이다 (오디오 출력은 '.part.wav' 등)
+TEMP_MARKER = '.part'
+# shard 인덱스 파일 이름이다. output_dir 바로 아래에 JSONL 형식으로 저장된다.
+SHARD_INDEX_FILENAME = 'shards_index.jsonl'
+# shard 파일 이름 패턴이다. 예) 'shard-000000.tar', 'shard-000001.tar', ...
+SHARD_NAME_FORMAT = 'shard-%06d.tar'
+# 실패한 tube를 기록하는 재시도 파일의 기본 이름이다. output_dir 바로 아래에 tubes 파일과 같은 형식으로 저장된다.
+RETRY_FILENAME = 'retry_tubes.txt'
+
+
+def get_output_subdir(output_filename, output_layout='flat'):
+    # 출력 파일이 저장될 하위 디렉토리(output_dir 기준 상대 경로)를 반환하는 함수
+    # output_filename: 출력 파일명 (예: '--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4')
+    # output_layout: 'flat'이면 output_dir 바로 아래에 저장한다 (기존 방식)
+    #                'hashed'이면 파일명의 md5 해시 앞 4글자로 2단계 디렉토리를 만든다
+    #                예) md5가 '3fa9...'이면 '3f/a9' 아래에 저장된다 (디렉토리당 파일 수가 1/65536로 줄어든다)
+    if output_layout == 'flat':
+        return ''
+    digest = hashlib.md5(output_filename.encode('utf-8')).hexdigest()
+    return os.path.join(digest[:2], digest[2:4])
+
+
+def get_temp_filepath(output_filepath):
+    # 출력 파일과 같은 디렉토리에 있는 임시 파일 경로를 반환하는 함수
+    # 같은 디렉토리(같은 파일시스템)에 있어야 os.replace()가 원자적으로 동작한다
+    # 예) 'out/3f/a9/clip.mp4' → 'out/3f/a9/.clip.part.mp4', 'out/clip.wav' → 'out/.clip.part.wav'
+    # 확장자를 유지해서 ffmpeg가 출력 포맷을 자동으로 결정할 수 있게 한다
+    output_dir, output_filename = os.path.split(output_filepath)
+    stem, ext = os.path.splitext(output_filename)
+    return os.path.join(output_dir, '.' + stem + TEMP_MARKER + ext)
+
+
+def sweep_temp_files(output_dir):
+    # 이전 실행에서 중단된 인코딩의 임시 파일을 모두 삭제하는 함수 (시작할 때 한 번 호출한다)
+    # output_dir: 출력 디렉토리 경로 (hashed 레이아웃의 하위 디렉토리까지 모두 확인한다)
+    # 반환값: 삭제한 파일 개수
+    removed = 0
+    for dirpath, _, filenames in os.walk(output_dir):
+        for filename in filenames:
+            if filename.startswith('.') and os.path.splitext(filename)[0].endswith(TEMP_MARKER):
+                os.remove(os.path.join(dirpath, filename))
+                removed += 1
+    return removed
+
+
+def file_checksum(filepath, chunk_size=1024 * 1024):
+    # 파일의 sha1 체크섬을 계산하는 함수
+    # 반환값: 예) 'sha1:2fd4e1c67a2d28fced849ee1bb76e7391b93eb12'
+    sha1 = hashlib.sha1()
+    with open(filepath, 'rb') as fin:
+        for chunk in iter(lambda: fin.read(chunk_size), b''):
+            sha1.update(chunk)
+    return 'sha1:' + sha1.hexdigest()
+
+
+class Manifest:
+    # 완성된 클립 목록을 기록하는 append-only manifest 클래스
+    # manifest에 기록된 클립만 "처리 완료"로 간주한다
+    # 시작할 때 한 번만 읽어서 key 집합을 만들어 두므로, skip 체크는 stat 호출 없이 메모리에서 수행된다
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_FILENAME)
+        # 이미 처리된 클립의 key 집합이다
+        # key는 출력 파일명에서 확장자를 뺀 것이다 (예: '--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351')
+        self.done = set()
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as fin:
+                for line in fin:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    self.done.add(json.loads(line)['key'])
+
+    def append(self, record, clip, num_bytes, checksum):
+        # 클립 하나를 manifest에 추가하는 함수
+        # record: trim_and_crop_min_size()가 반환한 클립 정보 딕셔너리
+        # clip: output_dir 기준 클립 경로 (tar 출력 모드에서는 'shard-000000.tar/{key}.mp4' 형식)
+        # num_bytes: 클립 파일 크기(바이트)
+        # checksum: file_checksum()으로 계산한 체크섬
+        key = os.path.splitext(os.path.basename(record['output_filepath']))[0]
+        entry = {
+            'key': key,
+            'clip': clip,
+            'params': {k: record[k] for k in TUBE_PARAM_KEYS},
+            'frames': record.get('output_frames', record['frames']),
+            'bytes': num_bytes,
+            'duration': record['duration'],
+            'checksum': checksum,
+        }
+        # chunk로 나눈 tube이면 tube 안에서의 위치를 함께 기록한다
+        if record.get('chunk') is not None:
+            entry['chunk'] = record['chunk']
+        # 리사이즈하거나 frame rate를 바꿨으면 출력 크기와 fps를 기록한다 (frames는 출력 fps의 프레임 수이다)
+        if get_output_format(record) is not None:
+            entry['output'] = get_output_format(record)
+        # 오디오만 추출했으면 오디오 형식을 기록한다 (--audio_only)
+        if record.get('audio_format'):
+            entry['audio'] = {'format': record['audio_format'], 'sample_rate': record['sample_rate'],
+                              'channels': record['audio_channels']}
+        # --quality_stats이면 크롭할 때 분석한 프레임 품질 요약을 기록한다 (다시 디코딩하지 않고 manifest로 필터링한다)
+        if record.get('quality'):
+            entry['quality'] = record['quality']
+        # 한 줄씩 append하므로 중간에 중단되어도 이전 기록은 그대로 유지된다
+        with open(self.path, 'a') as fout:
+            fout.write(json.dumps(entry) + '\n')
+        self.done.add(key)
+
+
+def get_output_format(record):
+    # --output_size/--output_fps로 바꾼 출력 형식 {'size': [너비, 높이] 또는 None, 'fps': fps 또는 None}
+    # 둘 다 지정하지 않았으면 None (crop 크기와 원본 fps 그대로)
+    if not record.get('output_size') and not record.get('output_fps'):
+        return None
+    return {'size': record.get('output_size'), 'fps': record.get('output_fps')}
+
+
+def get_clip_records(record):
+    # tube 처리 결과를 출력 클립 단위의 record 리스트로 바꾸는 함수
+    # chunk로 나누지 않았으면 record 하나, 나눴으면 chunk 순서대로 chunk마다 output_filepath, frames, duration,
+    # output_bytes를 chunk 값으로 바꾸고 chunk({'index', 'count', 'start', 'frames'})를 추가한 record이다
+    if not record.get('chunks'):
+        return [record]
+    clip_records = []
+    for chunk in record['chunks']:
+        output_frames = chunk.get('output_frames', chunk['frames'])
+        clip_records.append(dict(record, chunks=None, output_filepath=chunk['output_filepath'], frames=chunk['frames'],
+                                 output_frames=output_frames,
+                                 duration=output_frames / (record.get('output_fps') or record['fps']),
+                                 output_bytes=chunk['output_bytes'], quality=chunk.get('quality'),
+                                 chunk={'index': chunk['index'], 'count': len(record['chunks']),
+                                        'start': chunk['start'], 'frames': chunk['frames']}))
+    return clip_records
+
+
+def store_clip(record, output_dir, shard_writer=None, manifest=None):
+    # 워커가 만든 클립을 최종 출력에 반영하는 함수 (메인 프로세스에서만 호출한다)
+    # record: trim_and_crop_min_size()가 반환한 클립 정보 딕셔너리
+    # output_dir: 최종 출력 디렉토리 경로
+    # shard_writer: tar 출력 모드이면 ShardWriter, 아니면 None
+    # manifest: manifest를 사용하면 Manifest, 아니면 None
+    # chunk로 나눈 tube는 chunk 순서대로 하나씩 반영한다 (마지막 chunk가 기록되면 tube 전체가 처리된 것이다)
+    if record.get('chunks'):
+        for clip_record in get_clip_records(record):
+            store_clip(clip_record, output_dir, shard_writer, manifest)
+        return
+    clip_path = record['output_filepath']
+    if manifest is not None:
+        # shard에 추가되면 원본 파일이 삭제되므로 크기와 체크섬을 먼저 계산한다
+        num_bytes = os.path.getsize(clip_path)
+        checksum = file_checksum(clip_path)
+    if shard_writer is not None:
+        # tar 출력 모드에서는 shard가 닫혀서 인덱스에 기록될 때 manifest에 추가한다
+        shard_writer.add(record, manifest, checksum if manifest is not None else None)
+        return
+    if manifest is not None:
+        manifest.append(record, os.path.relpath(clip_path, output_dir), num_bytes, checksum)
+
+
+def append_retry_tube(retry_file, clip_params):
+    # 실패하거나 제한 시간을 넘긴 tube를 재시도 파일에 추가하는 함수 (메인 프로세스에서만 호출한다)
+    # retry_file: 재시도 파일 경로
+    # clip_params: tube 정보 문자열 (trim_and_crop_min_size()가 반환한 record['clip_params'])
+    # 입력 tube 정보를 그대로 한 줄씩 기록하므로 재시도 파일을 --clip_info_file/--tubes_file로 바로 다시 사용할 수 있다
+    # 예) '--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351'
+    retry_dir = os.path.dirname(retry_file)
+    if retry_dir:
+        os.makedirs(retry_dir, exist_ok=True)
+    with open(retry_file, 'a') as fout:
+        fout.write(clip_params.strip() + '\n')
+
+
+def load_shard_index(output_dir):
+    # shard 인덱스 파일을 읽어서 {key: entry} 딕셔너리로 반환하는 함수
+    # output_dir: shard와 인덱스가 저장된 디렉토리 경로
+    # 반환값: 예) {'--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351': {'shard': 'shard-000000.tar', ...}}
+    index = {}
+    index_path = os.path.join(output_dir, SHARD_INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return index
+    with open(index_path, 'r') as fin:
+        for line in fin:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            index[entry['key']] = entry
+    return index
+
+
+def read_shard_member(output_dir, entry, ext='mp4'):
+    # 인덱스 entry를 사용하여 shard 안의 파일 하나를 tar 전체를 읽지 않고 바로 읽어오는 함수 (random access)
+    # output_dir: shard가 저장된 디렉토리 경로
+    # entry: load_shard_index()가 반환한 딕셔너리의 값 하나
+    # ext: 'mp4'이면 클립 데이터, 'json'이면 sidecar 메타데이터를 읽는다
+    # 반환값: 파일 내용(bytes)
+    shard_path = os.path.join(output_dir, entry['shard'])
+    with open(shard_path, 'rb') as fin:
+        # tar 안에서 데이터가 시작하는 위치로 바로 이동한다
+        fin.seek(entry[ext + '_offset'])
+        return fin.read(entry[ext + '_size'])
+
+
+def list_output_clips(output_dir):
+    # output_dir에 완성된 클립 목록을 {key: 클립 위치}로 반환하는 함수 (학습용 변환 단계에서 사용한다)
+    # manifest가 있으면 manifest에 기록된 순서대로, tar 출력이면 shard 인덱스, 아니면 디렉토리 아래의 mp4 파일이다 (임시 파일 제외)
+    # 클립 위치: 클립 파일 경로, 또는 tar shard 안의 클립이면 shard 인덱스 entry (read_shard_member()로 읽는다)
+    clips = {}
+    shard_index = load_shard_index(output_dir)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as fin:
+            for line in fin:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                clips[entry['key']] = shard_index.get(entry['key']) or os.path.join(output_dir, entry['clip'])
+        return clips
+    if shard_index:
+        return shard_index
+    for dirpath, dirnames, filenames in os.walk(output_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.mp4') and not filename.endswith(TEMP_SUFFIX):
+                clips[os.path.splitext(filename)[0]] = os.path.join(dirpath, filename)
+    return clips
+
+
+class ShardWriter:
+    # 완성된 클립을 크기 제한이 있는 tar shard로 묶어서 저장하는 클래스
+    # 각 클립은 WebDataset 규칙에 따라 '{key}.mp4'와 '{key}.json' 두 개의 파일로 연속해서 저장된다
+    # 따라서 학습 시 reader는 shard를 순차적으로 스트리밍할 수 있다
+    # 또한 shards_index.jsonl에 각 파일의 offset/size를 기록해서 random access도 가능하게 한다
+    #
+    # 인덱스는 shard가 닫힐 때(완성되었을 때)만 기록한다
+    # 프로세스가 중간에 죽으면 인덱스에 없는 마지막 shard는 미완성 파일이므로,
+    # 다음 실행에서 같은 번호로 덮어쓰고 해당 클립들은 다시 처리된다
+
+    def __init__(self, output_dir, max_shard_bytes=1024 ** 3):
+        # output_dir: shard와 인덱스를 저장할 디렉토리 경로
+        # max_shard_bytes: shard 하나의 최대 크기(바이트), 기본값 1GB
+        self.output_dir = output_dir
+        self.max_shard_bytes = max_shard_bytes
+        self.index_path = os.path.join(output_dir, SHARD_INDEX_FILENAME)
+
+        # 이미 shard에 저장된 클립의 key 집합이다 (skip 체크를 메모리에서 수행하기 위해 사용)
+        index = load_shard_index(output_dir)
+        self.done = set(index)
+        # 인덱스에 기록된 마지막 shard 다음 번호부터 새 shard를 만든다
+        shard_ids = [int(entry['shard'][len('shard-'):-len('.tar')]) for entry in index.values()]
+        self.next_shard_id = max(shard_ids) + 1 if shard_ids else 0
+
+        self.tar = None
+        self.shard_name = None
+        # 현재 열려 있는 shard에 들어간 클립들의 인덱스 entry (shard가 닫힐 때 인덱스 파일에 기록한다)
+        self.pending = []
+        # 현재 shard에 들어간 클립들의 manifest 기록 (manifest, record, clip, 크기, 체크섬)
+        # 인덱스에 기록되기 전에 manifest에 쓰면, 중단된 경우 다음 실행이 미완성 shard를 덮어쓰는데도 클립을 건너뛴다
+        self.pending_manifest = []
+
+    def _open_shard(self):
+        self.shard_name = SHARD_NAME_FORMAT % self.next_shard_id
+        self.next_shard_id += 1
+        self.tar = tarfile.open(os.path.join(self.output_dir, self.shard_name), 'w', format=tarfile.USTAR_FORMAT)
+
+    def _close_shard(self):
+        if self.tar is None:
+            return
+        self.tar.close()
+        # shard가 완성되었으므로 인덱스에 추가한다 (append-only)
+        with open(self.index_path, 'a') as fout:
+            for entry in self.pending:
+                fout.write(json.dumps(entry) + '\n')
+        # 인덱스에 기록된 클립만 manifest에 추가한다
+        for manifest, record, clip, num_bytes, checksum in self.pending_manifest:
+            manifest.append(record, clip, num_bytes, checksum)
+        self.tar = None
+        self.shard_name = None
+        self.pending = []
+        self.pending_manifest = []
+
+    def _add_member(self, name, fileobj, size):
+        # tar에 파일 하나를 추가하고, 데이터가 시작하는 offset을 반환한다
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(time.time())
+        self.tar.addfile(info, fileobj)
+        # addfile() 후 self.tar.offset은 (512바이트 단위로 패딩된) 데이터 끝 위치이다
+        # 데이터 블록 크기만큼 빼면 데이터 시작 위치가 된다
+        blocks, remainder = divmod(size, tarfile.BLOCKSIZE)
+        if remainder > 0:
+            blocks += 1
+        return self.tar.offset - blocks * tarfile.BLOCKSIZE
+
+    def add(self, record, manifest=None, checksum=None):
+        # 완성된 클립 파일 하나를 shard에 추가하는 함수
+        # record: trim_and_crop_min_size()가 반환한 클립 정보 딕셔너리
+        #         record['output_filepath']의 mp4 파일은 shard에 추가된 후 삭제된다
+        #         TUBE_PARAM_KEYS 항목(tube 파라미터)은 sidecar JSON으로 저장된다
+        # manifest: Manifest이면 shard가 닫혀서 인덱스에 기록될 때 클립을 manifest에 추가한다
+        # checksum: manifest에 기록할 클립 체크섬 (file_checksum())
+        # 반환값: 클립이 저장된 shard 파일 이름
+        clip_path = record['output_filepath']
+        meta = {k: record[k] for k in TUBE_PARAM_KEYS}
+        if record.get('chunk') is not None:
+            meta['chunk'] = record['chunk']
+        if get_output_format(record) is not None:
+            meta['output'] = get_output_format(record)
+        if record.get('quality'):
+            meta['quality'] = record['quality']
+        key = os.path.splitext(os.path.basename(clip_path))[0]
+        clip_size = os.path.getsize(clip_path)
+        meta_bytes = json.dumps(meta, sort_keys=True).encode('utf-8')
+
+        # 현재 shard에 추가하면 크기 제한을 넘는 경우 새 shard를 연다
+        # (비어 있는 shard에는 크기와 관계없이 최소 하나의 클립을 넣는다)
+        if self.tar is not None and self.pending and self.tar.offset + clip_size + len(meta_bytes) > self.max_shard_bytes:
+            self._close_shard()
+        if self.tar is None:
+            self._open_shard()
+
+        with open(clip_path, 'rb') as fin:
+            mp4_offset = self._add_member(key + '.mp4', fin, clip_size)
+        json_offset = self._add_member(key + '.json', io.BytesIO(meta_bytes), len(meta_bytes))
+        self.pending.append({
+            'key': key,
+            'shard': self.shard_name,
+            'mp4_offset': mp4_offset,
+            'mp4_size': clip_size,
+            'json_offset': json_offset,
+            'json_size': len(meta_bytes),
+        })
+        if manifest is not None:
+            self.pending_manifest.append((manifest, record, self.shard_name + '/' + os.path.basename(clip_path),
+                                          clip_size, checksum))
+        self.done.add(key)
+        os.remove(clip_path)
+        return self.shard_name
+
+    def close(self):
+        self._close_shard()
@@ -0,0 +1,657 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import os
+from functools import partial
+from time import time as timer
+
+from talkinghead.rate_control import DEFAULT_MIN_BITRATE
+from talkinghead.clip_output import get_temp_filepath
+from talkinghead.ffmpeg_runner import FFmpegTimeout, get_error_message, init_progress_counter, run_ffmpeg, run_ffmpeg_async
+from talkinghead.pipeline_metrics import children_cpu_seconds
+from talkinghead.admission import imap_admitted
+from talkinghead.affinity import crop_tube_group, crop_tube_group_async, group_tubes_by_segment
+from talkinghead.plan import (build_tube_stream, get_output_filepaths, get_tube_timeout, new_tube_record, plan_tube,
+                              precheck_tube)
+from talkinghead.probe import get_fps, get_h_w, get_video_bitrate, get_video_codec, probe_video, probe_video_async
+from talkinghead.quality import collect_quality_stats, get_stats_filepath
+
+
+def trim_and_crop(input_dir, output_dir, clip_params, min_duration=0.0):
+    # 예시 clip_params: '--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351'
+    # 각 항목의 의미를 설명하면 아래와 같다:
+    #   video_name: '--Y9imYnfBw_0000'
+    #   H: 720          # 원본 영상의 height (세로 픽셀 수)
+    #   W: 1280         # 원본 영상의 width (가로 픽셀 수)
+    #   S: 0            # 시작 프레임 번호
+    #   E: 271          # 끝 프레임 번호
+    #   L: 504          # crop할 영역의 left 좌표 (픽셀, 원본 기준)
+    #   T: 63           # crop할 영역의 top 좌표 (픽셀, 원본 기준)
+    #   R: 792          # crop할 영역의 right 좌표 (픽셀, 원본 기준)
+    #   B: 351          # crop할 영역의 bottom 좌표 (픽셀, 원본 기준)
+    # min_duration: 최소 비디오 길이(초), 이 값 이상인 경우만 처리한다
+    import ffmpeg
+    
+    # clip_params 문자열(콤마로 구분된 값들)을 파싱해서 각각의 변수로 나눈다.
+    video_name, H, W, S, E, L, T, R, B = clip_params.strip().split(',')
+
+    # H, W, S, E, L, T, R, B를 문자열에서 정수(int)로 변환한다.
+    # 예) H=720, W=1280, S=0, E=271, L=504, T=63, R=792, B=351
+    H, W, S, E, L, T, R, B = int(H), int(W), int(S), int(E), int(L), int(T), int(R), int(B)
+    
+    # 출력 파일명을 지정한다.
+    # 예) '--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4'
+    output_filename = '{}_S{}_E{}_L{}_T{}_R{}_B{}.mp4'.format(video_name, S, E, L, T, R, B)
+    output_filepath = os.path.join(output_dir, output_filename)
+
+    # 만약 출력 파일이 이미 존재하면, 처리하지 않고 넘어간다(중복 방지).
+    if os.path.exists(output_filepath):
+        print('Output file %s exists, skipping' % (output_filepath))
+        return
+
+    # 입력 영상 파일 경로를 지정한다.
+    # 예) input_dir이 'small/1min_clips', video_name='--Y9imYnfBw_0000'이면
+    # 'small/1min_clips/--Y9imYnfBw_0000.mp4'가 input_filepath가 된다.
+    input_filepath = os.path.join(input_dir, video_name + '.mp4')
+
+    # 만약 입력 파일이 존재하지 않을 경우, 처리하지 않고 넘어간다.
+    if not os.path.exists(input_filepath):
+        print('Input file %s does not exist, skipping' % (input_filepath))
+        return
+
+    # 영상의 실제 height(h), width(w)를 ffmpeg.probe로 읽어온다.
+    # 실제 영상 크기가 crop 정보와 다를 수 있으니(리사이즈 등), crop 좌표 보정을 위해 필요함.
+    h, w = get_h_w(input_filepath)
+    # 예시: h=720, w=1280 (일치하거나 다를 수 있음)
+    # 비디오 파일의 fps(초당 프레임 수)를 가져온다
+    # 오디오를 동일한 시간 범위로 trim하기 위해 fps가 필요하다
+    # 예) fps=30이면 1초에 30프레임이다
+    fps = get_fps(input_filepath)
+    # 비디오 길이(초)를 계산한다
+    # duration = (E - S + 1) / fps는 비디오의 지속 시간(초)이다
+    # 예) S=0, E=271, fps=30이면 duration = (271-0+1)/30 = 272/30 = 9.07초
+    # min_duration보다 작으면 처리하지 않고 건너뛴다
+    duration = (E - S + 1) / fps
+    if min_duration > 0.0 and duration < min_duration:
+        # 비디오 길이가 min_duration보다 짧으면 건너뛴다
+        # print()를 사용하여 건너뛴다는 메시지를 출력한다
+        # %s는 문자열 포맷팅으로, video_name 값이 삽입된다
+        # %.2f는 소수점 둘째 자리까지 표시하는 포맷팅이다
+        print('Skipping %s: video duration (%.2f seconds) is shorter than %.2f seconds' % (video_name, duration, min_duration))
+        # 함수를 종료하고 다음 클립으로 넘어간다
+        return
+    # 원본 비디오의 코덱 정보를 가져온다
+    # get_video_codec() 함수는 ffmpeg.probe를 사용하여 비디오 파일의 코덱 이름을 가져온다
+    # 원본과 동일한 코덱을 사용하여 화질 손실을 최소화한다
+    # 예) 'h264', 'hevc', 'vp9' 등의 코덱 이름을 반환한다
+    original_codec = get_video_codec(input_filepath)
+    # 원본 비디오의 비트레이트를 가져온다
+    # get_video_bitrate() 함수는 ffmpeg.probe를 사용하여 비디오 파일의 비트레이트를 가져온다
+    # 원본과 동일한 비트레이트를 사용하여 화질 손실을 최소화한다
+    # 예) 2423000 (2423 kbps)
+    original_bitrate = get_video_bitrate(input_filepath)
+
+    # crop 좌표를 실제 프레임에 맞게 보정한다.
+    # 예) t = int(63 / 720 * 720) = 63
+    #     b = int(351 / 720 * 720) = 351
+    #     l = int(504 / 1280 * 1280) = 504
+    #     r = int(792 / 1280 * 1280) = 792
+    # (실제 h, w가 clip에서 온 H, W와 다르면 비례해서 변환)
+    t = int(T / H * h)   # top 좌표, 예: 63
+    b = int(B / H * h)   # bottom 좌표, 예: 351
+    l = int(L / W * w)   # left 좌표, 예: 504
+    r = int(R / W * w)   # right 좌표, 예: 792
+
+    # ffmpeg 입력 스트림 생성
+    # ffmpeg.input()은 비디오 파일을 입력 스트림으로 로드한다
+    # input_filepath에 지정된 비디오 파일을 읽어온다
+    input_stream = ffmpeg.input(input_filepath)
+    # 비디오와 오디오 스트림을 분리한다
+    # input_stream['v:0']은 첫 번째 비디오 스트림을 의미한다
+    # input_stream['a:0']은 첫 번째 오디오 스트림을 의미한다 (오디오가 없는 경우 None일 수 있음)
+    video = input_stream['v:0']
+    # 오디오 스트림이 있는지 확인한다
+    # try-except를 사용하여 오디오 스트림이 없을 경우를 처리한다
+    try:
+        audio = input_stream['a:0']
+        has_audio = True
+    except:
+        has_audio = False
+    
+    # 비디오 스트림에 특정 프레임 구간만 자르기(trim)
+    # ffmpeg.trim()의 start_frame/end_frame은 프레임 번호로 작동하지 않으므로 select 필터를 사용한다
+    # select 필터의 between(n,S,E)는 n번째 프레임이 S와 E 사이(포함)에 있으면 선택한다
+    # 예를 들어, S=1015, E=1107인 경우 1015~1107 프레임(총 93프레임)을 추출한다
+    # setpts=PTS-STARTPTS는 선택된 프레임들의 타임스탬프를 0부터 시작하도록 재설정한다
+    # stream = ffmpeg.trim(stream, start_frame=S, end_frame=E+1)  # 이 방법은 프레임 번호로 작동하지 않음
+    video = video.filter('select', f'between(n,{S},{E})').filter('setpts', 'PTS-STARTPTS')
+    # crop 적용 (좌상단 l,t, 너비 r-l, 높이 b-t로 자른다)
+    # 예) l=504, t=63, r-l=288, b-t=288
+    video = ffmpeg.crop(video, l, t, r-l, b-t)
+    
+    # 오디오 스트림도 동일한 시간 범위로 trim한다
+    # 프레임 번호를 시간(초)으로 변환한다
+    # start_time = S / fps는 시작 시간(초)이다
+    # 예) S=1015, fps=30이면 start_time = 1015/30 = 33.83초
+    # duration = (E - S + 1) / fps는 지속 시간(초)이다
+    # 예) S=1015, E=1107, fps=30이면 duration = (1107-1015+1)/30 = 93/30 = 3.1초
+    if has_audio:
+        start_time = S / fps
+        duration = (E - S + 1) / fps
+        # atrim 필터는 오디오를 특정 시간 범위로 자른다
+        # start=start_time은 시작 시간, duration=duration은 지속 시간이다
+        # asetpts=PTS-STARTPTS는 오디오 타임스탬프를 0부터 시작하도록 재설정한다
+        audio = audio.filter('atrim', start=start_time, duration=duration).filter('asetpts', 'PTS-STARTPTS')
+    
+    # 출력 파일로 저장할 스트림 설정
+    # ffmpeg.output()은 처리된 스트림을 파일로 출력하도록 설정한다
+    # output_filepath에 지정된 경로에 비디오 파일이 저장된다
+    # 오디오가 있으면 비디오와 오디오를 모두 포함하고, 없으면 비디오만 포함한다
+    # 원본 코덱을 사용하고 원본 비트레이트를 사용하여 화질 손실을 최소화한다
+    # vcodec은 비디오 코덱을 지정한다
+    # 원본 코덱이 'h264'인 경우 'libopenh264'를 사용한다 (libx264는 GPL 라이선스로 인해 사용 불가)
+    # 'hevc' 또는 'h265'인 경우 원본 코덱 그대로 사용한다 (libx265 인코더가 없을 수 있음)
+    # 'av1', 'vp9', 'vp8' 등 느린 코덱은 'libopenh264'로 변환한다 (인코딩 속도 향상, 화질은 원본 비트레이트 유지로 손실 최소화)
+    # 그 외는 원본 코덱 그대로 사용한다
+    if original_codec == 'h264':
+        # libopenh264는 CRF를 지원하지 않으므로 비트레이트를 사용한다
+        output_codec = 'libopenh264'
+    elif original_codec in ['hevc', 'h265']:
+        # HEVC는 libx265가 없을 수 있으므로 원본 코덱 그대로 사용한다
+        # 만약 인코딩이 실패하면 원본 코덱을 사용하는 것이 안전하다
+        output_codec = original_codec
+    elif original_codec in ['av1', 'vp9', 'vp8']:
+        # AV1, VP9, VP8은 인코딩이 매우 느리므로 H.264로 변환한다
+        # libopenh264는 사용 가능한 인코더이므로 이를 사용한다
+        # 원본 비트레이트를 유지하면 화질 손실을 최소화할 수 있다
+        output_codec = 'libopenh264'
+    else:
+        output_codec = original_codec
+    # ffmpeg.output()에 vcodec과 비트레이트 또는 CRF 파라미터를 추가하여 고화질로 인코딩한다
+    # vcodec=output_codec는 비디오 코덱을 지정한다
+    # 원본 비트레이트가 있으면 비트레이트를 사용하고, 없으면 CRF를 사용한다
+    # libopenh264는 CRF를 지원하지 않으므로 비트레이트를 사용해야 한다
+    # 비트레이트를 사용하면 원본과 동일한 화질을 유지할 수 있다
+    output_kwargs = {'vcodec': output_codec}
+    if original_bitrate:
+        # 비트레이트를 사용하여 원본과 동일한 화질을 유지한다
+        # b=original_bitrate는 비디오 비트레이트를 지정한다
+        output_kwargs['b:v'] = str(original_bitrate)
+    elif output_codec != 'libopenh264':
+        # CRF를 지원하는 코덱인 경우 CRF를 사용한다
+        # crf=18은 거의 무손실에 가까운 화질을 제공한다 (0이 완전 무손실, 23이 기본값, 51이 최저 화질)
+        output_kwargs['crf'] = 18
+    if has_audio:
+        # stream = ffmpeg.output(video, audio, output_filepath)  # 기존 코드: 화질 설정 없음
+        stream = ffmpeg.output(video, audio, output_filepath, **output_kwargs)
+    else:
+        # stream = ffmpeg.output(video, output_filepath)  # 기존 코드: 화질 설정 없음
+        stream = ffmpeg.output(video, output_filepath, **output_kwargs)
+    # 실제로 ffmpeg를 실행해 clip을 생성한다.
+    # run_ffmpeg()는 설정된 ffmpeg 파이프라인을 조용히 실행하고 진행 상황(프레임 수)을 보고한다
+    # 비디오가 성공적으로 생성되면 output_filepath에 파일이 저장된다
+    run_ffmpeg(stream, overwrite_output=False)
+
+
+def make_output_dirs(record):
+    # 출력 파일의 디렉토리를 만드는 함수 (hashed 레이아웃에서는 하위 디렉토리가 없을 수 있고, chunk마다 다를 수 있다)
+    for output_filepath in get_output_filepaths(record):
+        os.makedirs(os.path.dirname(output_filepath), exist_ok=True)
+
+
+def remove_temp_outputs(record):
+    # 실패하거나 제한 시간을 넘긴 인코딩의 임시 파일을 지우는 함수 (chunk로 나누면 모든 chunk의 임시 파일)
+    for output_filepath in get_output_filepaths(record):
+        temp_filepath = get_temp_filepath(output_filepath)
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+    stats_filepath = get_stats_filepath(record['output_filepath'])
+    if os.path.exists(stats_filepath):
+        os.remove(stats_filepath)
+
+
+def commit_outputs(record):
+    # 인코딩이 끝난 임시 파일을 최종 파일명으로 rename하고 출력 크기를 기록하는 함수
+    # chunk는 순서대로 rename하므로 마지막 chunk 파일이 있으면 모든 chunk가 완성된 것이다 (precheck_tube의 skip 체크)
+    # 품질 분석 브랜치가 있으면 프레임별 통계를 요약해서 record['quality']에 채운다 (chunk마다 chunk['quality'])
+    if record.get('quality_stats'):
+        collect_quality_stats(record)
+    for chunk in record.get('chunks') or []:
+        os.replace(get_temp_filepath(chunk['output_filepath']), chunk['output_filepath'])
+        chunk['output_bytes'] = os.path.getsize(chunk['output_filepath'])
+    if record.get('chunks'):
+        record['output_bytes'] = sum(chunk['output_bytes'] for chunk in record['chunks'])
+        return
+    os.replace(get_temp_filepath(record['output_filepath']), record['output_filepath'])
+    record['output_bytes'] = os.path.getsize(record['output_filepath'])
+
+
+def trim_and_crop_min_size(input_dir, output_dir, clip_params, min_crop_width=512, min_crop_height=512, min_duration=0.0,
+                           output_layout='flat', check_exists=True, rate_control='source', quality=None,
+                           min_bitrate=DEFAULT_MIN_BITRATE, vcodec=None, preset=None, tube_timeout=120.0,
+                           tube_timeout_per_frame=0.5, threads=0, filter_threads=0, chunk_frames=0, chunk_overlap=0,
+                           output_size=None, output_fps=None, scaler='bicubic', quality_stats=False):
+    # trim_and_crop_min_size: 프레임 크기가 min_crop_width x min_crop_height 이상인 경우만 처리하는 함수
+    # 입력 인자는 trim_and_crop과 동일하다
+    # input_dir: 입력 비디오가 있는 디렉토리 경로
+    # output_dir: 출력 비디오를 저장할 디렉토리 경로
+    # clip_params: 비디오 클립 정보가 담긴 문자열 (콤마로 구분)
+    # min_crop_width: 최소 crop 너비(픽셀), 이 값 이상인 경우만 처리한다
+    # min_crop_height: 최소 crop 높이(픽셀), 이 값 이상인 경우만 처리한다
+    # min_duration: 최소 비디오 길이(초), 이 값 이상인 경우만 처리한다
+    # output_layout: 'flat'이면 output_dir 바로 아래에, 'hashed'이면 해시 기반 2단계 하위 디렉토리에 저장한다
+    # check_exists: True이면 출력 파일이 이미 있을 때 건너뛴다
+    #               manifest/shard 인덱스로 메인 프로세스에서 미리 걸러낸 경우 False로 두어 stat 호출을 생략한다
+    # rate_control: 출력 비트레이트 정책 ('source', 'area', 'quality'), talkinghead/rate_control.py 참고
+    # quality: 'quality' 정책에서 사용할 CRF/QP 값 (None이면 코덱별 기본값)
+    # min_bitrate: 'area' 정책에서 사용할 최소 비트레이트(bps)
+    # vcodec: 출력 인코더를 강제로 지정한다 (None이면 원본 코덱에 따라 선택한다)
+    # preset: 인코더 preset (예: libx264의 'veryfast'), None이면 인코더 기본값을 사용한다
+    # tube_timeout, tube_timeout_per_frame: tube 하나의 제한 시간 = tube_timeout + tube_timeout_per_frame * 프레임 수 (초)
+    #               제한 시간이 지나면 ffprobe/ffmpeg를 kill하고 'timeout'으로 기록한다 (tube_timeout이 0이면 제한 없음)
+    # threads: ffmpeg 디코더/인코더 스레드 수 (-threads), 0이면 ffmpeg 기본값(CPU 수에 맞춤)을 사용한다
+    # filter_threads: ffmpeg 필터 스레드 수 (-filter_threads, -filter_complex_threads), 0이면 ffmpeg 기본값
+    #               워커 여러 개가 각자 CPU 수만큼 스레드를 만들지 않도록 scheduler.CropScheduler가 정해서 넘긴다
+    # chunk_frames: 0보다 크면 tube를 chunk_frames 프레임씩 나눈 chunk별 파일로 인코딩한다 (디코딩은 한 번만 한다)
+    #               chunk마다 인코더를 새로 시작하고 GOP 길이(-g)를 chunk 길이에 맞추므로 chunk 하나만으로 디코딩할 수 있다
+    # chunk_overlap: 이어지는 chunk끼리 겹치는 프레임 수 (talkinghead.plan.get_chunks() 참고)
+    # output_size: crop한 프레임을 리사이즈할 크기 ('256' 또는 '512x288' 형식), None이면 crop 크기 그대로
+    # output_fps: 출력 frame rate, None이면 원본 fps 그대로 (chunk_frames는 원본 fps의 프레임 수이다)
+    # scaler: output_size로 리사이즈할 때 사용할 스케일러 (ffmpeg scale 필터의 flags, 예: 'bicubic', 'lanczos', 'area')
+    #         리사이즈와 fps 변환은 crop과 같은 필터 그래프에서 수행한다
+    # quality_stats: True이면 crop한 스트림을 같은 필터 그래프에서 signalstats/blurdetect로 분석해서
+    #         클립별 밝기, 대비, 채도, 흐림, 움직임 요약을 record['quality']에 채운다 (manifest에 기록된다)
+    # 반환값: tube 처리 결과 딕셔너리 (건너뛴 경우에도 반환한다)
+    #         status: 'ok'(클립 생성), 'skipped'(건너뜀), 'failed'(ffprobe/ffmpeg 오류) 또는 'timeout'(제한 시간 초과)
+    #         reason: 건너뛴 사유 ('exists', 'missing_input', 'too_short', 'too_small') 또는
+    #                 실패하거나 제한 시간을 넘긴 단계 ('probe', 'encode'), 생성한 경우 None
+    #         error: 실패한 경우 오류 메시지 (ffmpeg stderr의 마지막 줄 등)
+    #         clip_params: 입력 tube 정보 문자열 (실패한 tube를 재시도 파일에 그대로 기록하기 위해 사용한다)
+    #         예외는 발생시키지 않으므로 tube 하나가 실패해도 풀 전체가 멈추지 않는다
+    #         probe_count/probe_seconds: ffprobe 호출 횟수와 시간, encode_seconds: ffmpeg 인코딩 시간
+    #         cpu_seconds: 이 tube에서 실행한 ffmpeg/ffprobe의 CPU 시간, wall_seconds: 전체 처리 시간
+    #         chunks: chunk로 나눈 경우 chunk별 {'index', 'start', 'frames', 'output_filepath', 'output_bytes'}
+    #         quality: quality_stats가 True이면 talkinghead.quality.summarize_frame_stats()의 요약 (chunk마다 chunk['quality'])
+    #         output_bytes: 생성된 클립 크기 (chunk로 나누면 합계), peak_rss_bytes: ffmpeg의 최대 RSS (admission.AdmissionController가 메모리 예측에 사용한다)
+    
+    # 예시 clip_params: '--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351'
+    # 각 항목의 의미는 trim_and_crop 함수와 동일하다
+    #   video_name: '--Y9imYnfBw_0000'
+    #   H: 720          # 원본 영상의 height (세로 픽셀 수)
+    #   W: 1280         # 원본 영상의 width (가로 픽셀 수)
+    #   S: 0            # 시작 프레임 번호
+    #   E: 271          # 끝 프레임 번호
+    #   L: 504          # crop할 영역의 left 좌표 (픽셀, 원본 기준)
+    #   T: 63           # crop할 영역의 top 좌표 (픽셀, 원본 기준)
+    #   R: 792          # crop할 영역의 right 좌표 (픽셀, 원본 기준)
+    #   B: 351          # crop할 영역의 bottom 좌표 (픽셀, 원본 기준)
+    
+    record = new_tube_record(output_dir, clip_params, output_layout, chunk_frames, chunk_overlap)
+    video_name = record['video_name']
+    start = timer()
+    cpu_start = children_cpu_seconds()
+
+    # 제한 시간(deadline)을 계산한다
+    # ffprobe와 ffmpeg는 남은 시간만큼만 실행되고, 넘기면 kill된다 (손상된 세그먼트에서 멈춰도 풀 전체가 멈추지 않는다)
+    budget = get_tube_timeout(record['frames'], tube_timeout, tube_timeout_per_frame)
+    deadline = start + budget if budget is not None else None
+
+    def remaining():
+        # 제한 시간까지 남은 시간(초), 제한이 없으면 None
+        if deadline is None:
+            return None
+        return max(0.0, deadline - timer())
+
+    def finish(status='ok', reason=None, error=None):
+        # record에 상태와 소요 시간을 채워서 반환한다
+        record['status'] = status
+        record['reason'] = reason
+        record['error'] = error
+        record['cpu_seconds'] = children_cpu_seconds() - cpu_start
+        record['wall_seconds'] = timer() - start
+        return record
+
+    # 출력 파일이 이미 있거나 입력 파일이 없으면 건너뛴다
+    input_filepath, reason = precheck_tube(record, input_dir, check_exists)
+    if reason is not None:
+        # 함수를 종료하고 다음 클립으로 넘어간다
+        return finish('skipped', reason)
+
+    # 영상의 실제 height(h), width(w), fps, 코덱, 비트레이트를 ffprobe 한 번으로 읽어온다
+    # 실제 영상 크기가 crop 정보와 다를 수 있으니(리사이즈 등), crop 좌표 보정을 위해 필요함
+    # probe에 걸린 시간을 측정한다 (벤치마크/통계용)
+    probe_start = timer()
+    try:
+        video_info = probe_video(input_filepath, timeout=remaining())
+    except FFmpegTimeout as e:
+        print('Timeout %s: %s' % (video_name, e))
+        return finish('timeout', 'probe')
+    except Exception as e:
+        # 손상된 파일 등으로 ffprobe가 실패하거나 비디오 스트림이 없는 경우
+        print('Failed %s: %s' % (video_name, get_error_message(e)))
+        return finish('failed', 'probe', get_error_message(e))
+    record['probe_count'] = 1
+    record['probe_seconds'] = timer() - probe_start
+
+    # crop 좌표와 인코더 옵션을 정해서 ffmpeg 출력 스트림을 만든다
+    # 비디오가 min_duration보다 짧거나 crop 영역이 min_crop_width x min_crop_height보다 작으면 건너뛴다
+    reason, stream = plan_tube(record, input_filepath, video_info, min_crop_width=min_crop_width,
+                               min_crop_height=min_crop_height, min_duration=min_duration, rate_control=rate_control,
+                               quality=quality, min_bitrate=min_bitrate, vcodec=vcodec, preset=preset,
+                               output_size=output_size, output_fps=output_fps, scaler=scaler,
+                               quality_stats=quality_stats, threads=threads, filter_threads=filter_threads)
+    if reason is not None:
+        return finish('skipped', reason)
+
+    # hashed 레이아웃에서는 하위 디렉토리가 없을 수 있으므로 먼저 생성한다
+    make_output_dirs(record)
+    # 실제로 ffmpeg를 실행해 clip을 생성한다
+    # run_ffmpeg()는 ffmpeg를 조용히 실행하고(-progress pipe:1) 인코딩한 프레임 수를 메인 프로세스에 보고한다
+    # 배너와 진행 로그는 출력하지 않고, 실패한 경우에만 stderr 마지막 부분을 출력한다
+    # ffmpeg는 같은 디렉토리의 임시 파일에 쓰고, 성공한 경우에만 output_filepath로 rename한다
+    # 따라서 워커가 인코딩 중에 죽더라도 output_filepath에는 완성된 파일만 존재한다
+    # 임시 파일은 항상 미완성 파일이므로 덮어쓴다 (overwrite_output=True)
+    # check_exists=False인 경우 output_filepath에 남아 있는 파일도 manifest에 없는 파일이므로 os.replace()가 덮어쓴다
+    # 제한 시간을 넘기면 run_ffmpeg()가 ffmpeg를 kill하고 FFmpegTimeout을 발생시킨다
+    encode_start = timer()
+    try:
+        result = run_ffmpeg(stream, overwrite_output=True, timeout=remaining())
+    except FFmpegTimeout as e:
+        # 제한 시간을 넘긴 경우 임시 파일을 지우고 'timeout'으로 기록한다 (다음 tube는 계속 처리된다)
+        remove_temp_outputs(record)
+        record['encode_seconds'] = timer() - encode_start
+        record['reported_frames'] = getattr(e, 'reported_frames', 0)
+        print('Timeout %s: %s' % (video_name, e))
+        return finish('timeout', 'encode')
+    except Exception as e:
+        # 실패하면 임시 파일을 지우고 'failed'로 기록한다
+        # 예외를 전달하면 imap_unordered()를 통해 메인 프로세스의 루프 전체가 중단되므로 결과로 반환한다
+        remove_temp_outputs(record)
+        record['encode_seconds'] = timer() - encode_start
+        record['reported_frames'] = getattr(e, 'reported_frames', 0)
+        return finish('failed', 'encode', get_error_message(e))
+    commit_outputs(record)
+    record['encode_seconds'] = timer() - encode_start
+    record['peak_rss_bytes'] = result['peak_rss']
+    return finish()
+
+
+async def trim_and_crop_async(input_dir, output_dir, clip_params, min_crop_width=512, min_crop_height=512, min_duration=0.0,
+                              output_layout='flat', check_exists=True, rate_control='source', quality=None,
+                              min_bitrate=DEFAULT_MIN_BITRATE, vcodec=None, preset=None, tube_timeout=120.0,
+                              tube_timeout_per_frame=0.5, threads=0, filter_threads=0, chunk_frames=0, chunk_overlap=0,
+                              output_size=None, output_fps=None, scaler='bicubic', quality_stats=False):
+    # trim_and_crop_min_size()의 asyncio 버전 (인자와 반환값이 같다)
+    # async_executor.AsyncExecutor의 이벤트 루프에서 실행되며, ffprobe/ffmpeg만 자식 프로세스로 실행하고
+    # 나머지(파일 확인, crop 계획)는 메인 프로세스에서 수행한다
+    # 같은 프로세스에서 여러 tube가 동시에 실행되므로 cpu_seconds는 RUSAGE_CHILDREN 대신 ffmpeg 프로세스의 CPU 시간으로 기록한다
+    record = new_tube_record(output_dir, clip_params, output_layout, chunk_frames, chunk_overlap)
+    video_name = record['video_name']
+    start = timer()
+    budget = get_tube_timeout(record['frames'], tube_timeout, tube_timeout_per_frame)
+    deadline = start + budget if budget is not None else None
+
+    def remaining():
+        if deadline is None:
+            return None
+        return max(0.0, deadline - timer())
+
+    def finish(status='ok', reason=None, error=None):
+        record['status'] = status
+        record['reason'] = reason
+        record['error'] = error
+        record['wall_seconds'] = timer() - start
+        return record
+
+    input_filepath, reason = precheck_tube(record, input_dir, check_exists)
+    if reason is not None:
+        return finish('skipped', reason)
+
+    probe_start = timer()
+    try:
+        video_info = await probe_video_async(input_filepath, timeout=remaining())
+    except FFmpegTimeout as e:
+        print('Timeout %s: %s' % (video_name, e))
+        return finish('timeout', 'probe')
+    except Exception as e:
+        print('Failed %s: %s' % (video_name, get_error_message(e)))
+        return finish('failed', 'probe', get_error_message(e))
+    record['probe_count'] = 1
+    record['probe_seconds'] = timer() - probe_start
+
+    reason, stream = plan_tube(record, input_filepath, video_info, min_crop_width=min_crop_width,
+                               min_crop_height=min_crop_height, min_duration=min_duration, rate_control=rate_control,
+                               quality=quality, min_bitrate=min_bitrate, vcodec=vcodec, preset=preset,
+                               output_size=output_size, output_fps=output_fps, scaler=scaler,
+                               quality_stats=quality_stats, threads=threads, filter_threads=filter_threads)
+    if reason is not None:
+        return finish('skipped', reason)
+
+    make_output_dirs(record)
+    encode_start = timer()
+    try:
+        result = await run_ffmpeg_async(stream, overwrite_output=True, timeout=remaining())
+    except Exception as e:
+        # 제한 시간 초과와 실패 모두 임시 파일을 지우고 결과로 반환한다
+        remove_temp_outputs(record)
+        record['encode_seconds'] = timer() - encode_start
+        record['reported_frames'] = getattr(e, 'reported_frames', 0)
+        if isinstance(e, FFmpegTimeout):
+            print('Timeout %s: %s' % (video_name, e))
+            return finish('timeout', 'encode')
+        return finish('failed', 'encode', get_error_message(e))
+    commit_outputs(record)
+    record['encode_seconds'] = timer() - encode_start
+    record['peak_rss_bytes'] = result['peak_rss']
+    record['cpu_seconds'] = result['cpu_seconds']
+    return finish()
+
+
+def start_plan_row(row, check_exists=True):
+    # plan row를 실행하기 전에 결과 record를 만들고 건너뛸 row인지 확인하는 함수
+    # 반환값: (record, 건너뛴 사유) - 처리해야 하면 사유는 None
+    #         계획한 후에 다른 실행이 클립을 만들었거나('exists') 세그먼트가 지워진 경우('missing_input')를 건너뛴다
+    record = dict(row, status='skipped', reason=None, error=None, probe_count=0, probe_seconds=0.0,
+                  encode_seconds=0.0, cpu_seconds=0.0, wall_seconds=0.0, output_bytes=0, peak_rss_bytes=0)
+    if check_exists and os.path.exists(get_output_filepaths(record)[-1]):
+        print('Output file %s exists, skipping' % (get_output_filepaths(record)[-1]))
+        return record, 'exists'
+    if not os.path.exists(record['input_filepath']):
+        print('Input file %s does not exist, skipping' % (record['input_filepath']))
+        return record, 'missing_input'
+    return record, None
+
+
+def run_plan_row(row, check_exists=True, tube_timeout=120.0, tube_timeout_per_frame=0.5, threads=0, filter_threads=0):
+    # talkinghead.plan.build_plan()이 만든 row 하나(status가 'planned')를 실행하는 함수
+    # tube 정보 파싱, ffprobe, crop 좌표 보정, 코덱/비트레이트 선택은 계획할 때 끝났으므로 ffmpeg만 실행한다
+    # 나머지 인자와 반환값은 trim_and_crop_min_size와 같다 (probe_count는 0)
+    record, reason = start_plan_row(row, check_exists)
+    start = timer()
+    cpu_start = children_cpu_seconds()
+
+    def finish(status='ok', reason=None, error=None):
+        record['status'] = status
+        record['reason'] = reason
+        record['error'] = error
+        record['cpu_seconds'] = children_cpu_seconds() - cpu_start
+        record['wall_seconds'] = timer() - start
+        return record
+
+    if reason is not None:
+        return finish('skipped', reason)
+    stream = build_tube_stream(record, record['input_filepath'], threads=threads, filter_threads=filter_threads)
+    make_output_dirs(record)
+    encode_start = timer()
+    try:
+        result = run_ffmpeg(stream, overwrite_output=True,
+                            timeout=get_tube_timeout(record['frames'], tube_timeout, tube_timeout_per_frame))
+    except Exception as e:
+        # 제한 시간 초과와 실패 모두 임시 파일을 지우고 결과로 반환한다
+        remove_temp_outputs(record)
+        record['encode_seconds'] = timer() - encode_start
+        record['reported_frames'] = getattr(e, 'reported_frames', 0)
+        if isinstance(e, FFmpegTimeout):
+            print('Timeout %s: %s' % (record['video_name'], e))
+            return finish('timeout', 'encode')
+        return finish('failed', 'encode', get_error_message(e))
+    commit_outputs(record)
+    record['encode_seconds'] = timer() - encode_start
+    record['peak_rss_bytes'] = result['peak_rss']
+    return finish()
+
+
+async def run_plan_row_async(row, check_exists=True, tube_timeout=120.0, tube_timeout_per_frame=0.5, threads=0,
+                             filter_threads=0):
+    # run_plan_row()의 asyncio 버전 (인자와 반환값이 같다, cpu_seconds는 ffmpeg 프로세스의 CPU 시간)
+    record, reason = start_plan_row(row, check_exists)
+    start = timer()
+
+    def finish(status='ok', reason=None, error=None):
+        record['status'] = status
+        record['reason'] = reason
+        record['error'] = error
+        record['wall_seconds'] = timer() - start
+        return record
+
+    if reason is not None:
+        return finish('skipped', reason)
+    stream = build_tube_stream(record, record['input_filepath'], threads=threads, filter_threads=filter_threads)
+    make_output_dirs(record)
+    encode_start = timer()
+    try:
+        result = await run_ffmpeg_async(stream, overwrite_output=True,
+                                        timeout=get_tube_timeout(record['frames'], tube_timeout, tube_timeout_per_frame))
+    except Exception as e:
+        remove_temp_outputs(record)
+        record['encode_seconds'] = timer() - encode_start
+        record['reported_frames'] = getattr(e, 'reported_frames', 0)
+        if isinstance(e, FFmpegTimeout):
+            print('Timeout %s: %s' % (record['video_name'], e))
+            return finish('timeout', 'encode')
+        return finish('failed', 'encode', get_error_message(e))
+    commit_outputs(record)
+    record['encode_seconds'] = timer() - encode_start
+    record['peak_rss_bytes'] = result['peak_rss']
+    record['cpu_seconds'] = result['cpu_seconds']
+    return finish()
+
+
+# run_crop_pool()에 넘기는 워커 함수 -> --executor async에서 같은 인자로 실행하는 asyncio 버전
+ASYNC_WORKERS = {
+    trim_and_crop_min_size: trim_and_crop_async,
+    run_plan_row: run_plan_row_async,
+}
+
+
+def run_pool(worker, items, config, progress, max_tasks_per_child=0, admission=None, executor='process',
+             affinity=False, group_worker=False, async_worker=None):
+    # config(워커 수와 ffmpeg 스레드 수)로 풀을 하나 만들어서 작업들을 처리하고 결과 record를 하나씩 돌려주는 제너레이터
+    # items: 작업(tube 또는 affinity.TubeGroup) 리스트 또는 작업을 차례로 돌려주는 iterable
+    #        iterable이면 풀을 멈추지 않고 돌려주는 대로 넣는다 (watch 모드, admission은 리스트에서만 사용한다)
+    # 나머지 인자는 run_crop_pool()과 같다
+    # multiprocessing과 asyncio는 풀을 만드는 메인 프로세스에서만 필요하므로 여기서 import한다
+    # (spawn 방식의 워커는 trim_and_crop_min_size를 찾기 위해 이 모듈만 import한다)
+    import multiprocessing as mp
+    from talkinghead.async_executor import AsyncExecutor
+
+    grouped = affinity or group_worker
+    print('Using pool size of %d with %s ffmpeg threads' % (config['num_workers'], config['threads'] or 'default'))
+    cropper = partial(worker, threads=config['threads'], filter_threads=config['filter_threads'])
+    if admission is not None:
+        admission.max_workers = config['num_workers']
+    pool = None
+    if executor == 'async':
+        # 이벤트 루프는 메인 프로세스에서 돌므로 공유 카운터를 메인 프로세스에 설정한다
+        init_progress_counter(progress.counter)
+        async_cropper = partial(async_worker or ASYNC_WORKERS[worker.func], *worker.args,
+                                **dict(worker.keywords, threads=config['threads'], filter_threads=config['filter_threads']))
+        if affinity and not group_worker:
+            async_cropper = partial(crop_tube_group_async, async_cropper)
+        results = AsyncExecutor(config['num_workers']).imap_unordered(async_cropper, items, admission)
+    else:
+        pool = mp.Pool(processes=config['num_workers'], initializer=init_progress_counter, initargs=(progress.counter,),
+                       maxtasksperchild=max_tasks_per_child or None)
+        if affinity and not group_worker:
+            cropper = partial(crop_tube_group, cropper)
+        if admission is not None:
+            results = imap_admitted(pool, cropper, items, admission)
+        else:
+            # imap_unordered()는 풀의 작업 스레드에서 items를 하나씩 꺼내므로 iterable이 기다리는 동안에도 결과를 돌려준다
+            results = pool.imap_unordered(cropper, items)
+    try:
+        for result in results:
+            for record in (result if grouped else [result]):
+                yield record
+    finally:
+        # with mp.Pool(...)과 같이 끝나면 풀을 종료한다
+        if pool is not None:
+            pool.terminate()
+
+
+def iter_stream_items(worker, tube_batches, affinity=False, num_workers=1, group_worker=False):
+    # 도착하는 tube 리스트들(talkinghead.watch.iter_arrived_tubes)을 풀의 작업 단위로 바꾸는 제너레이터
+    # 묶음 단위 워커이면 도착한 tube 리스트마다 세그먼트별로 묶는다 (num_workers: 풀 크기, 미리 읽을 세그먼트를 정한다)
+    grouped = affinity or group_worker
+    input_dir = worker.args[0] if worker.args else None
+    for batch in tube_batches:
+        if grouped:
+            yield from group_tubes_by_segment(batch, input_dir, num_workers=num_workers)
+        else:
+            yield from batch
+
+
+def run_crop_pool(worker, tubes, scheduler, progress, max_tasks_per_child=0, admission=None, executor='process',
+                  affinity=False, group_worker=False, async_worker=None):
+    # scheduler가 정한 워커 수와 ffmpeg 스레드 수로 tube들을 처리하고 결과 record를 하나씩 돌려주는 제너레이터
+    # worker: trim_and_crop_min_size 또는 run_plan_row에 tube 외의 인자를 고정한 partial (threads/filter_threads는 여기서 지정한다)
+    # tubes: 처리할 tube 정보 문자열 리스트, run_plan_row이면 status가 'planned'인 plan row 리스트
+    # scheduler: scheduler.CropScheduler
+    #            auto 모드에서 측정 중이면 calibration_size()개씩 후보 조합으로 처리하고 결과(frames/s)를 알려준다
+    #            측정이 끝나면 나머지 tube를 선택된 조합의 풀 하나로 처리한다
+    #            tube가 부족해서 측정이 끝나지 않으면 그대로 두므로 여러 비디오에 걸쳐 측정을 이어갈 수 있다
+    # progress: FrameProgress (모든 풀의 워커가 같은 공유 카운터에 프레임 수를 더한다)
+    # max_tasks_per_child: 워커가 이 개수만큼 tube를 처리하면 새 프로세스로 교체한다 (0이면 교체하지 않는다)
+    # admission: AdmissionController이면 메모리/CPU 여유가 있을 때만 tube를 넣는다 (풀 크기는 상한), None이면 모두 바로 넣는다
+    # executor: 'process'이면 mp.Pool 워커에서, 'async'이면 메인 프로세스의 asyncio 이벤트 루프에서 ffprobe/ffmpeg를 실행한다
+    #           async에서는 worker와 같은 인자로 asyncio 버전(async_worker, 없으면 ASYNC_WORKERS)을 실행하고, 워커 수는 동시에 실행하는 tube 수가 된다
+    # affinity: True이면 같은 세그먼트의 tube를 묶어서(affinity.TubeGroup) 한 워커가 연달아 처리하고 다음 세그먼트를 미리 읽는다
+    # group_worker: True이면 worker가 tube 하나가 아니라 세그먼트별 tube 묶음(affinity.TubeGroup)을 받아서 record 리스트를 반환한다
+    #               (talkinghead.audio.extract_audio_group처럼 세그먼트의 tube를 ffmpeg 한 번으로 처리하는 워커, affinity와 관계없이 묶는다)
+    # async_worker: executor가 'async'일 때 worker 대신 실행할 asyncio 버전 (예: extract_audio_group_async)
+    #               None이면 ASYNC_WORKERS에서 찾는다 (trim_and_crop_min_size, run_plan_row)
+    # tubes가 리스트가 아니면 watch 모드이다: 새로 도착한 tube 리스트를 차례로 돌려주는 iterable (talkinghead.watch.iter_arrived_tubes)
+    #           풀은 한 번만 만들고 도착한 tube를 같은 풀에 계속 넣는다 (auto 측정과 admission은 사용하지 않는다)
+    if not isinstance(tubes, list):
+        config = scheduler.current()
+        yield from run_pool(worker, iter_stream_items(worker, tubes, affinity, config['num_workers'], group_worker), config,
+                            progress, max_tasks_per_child, None, executor, affinity, group_worker, async_worker)
+        return
+    grouped = affinity or group_worker
+    start = 0
+    while start < len(tubes):
+        calibrating = scheduler.calibrating
+        config = scheduler.current()
+        batch = tubes[start:start + scheduler.calibration_size()] if calibrating else tubes[start:]
+        start += len(batch)
+        encoded_frames = 0
+        # 측정 시간은 배치의 경과 시간이 아니라 인코딩한 tube들의 처리 시간(wall_seconds) 합을 워커 수로 나눈 값이다
+        # (풀을 만드는 시간과 마지막 tube들이 끝나기를 기다리는 동안 노는 워커의 시간이 후보의 처리량에 섞이지 않는다)
+        busy_seconds = 0.0
+        # affinity가 켜져 있으면 작업 단위가 tube 하나가 아니라 세그먼트별 tube 묶음이 된다 (결과는 record 리스트)
+        # trim_and_crop_min_size의 worker.args[0]은 세그먼트 파일이 있는 input_dir이다 (plan row는 input_filepath를 들고 있다)
+        items = batch
+        if grouped:
+            input_dir = worker.args[0] if worker.args else None
+            items = group_tubes_by_segment(batch, input_dir, order=admission.order if admission is not None else None,
+                                           num_workers=config['num_workers'])
+        for record in run_pool(worker, items, config, progress, max_tasks_per_child, admission, executor, affinity,
+                               group_worker, async_worker):
+            if record['status'] == 'ok':
+                encoded_frames += record['frames']
+                busy_seconds += record['wall_seconds']
+            yield record
+        # 모든 tube를 건너뛴 경우(이미 처리된 tube 등)에는 측정값이 없으므로 같은 후보를 다음 묶음에서 다시 측정한다
+        if calibrating and encoded_frames > 0:
+            scheduler.report(encoded_frames, busy_seconds / config['num_workers'])
@@ -0,0 +1,124 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import os
+import shutil
+import subprocess
+import time
+
+
+def download_video(output_dir, video_id, delay=2.0):
+    """
+    output_dir: 저장할 디렉토리
+    video_id: YouTube video id (예: "--Y9imYnfBw")
+    delay: 다운로드 전 대기 시간(초), YouTube 봇 차단을 피하기 위해 사용한다
+    반환: 성공 시 mp4 파일 경로, 실패 시 None
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    video_path = os.path.join(output_dir, video_id + ".mp4")
+
+    # 이미 존재하면 스킵
+    if os.path.isfile(video_path):
+        print(f"File exists: {video_path}")
+        return video_path
+
+    # 다운로드 전 딜레이를 추가한다
+    # YouTube가 봇으로 인식하지 않도록 요청 간 간격을 둔다
+    # delay가 0보다 크면 해당 시간만큼 대기한다
+    # 예) delay=2.0이면 2초 대기한다
+    if delay > 0:
+        time.sleep(delay)
+
+    # yt-dlp를 이용해 최고 화질 mp4 + 오디오 통합본을 받는다.
+    # - f "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"
+    #   -> mp4 비디오+오디오 조합이 되면 그걸, 안 되면 best mp4 하나, 그것도 안 되면 best 전체
+    url = f"https://www.youtube.com/watch?v={video_id}"
+
+    cmd = [
+        "yt-dlp",
+        "-f", "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
+        "-o", video_path,
+        "--cookies", "./www.youtube.com_cookies.txt",
+        url,
+    ]
+
+    print("Running:", " ".join(cmd))
+
+    try:
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+        )
+    except FileNotFoundError:
+        print("yt-dlp 실행 파일을 찾을 수 없다. yt-dlp를 설치했는지 확인해라.")
+        return None
+
+    if result.returncode != 0:
+        print(f"yt-dlp failed for {video_id}")
+        print("stderr:", result.stderr)
+        return None
+
+    if os.path.isfile(video_path):
+        print(f"Downloaded: {video_path}")
+        return video_path
+    else:
+        print(f"yt-dlp reported success but file not found: {video_path}")
+        return None
+
+
+def get_video_size(video_id):
+    """
+    download_video()가 받을 포맷의 크기를 다운로드하지 않고 yt-dlp 메타데이터로 알아낸다
+    video_id: YouTube video id (예: "--Y9imYnfBw")
+    반환: 크기(바이트), yt-dlp가 filesize와 filesize_approx를 모두 알려주지 않거나 실패하면 None
+    """
+    url = f"https://www.youtube.com/watch?v={video_id}"
+
+    # 비디오+오디오를 합친 포맷은 filesize가 없고 두 스트림을 더한 filesize_approx만 있다
+    cmd = [
+        "yt-dlp",
+        "-f", "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
+        "--skip-download",
+        "--print", "%(filesize,filesize_approx)s",
+        "--cookies", "./www.youtube.com_cookies.txt",
+        url,
+    ]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except FileNotFoundError:
+        return None
+    if result.returncode != 0:
+        return None
+    try:
+        return int(result.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        # 크기를 모르면 'NA'가 출력된다
+        return None
+
+
+def get_local_video_size(source_dir, video_id):
+    # copy_local_video()가 복사할 파일의 크기(바이트), 파일이 없으면 None
+    source_path = os.path.join(source_dir, video_id + '.mp4')
+    return os.path.getsize(source_path) if os.path.isfile(source_path) else None
+
+
+def copy_local_video(source_dir, output_dir, video_id):
+    # YouTube 대신 로컬 디렉토리에서 비디오를 복사하는 함수 (download_video()의 로컬 대체, 벤치마크용)
+    # source_dir: '{video_id}.mp4' 파일들이 있는 디렉토리
+    # output_dir: 복사할 디렉토리 (temp_raw_dir)
+    # 반환값: 성공 시 mp4 파일 경로, 실패 시 None
+    os.makedirs(output_dir, exist_ok=True)
+    video_path = os.path.join(output_dir, video_id + '.mp4')
+    if os.path.isfile(video_path):
+        print('File exists: %s' % (video_path))
+        return video_path
+    source_path = os.path.join(source_dir, video_id + '.mp4')
+    if not os.path.isfile(source_path):
+        print('Local source not found: %s' % (source_path))
+        return None
+    shutil.copyfile(source_path, video_path)
+    return video_path
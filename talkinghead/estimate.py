@@ -0,0 +1,222 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import json
+import os
+
+from talkinghead.plan import (get_decode_frames, get_encode_frames, get_output_filepaths, new_tube_record,
+                              resolve_tube)
+
+# split_video()가 만드는 세그먼트 하나의 길이(초)이다 (-segment_time 00:01:00)
+SEGMENT_SECONDS = 60.0
+# probe 결과가 캐시에 없는 세그먼트에 가정하는 원본 코덱이다 (yt-dlp로 받는 YouTube 비디오는 대부분 h264이다)
+ASSUMED_CODEC = 'h264'
+
+
+def ratio(numerator, denominator):
+    # 측정값이 없으면(분모가 0이면) None을 반환하는 나눗셈
+    return numerator / denominator if denominator > 0 else None
+
+
+def load_throughput_profile(path):
+    # 이전 실행에서 측정한 단계별 처리 속도를 읽는 함수
+    # path: videos_process_train.py --metrics_file의 JSONL 파일 (type이 'video'인 줄을 사용한다)
+    #       또는 benchmarks.bench_pipeline --output_json의 JSON 파일 ('videos' 리스트를 사용한다)
+    # status가 'ok'인 비디오만 사용한다
+    # 반환값: {'videos': 측정한 비디오 수,
+    #          'download_bytes_per_second', 'split_bytes_per_second': 원본 비디오 바이트 기준 처리 속도,
+    #          'encode_frames_per_second': 크롭 단계의 벽시계 시간당 인코딩한 프레임 수 (측정한 실행의 풀 크기 기준),
+    #          'cleanup_seconds': 비디오 하나의 임시 파일 삭제 시간,
+    #          'output_bytes_per_frame': 출력 클립의 프레임당 바이트,
+    #          'segment_bytes': 세그먼트 하나의 평균 크기}
+    #         측정값이 없는 항목은 None
+    with open(path) as fin:
+        text = fin.read()
+    videos = None
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict) and 'videos' in data:
+            videos = data['videos']
+    except ValueError:
+        pass
+    if videos is None:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+        videos = [entry for entry in entries if entry.get('type') == 'video']
+    videos = [stats for stats in videos if stats.get('status') == 'ok']
+
+    def total(key, items=videos):
+        return sum(stats.get(key, 0) for stats in items)
+
+    # 세그먼트 수는 최근 실행의 통계에만 있다
+    counted = [stats for stats in videos if stats.get('segments')]
+    return {
+        'videos': len(videos),
+        'download_bytes_per_second': ratio(total('download_bytes'), total('download')),
+        'split_bytes_per_second': ratio(total('download_bytes'), total('split')),
+        'encode_frames_per_second': ratio(total('tube_frames'), total('crop')),
+        'cleanup_seconds': ratio(total('cleanup'), len(videos)),
+        'output_bytes_per_frame': ratio(total('output_bytes'), total('tube_frames')),
+        'segment_bytes': ratio(total('download_bytes', counted), total('segments', counted)),
+    }
+
+
+def estimate_tube(clip_params, output_dir, probe_cache=None, output_layout='flat', check_exists=True,
+                  assume_fps=30.0, output_bytes_per_frame=None, chunk_frames=0, chunk_overlap=0, **resolve_kwargs):
+    # 세그먼트를 받지 않고 tube 하나의 처리 결과와 작업량을 추정하는 함수
+    # probe_cache에 세그먼트의 ffprobe 결과가 있으면 그 값으로, 없으면 tubes 파일의 H, W와 assume_fps,
+    # 1분 길이를 가정해서 resolve_tube()를 실행한다 (실제 실행과 같은 필터, crop 좌표, 비트레이트 정책)
+    # output_dir, output_layout, check_exists, chunk_frames, chunk_overlap: trim_and_crop_min_size와 같다
+    #     (출력 파일이 있으면 'exists'로 건너뛴다)
+    # output_bytes_per_frame: 비트레이트가 정해지지 않는 경우(CRF/QP, 인코더 기본값) 출력 크기를 추정할 프레임당 바이트
+    # resolve_kwargs: resolve_tube()의 나머지 인자
+    # 반환값: new_tube_record()의 딕셔너리에 다음 항목을 채운 것
+    #         status: 'planned' 또는 'skipped' (reason: 'exists', 'too_short', 'too_small')
+    #         probed: 캐시된 probe 결과를 사용했는지 여부
+    #         decode_frames: 디코딩할 프레임 수 (probe 결과가 없으면 1분 세그먼트 끝까지로 가정한다)
+    #         output_bytes: 출력 크기 추정치 (비디오 스트림만), 추정할 수 없으면 None
+    record = new_tube_record(output_dir, clip_params, output_layout, chunk_frames, chunk_overlap)
+    entry = probe_cache.entries.get(record['video_name'] + '.mp4') if probe_cache is not None else None
+    record['probed'] = entry is not None
+    if check_exists and os.path.exists(get_output_filepaths(record)[-1]):
+        record['reason'] = 'exists'
+        return record
+    if entry is not None:
+        video_info = entry['info']
+    else:
+        video_info = {'h': record['H'], 'w': record['W'], 'fps': assume_fps, 'codec': ASSUMED_CODEC, 'bitrate': None,
+                      'has_audio': True, 'duration': SEGMENT_SECONDS, 'frames': None}
+    reason = resolve_tube(record, video_info, **resolve_kwargs)
+    if reason is not None:
+        record['reason'] = reason
+        return record
+    record['status'] = 'planned'
+    record['decode_frames'] = get_decode_frames(record, video_info)
+    bitrate = record['encoder_args'].get('b:v')
+    if bitrate is not None:
+        record['output_bytes'] = int(int(bitrate) * get_encode_frames(record) / (record.get('output_fps') or record['fps']) / 8)
+    elif output_bytes_per_frame is not None:
+        record['output_bytes'] = int(output_bytes_per_frame * get_encode_frames(record))
+    else:
+        record['output_bytes'] = None
+    return record
+
+
+def estimate_video_bytes(video_id, tubes, probe_cache=None, segment_bytes=None):
+    # 비디오 하나의 원본 크기(바이트)를 추정하는 함수 (세그먼트는 -c copy로 만들므로 세그먼트 크기의 합과 같다)
+    # tube가 있는 마지막 세그먼트 번호까지를 세그먼트 수로 보고(그 뒤의 세그먼트는 알 수 없다),
+    # probe 캐시에 있는 세그먼트는 기록된 크기를, 없는 세그먼트는 segment_bytes(측정한 평균 크기)를 사용한다
+    # 반환값: 추정 크기, segment_bytes가 필요한데 None이면 None
+    num_segments = 1 + max(int(tube.split(',')[0].strip().rsplit('_', 1)[1]) for tube in tubes)
+    nbytes = 0
+    for i in range(num_segments):
+        entry = probe_cache.entries.get('%s_%04d.mp4' % (video_id, i)) if probe_cache is not None else None
+        if entry is not None:
+            nbytes += entry['size']
+        elif segment_bytes is None:
+            return None
+        else:
+            nbytes += segment_bytes
+    return int(nbytes)
+
+
+def estimate_run(videos, output_dir, probe_cache=None, profile=None, prefetch_videos=0, temp_budget_bytes=0,
+                 **tube_kwargs):
+    # videos_process_train.py 실행 전체의 작업량과 시간을 추정하는 함수 (--dry_run)
+    # videos: 처리 순서대로 (video_id, 처리할 tube 리스트, 이미 처리되어 건너뛸 tube 수) 리스트
+    # output_dir: 워커가 클립을 쓸 디렉토리
+    # probe_cache: ProbeCache, 캐시된 세그먼트는 실제 probe 결과로 계획한다
+    # profile: load_throughput_profile()의 결과, None이면 시간과 (비트레이트가 없는 tube의) 출력 크기를 추정하지 않는다
+    # prefetch_videos, temp_budget_bytes: --prefetch_videos, --temp_budget_gb (임시 공간과 다운로드 겹침 추정에 사용한다)
+    # tube_kwargs: estimate_tube()의 나머지 인자
+    # 반환값: 추정치 딕셔너리 (추정할 수 없는 항목은 None)
+    profile = profile or {}
+    report = {'videos': 0, 'tubes': 0, 'planned': 0, 'skipped': {}, 'probed_tubes': 0, 'encode_frames': 0,
+              'decode_frames': 0, 'output_bytes': 0, 'unknown_output_tubes': 0, 'download_bytes': 0,
+              'peak_temp_bytes': None, 'stage_seconds': None, 'seconds': None}
+    footprints = []
+    stage_times = []
+    for video_id, tubes, num_done in videos:
+        report['tubes'] += len(tubes) + num_done
+        if num_done:
+            report['skipped']['done'] = report['skipped'].get('done', 0) + num_done
+        if not tubes:
+            # 처리할 tube가 없는 비디오는 받지 않는다
+            continue
+        report['videos'] += 1
+        video_frames = 0
+        for tube in tubes:
+            record = estimate_tube(tube, output_dir, probe_cache,
+                                   output_bytes_per_frame=profile.get('output_bytes_per_frame'), **tube_kwargs)
+            report['probed_tubes'] += record['probed']
+            if record['status'] != 'planned':
+                report['skipped'][record['reason']] = report['skipped'].get(record['reason'], 0) + 1
+                continue
+            report['planned'] += 1
+            report['encode_frames'] += get_encode_frames(record)
+            report['decode_frames'] += record['decode_frames']
+            video_frames += get_encode_frames(record)
+            if record['output_bytes'] is None:
+                report['unknown_output_tubes'] += 1
+            else:
+                report['output_bytes'] += record['output_bytes']
+        video_bytes = estimate_video_bytes(video_id, tubes, probe_cache, profile.get('segment_bytes'))
+        # 원본 비디오와 세그먼트를 합쳐서 원본 크기의 2배를 임시 공간으로 사용한다 (TempSpace와 같은 계산)
+        footprints.append(None if video_bytes is None else 2 * video_bytes)
+        if video_bytes is not None and report['download_bytes'] is not None:
+            report['download_bytes'] += video_bytes
+        else:
+            report['download_bytes'] = None
+        stage_times.append(estimate_stage_seconds(video_bytes, video_frames, profile))
+
+    report['peak_temp_bytes'] = estimate_peak_temp_bytes(footprints, prefetch_videos, temp_budget_bytes)
+    if stage_times and all(times is not None for times in stage_times):
+        report['stage_seconds'] = {stage: sum(times[stage] for times in stage_times) for stage in stage_times[0]}
+        report['seconds'] = estimate_wall_seconds(stage_times, prefetch_videos)
+    elif not stage_times:
+        report['stage_seconds'] = {}
+        report['seconds'] = 0.0
+    return report
+
+
+def estimate_stage_seconds(video_bytes, video_frames, profile):
+    # 비디오 하나의 단계별 시간(초)을 측정한 처리 속도로 추정하는 함수
+    # 반환값: {'download': ..., 'split': ..., 'crop': ..., 'cleanup': ...}, 필요한 값이 없으면 None
+    rates = [profile.get('download_bytes_per_second'), profile.get('split_bytes_per_second'),
+             profile.get('encode_frames_per_second')]
+    if video_bytes is None or any(rate is None for rate in rates):
+        return None
+    return {'download': video_bytes / rates[0], 'split': video_bytes / rates[1], 'crop': video_frames / rates[2],
+            'cleanup': profile.get('cleanup_seconds') or 0.0}
+
+
+def estimate_wall_seconds(stage_times, prefetch_videos=0):
+    # 단계별 시간으로 전체 벽시계 시간을 추정하는 함수
+    # prefetch를 사용하지 않으면 모든 단계가 차례로 실행된다
+    # prefetch를 사용하면 다음 비디오의 다운로드가 현재 비디오의 분할/크롭과 겹치므로 둘 중 긴 쪽만 더한다
+    if not prefetch_videos:
+        return sum(sum(times.values()) for times in stage_times)
+    seconds = stage_times[0]['download']
+    for i, times in enumerate(stage_times):
+        process = times['split'] + times['crop'] + times['cleanup']
+        next_download = stage_times[i + 1]['download'] if i + 1 < len(stage_times) else 0.0
+        seconds += max(process, next_download)
+    return seconds
+
+
+def estimate_peak_temp_bytes(footprints, prefetch_videos=0, temp_budget_bytes=0):
+    # 동시에 남아 있는 임시 파일(원본 + 세그먼트)의 최대 크기를 추정하는 함수
+    # footprints: 처리 순서대로 비디오별 임시 공간(바이트), 알 수 없으면 None
+    # 처리 중인 비디오 하나와 미리 받아 둔 비디오 prefetch_videos개가 함께 남아 있을 수 있다
+    # temp_budget_bytes가 있으면 그 안으로 제한된다 (비디오 하나가 예산보다 크면 그 비디오만 진행한다)
+    if any(nbytes is None for nbytes in footprints):
+        return None
+    peak = 0
+    window = prefetch_videos + 1
+    for i in range(len(footprints)):
+        in_flight = footprints[i:i + window]
+        nbytes = sum(in_flight)
+        if temp_budget_bytes:
+            nbytes = min(nbytes, max(temp_budget_bytes, max(in_flight)))
+        peak = max(peak, nbytes)
+    return peak
@@ -0,0 +1,346 @@
+import collections
+import json
+import os
+import subprocess
+import threading
+
+# ffmpeg-python, tqdm, multiprocessing, asyncio는 사용하는 함수 안에서 import한다
+# (spawn 방식의 풀 워커나 라이브러리로 import할 때 쓰지 않는 모듈까지 읽지 않도록)
+
+
+# ffprobe 명령어 (ffmpeg.probe()와 같은 옵션, 입력 파일 경로는 뒤에 붙인다)
+PROBE_ARGS = ['ffprobe', '-show_format', '-show_streams', '-of', 'json']
+
+# 워커 프로세스에서 인코딩한 프레임 수를 메인 프로세스와 공유하는 카운터이다
+# mp.Pool의 initializer(init_progress_counter)로 설정되며, 설정되지 않으면 진행 상황을 보고하지 않는다
+_progress_counter = None
+
+
+class FFmpegTimeout(Exception):
+    # ffmpeg/ffprobe가 제한 시간 안에 끝나지 않아 강제로 종료한 경우 발생하는 예외
+    pass
+
+
+def get_error_message(error):
+    # 예외를 한 줄 메시지로 바꾸는 함수 (결과 record와 재시도 파일에 기록하기 위해 사용한다)
+    # ffmpeg.Error는 메시지가 항상 같으므로 stderr의 마지막 줄을 사용한다
+    # 예) "[vost#0:0 @ 0x349bdc40] Unknown encoder 'nosuch_enc'"
+    import ffmpeg
+
+    if isinstance(error, ffmpeg.Error) and error.stderr:
+        lines = [line for line in error.stderr.decode('utf-8', 'replace').splitlines() if line.strip()]
+        if lines:
+            return lines[-1].strip()
+    return '%s: %s' % (type(error).__name__, error)
+
+
+def init_progress_counter(counter):
+    # mp.Pool의 initializer로 사용하는 함수
+    # counter: 메인 프로세스에서 만든 mp.Value('q', 0)
+    global _progress_counter
+    _progress_counter = counter
+
+
+def _report_frames(num_frames):
+    # 새로 인코딩한 프레임 수를 공유 카운터에 더한다
+    if _progress_counter is None or num_frames <= 0:
+        return
+    with _progress_counter.get_lock():
+        _progress_counter.value += num_frames
+
+
+def get_peak_rss(pid):
+    # 프로세스의 최대 RSS(VmHWM, 바이트)를 반환하는 함수, 이미 종료되었거나 /proc이 없으면 0
+    try:
+        with open('/proc/%d/status' % (pid)) as fin:
+            for line in fin:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def get_process_cpu_seconds(pid):
+    # 실행 중인 프로세스가 지금까지 사용한 CPU 시간(user + sys, 초)을 반환하는 함수, 이미 종료되었거나 /proc이 없으면 0
+    try:
+        with open('/proc/%d/stat' % (pid)) as fin:
+            # 두 번째 필드(프로세스 이름)에 공백이 들어갈 수 있으므로 마지막 ')' 뒤부터 나눈다
+            # ')' 뒤의 12, 13번째 필드가 utime, stime이다 (clock tick 단위)
+            fields = fin.read().rpartition(')')[2].split()
+        return (int(fields[11]) + int(fields[12])) / float(os.sysconf('SC_CLK_TCK'))
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+def probe_file(filepath, timeout=None):
+    # ffmpeg.probe()와 같지만 제한 시간을 지원하는 함수
+    # 손상된 파일에서 ffprobe가 멈추면 timeout(초) 후에 ffprobe를 종료하고 FFmpegTimeout을 발생시킨다
+    # 반환값: ffprobe -show_format -show_streams의 JSON 결과 (ffmpeg.probe()와 같은 형식)
+    import ffmpeg
+
+    try:
+        # subprocess.run()은 제한 시간이 지나면 자식 프로세스를 kill한 후 TimeoutExpired를 발생시킨다
+        result = subprocess.run(PROBE_ARGS + [filepath],
+                                stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise FFmpegTimeout('ffprobe timed out after %.1f seconds: %s' % (timeout, filepath))
+    if result.returncode != 0:
+        raise ffmpeg.Error('ffprobe', result.stdout, result.stderr)
+    return json.loads(result.stdout.decode('utf-8'))
+
+
+def compile_ffmpeg_args(stream, overwrite_output=True):
+    # ffmpeg를 조용히 실행하고(-hide_banner -nostats -loglevel error) -progress pipe:1로 진행 상황을 받는 명령어를 만드는 함수
+    # stream: ffmpeg.output()으로 만든 출력 스트림
+    # 반환값: 명령어 리스트 (예: ['ffmpeg', '-i', 'in.mp4', ..., 'out.mp4', '-hide_banner', ..., '-y'])
+    import ffmpeg
+
+    stream = stream.global_args('-hide_banner', '-nostats', '-loglevel', 'error', '-progress', 'pipe:1')
+    return ffmpeg.compile(stream, overwrite_output=overwrite_output)
+
+
+class ProgressReader:
+    # ffmpeg -progress pipe:1 출력을 한 줄씩 읽어서 진행 상황을 모으는 클래스
+    # -progress 출력은 'key=value' 줄의 묶음이고, 각 묶음은 'progress=continue' 또는 'progress=end'로 끝난다
+    # 예) frame=120 / fps=143.2 / ... / speed=4.77x / progress=continue
+    # 묶음이 끝날 때마다 새로 인코딩한 프레임 수를 공유 카운터에 더하고 ffmpeg의 최대 RSS와 CPU 시간을 읽는다
+
+    def __init__(self, pid):
+        self.pid = pid
+        # peak_rss: ffmpeg의 최대 RSS(바이트), cpu_seconds: ffmpeg가 사용한 CPU 시간(초)
+        self.progress = {'frames': 0, 'fps': 0.0, 'speed': 0.0, 'peak_rss': 0, 'cpu_seconds': 0.0}
+        self.reported = 0
+
+    def feed(self, line):
+        progress = self.progress
+        key, _, value = line.decode('utf-8', 'replace').strip().partition('=')
+        value = value.strip()
+        try:
+            if key == 'frame':
+                progress['frames'] = int(value)
+            elif key == 'fps':
+                progress['fps'] = float(value)
+            elif key == 'speed' and value.endswith('x'):
+                progress['speed'] = float(value[:-1])
+        except ValueError:
+            # 시작 직후에는 'N/A'가 올 수 있다
+            return
+        if key == 'progress':
+            _report_frames(progress['frames'] - self.reported)
+            self.reported = progress['frames']
+            # 'progress=end'는 ffmpeg가 종료되기 직전에 오므로 짧은 tube도 최소 한 번은 읽는다
+            progress['peak_rss'] = max(progress['peak_rss'], get_peak_rss(self.pid))
+            progress['cpu_seconds'] = max(progress['cpu_seconds'], get_process_cpu_seconds(self.pid))
+
+
+def run_ffmpeg(stream, overwrite_output=True, stderr_tail=30, timeout=None):
+    # ffmpeg.run() 대신 사용하는 함수
+    # ffmpeg를 조용히 실행하고(-hide_banner -nostats -loglevel error) -progress pipe:1로 진행 상황을 받는다
+    # 배너와 진행 로그를 터미널에 출력하지 않으므로 워커가 많아도 출력이 섞이지 않고 SSH/로그 수집기가 느려지지 않는다
+    # stream: ffmpeg.output()으로 만든 출력 스트림
+    # overwrite_output: True이면 출력 파일을 덮어쓴다 (-y)
+    # stderr_tail: 실패했을 때 예외에 포함할 stderr 마지막 줄 수
+    # timeout: 제한 시간(초), 지나면 ffmpeg를 kill하고 FFmpegTimeout을 발생시킨다 (None이면 제한 없음)
+    # 반환값: 마지막 진행 상황 딕셔너리 (예: {'frames': 272, 'fps': 143.2, 'speed': 4.77, 'peak_rss': 157286400, 'cpu_seconds': 3.1})
+    #         peak_rss와 cpu_seconds는 진행 상황을 받을 때마다 읽은 ffmpeg의 최대 RSS(바이트)와 CPU 시간이다
+    # 실패하면 stderr 마지막 부분을 담은 ffmpeg.Error를 발생시킨다 (ffmpeg.run()과 같은 예외 타입)
+    import ffmpeg
+
+    args = compile_ffmpeg_args(stream, overwrite_output=overwrite_output)
+    process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # stderr는 별도 스레드에서 읽는다 (파이프 버퍼가 가득 차서 ffmpeg가 멈추는 것을 막는다)
+    # 성공하면 버리고, 실패한 경우에만 마지막 몇 줄을 보여준다
+    tail = collections.deque(maxlen=stderr_tail)
+    stderr_reader = threading.Thread(target=lambda: tail.extend(process.stderr), daemon=True)
+    stderr_reader.start()
+
+    # 제한 시간이 지나면 타이머 스레드가 ffmpeg를 kill한다
+    # ffmpeg가 멈추면 stdout도 멈추므로, kill되면 stdout이 닫혀서 아래 루프가 끝난다
+    killed = threading.Event()
+
+    def kill():
+        # stdout이 끝난 후 watchdog.cancel() 전에 타이머가 울릴 수 있다, 이미 끝난 ffmpeg는 kill하지 않는다
+        if process.poll() is not None:
+            return
+        killed.set()
+        process.kill()
+
+    watchdog = None
+    if timeout is not None:
+        watchdog = threading.Timer(timeout, kill)
+        watchdog.daemon = True
+        watchdog.start()
+
+    reader = ProgressReader(process.pid)
+    for line in process.stdout:
+        reader.feed(line)
+    progress = reader.progress
+
+    process.wait()
+    if watchdog is not None:
+        watchdog.cancel()
+    stderr_reader.join()
+    # kill 직전에 ffmpeg가 정상 종료했으면 완성된 클립이므로 제한 시간 초과로 보지 않는다
+    if killed.is_set() and process.returncode != 0:
+        error = FFmpegTimeout('ffmpeg timed out after %.1f seconds (%d frames encoded)' % (timeout, progress['frames']))
+    elif process.returncode != 0:
+        stderr = b''.join(tail)
+        print('ffmpeg failed with exit code %d:\n%s' % (process.returncode, stderr.decode('utf-8', 'replace')))
+        error = ffmpeg.Error('ffmpeg', b'', stderr)
+    else:
+        return progress
+    # 실패하기 전까지 공유 카운터에 더한 프레임 수 (FrameProgress.tube_done()이 나머지만 더한다)
+    error.reported_frames = reader.reported
+    raise error
+
+
+def run_ffmpeg_capture(stream, timeout=None):
+    # 출력을 stdout('pipe:')으로 보내는 ffmpeg를 조용히 실행하고 stdout 전체를 반환하는 함수 (원시 프레임 디코딩 등)
+    # timeout(초)이 지나면 ffmpeg를 kill하고 FFmpegTimeout을 발생시킨다, 실패하면 stderr를 담은 ffmpeg.Error를 발생시킨다
+    import ffmpeg
+
+    args = ffmpeg.compile(stream.global_args('-hide_banner', '-nostats', '-loglevel', 'error'))
+    try:
+        result = subprocess.run(args, stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise FFmpegTimeout('ffmpeg timed out after %.1f seconds' % (timeout))
+    if result.returncode != 0:
+        raise ffmpeg.Error('ffmpeg', b'', result.stderr)
+    return result.stdout
+
+
+async def probe_file_async(filepath, timeout=None):
+    # probe_file()의 asyncio 버전 (이벤트 루프를 막지 않고 ffprobe를 실행한다)
+    import asyncio
+    import ffmpeg
+
+    process = await asyncio.create_subprocess_exec(*(PROBE_ARGS + [filepath]), stdin=subprocess.DEVNULL,
+                                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.CancelledError:
+        # AsyncExecutor가 작업을 취소하면 자식 프로세스도 kill한다 (이벤트 루프가 끝난 후에 남지 않도록)
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        raise
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise FFmpegTimeout('ffprobe timed out after %.1f seconds: %s' % (timeout, filepath))
+    if process.returncode != 0:
+        raise ffmpeg.Error('ffprobe', stdout, stderr)
+    return json.loads(stdout.decode('utf-8'))
+
+
+async def run_ffmpeg_async(stream, overwrite_output=True, stderr_tail=30, timeout=None):
+    # run_ffmpeg()의 asyncio 버전 (인자, 반환값, 예외가 같다)
+    # stdout/stderr를 읽는 스레드와 타이머 스레드 대신 이벤트 루프에서 읽고, 제한 시간은 asyncio.wait_for()로 처리한다
+    import asyncio
+    import ffmpeg
+
+    args = compile_ffmpeg_args(stream, overwrite_output=overwrite_output)
+    process = await asyncio.create_subprocess_exec(*args, stdin=subprocess.DEVNULL,
+                                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    tail = collections.deque(maxlen=stderr_tail)
+    reader = ProgressReader(process.pid)
+
+    async def read_stderr():
+        async for line in process.stderr:
+            tail.append(line)
+
+    async def read_progress():
+        async for line in process.stdout:
+            reader.feed(line)
+
+    try:
+        await asyncio.wait_for(asyncio.gather(read_stderr(), read_progress(), process.wait()), timeout)
+    except asyncio.CancelledError:
+        # AsyncExecutor가 작업을 취소하면 자식 프로세스도 kill한다 (이벤트 루프가 끝난 후에 남지 않도록)
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        raise
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        error = FFmpegTimeout('ffmpeg timed out after %.1f seconds (%d frames encoded)' % (timeout, reader.progress['frames']))
+        error.reported_frames = reader.reported
+        raise error
+    if process.returncode != 0:
+        stderr = b''.join(tail)
+        print('ffmpeg failed with exit code %d:\n%s' % (process.returncode, stderr.decode('utf-8', 'replace')))
+        error = ffmpeg.Error('ffmpeg', b'', stderr)
+        error.reported_frames = reader.reported
+        raise error
+    return reader.progress
+
+
+class FrameProgress:
+    # 모든 워커의 인코딩 프레임 수를 합쳐서 하나의 진행률 표시줄(frames/s, ETA)로 보여주는 클래스
+    # 워커는 run_ffmpeg()에서 공유 카운터에 프레임 수를 더하고, 메인 프로세스의 스레드가 주기적으로 읽어서 표시한다
+    #
+    # 사용 예)
+    #   progress = FrameProgress(total_frames)
+    #   with mp.Pool(processes=n, initializer=init_progress_counter, initargs=(progress.counter,)) as p, progress:
+    #       for record in p.imap_unordered(...):
+    #           progress.tube_done(record)
+
+    def __init__(self, total_frames, desc='Cropping', interval=0.5, leave=True):
+        # total_frames: 처리할 전체 프레임 수 (tube별 E - S + 1의 합)
+        # interval: 표시를 갱신하는 간격(초)
+        import multiprocessing as mp
+
+        self.counter = mp.Value('q', 0)
+        self.total_frames = total_frames
+        self.desc = desc
+        self.interval = interval
+        self.leave = leave
+        # 인코딩하지 않고 끝난 tube(건너뛴 tube 등)의 프레임 수이다 (ETA가 맞도록 완료된 것으로 센다)
+        self.skipped_frames = 0
+        self.tubes_done = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._bar = None
+
+    def __enter__(self):
+        from tqdm import tqdm
+
+        self._bar = tqdm(total=self.total_frames, desc=self.desc, unit='frame', unit_scale=True, leave=self.leave)
+        self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        self._refresh()
+        self._bar.close()
+
+    def tube_done(self, record):
+        # 워커가 tube 하나를 끝냈을 때 메인 프로세스에서 호출한다
+        # record: trim_and_crop_min_size()가 반환한 딕셔너리
+        self.tubes_done += 1
+        if record['status'] != 'ok':
+            # 실패하거나 제한 시간을 넘긴 tube는 ffmpeg가 죽기 전에 공유 카운터에 더한 프레임을 빼고 더한다
+            self.skipped_frames += record['frames'] - record.get('reported_frames', 0)
+        elif record.get('audio_format'):
+            # 오디오만 추출한 tube는 ffmpeg가 비디오 프레임을 알려주지 않으므로 끝날 때 모두 더한다
+            self.skipped_frames += record['frames']
+        else:
+            # ffmpeg는 첫 번째 출력의 프레임 수만 알려주므로 tube의 나머지 프레임을 끝날 때 더한다
+            # (chunk로 나누면 첫 번째 chunk, --output_fps로 frame rate를 바꾸면 출력 fps의 프레임 수를 알려준다)
+            first_output = record['chunks'][0] if record.get('chunks') else record
+            self.skipped_frames += record['frames'] - first_output.get('output_frames', first_output['frames'])
+
+    def _refresh(self):
+        done = min(self.total_frames, self.counter.value + self.skipped_frames)
+        self._bar.set_postfix_str('%d tubes' % (self.tubes_done), refresh=False)
+        # update()로 증가분을 전달해야 tqdm이 frames/s와 ETA를 계산한다
+        self._bar.update(done - self._bar.n)
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.interval):
+            self._refresh()
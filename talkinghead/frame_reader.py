@@ -0,0 +1,210 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import bisect
+import json
+import os
+import subprocess
+import threading
+
+import numpy as np
+
+from talkinghead.clip_output import list_output_clips
+from talkinghead.ffmpeg_runner import FFmpegTimeout, run_ffmpeg_capture
+
+# 클립별 keyframe 인덱스를 저장하는 JSONL 파일의 기본 이름 (클립 디렉토리 바로 아래에 저장된다)
+KEYFRAME_INDEX_FILENAME = 'keyframe_index.jsonl'
+# 비디오 패킷의 시각과 keyframe 여부, 프레임 크기만 읽는 ffprobe 명령어 (입력 경로는 뒤에 붙인다)
+PACKET_PROBE_ARGS = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries',
+                     'packet=pts_time,flags:stream=width,height:format=start_time', '-of', 'json']
+
+
+def get_clip_url(clips_dir, location):
+    # clip_output.list_output_clips()가 반환한 클립 위치를 ffmpeg/ffprobe 입력 경로로 바꾸는 함수
+    # tar shard 안의 클립은 subfile 프로토콜로 shard의 해당 구간만 읽는다 (꺼내지 않고 seek할 수 있다)
+    # 예) 'subfile,,start,1536,end,124416,,:train/cropped_clips/shard-000000.tar'
+    if not isinstance(location, dict):
+        return location
+    start = location['mp4_offset']
+    return 'subfile,,start,%d,end,%d,,:%s' % (start, start + location['mp4_size'],
+                                             os.path.join(clips_dir, location['shard']))
+
+
+def get_clip_size(clips_dir, location):
+    # 클립 파일 크기(바이트), 인덱스가 현재 클립의 것인지 확인할 때 사용한다
+    if isinstance(location, dict):
+        return location['mp4_size']
+    return os.path.getsize(location)
+
+
+def build_keyframe_index(url, timeout=None):
+    # 클립의 비디오 패킷을 한 번 읽어서 프레임별 시각과 keyframe 위치를 만드는 함수 (디코딩하지 않는다)
+    # 반환값: {'width': 288, 'height': 288, 'frames': 272, 'times': [0.0, 0.0333, ...], 'keyframes': [0, 250]}
+    #         times는 표시 순서의 프레임 시각(초, 파일 시작 기준), keyframes는 keyframe인 프레임 번호이다
+    #         (B 프레임이 있으면 패킷 순서와 표시 순서가 다르므로 시각으로 정렬한다)
+    import ffmpeg
+
+    try:
+        result = subprocess.run(PACKET_PROBE_ARGS + [url], stdin=subprocess.DEVNULL, capture_output=True,
+                                timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise FFmpegTimeout('ffprobe timed out after %.1f seconds: %s' % (timeout, url))
+    if result.returncode != 0:
+        raise ffmpeg.Error('ffprobe', result.stdout, result.stderr)
+    probe = json.loads(result.stdout.decode('utf-8'))
+    start_time = float(probe.get('format', {}).get('start_time') or 0.0)
+    packets = sorted((float(packet['pts_time']) - start_time, 'K' in packet.get('flags', ''))
+                     for packet in probe.get('packets', []) if packet.get('pts_time', 'N/A') != 'N/A')
+    stream = probe['streams'][0]
+    return {'width': int(stream['width']), 'height': int(stream['height']), 'frames': len(packets),
+            'times': [round(t, 6) for t, _ in packets], 'keyframes': [i for i, (_, key) in enumerate(packets) if key]}
+
+
+class KeyframeIndex:
+    # build_keyframe_index() 결과를 클립 key별로 저장하는 JSONL 캐시 (talkinghead.probe.ProbeCache와 같은 방식)
+    # 클립마다 한 번만 ffprobe로 패킷을 읽고, 이후에는 파일에서 읽는다 (클립 크기가 달라지면 다시 만든다)
+    # 한 줄에 하나씩 {"key": ..., "size": 클립 크기, "index": {...}} 형식으로 추가한다
+
+    def __init__(self, path=None):
+        # path: 인덱스 파일 경로, None이면 메모리에만 저장한다
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path) as fin:
+                for line in fin:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 중단된 실행에서 마지막 줄이 잘렸을 수 있다
+                        continue
+                    self.entries[entry['key']] = entry
+
+    def get(self, key, size):
+        entry = self.entries.get(key)
+        if entry is None or entry['size'] != size:
+            return None
+        return entry['index']
+
+    def put(self, key, size, index):
+        entry = {'key': key, 'size': size, 'index': index}
+        with self._lock:
+            self.entries[key] = entry
+            if self.path is not None:
+                with open(self.path, 'a+b') as fout:
+                    # 중단된 실행이 마지막 줄을 끝까지 쓰지 못했으면 줄을 바꾼 후에 쓴다 (잘린 줄에 이어 붙으면 이 entry도 읽지 못한다)
+                    if fout.tell() > 0:
+                        fout.seek(-1, os.SEEK_END)
+                        if fout.read(1) != b'\n':
+                            fout.write(b'\n')
+                    fout.write((json.dumps(entry) + '\n').encode('utf-8'))
+
+
+class FrameReader:
+    # 크롭 출력 클립에서 임의의 프레임을 읽는 reader (face-vid2vid처럼 클립마다 source/driving 프레임을 뽑는 학습용)
+    # 클립마다 keyframe 인덱스를 한 번 만들어 저장해 두고, 프레임 k를 읽을 때는 k 이전의 가장 가까운 keyframe부터만 디코딩한다
+    # (처음부터 k까지 디코딩하지 않는다), 같은 GOP의 프레임 여러 개는 ffmpeg 한 번으로 읽는다
+    # 클립 디렉토리는 videos_crop.py/videos_process_train.py의 출력 디렉토리이다 (파일, manifest, tar shard 모두 가능)
+    #
+    # 사용 예)
+    #   reader = FrameReader('train/cropped_clips', size=(256, 256))
+    #   key = reader.keys()[0]
+    #   source, driving = reader.get_pair(key, 0, reader.num_frames(key) - 1)   # (256, 256, 3) uint8 배열 두 개
+
+    def __init__(self, clips_dir, index_path=None, size=None, scaler='bicubic', timeout=None):
+        # clips_dir: 클립 디렉토리
+        # index_path: keyframe 인덱스 파일 경로, None이면 clips_dir/keyframe_index.jsonl
+        # size: (너비, 높이)로 리사이즈해서 읽는다, None이면 클립 크기 그대로
+        # scaler: size로 리사이즈할 때 사용할 스케일러 (ffmpeg scale 필터의 flags)
+        # timeout: ffprobe/ffmpeg 하나의 제한 시간(초), None이면 제한 없음
+        self.clips_dir = clips_dir
+        self.clips = list_output_clips(clips_dir)
+        self.index = KeyframeIndex(index_path if index_path is not None else os.path.join(clips_dir, KEYFRAME_INDEX_FILENAME))
+        self.size = tuple(size) if size else None
+        self.scaler = scaler
+        self.timeout = timeout
+
+    def keys(self):
+        return list(self.clips)
+
+    def __len__(self):
+        return len(self.clips)
+
+    def clip_index(self, key):
+        # 클립의 keyframe 인덱스 (없으면 만들어서 인덱스 파일에 추가한다)
+        location = self.clips[key]
+        size = get_clip_size(self.clips_dir, location)
+        index = self.index.get(key, size)
+        if index is None:
+            index = build_keyframe_index(get_clip_url(self.clips_dir, location), timeout=self.timeout)
+            self.index.put(key, size, index)
+        return index
+
+    def num_frames(self, key):
+        return self.clip_index(key)['frames']
+
+    def _decode_run(self, key, index, first, count):
+        # first번째 프레임(keyframe)부터 count개 프레임을 디코딩해서 (count, 높이, 너비, 3) 배열로 반환한다
+        # -ss를 입력 옵션으로 주면 ffmpeg는 그 시각 이전의 keyframe으로 seek하고, 그 시각보다 앞의 프레임은 버린다
+        # keyframe 시각과 바로 앞 프레임 시각의 중간으로 seek해서 시각의 반올림 오차와 관계없이 first번째 프레임부터 출력된다
+        import ffmpeg
+
+        times = index['times']
+        url = get_clip_url(self.clips_dir, self.clips[key])
+        if first > 0:
+            stream = ffmpeg.input(url, ss='%.6f' % ((times[first - 1] + times[first]) / 2))
+        else:
+            stream = ffmpeg.input(url)
+        video = stream['v:0']
+        width, height = index['width'], index['height']
+        if self.size:
+            width, height = self.size
+            video = video.filter('scale', width, height, flags=self.scaler)
+        # fps_mode passthrough: 프레임을 복제하거나 버리지 않고 디코딩한 순서대로 내보낸다
+        video = video.output('pipe:', format='rawvideo', pix_fmt='rgb24', fps_mode='passthrough',
+                             **{'frames:v': count})
+        frames = np.frombuffer(run_ffmpeg_capture(video, timeout=self.timeout), dtype=np.uint8)
+        frames = frames.reshape(-1, height, width, 3)
+        if len(frames) < count:
+            raise ValueError('decoded %d of %d frames from frame %d of clip %s' % (len(frames), count, first, key))
+        return frames
+
+    def get_frames(self, key, frame_indices):
+        # 클립의 프레임들을 요청한 순서대로 (len(frame_indices), 높이, 너비, 3) uint8 배열로 반환하는 함수
+        # 프레임마다 이전의 가장 가까운 keyframe을 찾고, 같은 keyframe에 속하는 프레임은 한 번의 디코딩으로 읽는다
+        index = self.clip_index(key)
+        keyframes = index['keyframes'] or [0]
+        groups = {}
+        for frame_index in frame_indices:
+            if not 0 <= frame_index < index['frames']:
+                raise IndexError('frame %d out of range for clip %s (%d frames)' % (frame_index, key, index['frames']))
+            keyframe = keyframes[max(0, bisect.bisect_right(keyframes, frame_index) - 1)]
+            groups.setdefault(keyframe, set()).add(frame_index)
+        decoded = {}
+        for keyframe, wanted in groups.items():
+            frames = self._decode_run(key, index, keyframe, max(wanted) - keyframe + 1)
+            for frame_index in wanted:
+                decoded[frame_index] = frames[frame_index - keyframe]
+        return np.stack([decoded[frame_index] for frame_index in frame_indices])
+
+    def get_frame(self, key, frame_index):
+        return self.get_frames(key, [frame_index])[0]
+
+    def get_pair(self, key, source_index, driving_index):
+        # source 프레임과 driving 프레임을 함께 읽는 함수 (같은 GOP에 있으면 디코딩은 한 번이다)
+        frames = self.get_frames(key, [source_index, driving_index])
+        return frames[0], frames[1]
+
+    def build_index(self, keys=None):
+        # keys(None이면 모든 클립)의 keyframe 인덱스를 미리 만드는 함수 (학습 전에 한 번 실행해 두면 된다)
+        # 반환값: 새로 만든 클립 수
+        built = 0
+        for key in (keys if keys is not None else self.clips):
+            if self.index.get(key, get_clip_size(self.clips_dir, self.clips[key])) is None:
+                self.clip_index(key)
+                built += 1
+        return built
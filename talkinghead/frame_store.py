@@ -0,0 +1,178 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from talkinghead.clip_output import read_shard_member
+from talkinghead.ffmpeg_runner import run_ffmpeg_capture
+
+# frame store의 메타데이터 파일 이름 (프레임 크기와 dtype)
+STORE_META_FILENAME = 'frame_store.json'
+# 클립별 위치를 기록하는 인덱스 파일 이름 (JSONL, 한 줄에 클립 하나)
+STORE_INDEX_FILENAME = 'frame_index.jsonl'
+# 프레임 데이터 파일 이름 패턴이다. 예) 'frames-000000.u8', 'frames-000001.u8', ...
+# 각 파일은 헤더 없이 (프레임 수, 높이, 너비, 3) 모양의 uint8 RGB 프레임을 이어 붙인 것이다
+STORE_SHARD_FORMAT = 'frames-%06d.u8'
+# 기본 shard 크기(프레임 수), 256x256이면 약 19GB
+DEFAULT_SHARD_FRAMES = 100000
+
+
+def decode_clip(filepath, width, height, scaler='bicubic', timeout=None):
+    # 클립 하나를 디코딩해서 (프레임 수, height, width, 3) uint8 배열로 반환하는 함수
+    # 클립마다 크기가 다르므로 scale 필터로 같은 크기로 맞춘다 (scaler는 scale 필터의 flags)
+    # timeout(초)이 지나면 ffmpeg를 kill하고 FFmpegTimeout을 발생시킨다, 실패하면 ffmpeg.Error를 발생시킨다
+    import ffmpeg
+
+    stream = ffmpeg.input(filepath)['v:0'].filter('scale', width, height, flags=scaler)
+    stream = stream.output('pipe:', format='rawvideo', pix_fmt='rgb24')
+    return np.frombuffer(run_ffmpeg_capture(stream, timeout=timeout), dtype=np.uint8).reshape(-1, height, width, 3)
+
+
+def decode_output_clip(output_dir, location, width, height, scaler='bicubic', timeout=None):
+    # clip_output.list_output_clips()가 반환한 클립 위치의 클립을 decode_clip()으로 디코딩하는 함수
+    # tar shard 안의 클립은 임시 파일로 꺼내서 디코딩한다 (mp4는 moov가 끝에 있을 수 있어서 파이프로 읽지 않는다)
+    if not isinstance(location, dict):
+        return decode_clip(location, width, height, scaler, timeout)
+    with tempfile.NamedTemporaryFile(suffix='.mp4') as fout:
+        fout.write(read_shard_member(output_dir, location))
+        fout.flush()
+        return decode_clip(fout.name, width, height, scaler, timeout)
+
+
+class FrameStore:
+    # 클립의 프레임을 고정 크기 uint8 배열로 이어 붙여 저장하고 memmap으로 읽는 frame store
+    # 학습할 때 mp4를 매번 디코딩하지 않고, 클립의 프레임을 복사 없이 슬라이싱해서 바로 읽는다
+    # 프레임은 shard 파일(frames-000000.u8, ...)에 이어 붙이고, frame_index.jsonl에 클립마다
+    # {"key": ..., "shard": "frames-000000.u8", "start": shard 안의 시작 프레임, "frames": 프레임 수}를 한 줄씩 추가한다
+    # 프레임을 모두 쓴 후에 인덱스를 추가하므로, 중간에 중단되어도 인덱스에 있는 클립은 항상 완전하다
+    # (인덱스에 없는 shard 끝부분은 다음에 쓰기 전에 잘라낸다)
+    #
+    # 사용 예)
+    #   store = FrameStore('train/frames', height=256, width=256)
+    #   store.append('--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351', frames)   # frames: (272, 256, 256, 3) uint8
+    #   clip = FrameStore('train/frames').get('--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351')   # memmap 뷰
+    #   driving = clip[100]
+
+    def __init__(self, store_dir, height=None, width=None, max_shard_frames=DEFAULT_SHARD_FRAMES):
+        # store_dir: frame store 디렉토리
+        # height, width: 새로 만들 때의 프레임 크기, 이미 있는 store는 저장된 크기를 사용한다 (다르면 ValueError)
+        # max_shard_frames: shard 하나에 넣을 최대 프레임 수 (넘으면 다음 클립부터 새 shard에 쓴다)
+        self.store_dir = store_dir
+        self.max_shard_frames = max_shard_frames
+        meta_path = os.path.join(store_dir, STORE_META_FILENAME)
+        if os.path.exists(meta_path):
+            with open(meta_path) as fin:
+                meta = json.load(fin)
+            if (height, width) != (None, None) and (height, width) != (meta['height'], meta['width']):
+                raise ValueError('frame store %s has %dx%d frames, not %sx%s' % (
+                    store_dir, meta['width'], meta['height'], width, height))
+        else:
+            if height is None or width is None:
+                raise ValueError('frame store %s does not exist and no frame size was given' % (store_dir))
+            meta = {'height': height, 'width': width, 'channels': 3, 'dtype': 'uint8'}
+            os.makedirs(store_dir, exist_ok=True)
+            with open(meta_path, 'w') as fout:
+                json.dump(meta, fout)
+        self.height = meta['height']
+        self.width = meta['width']
+        self.frame_bytes = self.height * self.width * 3
+        self._maps = {}
+        self.refresh()
+
+    def refresh(self):
+        # 인덱스 파일을 읽는다 (읽는 중에 다른 프로세스가 추가한 클립도 다시 호출하면 보인다)
+        # key -> 인덱스 entry (추가한 순서대로)
+        self.index = {}
+        # shard 이름 -> 인덱스에 기록된 프레임 수
+        self.shard_frames = {}
+        index_path = os.path.join(self.store_dir, STORE_INDEX_FILENAME)
+        if os.path.exists(index_path):
+            with open(index_path) as fin:
+                for line in fin:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 중단된 실행에서 마지막 줄이 잘렸을 수 있다
+                        continue
+                    self._add_entry(entry)
+
+    def _add_entry(self, entry):
+        self.index[entry['key']] = entry
+        self.shard_frames[entry['shard']] = max(self.shard_frames.get(entry['shard'], 0),
+                                                entry['start'] + entry['frames'])
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def keys(self):
+        return list(self.index)
+
+    def _current_shard(self):
+        # 다음 클립을 쓸 shard 이름과 그 shard의 프레임 수
+        # 마지막 shard가 max_shard_frames 이상이면 새 shard를 연다 (비어 있는 shard에는 크기와 관계없이 클립 하나를 넣는다)
+        shard_id = len(self.shard_frames) - 1 if self.shard_frames else 0
+        shard = STORE_SHARD_FORMAT % (shard_id)
+        if self.shard_frames.get(shard, 0) >= self.max_shard_frames:
+            shard = STORE_SHARD_FORMAT % (shard_id + 1)
+        return shard, self.shard_frames.get(shard, 0)
+
+    def append(self, key, frames):
+        # 클립 하나의 프레임을 store 끝에 추가하는 함수 (이미 있는 shard는 다시 쓰지 않는다)
+        # frames: (프레임 수, height, width, 3) uint8 배열 또는 decode_clip()과 같은 순서의 원시 바이트
+        # 반환값: 추가한 인덱스 entry
+        if key in self.index:
+            raise ValueError('clip %s is already in the frame store' % (key))
+        data = frames.tobytes() if isinstance(frames, np.ndarray) else bytes(frames)
+        if not data or len(data) % self.frame_bytes != 0:
+            raise ValueError('clip %s is not a whole number of %dx%d RGB frames' % (key, self.width, self.height))
+        shard, start = self._current_shard()
+        shard_path = os.path.join(self.store_dir, shard)
+        with open(shard_path, 'ab') as fout:
+            # 인덱스에 없는 끝부분(중단된 append)을 잘라낸 후 이어 쓴다
+            fout.truncate(start * self.frame_bytes)
+            fout.write(data)
+        entry = {'key': key, 'shard': shard, 'start': start, 'frames': len(data) // self.frame_bytes}
+        with open(os.path.join(self.store_dir, STORE_INDEX_FILENAME), 'a+b') as fout:
+            # 중단된 실행이 마지막 줄을 끝까지 쓰지 못했으면 줄을 바꾼 후에 쓴다 (잘린 줄에 이어 붙으면 이 entry도 읽지 못한다)
+            if fout.tell() > 0:
+                fout.seek(-1, os.SEEK_END)
+                if fout.read(1) != b'\n':
+                    fout.write(b'\n')
+            fout.write((json.dumps(entry) + '\n').encode('utf-8'))
+        self._add_entry(entry)
+        return entry
+
+    def _map(self, shard, end):
+        # shard를 (프레임 수, height, width, 3) memmap으로 연다, 이미 연 memmap이 end 프레임보다 짧으면 다시 연다
+        # (읽는 중에 다른 프로세스가 같은 shard에 클립을 추가한 경우)
+        frames = self._maps.get(shard)
+        if frames is None or len(frames) < end:
+            shard_path = os.path.join(self.store_dir, shard)
+            num_frames = os.path.getsize(shard_path) // self.frame_bytes
+            frames = np.memmap(shard_path, dtype=np.uint8, mode='r', shape=(num_frames, self.height, self.width, 3))
+            self._maps[shard] = frames
+        return frames
+
+    def get(self, key):
+        # 클립의 프레임을 (프레임 수, height, width, 3) memmap 뷰로 반환한다 (복사하지 않는다)
+        entry = self.index[key]
+        start, end = entry['start'], entry['start'] + entry['frames']
+        return self._map(entry['shard'], end)[start:end]
+
+    def get_frame(self, key, frame_index):
+        # 클립의 frame_index번째 프레임을 (height, width, 3) 뷰로 반환한다
+        entry = self.index[key]
+        if not 0 <= frame_index < entry['frames']:
+            raise IndexError('frame %d out of range for clip %s (%d frames)' % (frame_index, key, entry['frames']))
+        return self.get(key)[frame_index]
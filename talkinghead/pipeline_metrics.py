@@ -0,0 +1,125 @@
+import json
+import os
+import resource
+import time
+
+
+# per-tube 메트릭으로 기록하는 record 항목이다
+# trim_and_crop_min_size()가 반환하는 record에서 이 항목들만 골라서 기록한다
+TUBE_METRIC_KEYS = ('video_name', 'status', 'reason', 'error', 'frames', 'probe_count', 'probe_seconds', 'encode_seconds',
+                    'cpu_seconds', 'wall_seconds', 'output_bytes', 'peak_rss_bytes')
+# Prometheus 메트릭 이름의 접두사이다
+PROMETHEUS_PREFIX = 'talkinghead'
+# Prometheus textfile에 기록하는 누적 카운터 목록이다 (통계 항목, 메트릭 이름, 설명)
+# 비디오 단위 통계(process_video()의 반환값)에서 같은 이름의 항목을 누적한다
+PROMETHEUS_COUNTERS = [
+    ('download_bytes', 'download_bytes', 'Bytes of raw videos downloaded.'),
+    ('download', 'download_seconds', 'Seconds spent downloading raw videos.'),
+    ('split', 'split_seconds', 'Seconds spent splitting raw videos into 1-min segments.'),
+    ('probe_count', 'probes', 'Number of ffprobe calls made by crop workers.'),
+    ('probe', 'probe_seconds', 'Seconds spent in ffprobe calls, summed over crop workers.'),
+    ('crop', 'crop_seconds', 'Wall-clock seconds spent in the crop stage.'),
+    ('crop_cpu', 'crop_cpu_seconds', 'CPU seconds (user + sys) used by ffmpeg/ffprobe in crop workers.'),
+    ('cleanup', 'cleanup_seconds', 'Seconds spent deleting temporary files.'),
+    ('output_bytes', 'output_bytes', 'Bytes of cropped clips written.'),
+    ('tube_frames', 'frames', 'Frames of cropped clips written.'),
+    ('clips', 'clips', 'Number of cropped clips written.'),
+    ('failed', 'tube_failures', 'Number of tubes whose ffprobe/ffmpeg failed.'),
+    ('timeouts', 'tube_timeouts', 'Number of tubes whose ffprobe/ffmpeg was killed after the time budget.'),
+]
+
+
+def children_cpu_seconds():
+    # 지금까지 종료된 자식 프로세스(ffmpeg/ffprobe)가 사용한 CPU 시간(user + sys)을 반환한다
+    # 워커 안에서 호출하면 해당 워커가 실행한 ffmpeg/ffprobe의 CPU 시간만 집계된다
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class MetricsWriter:
+    # 파이프라인 메트릭을 JSONL 파일과 Prometheus textfile로 내보내는 클래스
+    # JSONL 파일에는 tube 하나, 비디오 하나가 끝날 때마다 한 줄씩 추가한다 (type이 'tube' 또는 'video')
+    # Prometheus textfile은 비디오 하나가 끝날 때마다 누적 카운터 스냅샷으로 덮어쓴다
+    # (node_exporter의 textfile collector가 읽는 형식이다)
+
+    def __init__(self, metrics_file=None, prometheus_file=None):
+        # metrics_file: JSONL 메트릭 파일 경로, None이면 기록하지 않는다
+        # prometheus_file: Prometheus textfile 경로 (.prom), None이면 기록하지 않는다
+        self.metrics_file = metrics_file
+        self.prometheus_file = prometheus_file
+        # 실행 시작 이후의 누적 카운터이다
+        self.totals = {key: 0 for key, _, _ in PROMETHEUS_COUNTERS}
+        # 상태별 비디오 수 (예: {'ok': 10, 'download_failed': 2})
+        self.videos = {}
+        # 상태/사유별 tube 수 (예: {('ok', ''): 40, ('skipped', 'too_small'): 7})
+        self.tubes = {}
+        if metrics_file:
+            os.makedirs(os.path.dirname(os.path.abspath(metrics_file)), exist_ok=True)
+
+    def _write(self, entry):
+        if not self.metrics_file:
+            return
+        entry['time'] = time.time()
+        with open(self.metrics_file, 'a') as fout:
+            fout.write(json.dumps(entry) + '\n')
+
+    def write_tube(self, video_id, record):
+        # tube 하나의 메트릭을 기록하는 함수
+        # video_id: tube가 속한 비디오 ID
+        # record: trim_and_crop_min_size()가 반환한 딕셔너리 (TUBE_METRIC_KEYS 항목만 기록한다)
+        entry = {'type': 'tube', 'video_id': video_id,
+                 'key': os.path.splitext(os.path.basename(record['output_filepath']))[0]}
+        entry.update({k: record[k] for k in TUBE_METRIC_KEYS})
+        status = (record['status'], record['reason'] or '')
+        self.tubes[status] = self.tubes.get(status, 0) + 1
+        self._write(entry)
+
+    def skip_tubes(self, video_id, reason, count):
+        # 워커에 보내지 않고 메인 프로세스에서 건너뛴 tube 수를 기록하는 함수 (예: manifest에 이미 있는 tube)
+        if count <= 0:
+            return
+        status = ('skipped', reason)
+        self.tubes[status] = self.tubes.get(status, 0) + count
+        self._write({'type': 'skip', 'video_id': video_id, 'reason': reason, 'count': count})
+
+    def write_video(self, stats):
+        # 비디오 하나의 메트릭을 기록하고 Prometheus textfile을 갱신하는 함수
+        # stats: process_video()가 반환한 단계별 통계 딕셔너리
+        entry = {'type': 'video'}
+        entry.update(stats)
+        self._write(entry)
+        self.videos[stats['status']] = self.videos.get(stats['status'], 0) + 1
+        for key in self.totals:
+            self.totals[key] += stats.get(key, 0)
+        self.write_prometheus()
+
+    def write_prometheus(self):
+        # 누적 카운터를 Prometheus text exposition 형식으로 저장하는 함수
+        # 수집기가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓴 뒤 rename한다
+        if not self.prometheus_file:
+            return
+        lines = []
+        for key, name, help_text in PROMETHEUS_COUNTERS:
+            metric = '%s_%s_total' % (PROMETHEUS_PREFIX, name)
+            lines.append('# HELP %s %s' % (metric, help_text))
+            lines.append('# TYPE %s counter' % (metric))
+            lines.append('%s %s' % (metric, self.totals[key]))
+        metric = '%s_videos_total' % (PROMETHEUS_PREFIX)
+        lines.append('# HELP %s Number of processed videos by status.' % (metric))
+        lines.append('# TYPE %s counter' % (metric))
+        for status, count in sorted(self.videos.items()):
+            lines.append('%s{status="%s"} %d' % (metric, status, count))
+        metric = '%s_tubes_total' % (PROMETHEUS_PREFIX)
+        lines.append('# HELP %s Number of tubes by status and skip reason.' % (metric))
+        lines.append('# TYPE %s counter' % (metric))
+        for (status, reason), count in sorted(self.tubes.items()):
+            lines.append('%s{status="%s",reason="%s"} %d' % (metric, status, reason, count))
+        metric = '%s_last_update_seconds' % (PROMETHEUS_PREFIX)
+        lines.append('# HELP %s Unix time of the last update.' % (metric))
+        lines.append('# TYPE %s gauge' % (metric))
+        lines.append('%s %f' % (metric, time.time()))
+
+        temp_path = self.prometheus_file + '.tmp'
+        with open(temp_path, 'w') as fout:
+            fout.write('\n'.join(lines) + '\n')
+        os.replace(temp_path, self.prometheus_file)
@@ -0,0 +1,539 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import collections
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from talkinghead.rate_control import DEFAULT_MIN_BITRATE, get_encoder_kwargs, select_output_codec
+from talkinghead.clip_output import get_output_subdir, get_temp_filepath
+from talkinghead.ffmpeg_runner import FFmpegTimeout, get_error_message
+from talkinghead.probe import ProbeCache
+from talkinghead.quality import add_quality_branch, get_stats_filepath
+
+
+def get_output_filename(clip_params):
+    # tube 정보 문자열로부터 출력 파일명을 만드는 함수
+    # 예) '--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351' → '--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4'
+    # 워커를 실행하지 않고도 메인 프로세스에서 이미 처리된 tube인지 확인할 때 사용한다
+    video_name, H, W, S, E, L, T, R, B = clip_params.strip().split(',')
+    S, E, L, T, R, B = int(S), int(E), int(L), int(T), int(R), int(B)
+    return '{}_S{}_E{}_L{}_T{}_R{}_B{}.mp4'.format(video_name, S, E, L, T, R, B)
+
+
+def get_tube_frames(clip_params):
+    # tube 정보 문자열로부터 tube의 프레임 수(E - S + 1)를 계산하는 함수
+    # 진행률 표시줄의 전체 프레임 수를 워커를 실행하기 전에 계산할 때 사용한다
+    # 예) '--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351' → 272
+    fields = clip_params.strip().split(',')
+    return int(fields[4]) - int(fields[3]) + 1
+
+
+def get_chunks(num_frames, chunk_frames=0, chunk_overlap=0):
+    # tube를 chunk_frames 프레임씩 나누는 구간을 계산하는 함수 (--chunk_frames)
+    # 앞의 chunk와 chunk_overlap 프레임씩 겹치도록 chunk_frames - chunk_overlap 프레임 간격으로 시작한다
+    # 마지막 chunk는 tube 끝에 맞춰서 시작하므로 모든 chunk가 chunk_frames 프레임이다 (마지막 chunk는 더 많이 겹칠 수 있다)
+    # tube가 chunk_frames보다 짧으면 tube 전체가 chunk 하나가 된다
+    # 반환값: [(tube 안에서의 시작 프레임, 프레임 수), ...], chunk_frames가 0이면 빈 리스트
+    # 예) num_frames=272, chunk_frames=100, chunk_overlap=20 → [(0, 100), (80, 100), (160, 100), (172, 100)]
+    if chunk_frames <= 0:
+        return []
+    if num_frames <= chunk_frames:
+        return [(0, num_frames)]
+    step = max(1, chunk_frames - chunk_overlap)
+    starts = list(range(0, num_frames - chunk_frames + 1, step))
+    if starts[-1] + chunk_frames < num_frames:
+        starts.append(num_frames - chunk_frames)
+    return [(start, chunk_frames) for start in starts]
+
+
+def get_chunk_filename(output_filename, index):
+    # tube의 출력 파일명으로부터 chunk의 출력 파일명을 만드는 함수
+    # 예) '--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4', 2 → '--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351_C002.mp4'
+    return '{}_C{:03d}.mp4'.format(os.path.splitext(output_filename)[0], index)
+
+
+def get_tube_key(clip_params, chunk_frames=0, chunk_overlap=0):
+    # 메인 프로세스에서 tube가 이미 처리되었는지 확인할 때 사용하는 key (shard 인덱스/manifest의 key)
+    # chunk로 나누면 마지막 chunk의 key이다 (chunk는 순서대로 저장하므로 마지막 chunk가 있으면 모두 저장된 것이다)
+    output_filename = get_output_filename(clip_params)
+    chunks = get_chunks(get_tube_frames(clip_params), chunk_frames, chunk_overlap)
+    if chunks:
+        output_filename = get_chunk_filename(output_filename, len(chunks) - 1)
+    return os.path.splitext(output_filename)[0]
+
+
+def parse_output_size(output_size):
+    # --output_size 값을 [너비, 높이]로 바꾸는 함수
+    # 예) '256' → [256, 256], '512x288' → [512, 288], None 또는 '' → None (크기를 바꾸지 않는다)
+    # 형식이 잘못되었거나 0 이하이면 ValueError를 발생시킨다
+    if not output_size:
+        return None
+    if isinstance(output_size, (list, tuple)):
+        width, height = output_size
+    elif 'x' in str(output_size):
+        width, height = str(output_size).split('x')
+    else:
+        width = height = output_size
+    width, height = int(width), int(height)
+    if width <= 0 or height <= 0:
+        raise ValueError('output size must be positive: %s' % (output_size,))
+    return [width, height]
+
+
+def get_output_frames(frames, fps, output_fps=None):
+    # 원본 fps의 frames 프레임을 output_fps로 바꿨을 때의 출력 프레임 수 (fps 필터는 가장 가까운 시각의 프레임을 고른다)
+    # 예) frames=272, fps=30, output_fps=25 → 227, output_fps가 None이면 frames 그대로
+    if not output_fps:
+        return frames
+    return max(1, int(round(frames * output_fps / fps)))
+
+
+def get_output_filepaths(record):
+    # record가 만드는 출력 파일 경로 리스트 (chunk로 나누면 chunk 순서대로, 아니면 output_filepath 하나)
+    if record.get('chunks'):
+        return [chunk['output_filepath'] for chunk in record['chunks']]
+    return [record['output_filepath']]
+
+
+def get_tube_timeout(num_frames, tube_timeout=120.0, tube_timeout_per_frame=0.5):
+    # tube 하나에 허용하는 전체 처리 시간(초)을 계산하는 함수
+    # 긴 tube일수록 인코딩 시간이 길어지므로 프레임 수에 비례해서 늘린다
+    # 예) num_frames=272, tube_timeout=120, tube_timeout_per_frame=0.5이면 120 + 136 = 256초
+    # 반환값: 제한 시간(초), tube_timeout이 0 이하이면 None (제한 없음)
+    if tube_timeout <= 0:
+        return None
+    return tube_timeout + tube_timeout_per_frame * num_frames
+
+
+def new_tube_record(output_dir, clip_params, output_layout='flat', chunk_frames=0, chunk_overlap=0):
+    # tube 정보 문자열을 파싱해서 처리 결과와 메트릭을 담을 record를 만드는 함수
+    # 건너뛰는 경우에도 사유와 소요 시간을 메인 프로세스에 알리기 위해 record를 반환한다
+    # output_dir, output_layout, chunk_frames, chunk_overlap: trim_and_crop_min_size와 같다
+    # 반환값: record 딕셔너리 (status는 처리가 끝날 때 채운다)
+    #         chunk_frames가 있으면 chunks에 chunk별 {'index', 'start', 'frames', 'output_filepath'}를 담는다
+
+    # clip_params 문자열(콤마로 구분된 값들)을 파싱해서 각각의 변수로 나눈다
+    # strip()은 앞뒤 공백을 제거하고, split(',')은 콤마를 기준으로 문자열을 분리한다
+    # 예) '--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351' → 
+    #     ['--Y9imYnfBw_0000', ' 720', ' 1280', ' 0', ' 271', ' 504', ' 63', ' 792', ' 351']
+    video_name, H, W, S, E, L, T, R, B = clip_params.strip().split(',')
+
+    # H, W, S, E, L, T, R, B를 문자열에서 정수(int)로 변환한다
+    # 각 변수는 앞뒤 공백이 있을 수 있으므로 int() 변환 시 자동으로 처리된다
+    # 예) H=720, W=1280, S=0, E=271, L=504, T=63, R=792, B=351
+    H, W, S, E, L, T, R, B = int(H), int(W), int(S), int(E), int(L), int(T), int(R), int(B)
+    
+    # 출력 파일명을 지정한다
+    # get_output_filename()은 파일명에 각 파라미터 값을 삽입한다
+    # 예) '--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4'
+    output_filename = get_output_filename(clip_params)
+    # os.path.join()을 사용하여 출력 디렉토리, 하위 디렉토리, 파일명을 결합한다
+    # 예) output_dir='small/cropped_clips', output_filename='--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4'
+    #     → 'small/cropped_clips/--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4' (flat)
+    #     → 'small/cropped_clips/3f/a9/--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4' (hashed)
+    output_filepath = os.path.join(output_dir, get_output_subdir(output_filename, output_layout), output_filename)
+    # chunk로 나누면 chunk마다 별도의 파일이 된다 (hashed 레이아웃의 하위 디렉토리도 chunk 파일명으로 정한다)
+    chunks = []
+    for index, (start, frames) in enumerate(get_chunks(E - S + 1, chunk_frames, chunk_overlap)):
+        chunk_filename = get_chunk_filename(output_filename, index)
+        chunks.append({'index': index, 'start': start, 'frames': frames,
+                       'output_filepath': os.path.join(output_dir, get_output_subdir(chunk_filename, output_layout),
+                                                       chunk_filename)})
+
+    return {
+        'output_filepath': output_filepath,
+        'video_name': video_name,
+        'H': H, 'W': W, 'S': S, 'E': E, 'L': L, 'T': T, 'R': R, 'B': B,
+        'clip_params': clip_params.strip(),
+        'status': 'skipped',
+        'reason': None,
+        'error': None,
+        'frames': E - S + 1,
+        # 인코딩이 실패했을 때 ffmpeg가 그 전까지 진행률 카운터에 보고한 프레임 수
+        'reported_frames': 0,
+        'probe_count': 0,
+        'probe_seconds': 0.0,
+        'encode_seconds': 0.0,
+        'cpu_seconds': 0.0,
+        'wall_seconds': 0.0,
+        'output_bytes': 0,
+        'peak_rss_bytes': 0,
+        'chunks': chunks,
+    }
+
+
+def precheck_tube(record, input_dir, check_exists=True):
+    # ffprobe를 실행하기 전에 파일 존재 여부만으로 건너뛸 tube인지 확인하는 함수
+    # 반환값: (input_filepath, 건너뛴 사유) - 처리해야 하면 사유는 None, 아니면 'exists' 또는 'missing_input'
+
+    # 만약 출력 파일이 이미 존재하면, 처리하지 않고 넘어간다(중복 방지)
+    # os.path.exists()는 파일이나 디렉토리가 존재하는지 확인한다
+    # 이미 처리된 파일은 다시 처리하지 않아 시간을 절약한다
+    # chunk로 나누면 마지막 chunk 파일을 확인한다 (chunk는 순서대로 rename하므로 마지막 chunk가 있으면 모두 있다)
+    if check_exists and os.path.exists(get_output_filepaths(record)[-1]):
+        # 출력 파일이 존재한다는 메시지를 출력한다
+        # %s는 문자열 포맷팅으로, output_filepath 값이 삽입된다
+        print('Output file %s exists, skipping' % (get_output_filepaths(record)[-1]))
+        return None, 'exists'
+
+    # 입력 영상 파일 경로를 지정한다
+    # os.path.join()을 사용하여 입력 디렉토리와 비디오 파일명을 결합한다
+    # video_name에 '.mp4' 확장자를 추가한다
+    # 예) input_dir이 'small/1min_clips', video_name='--Y9imYnfBw_0000'이면
+    #     'small/1min_clips/--Y9imYnfBw_0000.mp4'가 input_filepath가 된다
+    input_filepath = os.path.join(input_dir, record['video_name'] + '.mp4')
+
+    # 만약 입력 파일이 존재하지 않을 경우, 처리하지 않고 넘어간다
+    # not os.path.exists()는 파일이 존재하지 않으면 True를 반환한다
+    # 파일이 없으면 처리할 수 없으므로 건너뛴다
+    if not os.path.exists(input_filepath):
+        # 입력 파일이 존재하지 않는다는 메시지를 출력한다
+        # %s는 문자열 포맷팅으로, input_filepath 값이 삽입된다
+        print('Input file %s does not exist, skipping' % (input_filepath))
+        return input_filepath, 'missing_input'
+    return input_filepath, None
+
+
+def resolve_tube(record, video_info, min_crop_width=512, min_crop_height=512, min_duration=0.0,
+                 rate_control='source', quality=None, min_bitrate=DEFAULT_MIN_BITRATE, vcodec=None, preset=None,
+                 output_size=None, output_fps=None, scaler='bicubic', quality_stats=False):
+    # probe 결과로 tube의 crop 좌표, 길이, 인코더 옵션을 정해서 record에 채우는 함수
+    # 자식 프로세스를 실행하지 않으므로 executor(mp.Pool 워커 또는 asyncio 이벤트 루프)와 관계없이 같은 결과를 만든다
+    # record: new_tube_record()가 만든 딕셔너리
+    #         fps, duration, seek(시작 프레임의 시각, 초), crop([l, t, r, b], 실제 프레임 픽셀), has_audio,
+    #         encoder_args(ffmpeg.output()에 넘길 인코더 옵션)를 채운다
+    #         output_size, output_fps, scaler와 출력 프레임 수(output_frames, chunk마다도)를 채운다
+    #         output_fps가 있으면 duration은 출력 프레임 수 / output_fps이다 (오디오를 이 길이로 자른다)
+    #         quality_stats가 True이면 build_tube_stream()이 프레임 품질 분석 브랜치를 추가한다 (talkinghead.quality 참고)
+    # video_info: probe_video()의 결과
+    # 나머지 인자는 trim_and_crop_min_size와 같다
+    # 반환값: 건너뛴 사유 ('too_short', 'too_small'), 처리해야 하면 None
+    video_name, S, E = record['video_name'], record['S'], record['E']
+    h, w, fps = video_info['h'], video_info['w'], video_info['fps']
+    record['fps'] = fps
+    # 비디오 길이(초)를 계산한다
+    # duration = (E - S + 1) / fps는 비디오의 지속 시간(초)이다
+    # 예) S=0, E=271, fps=30이면 duration = (271-0+1)/30 = 272/30 = 9.07초
+    # min_duration보다 작으면 처리하지 않고 건너뛴다
+    duration = (E - S + 1) / fps
+    if min_duration > 0.0 and duration < min_duration:
+        # 비디오 길이가 min_duration보다 짧으면 건너뛴다
+        # %.2f는 소수점 둘째 자리까지 표시하는 포맷팅이다
+        print('Skipping %s: video duration (%.2f seconds) is shorter than %.2f seconds' % (video_name, duration, min_duration))
+        return 'too_short'
+
+    # crop 좌표를 실제 프레임에 맞게 보정한다
+    # 원본 영상 크기(H, W)와 실제 영상 크기(h, w)가 다를 수 있으므로 비례 계산을 수행한다
+    # 예) T=63, H=720, h=720이면 t = int(63 / 720 * 720) = 63
+    #     B=351, H=720, h=720이면 b = int(351 / 720 * 720) = 351
+    #     L=504, W=1280, w=1280이면 l = int(504 / 1280 * 1280) = 504
+    #     R=792, W=1280, w=1280이면 r = int(792 / 1280 * 1280) = 792
+    # (실제 h, w가 clip에서 온 H, W와 다르면 비례해서 변환)
+    t = int(record['T'] / record['H'] * h)   # top 좌표를 실제 영상 크기에 맞게 보정, 예: 63
+    b = int(record['B'] / record['H'] * h)   # bottom 좌표를 실제 영상 크기에 맞게 보정, 예: 351
+    l = int(record['L'] / record['W'] * w)   # left 좌표를 실제 영상 크기에 맞게 보정, 예: 504
+    r = int(record['R'] / record['W'] * w)   # right 좌표를 실제 영상 크기에 맞게 보정, 예: 792
+
+    # crop된 영역의 너비와 높이를 계산한다
+    # 예) r=792, l=504이면 r-l=288 (가로 288픽셀), b=351, t=63이면 b-t=288 (세로 288픽셀)
+    crop_width = r - l
+    crop_height = b - t
+
+    # crop된 영역의 크기가 min_crop_width x min_crop_height 이상인지 확인한다
+    # 두 조건을 모두 만족해야만 처리한다 (and 연산자 사용)
+    # 예) crop_width=288, crop_height=288, min_crop_width=512, min_crop_height=512이면 288 >= 512는 False이므로 건너뛴다
+    #     crop_width=600, crop_height=600, min_crop_width=512, min_crop_height=512이면 600 >= 512는 True이므로 처리한다
+    if crop_width < min_crop_width or crop_height < min_crop_height:
+        # crop_width와 crop_height 값도 함께 출력하여 디버깅에 도움이 되도록 한다
+        print('Skipping %s: crop size (%dx%d) is smaller than %dx%d' % (video_name, crop_width, crop_height, min_crop_width, min_crop_height))
+        return 'too_small'
+
+    # 출력 크기와 frame rate (--output_size, --output_fps)
+    # fps를 바꾸면 프레임 수가 달라지므로 출력 프레임 수를 미리 정하고, 오디오도 출력 프레임의 길이에 맞춰 자른다
+    # 예) 272프레임, fps=30, output_fps=25이면 227프레임, duration = 227 / 25 = 9.08초
+    record['output_size'] = parse_output_size(output_size)
+    record['output_fps'] = output_fps or None
+    record['scaler'] = scaler
+    record['output_frames'] = get_output_frames(record['frames'], fps, record['output_fps'])
+    for chunk in record.get('chunks') or []:
+        chunk['output_frames'] = get_output_frames(chunk['frames'], fps, record['output_fps'])
+
+    # 출력 스트림 설정
+    # select_output_codec()은 원본 코덱에 따라 출력 인코더를 선택한다 (예: 'h264' → 'libopenh264')
+    # vcodec이 지정되면 원본 코덱과 관계없이 해당 인코더를 사용한다
+    output_codec = vcodec if vcodec else select_output_codec(video_info['codec'])
+    # get_encoder_kwargs()는 rate control 정책에 따라 비트레이트 또는 CRF/QP 옵션을 계산한다
+    # 'source' 정책은 원본 비트레이트를, 'area' 정책은 crop 면적 비율로 줄인 비트레이트를,
+    # 'quality' 정책은 코덱별 CRF/QP 목표를 사용한다
+    # 예) rate_control='area', original_bitrate=2423000, crop=288x288, frame=1280x720이면 {'b:v': '218070'}
+    # 리사이즈하면 'area' 정책은 crop 면적 대신 출력 크기의 면적으로 비트레이트를 줄인다
+    output_area = crop_width * crop_height
+    if record['output_size']:
+        output_area = record['output_size'][0] * record['output_size'][1]
+    output_kwargs = {'vcodec': output_codec}
+    output_kwargs.update(get_encoder_kwargs(output_codec, video_info['bitrate'], output_area, h * w,
+                                            rate_control=rate_control, quality=quality, min_bitrate=min_bitrate))
+    if preset:
+        output_kwargs['preset'] = preset
+    # chunk로 나누면 GOP 길이를 chunk 길이에 맞춘다 (chunk마다 인코더를 새로 시작하므로 첫 프레임은 항상 키프레임이다)
+    if record.get('chunks'):
+        output_kwargs['g'] = max(chunk['output_frames'] for chunk in record['chunks'])
+    # 생성할 클립의 정보를 record에 기록한다
+    # 메인 프로세스는 이 정보를 사용하여 manifest를 기록하거나 클립을 shard로 묶는다
+    record['crop'] = [l, t, r, b]
+    record['duration'] = record['output_frames'] / (record['output_fps'] or fps)
+    record['seek'] = S / fps
+    # 오디오 스트림이 없는 세그먼트는 비디오만 출력한다
+    record['has_audio'] = video_info.get('has_audio', True)
+    record['encoder_args'] = output_kwargs
+    record['quality_stats'] = bool(quality_stats)
+    return None
+
+
+def build_tube_stream(record, input_filepath, threads=0, filter_threads=0):
+    # resolve_tube()로 채운 record로 ffmpeg 출력 스트림을 만드는 함수 (probe 없이 record의 값만 사용한다)
+    # threads: ffmpeg 디코더/인코더 스레드 수 (-threads), 0이면 ffmpeg 기본값
+    # filter_threads: ffmpeg 필터 스레드 수 (-filter_threads, -filter_complex_threads), 0이면 ffmpeg 기본값
+    # 반환값: get_temp_filepath(output_filepath)에 쓰는 출력 스트림 (chunk로 나누면 chunk별 임시 파일에 쓰는 출력들을 합친 스트림)
+    # ffmpeg-python은 스트림을 만들 때만 필요하므로 여기서 import한다 (talkinghead.plan을 import하는 비용을 줄인다)
+    import ffmpeg
+
+    S, E = record['S'], record['E']
+    l, t, r, b = record['crop']
+    crop_width = r - l
+    crop_height = b - t
+    # ffmpeg 입력 스트림 생성
+    # ffmpeg.input()은 비디오 파일을 입력 스트림으로 로드한다
+    # threads가 지정되면 디코더 스레드 수를 제한한다 (입력 옵션 -threads)
+    if threads:
+        input_stream = ffmpeg.input(input_filepath, threads=threads)
+    else:
+        input_stream = ffmpeg.input(input_filepath)
+    # 비디오와 오디오 스트림을 분리한다
+    # input_stream['v:0']은 첫 번째 비디오 스트림, input_stream['a:0']은 첫 번째 오디오 스트림을 의미한다
+    video = input_stream['v:0']
+    has_audio = record['has_audio']
+    if has_audio:
+        audio = input_stream['a:0']
+    
+    # 비디오 스트림에 특정 프레임 구간만 자르기(trim)
+    # ffmpeg.trim()의 start_frame/end_frame은 프레임 번호로 작동하지 않으므로 select 필터를 사용한다
+    # select 필터의 between(n,S,E)는 n번째 프레임이 S와 E 사이(포함)에 있으면 선택한다
+    # 예를 들어, S=1015, E=1107인 경우 1015~1107 프레임(총 93프레임)을 추출한다
+    # setpts=PTS-STARTPTS는 선택된 프레임들의 타임스탬프를 0부터 시작하도록 재설정한다
+    video = video.filter('select', f'between(n,{S},{E})').filter('setpts', 'PTS-STARTPTS')
+    # crop 적용 (좌상단 l,t, 너비 crop_width, 높이 crop_height로 자른다)
+    # 예) l=504, t=63, crop_width=288, crop_height=288이면
+    #     (504, 63) 위치에서 288x288 크기의 영역을 잘라낸다
+    video = ffmpeg.crop(video, l, t, crop_width, crop_height)
+    # --output_size가 있으면 crop한 프레임을 같은 필터 그래프에서 리사이즈한다 (다운스트림에서 다시 디코딩하지 않도록)
+    # 예) output_size=[256, 256], scaler='bicubic'이면 scale=256:256:flags=bicubic
+    if record.get('output_size'):
+        output_width, output_height = record['output_size']
+        video = video.filter('scale', output_width, output_height, flags=record.get('scaler') or 'bicubic')
+    # --output_fps가 있으면 fps 필터로 frame rate를 바꾸고(chunk로 나누면 chunk마다 trim한 후에),
+    # 출력 프레임 수를 -frames:v로 고정해서 오디오 길이(duration)와 맞춘다
+    output_fps = record.get('output_fps')
+    frame_rate = output_fps or record['fps']
+    # --quality_stats이면 crop(리사이즈)한 스트림을 split해서 분석 필터(signalstats, blurdetect)를 거친 프레임별 통계를
+    # 임시 파일에 쓴다, 인코딩과 같은 디코딩 결과를 사용하므로 품질 필터링을 위해 클립을 다시 디코딩하지 않는다
+    # 분석은 fps 변환 전에 하므로 통계의 프레임 번호는 tube의 프레임 번호와 같다 (chunk별 요약에 사용한다)
+    stats_output = None
+    if record.get('quality_stats'):
+        video, stats_output = add_quality_branch(video, get_stats_filepath(record['output_filepath']))
+
+    # 오디오 스트림도 동일한 시간 범위로 trim한다
+    # 프레임 번호를 시간(초)으로 변환한다
+    # 예) S=1015, E=1107, fps=30이면 start_time = 1015/30 = 33.83초, duration = 93/30 = 3.1초
+    if has_audio:
+        start_time = record['seek']
+        # atrim 필터는 오디오를 특정 시간 범위로 자른다
+        # asetpts=PTS-STARTPTS는 오디오 타임스탬프를 0부터 시작하도록 재설정한다
+        audio = audio.filter('atrim', start=start_time, duration=record['duration']).filter('asetpts', 'PTS-STARTPTS')
+    
+    output_kwargs = dict(record['encoder_args'])
+    # threads가 지정되면 인코더 스레드 수도 제한한다 (출력 옵션 -threads)
+    if threads:
+        output_kwargs['threads'] = threads
+    if output_fps and not record.get('chunks'):
+        video = video.filter('fps', fps=output_fps)
+        output_kwargs['frames:v'] = record['output_frames']
+    if record.get('chunks'):
+        # chunk로 나누면 crop한 스트림을 split해서 chunk마다 trim하고, chunk별 파일로 인코딩한다
+        # 디코딩과 crop은 한 번만 하고 출력(인코더)만 chunk 수만큼 늘어난다
+        chunks = record['chunks']
+        videos = video.filter_multi_output('split', len(chunks))
+        if has_audio:
+            audios = audio.filter_multi_output('asplit', len(chunks))
+        outputs = []
+        for i, chunk in enumerate(chunks):
+            start, frames = chunk['start'], chunk['frames']
+            chunk_video = videos[i].filter('trim', start_frame=start, end_frame=start + frames).filter('setpts', 'PTS-STARTPTS')
+            chunk_kwargs = output_kwargs
+            if output_fps:
+                chunk_video = chunk_video.filter('fps', fps=output_fps)
+                chunk_kwargs = dict(output_kwargs, **{'frames:v': chunk['output_frames']})
+            temp_filepath = get_temp_filepath(chunk['output_filepath'])
+            if has_audio:
+                chunk_audio = audios[i].filter('atrim', start=start / record['fps'],
+                                               duration=chunk.get('output_frames', frames) / frame_rate)
+                chunk_audio = chunk_audio.filter('asetpts', 'PTS-STARTPTS')
+                outputs.append(ffmpeg.output(chunk_video, chunk_audio, temp_filepath, **chunk_kwargs))
+            else:
+                outputs.append(ffmpeg.output(chunk_video, temp_filepath, **chunk_kwargs))
+        if stats_output is not None:
+            outputs.append(stats_output)
+        stream = ffmpeg.merge_outputs(*outputs)
+    # 인코딩 중인 파일은 임시 파일명으로 쓴다 (예: 'small/cropped_clips/.--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.part.mp4')
+    elif has_audio:
+        stream = ffmpeg.output(video, audio, get_temp_filepath(record['output_filepath']), **output_kwargs)
+    else:
+        stream = ffmpeg.output(video, get_temp_filepath(record['output_filepath']), **output_kwargs)
+    if stats_output is not None and not record.get('chunks'):
+        stream = ffmpeg.merge_outputs(stream, stats_output)
+    # crop/trim 필터 그래프의 스레드 수를 제한한다 (ffmpeg-python은 -filter_complex를 사용하므로 두 옵션을 모두 준다)
+    if filter_threads:
+        stream = stream.global_args('-filter_threads', str(filter_threads), '-filter_complex_threads', str(filter_threads))
+    return stream
+
+
+def plan_tube(record, input_filepath, video_info, min_crop_width=512, min_crop_height=512, min_duration=0.0,
+              rate_control='source', quality=None, min_bitrate=DEFAULT_MIN_BITRATE, vcodec=None, preset=None,
+              output_size=None, output_fps=None, scaler='bicubic', quality_stats=False, threads=0, filter_threads=0):
+    # resolve_tube()와 build_tube_stream()을 차례로 호출하는 함수 (워커 안에서 probe 직후에 계획하는 경우)
+    # 반환값: (건너뛴 사유, 출력 스트림) - 처리해야 하면 사유는 None, 건너뛰면 스트림은 None
+    reason = resolve_tube(record, video_info, min_crop_width=min_crop_width, min_crop_height=min_crop_height,
+                          min_duration=min_duration, rate_control=rate_control, quality=quality,
+                          min_bitrate=min_bitrate, vcodec=vcodec, preset=preset, output_size=output_size,
+                          output_fps=output_fps, scaler=scaler, quality_stats=quality_stats)
+    if reason is not None:
+        return reason, None
+    return None, build_tube_stream(record, input_filepath, threads=threads, filter_threads=filter_threads)
+
+
+def get_clip_params(tube):
+    # 작업 단위로 쓰이는 tube 정보 문자열 또는 plan row(딕셔너리)에서 tube 정보 문자열을 반환하는 함수
+    return tube['clip_params'] if isinstance(tube, dict) else tube
+
+
+def build_plan(tubes, input_dir, output_dir, probe_cache=None, output_layout='flat', check_exists=True,
+               probe_workers=8, probe_timeout=None, chunk_frames=0, chunk_overlap=0, **resolve_kwargs):
+    # 모든 tube의 crop 계획을 워커를 실행하기 전에 한 번에 정하는 함수
+    # 세그먼트 파일마다 ffprobe를 한 번만 실행하고(같은 세그먼트의 tube는 결과를 공유한다), 세그먼트들은 스레드로 동시에 probe한다
+    # tubes: tube 정보 문자열 리스트
+    # input_dir, output_dir, output_layout, check_exists, chunk_frames, chunk_overlap: trim_and_crop_min_size와 같다
+    # probe_cache: ProbeCache, None이면 이번 호출 안에서만 캐시한다
+    # probe_workers: 동시에 실행할 ffprobe 수
+    # probe_timeout: ffprobe 하나의 제한 시간(초), None이면 제한 없음
+    # resolve_kwargs: resolve_tube()의 나머지 인자 (min_crop_width, min_crop_height, min_duration, rate_control, ...)
+    # 반환값: tube 순서대로 plan row(new_tube_record()의 딕셔너리) 리스트
+    #         status가 'planned'인 row는 resolve_tube()의 결과와 input_filepath, decode_frames가 채워져 있고
+    #         run_plan_row()로 실행한다
+    #         나머지는 이미 결과가 정해진 row이다 ('skipped'와 건너뛴 사유, 또는 probe에서 'failed'/'timeout')
+    #         decode_frames는 tube 하나를 처리할 때 디코딩하는 프레임 수이다
+    #         (select 필터는 세그먼트 끝까지 디코딩하므로 세그먼트의 프레임 수, 알 수 없으면 E + 1)
+    if probe_cache is None:
+        probe_cache = ProbeCache()
+    records = []
+    by_input = collections.OrderedDict()
+    for tube in tubes:
+        record = new_tube_record(output_dir, tube, output_layout, chunk_frames, chunk_overlap)
+        input_filepath, reason = precheck_tube(record, input_dir, check_exists)
+        record['input_filepath'] = input_filepath
+        record['reason'] = reason
+        if reason is None:
+            by_input.setdefault(input_filepath, []).append(record)
+        records.append(record)
+
+    def probe_one(input_filepath):
+        try:
+            return probe_cache.probe(input_filepath, timeout=probe_timeout), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, probe_workers)) as executor:
+        probes = list(executor.map(probe_one, by_input))
+    for (input_filepath, input_records), (video_info, error) in zip(by_input.items(), probes):
+        for record in input_records:
+            if error is not None:
+                record['status'] = 'timeout' if isinstance(error, FFmpegTimeout) else 'failed'
+                record['reason'] = 'probe'
+                record['error'] = None if isinstance(error, FFmpegTimeout) else get_error_message(error)
+                continue
+            reason = resolve_tube(record, video_info, **resolve_kwargs)
+            if reason is not None:
+                record['reason'] = reason
+                continue
+            record['status'] = 'planned'
+            record['decode_frames'] = get_decode_frames(record, video_info)
+    return records
+
+
+def get_decode_frames(record, video_info):
+    # tube 하나를 처리할 때 디코딩하는 프레임 수를 반환하는 함수
+    # select 필터는 세그먼트 끝까지 디코딩하므로 세그먼트의 프레임 수이다 (알 수 없으면 E + 1)
+    segment_frames = video_info.get('frames')
+    if not segment_frames and video_info.get('duration'):
+        segment_frames = int(round(video_info['duration'] * video_info['fps']))
+    return max(segment_frames or 0, record['E'] + 1)
+
+
+def summarize_plan(records):
+    # plan row들을 집계하는 함수 (실행할 작업량의 정확한 추정치)
+    # 반환값: {'tubes': 전체 tube 수, 'planned': 실행할 tube 수, 'skipped': {사유: 수}, 'failed': probe 실패 수,
+    #          'timeouts': probe 시간 초과 수, 'encode_frames': 인코딩할 프레임 수, 'decode_frames': 디코딩할 프레임 수,
+    #          'segments': 실행할 tube가 읽는 세그먼트 수}
+    summary = {'tubes': len(records), 'planned': 0, 'skipped': {}, 'failed': 0, 'timeouts': 0,
+               'encode_frames': 0, 'decode_frames': 0, 'segments': 0}
+    segments = set()
+    for record in records:
+        if record['status'] == 'planned':
+            summary['planned'] += 1
+            summary['encode_frames'] += get_encode_frames(record)
+            summary['decode_frames'] += record['decode_frames']
+            segments.add(record['input_filepath'])
+        elif record['status'] == 'skipped':
+            summary['skipped'][record['reason']] = summary['skipped'].get(record['reason'], 0) + 1
+        elif record['status'] == 'timeout':
+            summary['timeouts'] += 1
+        else:
+            summary['failed'] += 1
+    summary['segments'] = len(segments)
+    return summary
+
+
+def get_encode_frames(record):
+    # record를 처리할 때 인코딩하는 프레임 수 (chunk로 나누면 겹치는 프레임을 chunk마다 다시 인코딩한다)
+    # --output_fps로 frame rate를 바꾸면 출력 frame rate의 프레임 수이다
+    if record.get('chunks'):
+        return sum(chunk.get('output_frames', chunk['frames']) for chunk in record['chunks'])
+    return record.get('output_frames', record['frames'])
+
+
+def write_plan(plan_file, records):
+    # plan row들을 JSONL 파일로 쓰는 함수 (한 줄에 row 하나)
+    # 임시 파일에 쓴 후 rename하므로 중간에 중단되어도 이전 plan 파일이 깨지지 않는다
+    temp_file = plan_file + '.tmp'
+    with open(temp_file, 'w') as fout:
+        for record in records:
+            fout.write(json.dumps(record) + '\n')
+    os.replace(temp_file, plan_file)
+
+
+def read_plan(plan_file):
+    # write_plan()으로 쓴 plan 파일을 읽는 함수
+    # 반환값: plan row 리스트
+    with open(plan_file) as fin:
+        return [json.loads(line) for line in fin if line.strip()]
+
+
+def get_rows_outside_dir(plan_rows, output_dir):
+    # 출력 파일이 output_dir 아래에 있지 않은 plan row 리스트를 반환하는 함수
+    # plan row는 --plan_out을 실행할 때의 출력 경로를 그대로 들고 있으므로, 다른 출력 디렉토리로 실행하는 plan을 찾는다
+    output_dir = os.path.abspath(output_dir)
+    return [row for row in plan_rows
+            if any(os.path.commonpath([output_dir, os.path.abspath(filepath)]) != output_dir
+                   for filepath in get_output_filepaths(row))]
@@ -0,0 +1,169 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import json
+import os
+import threading
+
+from talkinghead.ffmpeg_runner import probe_file, probe_file_async
+
+
+def get_h_w(filepath, timeout=None, probe=None):
+    # probe: 이미 읽은 ffprobe 결과가 있으면 넘겨서 ffprobe를 다시 실행하지 않는다 (get_fps 등도 같다)
+    if probe is None:
+        probe = probe_file(filepath, timeout=timeout)
+    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
+    height = int(video_stream['height'])
+    width = int(video_stream['width'])
+    return height, width
+
+
+def get_fps(filepath, timeout=None, probe=None):
+    # 비디오 파일의 fps(초당 프레임 수)를 가져온다
+    # ffmpeg.probe()로 비디오 파일의 메타데이터를 읽어온다
+    # probe_file()은 ffmpeg.probe()와 같지만 timeout(초)이 지나면 ffprobe를 종료하고 FFmpegTimeout을 발생시킨다
+    if probe is None:
+        probe = probe_file(filepath, timeout=timeout)
+    # 비디오 스트림을 찾는다
+    # codec_type이 'video'인 스트림을 찾아서 video_stream에 저장한다
+    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
+    # fps를 계산한다
+    # r_frame_rate는 "30/1" 같은 문자열 형식으로 저장되어 있다
+    # 이를 분자와 분모로 나눠서 실제 fps 값을 계산한다
+    # 예) "30/1" → 30.0, "29.97/1" → 29.97
+    r_frame_rate = video_stream['r_frame_rate']
+    num, den = map(int, r_frame_rate.split('/'))
+    fps = num / den if den > 0 else 30.0  # 분모가 0이면 기본값 30.0 사용
+    return fps
+
+
+def get_video_codec(filepath, timeout=None, probe=None):
+    # 비디오 파일의 코덱 정보를 가져온다
+    # ffmpeg.probe()로 비디오 파일의 메타데이터를 읽어온다
+    # probe_file()은 ffmpeg.probe()와 같지만 timeout(초)이 지나면 ffprobe를 종료하고 FFmpegTimeout을 발생시킨다
+    if probe is None:
+        probe = probe_file(filepath, timeout=timeout)
+    # 비디오 스트림을 찾는다
+    # codec_type이 'video'인 스트림을 찾아서 video_stream에 저장한다
+    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
+    # 비디오 코덱 이름을 가져온다
+    # codec_name은 'h264', 'hevc', 'vp9' 등의 코덱 이름을 반환한다
+    # 예) 'h264'는 H.264 코덱을 의미한다
+    codec_name = video_stream.get('codec_name', 'libx264')
+    return codec_name
+
+
+def get_video_bitrate(filepath, timeout=None, probe=None):
+    # 비디오 파일의 비트레이트를 가져온다
+    # ffmpeg.probe()로 비디오 파일의 메타데이터를 읽어온다
+    # probe_file()은 ffmpeg.probe()와 같지만 timeout(초)이 지나면 ffprobe를 종료하고 FFmpegTimeout을 발생시킨다
+    if probe is None:
+        probe = probe_file(filepath, timeout=timeout)
+    # 비디오 스트림을 찾는다
+    # codec_type이 'video'인 스트림을 찾아서 video_stream에 저장한다
+    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
+    # 비디오 비트레이트를 가져온다
+    # bit_rate는 문자열 형식으로 저장되어 있으므로 정수로 변환한다
+    # 비트레이트가 없으면 None을 반환한다
+    # 예) '2423000' → 2423000 (2423 kbps)
+    bitrate = video_stream.get('bit_rate')
+    if bitrate:
+        return int(bitrate)
+    # 비트레이트 정보가 없으면 전체 비트레이트에서 오디오 비트레이트를 빼서 계산한다
+    # format의 bit_rate는 전체 비트레이트이다
+    total_bitrate = probe.get('format', {}).get('bit_rate')
+    if total_bitrate:
+        # 오디오 스트림을 찾는다
+        audio_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'audio'), None)
+        audio_bitrate = int(audio_stream.get('bit_rate', 0)) if audio_stream else 0
+        return int(total_bitrate) - audio_bitrate
+    # 비트레이트 정보가 전혀 없으면 None을 반환한다
+    return None
+
+
+def get_video_info(filepath, probe):
+    # ffprobe 결과 하나에서 크롭 계획에 필요한 정보를 모두 꺼내는 함수
+    # 반환값: {'h': 720, 'w': 1280, 'fps': 30.0, 'codec': 'h264', 'bitrate': 2423000, 'has_audio': True,
+    #          'duration': 60.0, 'frames': 1800}
+    #         duration(초)과 frames(비디오 스트림의 프레임 수)는 ffprobe가 알려주지 않으면 None이다
+    h, w = get_h_w(filepath, probe=probe)
+    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
+    duration = probe.get('format', {}).get('duration')
+    frames = video_stream.get('nb_frames')
+    return {'h': h, 'w': w, 'fps': get_fps(filepath, probe=probe),
+            'codec': get_video_codec(filepath, probe=probe), 'bitrate': get_video_bitrate(filepath, probe=probe),
+            'has_audio': any(stream['codec_type'] == 'audio' for stream in probe['streams']),
+            'duration': float(duration) if duration else None, 'frames': int(frames) if frames else None}
+
+
+def probe_video(filepath, timeout=None):
+    # 비디오 파일을 ffprobe로 한 번만 읽어서 get_video_info()의 결과를 반환하는 함수
+    # (get_h_w, get_fps, get_video_codec, get_video_bitrate를 각각 호출하면 ffprobe가 네 번 실행된다)
+    return get_video_info(filepath, probe_file(filepath, timeout=timeout))
+
+
+async def probe_video_async(filepath, timeout=None):
+    # probe_video()의 asyncio 버전
+    return get_video_info(filepath, await probe_file_async(filepath, timeout=timeout))
+
+
+class ProbeCache:
+    # get_video_info() 결과를 세그먼트 파일명별로 저장하는 JSONL 캐시
+    # 같은 세그먼트를 여러 번 계획하거나(재실행, --dry_run) 세그먼트 파일이 지워진 후에도 ffprobe를 다시 실행하지 않는다
+    # 파일명(basename)으로 찾으므로 temp 디렉토리가 바뀌어도 재사용되고, 파일이 있으면 크기가 같은지 확인한다
+    # 한 줄에 하나씩 {"name": "--Y9imYnfBw_0000.mp4", "size": 12345678, "info": {...}} 형식으로 추가한다
+    #
+    # 사용 예)
+    #   cache = ProbeCache('train/probe_cache.jsonl')
+    #   video_info = cache.probe('train/temp_1min_clips/--Y9imYnfBw_0000.mp4')   # 캐시에 없으면 ffprobe를 실행한다
+
+    def __init__(self, path=None):
+        # path: 캐시 파일 경로, None이면 메모리에만 저장한다
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path) as fin:
+                for line in fin:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 중단된 실행에서 마지막 줄이 잘렸을 수 있다
+                        continue
+                    self.entries[entry['name']] = entry
+
+    def get(self, filepath):
+        # 캐시된 get_video_info() 결과를 반환한다, 없거나 파일 크기가 다르면 None
+        entry = self.entries.get(os.path.basename(filepath))
+        if entry is None:
+            return None
+        if os.path.exists(filepath) and os.path.getsize(filepath) != entry['size']:
+            return None
+        return entry['info']
+
+    def put(self, filepath, info):
+        entry = {'name': os.path.basename(filepath), 'size': os.path.getsize(filepath), 'info': info}
+        with self._lock:
+            self.entries[entry['name']] = entry
+            if self.path is not None:
+                with open(self.path, 'a') as fout:
+                    fout.write(json.dumps(entry) + '\n')
+
+    def probe(self, filepath, timeout=None):
+        # 캐시에 있으면 캐시된 결과를, 없으면 probe_video()를 실행해서 캐시에 추가한 결과를 반환한다
+        # 여러 스레드에서 동시에 호출할 수 있다 (ffprobe 실행 중에는 잠그지 않는다)
+        info = self.get(filepath)
+        with self._lock:
+            if info is not None:
+                self.hits += 1
+                return info
+            self.misses += 1
+        info = probe_video(filepath, timeout=timeout)
+        self.put(filepath, info)
+        return info
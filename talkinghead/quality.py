@@ -0,0 +1,93 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import os
+
+from talkinghead.clip_output import get_temp_filepath
+
+# 분석 브랜치가 프레임마다 기록하는 metadata 키 -> 요약에 사용하는 이름
+# signalstats: YAVG(평균 밝기), YLOW/YHIGH(밝기 10%/90% 지점), SATAVG(평균 채도), YDIF(이전 프레임과의 평균 밝기 차이)
+# blurdetect: lavfi.blur (클수록 흐리다)
+FRAME_STAT_KEYS = {
+    'lavfi.signalstats.YAVG': 'y_avg',
+    'lavfi.signalstats.YLOW': 'y_low',
+    'lavfi.signalstats.YHIGH': 'y_high',
+    'lavfi.signalstats.SATAVG': 'sat_avg',
+    'lavfi.signalstats.YDIF': 'y_dif',
+    'lavfi.blur': 'blur',
+}
+# YDIF가 이 값보다 작은 프레임은 이전 프레임과 거의 같은 정지 프레임으로 센다 (0~255 밝기 단위)
+STATIC_FRAME_YDIF = 0.5
+
+
+def get_stats_filepath(output_filepath):
+    # 분석 브랜치가 프레임별 통계를 쓰는 임시 파일 경로 (클립의 임시 파일과 같은 이름 규칙이라 sweep_temp_files()가 지운다)
+    # 예) 'out/clip.mp4' → 'out/.clip.part.stats'
+    return os.path.splitext(get_temp_filepath(output_filepath))[0] + '.stats'
+
+
+def add_quality_branch(video, stats_filepath):
+    # crop한 비디오 스트림을 split해서 한쪽에 분석 필터를 연결하는 함수 (같은 필터 그래프에서 디코딩은 한 번이다)
+    # 분석 브랜치: signalstats(밝기, 채도, 프레임 차이) → blurdetect(흐림) → metadata=print로 프레임별 값을 stats_filepath에 쓴다
+    # 반환값: (인코딩할 비디오 스트림, 분석 브랜치의 출력 스트림 - null muxer이므로 파일을 만들지 않는다)
+    import ffmpeg
+
+    videos = video.filter_multi_output('split', 2)
+    stats = videos[1].filter('signalstats').filter('blurdetect')
+    stats = stats.filter('metadata', mode='print', file=stats_filepath)
+    return videos[0], ffmpeg.output(stats, os.devnull, format='null')
+
+
+def read_frame_stats(stats_filepath):
+    # metadata=print가 쓴 파일을 읽어서 프레임 순서대로 {'y_avg': ..., 'blur': ..., ...} 리스트로 반환하는 함수
+    # 파일 형식) 'frame:0    pts:0       pts_time:0' 줄 다음에 'lavfi.signalstats.YAVG=126.714' 같은 줄이 이어진다
+    frames = []
+    with open(stats_filepath) as fin:
+        for line in fin:
+            if line.startswith('frame:'):
+                frames.append({})
+                continue
+            key, _, value = line.strip().partition('=')
+            if frames and key in FRAME_STAT_KEYS:
+                frames[-1][FRAME_STAT_KEYS[key]] = float(value)
+    return frames
+
+
+def summarize_frame_stats(frames):
+    # 클립 하나의 프레임별 통계를 manifest에 기록할 요약 값으로 바꾸는 함수
+    # 반환값: {'frames': 분석한 프레임 수, 'brightness': 평균 밝기, 'brightness_min': 가장 어두운 프레임의 밝기,
+    #          'contrast': 평균 (YHIGH - YLOW), 'saturation': 평균 채도, 'blur': 평균 흐림, 'blur_max': 가장 흐린 프레임,
+    #          'motion': 평균 프레임 차이(YDIF), 'static_ratio': 정지 프레임 비율}, 프레임이 없으면 None
+    #         프레임 차이는 클립의 첫 프레임을 제외하고 계산한다 (chunk의 첫 프레임은 이전 chunk의 프레임과 비교한 값이다)
+    if not frames:
+        return None
+
+    def mean(values):
+        return round(sum(values) / len(values), 4) if values else None
+
+    diffs = [frame.get('y_dif', 0.0) for frame in frames[1:]]
+    return {
+        'frames': len(frames),
+        'brightness': mean([frame.get('y_avg', 0.0) for frame in frames]),
+        'brightness_min': round(min(frame.get('y_avg', 0.0) for frame in frames), 4),
+        'contrast': mean([frame.get('y_high', 0.0) - frame.get('y_low', 0.0) for frame in frames]),
+        'saturation': mean([frame.get('sat_avg', 0.0) for frame in frames]),
+        'blur': mean([frame.get('blur', 0.0) for frame in frames]),
+        'blur_max': round(max(frame.get('blur', 0.0) for frame in frames), 4),
+        'motion': mean(diffs),
+        'static_ratio': round(sum(diff < STATIC_FRAME_YDIF for diff in diffs) / len(diffs), 4) if diffs else None,
+    }
+
+
+def collect_quality_stats(record):
+    # 인코딩이 끝난 tube의 통계 파일을 읽어서 record['quality']에 요약을 채우고 파일을 지우는 함수
+    # chunk로 나눈 tube는 chunk마다 해당 구간(tube 기준 start부터 frames개)의 요약을 chunk['quality']에 채운다
+    # 분석은 fps 변환 전의 프레임으로 하므로 프레임 번호는 원본 fps 기준이다
+    stats_filepath = get_stats_filepath(record['output_filepath'])
+    frames = read_frame_stats(stats_filepath) if os.path.exists(stats_filepath) else []
+    record['quality'] = summarize_frame_stats(frames)
+    for chunk in record.get('chunks') or []:
+        chunk['quality'] = summarize_frame_stats(frames[chunk['start']:chunk['start'] + chunk['frames']])
+    if os.path.exists(stats_filepath):
+        os.remove(stats_filepath)
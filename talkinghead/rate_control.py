@@ -0,0 +1,84 @@
+# 사용할 수 있는 rate control 정책 목록이다
+#   source : 원본 영상의 전체 프레임 비트레이트를 그대로 사용한다 (기존 방식)
+#   area   : 원본 비트레이트에 (crop 면적 / 원본 프레임 면적)을 곱해서 사용한다
+#            crop이 원본 프레임의 1/10이면 비트레이트도 1/10이 되어 화질은 비슷하고 출력 크기와 인코딩 시간이 줄어든다
+#   quality: 비트레이트 대신 코덱별 품질 목표(CRF 또는 QP)를 사용한다
+RATE_CONTROL_POLICIES = ['source', 'area', 'quality']
+
+# quality 정책에서 코덱별로 사용하는 옵션 이름과 기본 품질 값이다
+# libx264/libx265는 CRF를 지원한다 (0이 무손실, 값이 클수록 화질이 낮아진다)
+# libopenh264는 CRF를 지원하지 않으므로 rc_mode=quality와 qmin/qmax로 QP를 고정한다
+DEFAULT_QUALITY = {
+    'libx264': 18,
+    'libx265': 20,
+    'hevc': 20,
+    'h265': 20,
+    'libopenh264': 24,
+}
+
+# area 정책에서 사용하는 최소 비트레이트(bps)이다
+# crop이 아주 작을 때 비트레이트가 지나치게 낮아지는 것을 막는다
+DEFAULT_MIN_BITRATE = 200000
+
+
+def select_output_codec(original_codec):
+    # 원본 비디오 코덱에 따라 출력 인코더를 선택하는 함수
+    # 원본 코덱이 'h264'인 경우 'libopenh264'를 사용한다 (libx264는 GPL 라이선스로 인해 사용 불가)
+    # 'hevc' 또는 'h265'인 경우 원본 코덱 그대로 사용한다 (libx265 인코더가 없을 수 있음)
+    # 'av1', 'vp9', 'vp8' 등 느린 코덱은 'libopenh264'로 변환한다 (인코딩 속도 향상)
+    # 그 외는 원본 코덱 그대로 사용한다
+    if original_codec == 'h264':
+        return 'libopenh264'
+    elif original_codec in ['hevc', 'h265']:
+        return original_codec
+    elif original_codec in ['av1', 'vp9', 'vp8']:
+        return 'libopenh264'
+    return original_codec
+
+
+def get_quality_kwargs(output_codec, quality=None):
+    # quality 정책에서 사용할 ffmpeg 출력 옵션을 반환하는 함수
+    # output_codec: 출력 인코더 이름
+    # quality: CRF/QP 값, None이면 DEFAULT_QUALITY의 코덱별 기본값을 사용한다
+    # 반환값: ffmpeg.output()에 전달할 딕셔너리, 품질 목표를 지원하지 않는 코덱이면 None
+    if output_codec not in DEFAULT_QUALITY:
+        return None
+    if quality is None:
+        quality = DEFAULT_QUALITY[output_codec]
+    if output_codec == 'libopenh264':
+        return {'rc_mode': 'quality', 'qmin': quality, 'qmax': quality}
+    return {'crf': quality}
+
+
+def get_encoder_kwargs(output_codec, source_bitrate, crop_area, frame_area, rate_control='source', quality=None,
+                       min_bitrate=DEFAULT_MIN_BITRATE):
+    # rate control 정책에 따라 ffmpeg 출력 옵션(vcodec 제외)을 계산하는 함수
+    # output_codec: 출력 인코더 이름 (select_output_codec()의 반환값)
+    # source_bitrate: 원본 비디오 비트레이트(bps), 알 수 없으면 None
+    # crop_area: crop 영역의 면적(픽셀 수), 예) 288 * 288
+    # frame_area: 원본 프레임의 면적(픽셀 수), 예) 1280 * 720
+    # rate_control: RATE_CONTROL_POLICIES 중 하나
+    # quality: quality 정책에서 사용할 CRF/QP 값 (None이면 코덱별 기본값)
+    # min_bitrate: area 정책에서 사용할 최소 비트레이트(bps)
+    # 반환값: 예) {'b:v': '218070'} 또는 {'crf': 18}
+    if rate_control == 'quality':
+        quality_kwargs = get_quality_kwargs(output_codec, quality)
+        if quality_kwargs is not None:
+            return quality_kwargs
+        # 품질 목표를 지원하지 않는 코덱은 area 정책으로 대신 처리한다
+        rate_control = 'area'
+
+    if source_bitrate:
+        if rate_control == 'area':
+            # crop 면적 비율만큼 비트레이트를 줄인다
+            # 예) source_bitrate=2423000, crop_area=288*288, frame_area=1280*720이면 약 218070 bps
+            bitrate = int(source_bitrate * min(1.0, crop_area / frame_area))
+            return {'b:v': str(max(min_bitrate, bitrate))}
+        # source 정책: 원본과 동일한 비트레이트를 사용한다
+        return {'b:v': str(source_bitrate)}
+
+    # 원본 비트레이트를 알 수 없으면 CRF를 지원하는 코덱인 경우 CRF를 사용한다
+    # libopenh264는 CRF를 지원하지 않으므로 아무 옵션도 주지 않는다 (인코더 기본값 사용)
+    if output_codec != 'libopenh264':
+        return {'crf': 18}
+    return {}
@@ -0,0 +1,111 @@
+import os
+
+from talkinghead.plan import get_clip_params
+
+
+# 사용할 수 있는 스케줄링 모드 목록이다
+#   fixed    : --num_workers와 --ffmpeg_threads를 그대로 사용한다 (기존 방식, ffmpeg_threads가 0이면 ffmpeg가 스레드 수를 정한다)
+#   heuristic: CPU 수와 원본 해상도로 ffmpeg 스레드 수를 정하고, 워커 수 = CPU 수 / 스레드 수로 맞춘다
+#   auto     : 후보 조합(워커 수 x 스레드 수)을 처음 몇 개의 tube로 하나씩 실행해 보고 가장 빠른 조합으로 나머지를 처리한다
+SCHEDULE_MODES = ['fixed', 'heuristic', 'auto']
+# auto 모드에서 시험하는 ffmpeg 스레드 수 후보이다 (워커 수는 CPU 수 / 스레드 수)
+THREAD_CANDIDATES = [1, 2, 4, 8]
+
+
+def available_cpus():
+    # 이 프로세스가 사용할 수 있는 CPU 수를 반환하는 함수 (taskset/cgroup으로 제한된 경우도 반영한다)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def get_median_resolution(tubes):
+    # tube 목록에서 원본 해상도(H, W)의 중앙값을 반환하는 함수 (probe 없이 tubes 파일의 H, W만 사용한다)
+    # tubes: tube 정보 문자열 또는 plan row 리스트 (예: ['--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351', ...])
+    # 반환값: (height, width), tube가 없으면 (720, 1280)
+    sizes = []
+    for tube in tubes:
+        fields = get_clip_params(tube).split(',')
+        sizes.append((int(fields[1]) * int(fields[2]), int(fields[1]), int(fields[2])))
+    if not sizes:
+        return 720, 1280
+    sizes.sort()
+    _, height, width = sizes[len(sizes) // 2]
+    return height, width
+
+
+def get_threads_for_resolution(height, width):
+    # 원본 해상도에 맞는 ffmpeg 하나당 스레드 수를 반환하는 함수
+    # 크롭 작업은 원본 전체 프레임 디코딩이 대부분을 차지하므로 원본 해상도가 클수록 스레드를 늘린다
+    # 작은 해상도에서 스레드를 늘리면 동기화 비용만 커지므로 워커 수를 늘리는 편이 낫다
+    pixels = height * width
+    if pixels >= 2560 * 1440:
+        return 8
+    if pixels >= 1920 * 1080:
+        return 4
+    if pixels >= 1280 * 720:
+        return 2
+    return 1
+
+
+class CropScheduler:
+    # 크롭 풀의 워커 수와 ffmpeg 하나당 스레드 수(-threads, -filter_threads)를 함께 정하는 클래스
+    # 워커 수 x 스레드 수가 CPU 수를 넘지 않게 맞춰서 실행 가능한 스레드 수가 CPU 수보다 훨씬 많아지는 것(컨텍스트 스위칭)을 막는다
+    #
+    # 사용 예)
+    #   scheduler = CropScheduler('auto', num_workers=32, height=720, width=1280)
+    #   while scheduler.calibrating:
+    #       config = scheduler.current()                 # {'num_workers': 16, 'threads': 2, 'filter_threads': 2}
+    #       ... 처음 scheduler.calibration_size()개의 tube를 config로 처리한다 ...
+    #       scheduler.report(encoded_frames, elapsed)    # 측정 결과를 알려주면 다음 후보로 넘어간다 (elapsed: tube 처리 시간 합 / 워커 수)
+    #   config = scheduler.current()                     # 가장 빠른 조합
+
+    def __init__(self, mode, num_workers, threads=0, height=720, width=1280, num_cpus=None):
+        # mode: SCHEDULE_MODES 중 하나
+        # num_workers, threads: fixed 모드에서 사용할 워커 수와 ffmpeg 스레드 수 (threads=0이면 ffmpeg 기본값)
+        # height, width: 원본 해상도 (heuristic 모드에서 스레드 수를 정할 때 사용한다)
+        # num_cpus: 사용할 CPU 수, None이면 available_cpus()
+        self.mode = mode
+        self.num_cpus = num_cpus if num_cpus else available_cpus()
+        heuristic_threads = min(self.num_cpus, get_threads_for_resolution(height, width))
+        self.heuristic = (max(1, self.num_cpus // heuristic_threads), heuristic_threads)
+        if mode == 'fixed':
+            self.candidates = [(num_workers, threads)]
+        elif mode == 'heuristic':
+            self.candidates = [self.heuristic]
+        else:
+            self.candidates = [(max(1, self.num_cpus // t), t) for t in THREAD_CANDIDATES if t <= self.num_cpus]
+        # 후보 조합별 측정 결과 (frames/s)
+        self.results = {}
+        self.index = 0
+        # 최종 선택된 조합, auto 모드에서는 모든 후보를 측정한 후에 정해진다
+        self.best = self.candidates[0] if len(self.candidates) == 1 else None
+
+    @property
+    def calibrating(self):
+        return self.best is None
+
+    def current(self):
+        # 지금 사용할 조합을 반환한다
+        # 반환값: {'num_workers': 워커 수, 'threads': ffmpeg -threads, 'filter_threads': ffmpeg -filter_threads}
+        num_workers, threads = self.best if self.best is not None else self.candidates[self.index]
+        return {'num_workers': num_workers, 'threads': threads, 'filter_threads': threads}
+
+    def calibration_size(self):
+        # 현재 후보를 측정할 때 사용할 tube 수 (모든 워커가 두 번씩 tube를 받을 만큼)
+        return self.current()['num_workers'] * 2
+
+    def report(self, frames, seconds):
+        # 현재 후보로 처리한 결과(인코딩한 프레임 수, 경과 시간)를 기록하고 다음 후보로 넘어간다
+        # seconds: 워커들이 tube를 처리하는 데 쓴 시간 (풀 시작과 마지막 tube를 기다리는 시간은 빼고 넘긴다)
+        # 모든 후보를 측정하면 frames/s가 가장 높은 조합을 선택한다
+        if not self.calibrating:
+            return
+        candidate = self.candidates[self.index]
+        self.results[candidate] = frames / seconds if seconds > 0 else 0.0
+        print('Calibration: %d workers x %d threads: %.1f frames/s' % (candidate[0], candidate[1], self.results[candidate]))
+        self.index += 1
+        if self.index == len(self.candidates):
+            self.best = max(self.results, key=self.results.get)
+            print('Selected %d workers x %d threads' % (self.best[0], self.best[1]))
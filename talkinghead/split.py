@@ -0,0 +1,78 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import glob
+import os
+import subprocess
+
+
+def split_video(input_file, output_dir):
+    # 비디오를 1분 단위로 분할하는 함수
+    # input_file: 입력 비디오 파일 경로
+    # output_dir: 분할된 비디오를 저장할 디렉토리 경로
+    # 반환값: 성공 시 True, 실패 시 False
+    
+    # 파일 경로에서 파일명만 추출하고 확장자를 제거한다
+    # os.path.basename()은 경로에서 마지막 부분(파일명)만 추출한다
+    # 예) "train/temp_raw_videos/--Y9imYnfBw.mp4" → "--Y9imYnfBw.mp4"
+    # os.path.splitext()는 파일명과 확장자를 분리한다
+    # 예) "--Y9imYnfBw.mp4" → ("--Y9imYnfBw", ".mp4")
+    # [0]은 파일명 부분만 가져온다 → "--Y9imYnfBw"
+    filename_without_ext = os.path.splitext(os.path.basename(input_file))[0]
+    
+    # 출력 파일명 패턴을 생성한다
+    # os.path.join()은 경로를 올바르게 결합한다
+    # 예) output_dir="train/temp_1min_clips", filename_without_ext="--Y9imYnfBw"이면
+    #     "train/temp_1min_clips/--Y9imYnfBw_%04d.mp4"가 된다
+    # %04d는 ffmpeg의 segment 포맷에서 사용하는 4자리 숫자 자동 증가 패턴이다 (0000, 0001, 0002, ...)
+    output_pattern = os.path.join(output_dir, f'{filename_without_ext}_%04d.mp4')
+    
+    # ffmpeg 명령어를 실행하여 비디오를 1분 단위로 분할한다
+    # subprocess.run()은 외부 명령어를 실행한다
+    # -i: 입력 파일을 지정한다
+    # -c copy: 비디오/오디오 코덱을 재인코딩하지 않고 복사한다 (빠르고 품질 손실 없음)
+    # -map 0: 입력 파일의 모든 스트림(비디오, 오디오 등)을 매핑한다
+    # -segment_time 00:01:00: 각 세그먼트의 길이를 1분(00:01:00)으로 설정한다
+    # -f segment: 세그먼트 포맷으로 출력한다 (여러 파일로 분할)
+    # output_pattern: 출력 파일명 패턴을 지정한다
+    # 예를 들어, --Y9imYnfBw.mp4가 3분 길이면 --Y9imYnfBw_0000.mp4, --Y9imYnfBw_0001.mp4, --Y9imYnfBw_0002.mp4가 생성된다
+    try:
+        result = subprocess.run([
+            'ffmpeg',
+            '-i', input_file,
+            '-c', 'copy',
+            '-map', '0',
+            '-segment_time', '00:01:00',
+            '-f', 'segment',
+            output_pattern
+        ], check=False, capture_output=True, text=True)  # check=False는 오류가 발생해도 예외를 발생시키지 않는다
+        # capture_output=True는 stdout과 stderr를 캡처한다
+        # text=True는 출력을 문자열로 받는다
+        
+        # ffmpeg가 성공적으로 실행되었는지 확인한다
+        # returncode가 0이면 성공이다
+        if result.returncode == 0:
+            print('Split video: %s' % (os.path.basename(input_file)))
+            return True
+        else:
+            print('Failed to split video: %s' % (os.path.basename(input_file)))
+            print(result.stderr)
+            return False
+    except Exception as e:
+        print('Error splitting video %s: %s' % (os.path.basename(input_file), str(e)))
+        return False
+
+
+def get_segment_filepaths(input_file, output_dir):
+    # split_video()가 input_file에서 만든 세그먼트 파일 경로 리스트 (세그먼트 번호 순서)
+    # 예) "raw/--Y9imYnfBw.mp4" → ["1min/--Y9imYnfBw_0000.mp4", "1min/--Y9imYnfBw_0001.mp4", ...]
+    filename_without_ext = os.path.splitext(os.path.basename(input_file))[0]
+    return sorted(glob.glob(os.path.join(output_dir, glob.escape(filename_without_ext) + '_[0-9][0-9][0-9][0-9].mp4')))
+
+
+def get_split_done_filepath(input_file, output_dir):
+    # split_video()가 input_file을 끝까지 분할했음을 표시하는 파일 경로 ('.'으로 시작하므로 DirectoryWatcher가 무시한다)
+    # 예) "raw/--Y9imYnfBw.mp4" → "1min/.--Y9imYnfBw.split_done"
+    filename_without_ext = os.path.splitext(os.path.basename(input_file))[0]
+    return os.path.join(output_dir, '.%s.split_done' % (filename_without_ext))
@@ -0,0 +1,167 @@
+import os
+import shutil
+import threading
+import time
+
+
+class TempSpace:
+    # 처리 중인 비디오의 임시 파일(원본 비디오 + 분할된 세그먼트) 크기를 집계하고 예산(바이트)을 넘지 않게 막는 클래스
+    # 새 비디오를 다운로드하기 전에 wait_for_space()를 호출하면 예산 안에 들어올 때까지(앞의 비디오가 끝날 때까지) 기다린다
+    # 처리 중인 비디오가 하나도 없으면 예산보다 큰 비디오도 진행한다 (멈추지 않도록)
+    # 여러 스레드(다운로드 prefetch 스레드와 메인 스레드)에서 함께 사용한다
+    #
+    # 사용 예)
+    #   temp_space = TempSpace(budget_bytes=100 * 1024 ** 3)
+    #   temp_space = TempSpace(budget_bytes=100 * 1024 ** 3, default_video_bytes=500 * 1024 ** 2)
+    #   temp_space.reserve(video_id, nbytes)           # 다운로드 전 (yt-dlp가 알려준 크기, 모르면 None)
+    #   temp_space.record(video_id, actual_size, staged)   # 분할할 디렉토리를 정한 후 (원본 + 디스크의 세그먼트)
+    #   temp_space.release(video_id)                   # 비디오 처리가 끝난 후
+
+    def __init__(self, budget_bytes=0, default_video_bytes=0):
+        # budget_bytes: 임시 파일 예산(바이트), 0이면 제한하지 않는다
+        # default_video_bytes: 다운로드 전에 크기를 모르는 비디오의 예상 크기(바이트)
+        self.budget_bytes = budget_bytes
+        # 처리 중인 비디오 ID -> 임시 파일 크기(바이트)
+        self.in_flight = {}
+        # 크기를 모르는 비디오를 다운로드 전에 잡아 두는 크기(바이트)
+        # default_video_bytes와 지금까지 받은 가장 큰 비디오 중 큰 값이다
+        self.expected_bytes = default_video_bytes
+        # 예산 때문에 기다린 시간(초, 통계용)
+        self.wait_seconds = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def used(self):
+        with self._cond:
+            return sum(self.in_flight.values())
+
+    def wait_for_space(self, nbytes):
+        # nbytes만큼 더 써도 예산을 넘지 않을 때까지 기다린다
+        if not self.budget_bytes:
+            return
+        with self._cond:
+            start = time.time()
+            while self.in_flight and sum(self.in_flight.values()) + nbytes > self.budget_bytes:
+                self._cond.wait()
+            self.wait_seconds += time.time() - start
+
+    def set(self, video_id, nbytes):
+        # 비디오의 임시 파일 크기를 기록한다 (예상 크기로 미리 잡아 둔 뒤 실제 크기로 바꿀 때도 사용한다)
+        with self._cond:
+            self.in_flight[video_id] = nbytes
+
+    def reserve(self, video_id, nbytes=None):
+        # 다운로드하기 전에 호출한다 (예상 크기의 원본 + 세그먼트가 예산 안에 들어올 때까지 기다린 뒤 미리 기록한다)
+        # prefetch 스레드와 --prefetch_videos 0일 때의 메인 스레드 다운로드 모두 이 함수를 거친다
+        # nbytes: 다운로드 전에 알아낸 비디오 크기(바이트, yt-dlp의 filesize 등), None이면 expected_bytes를 사용한다
+        # 기다린 후 기록하기까지 다른 스레드가 끼어들지 않도록 조건 변수의 lock을 잡은 채로 기록한다
+        reserved = 2 * (nbytes if nbytes else self.expected_bytes)
+        with self._cond:
+            self.wait_for_space(reserved)
+            self.in_flight[video_id] = reserved
+        return reserved
+
+    def record(self, video_id, size, staged=False):
+        # 다운로드가 끝난 후 실제 비디오 크기(바이트)로 바꿔 기록한다 (원본과 거의 같은 크기의 세그먼트를 합쳐 2배)
+        # staged: 세그먼트를 --staging_dir(RAM 디스크)에 만들면 디스크 예산에는 원본만 기록한다
+        with self._cond:
+            self.expected_bytes = max(self.expected_bytes, size)
+            self.in_flight[video_id] = size if staged else 2 * size
+            self._cond.notify_all()
+
+    def release(self, video_id):
+        # 비디오 처리가 끝났을 때 호출한다 (임시 파일을 지웠거나, --delete_temp off로 남겨 둔 경우 모두 집계에서 뺀다)
+        with self._cond:
+            self.in_flight.pop(video_id, None)
+            self._cond.notify_all()
+
+
+def choose_split_dir(temp_split_dir, staging_dir, video_id, nbytes, reserve_bytes=0):
+    # 분할된 세그먼트를 저장할 디렉토리를 고르는 함수
+    # staging_dir(예: /dev/shm/talkinghead)에 nbytes + reserve_bytes 이상 여유가 있으면 그 아래의 비디오별 디렉토리를,
+    # 없거나 staging_dir이 None이면 temp_split_dir을 사용한다
+    # 세그먼트는 -c copy로 만들므로 전체 크기가 원본 비디오 크기와 거의 같다 (nbytes로 원본 크기를 넘긴다)
+    # 반환값: (split_dir, staged) - staged가 True이면 비디오 처리가 끝난 후 split_dir을 통째로 지워야 한다
+    if staging_dir:
+        os.makedirs(staging_dir, exist_ok=True)
+        if shutil.disk_usage(staging_dir).free - reserve_bytes >= nbytes:
+            split_dir = os.path.join(staging_dir, video_id)
+            os.makedirs(split_dir, exist_ok=True)
+            return split_dir, True
+    return temp_split_dir, False
+
+
+class DownloadPrefetcher:
+    # 현재 비디오를 분할/크롭하는 동안 다음 비디오들을 백그라운드 스레드에서 미리 다운로드하는 클래스
+    # 미리 받아 두는 비디오 수는 max_ahead개 이하이고, 다운로드 전에 TempSpace 예산이 생길 때까지 기다린다
+    # 다운로드 크기는 estimate_bytes가 알려주고, 모르면 TempSpace.expected_bytes로 예상한다
+    # (원본과 세그먼트를 합쳐서 원본 크기의 2배를 잡는다)
+    #
+    # 사용 예)
+    #   prefetcher = DownloadPrefetcher(video_ids, download, temp_space, needs_download=has_pending_tubes, max_ahead=2)
+    #   for video_id in video_ids:
+    #       prefetched, video_path = prefetcher.get(video_id)   # 미리 받지 않은 비디오이면 prefetched가 False
+    #   prefetcher.close()
+
+    def __init__(self, video_ids, download, temp_space, needs_download=None, max_ahead=1, estimate_bytes=None):
+        # video_ids: 처리할 순서대로 정렬된 비디오 ID 리스트
+        # download: 비디오 ID를 받아서 다운로드한 파일 경로(실패하면 None)를 반환하는 함수
+        # temp_space: TempSpace
+        # needs_download: 비디오 ID를 받아서 다운로드가 필요한지 반환하는 함수 (처리할 tube가 없는 비디오는 받지 않는다)
+        # max_ahead: 메인 스레드가 아직 가져가지 않은 다운로드의 최대 개수
+        # estimate_bytes: 비디오 ID를 받아서 다운로드 전에 알 수 있는 크기(바이트, 모르면 None)를 반환하는 함수
+        self.video_ids = list(video_ids)
+        self.download = download
+        self.temp_space = temp_space
+        self.needs_download = needs_download
+        self.max_ahead = max_ahead
+        self.estimate_bytes = estimate_bytes
+        # 다운로드가 끝난 비디오 ID -> 파일 경로 (실패하면 None)
+        self.ready = {}
+        # 다운로드하지 않고 건너뛴 비디오 ID
+        self.skipped = set()
+        self._stop = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        for video_id in self.video_ids:
+            with self._cond:
+                while not self._stop and len(self.ready) >= self.max_ahead:
+                    self._cond.wait()
+                if self._stop:
+                    return
+            if self.needs_download is not None and not self.needs_download(video_id):
+                with self._cond:
+                    self.skipped.add(video_id)
+                    self._cond.notify_all()
+                continue
+            self.temp_space.reserve(video_id, self.estimate_bytes(video_id) if self.estimate_bytes is not None else None)
+            video_path = self.download(video_id)
+            if video_path is not None:
+                self.temp_space.record(video_id, os.path.getsize(video_path))
+            else:
+                self.temp_space.release(video_id)
+            with self._cond:
+                self.ready[video_id] = video_path
+                self._cond.notify_all()
+
+    def get(self, video_id):
+        # 미리 받은 비디오의 파일 경로를 반환한다 (아직 받는 중이면 끝날 때까지 기다린다)
+        # 반환값: (prefetched, video_path) - prefetched가 False이면 미리 받지 않은 비디오이므로 직접 다운로드해야 한다
+        with self._cond:
+            while video_id not in self.ready and video_id not in self.skipped and self._thread.is_alive():
+                self._cond.wait(timeout=1.0)
+            if video_id in self.ready:
+                video_path = self.ready.pop(video_id)
+                self._cond.notify_all()
+                return True, video_path
+            return False, None
+
+    def close(self):
+        # 남은 다운로드를 중단한다 (진행 중인 다운로드 하나는 끝날 때까지 기다린다)
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,110 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import collections
+import glob
+import os
+import time
+from time import time as timer
+
+from talkinghead.plan import get_clip_params
+
+# 디렉토리를 다시 확인하는 기본 간격(초)
+DEFAULT_POLL_INTERVAL = 5.0
+# 완료 표시 파일이 없을 때, 크기와 수정 시각이 이 시간(초) 동안 바뀌지 않은 파일을 완성된 파일로 본다
+DEFAULT_STABLE_SECONDS = 10.0
+
+
+class DirectoryWatcher:
+    # 다른 프로세스(다운로드, 분할)가 쓰고 있는 디렉토리에서 완성된 파일만 골라내는 클래스
+    # 파일이 완성되었는지는 두 가지 방법 중 하나로 판단한다
+    #   - done_marker가 있으면: '{파일}{done_marker}' 파일이 있을 때 (예: 'vid_0000.mp4.done', 쓰는 쪽이 파일을 다 쓴 후에 만든다)
+    #   - 없으면: 크기와 수정 시각이 stable_seconds 동안 바뀌지 않았을 때
+    # '.'으로 시작하는 파일(clip_output.get_temp_filepath()의 임시 파일 등)은 무시한다
+    # 한 번 돌려준 파일은 다시 돌려주지 않는다
+    #
+    # 사용 예)
+    #   watcher = DirectoryWatcher('small/1min_clips', done_marker='.done')
+    #   for filepaths in watcher.watch(poll_interval=5.0):
+    #       ... 새로 완성된 파일들을 처리한다 ...
+
+    def __init__(self, input_dir, pattern='*.mp4', done_marker='', stable_seconds=DEFAULT_STABLE_SECONDS):
+        # input_dir: 확인할 디렉토리
+        # pattern: 확인할 파일의 glob 패턴 (input_dir 기준)
+        # done_marker: 완료 표시 파일의 접미사, 빈 문자열이면 크기가 바뀌지 않는지로 판단한다
+        # stable_seconds: done_marker가 없을 때 파일이 바뀌지 않아야 하는 시간(초)
+        self.input_dir = input_dir
+        self.pattern = pattern
+        self.done_marker = done_marker
+        self.stable_seconds = stable_seconds
+        # 이미 돌려준 파일 경로
+        self.seen = set()
+        # 아직 완성되지 않은 파일 경로 -> ((크기, 수정 시각), 그 상태를 처음 본 시각)
+        self.states = {}
+
+    def poll(self):
+        # 디렉토리를 한 번 확인해서 새로 완성된 파일 경로 리스트를 이름 순서로 반환하는 함수
+        now = timer()
+        ready = []
+        for filepath in sorted(glob.glob(os.path.join(self.input_dir, self.pattern))):
+            if filepath in self.seen or os.path.basename(filepath).startswith('.'):
+                continue
+            if self.done_marker:
+                if os.path.exists(filepath + self.done_marker):
+                    ready.append(filepath)
+                continue
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                # 확인하는 사이에 지워졌거나 이름이 바뀐 경우
+                continue
+            state = (stat.st_size, stat.st_mtime)
+            previous = self.states.get(filepath)
+            if previous is None or previous[0] != state:
+                self.states[filepath] = (state, now)
+                continue
+            if now - previous[1] >= self.stable_seconds:
+                ready.append(filepath)
+        for filepath in ready:
+            self.seen.add(filepath)
+            self.states.pop(filepath, None)
+        return ready
+
+    def watch(self, poll_interval=DEFAULT_POLL_INTERVAL, idle_timeout=0.0):
+        # poll_interval마다 디렉토리를 확인해서 새로 완성된 파일이 있으면 그 리스트를 돌려주는 제너레이터
+        # idle_timeout: 이 시간(초) 동안 새 파일이 없으면 끝낸다, 0이면 끝내지 않는다 (호출한 쪽에서 멈춘다)
+        last_arrival = timer()
+        while True:
+            ready = self.poll()
+            if ready:
+                last_arrival = timer()
+                yield ready
+            elif idle_timeout and timer() - last_arrival >= idle_timeout:
+                return
+            time.sleep(poll_interval)
+
+
+def iter_arrived_tubes(tubes, watcher, poll_interval=DEFAULT_POLL_INTERVAL, idle_timeout=0.0):
+    # tube들 중 세그먼트 파일이 완성된 tube를 도착하는 대로 돌려주는 제너레이터 (videos_crop.py --watch)
+    # talkinghead.crop.run_crop_pool()에 tube 리스트 대신 넘기면 하나의 풀에 도착한 tube를 계속 넣는다
+    # tubes: tube 정보 문자열 리스트
+    # watcher: 세그먼트 디렉토리(input_dir)의 DirectoryWatcher
+    # poll_interval, idle_timeout: DirectoryWatcher.watch()와 같다
+    # 반환값: 새로 완성된 세그먼트들의 tube 리스트를 차례로 돌려준다 (모든 tube를 돌려주면 끝난다)
+    pending = collections.OrderedDict()
+    for tube in tubes:
+        pending.setdefault(get_clip_params(tube).split(',')[0].strip(), []).append(tube)
+    if not pending:
+        return
+    print('Watching %s for %d segments' % (watcher.input_dir, len(pending)))
+    for filepaths in watcher.watch(poll_interval, idle_timeout):
+        arrived = []
+        for filepath in filepaths:
+            arrived.extend(pending.pop(os.path.splitext(os.path.basename(filepath))[0], []))
+        if arrived:
+            print('Queued %d tubes from new segments (%d segments still pending)' % (len(arrived), len(pending)))
+            yield arrived
+        if not pending:
+            return
+    print('No new segments for %.0f seconds, %d segments never arrived' % (idle_timeout, len(pending)))
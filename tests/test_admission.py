@@ -0,0 +1,75 @@
+import pytest
+
+from talkinghead import admission as admission_module
+from talkinghead.admission import (BYTES_PER_FRAME, DEFAULT_BYTES_PER_PIXEL, FFMPEG_BASE_RSS, AdmissionController,
+                                   get_tube_cost)
+from talkinghead.affinity import TubeGroup
+
+SMALL = 'a_0000, 360, 640, 0, 99, 0, 0, 100, 100'
+MEDIUM = 'b_0000, 1080, 1920, 0, 299, 0, 0, 100, 100'
+LARGE = 'c_0000, 2160, 3840, 0, 299, 0, 0, 100, 100'
+
+
+@pytest.fixture
+def free_machine(monkeypatch):
+    # 메모리 8GB가 남아 있고 load가 0인 상태로 고정한다 (자손 ffmpeg는 아직 메모리를 쓰지 않았다)
+    state = {'available': 8 * 1024 ** 3, 'children': 0, 'load': 0.0}
+    monkeypatch.setattr(admission_module, 'get_available_memory', lambda: state['available'])
+    monkeypatch.setattr(admission_module, 'get_children_rss', lambda: state['children'])
+    monkeypatch.setattr(admission_module.os, 'getloadavg', lambda: (state['load'], 0.0, 0.0))
+    return state
+
+
+def test_tube_cost_and_rss():
+    assert get_tube_cost(MEDIUM) == 1080 * 1920 * 300
+    admission = AdmissionController(4, max_load=8)
+    assert admission.estimate_rss(MEDIUM) == FFMPEG_BASE_RSS + DEFAULT_BYTES_PER_PIXEL * 1080 * 1920 + BYTES_PER_FRAME * 300
+    # 묶음은 tube를 차례대로 처리하므로 가장 큰 tube의 RSS를 사용한다
+    assert admission.estimate_rss(TubeGroup([SMALL, LARGE], None)) == admission.estimate_rss(LARGE)
+
+
+def test_order_largest_first():
+    admission = AdmissionController(4, max_load=8)
+    assert admission.order([SMALL, LARGE, MEDIUM]) == [LARGE, MEDIUM, SMALL]
+    # 묶음은 tube 비용의 합으로 정렬한다
+    groups = [TubeGroup([MEDIUM], None), TubeGroup([SMALL] * 50, None), TubeGroup([LARGE], None)]
+    assert admission.order(groups) == [groups[2], groups[1], groups[0]]
+
+
+def test_admit_waits_for_memory_and_load(free_machine):
+    admission = AdmissionController(4, memory_reserve=1024 ** 3, max_load=8)
+    rss = admission.estimate_rss(LARGE)
+    # 실행 중인 tube가 없으면 메모리와 관계없이 하나는 넣는다
+    free_machine['available'] = 0
+    assert admission.admit(LARGE)
+    # 여유 메모리 - 예약분 - 아직 반영되지 않은 실행 중 tube의 RSS가 새 tube의 RSS보다 작으면 기다린다
+    free_machine['available'] = 1024 ** 3 + 2 * rss - 1
+    assert not admission.admit(LARGE) and admission.memory_waits == 1
+    # 실행 중인 ffmpeg가 예상만큼 메모리를 쓰고 있으면 그만큼은 이미 MemAvailable에 반영되어 있다
+    free_machine['children'] = rss
+    assert admission.admit(LARGE)
+    free_machine['available'] = 64 * 1024 ** 3
+    free_machine['load'] = 8.0
+    assert not admission.admit(SMALL) and admission.load_waits == 1
+    free_machine['load'] = 0.0
+    assert admission.admit(SMALL) and admission.admit(SMALL)
+    # 풀 크기만큼 실행 중이면 넣지 않는다
+    assert not admission.admit(SMALL)
+    admission.release(SMALL)
+    assert len(admission.running) == 3
+
+
+def test_release_learns_bytes_per_pixel(free_machine):
+    admission = AdmissionController(4, max_load=8)
+    assert admission.admit(MEDIUM)
+    record = {'frames': 300, 'H': 1080, 'W': 1920,
+              'peak_rss_bytes': FFMPEG_BASE_RSS + BYTES_PER_FRAME * 300 + 100 * 1080 * 1920}
+    admission.release(MEDIUM, record)
+    assert admission.running == []
+    assert admission.bytes_per_pixel == pytest.approx(100.0)
+    # 더 작은 측정값으로는 줄이지 않는다
+    admission.release(TubeGroup([MEDIUM], None), [dict(record, peak_rss_bytes=FFMPEG_BASE_RSS)])
+    assert admission.bytes_per_pixel == pytest.approx(100.0)
+    # 실패한 작업(result=None)은 실행 목록에서만 뺀다
+    admission.release(MEDIUM, None)
+    assert admission.bytes_per_pixel == pytest.approx(100.0)
@@ -0,0 +1,38 @@
+import os
+
+from talkinghead.affinity import TubeGroup, get_group_tubes, group_tubes_by_segment
+
+
+def make_tube(segment, start):
+    return '%s, 720, 1280, %d, %d, 0, 0, 256, 256' % (segment, start, start + 99)
+
+
+def test_group_tubes_by_segment_sorts_within_segment():
+    tubes = [make_tube('vid_0001', 50), make_tube('vid_0000', 0), make_tube('vid_0001', 10)]
+    groups = group_tubes_by_segment(tubes, 'in')
+    assert [group.tubes for group in groups] == [[make_tube('vid_0001', 10), make_tube('vid_0001', 50)],
+                                                 [make_tube('vid_0000', 0)]]
+    assert get_group_tubes(groups[0]) == groups[0].tubes
+    assert get_group_tubes(tubes[0]) == [tubes[0]]
+
+
+def test_prefetch_points_past_groups_in_flight():
+    # 묶음 i를 시작할 때 i+1 ~ i+num_workers-1번째 묶음은 이미 다른 워커에서 실행 중이다
+    tubes = [make_tube('vid_%04d' % i, 0) for i in range(6)]
+    groups = group_tubes_by_segment(tubes, 'in', num_workers=3)
+    assert [group.prefetch_filepath for group in groups] == [
+        os.path.join('in', 'vid_0003.mp4'), os.path.join('in', 'vid_0004.mp4'), os.path.join('in', 'vid_0005.mp4'),
+        None, None, None]
+    # 워커가 하나이면 다음 묶음을 미리 읽는다
+    groups = group_tubes_by_segment(tubes, 'in')
+    assert groups[0].prefetch_filepath == os.path.join('in', 'vid_0001.mp4')
+    assert groups[-1].prefetch_filepath is None
+
+
+def test_prefetch_follows_order_and_plan_rows():
+    rows = [{'clip_params': make_tube('vid_%04d' % i, 0), 'input_filepath': '/seg/vid_%04d.mp4' % i} for i in range(4)]
+    groups = group_tubes_by_segment(rows, None, order=lambda groups: list(reversed(groups)), num_workers=2)
+    assert [group.tubes[0]['input_filepath'] for group in groups] == ['/seg/vid_0003.mp4', '/seg/vid_0002.mp4',
+                                                                      '/seg/vid_0001.mp4', '/seg/vid_0000.mp4']
+    assert [group.prefetch_filepath for group in groups] == ['/seg/vid_0001.mp4', '/seg/vid_0000.mp4', None, None]
+    assert isinstance(groups[0], TubeGroup)
@@ -0,0 +1,33 @@
+from talkinghead.plan import get_chunks
+
+
+def test_get_chunks_disabled():
+    assert get_chunks(272, 0) == []
+    assert get_chunks(272, -1, 10) == []
+
+
+def test_get_chunks_short_tube_is_one_chunk():
+    assert get_chunks(50, 100, 20) == [(0, 50)]
+    assert get_chunks(100, 100, 20) == [(0, 100)]
+
+
+def test_get_chunks_overlap_and_last_chunk_aligned_to_end():
+    # 주석의 예와 같다: 마지막 chunk는 tube 끝에 맞춰서 시작한다
+    assert get_chunks(272, 100, 20) == [(0, 100), (80, 100), (160, 100), (172, 100)]
+    assert get_chunks(300, 100) == [(0, 100), (100, 100), (200, 100)]
+
+
+def test_get_chunks_cover_every_frame():
+    for num_frames in range(1, 400, 7):
+        chunks = get_chunks(num_frames, 64, 16)
+        covered = set()
+        for start, frames in chunks:
+            assert frames == min(64, num_frames)
+            assert 0 <= start and start + frames <= num_frames
+            covered.update(range(start, start + frames))
+        assert covered == set(range(num_frames))
+
+
+def test_get_chunks_overlap_not_smaller_than_chunk():
+    # chunk_overlap >= chunk_frames이면 한 프레임씩 이동한다 (무한 루프가 되지 않는다)
+    assert get_chunks(5, 3, 3) == [(0, 3), (1, 3), (2, 3)]
@@ -0,0 +1,43 @@
+import json
+import os
+
+from talkinghead.clip_output import Manifest, ShardWriter, load_shard_index, store_clip
+
+
+def make_record(output_dir, key, data):
+    # trim_and_crop_min_size()가 반환하는 record 중 clip_output이 사용하는 항목만 채운다
+    output_filepath = os.path.join(output_dir, key + '.mp4')
+    with open(output_filepath, 'wb') as fout:
+        fout.write(data)
+    return {'output_filepath': output_filepath, 'video_name': key.split('_S')[0], 'H': 720, 'W': 1280,
+            'S': 0, 'E': 99, 'L': 0, 'T': 0, 'R': 256, 'B': 256, 'crop': [0, 0, 256, 256], 'fps': 30.0,
+            'frames': 100, 'duration': 100 / 30.0}
+
+
+def test_manifest_resume(tmp_path):
+    output_dir = str(tmp_path)
+    manifest = Manifest(output_dir)
+    assert manifest.done == set()
+    store_clip(make_record(output_dir, 'vid_0000_S0', b'a' * 10), output_dir, manifest=manifest)
+    store_clip(make_record(output_dir, 'vid_0000_S1', b'b' * 20), output_dir, manifest=manifest)
+    # 마지막 줄이 쓰이다가 중단된 경우에도 앞의 기록은 남는다
+    with open(manifest.path) as fin:
+        lines = fin.read().splitlines()
+    assert [json.loads(line)['bytes'] for line in lines] == [10, 20]
+    assert json.loads(lines[0])['clip'] == 'vid_0000_S0.mp4'
+
+    resumed = Manifest(output_dir)
+    assert resumed.done == {'vid_0000_S0', 'vid_0000_S1'}
+
+
+def test_tar_manifest_waits_for_shard_index(tmp_path):
+    # tar 출력 모드에서는 shard가 인덱스에 기록된 후에만 manifest에 추가한다
+    output_dir = str(tmp_path)
+    manifest = Manifest(output_dir)
+    writer = ShardWriter(output_dir)
+    store_clip(make_record(output_dir, 'vid_0000_S0', b'a' * 10), output_dir, writer, manifest)
+    assert Manifest(output_dir).done == set()
+    writer.close()
+    assert Manifest(output_dir).done == {'vid_0000_S0'}
+    entry = json.loads(open(manifest.path).readline())
+    assert entry['clip'] == load_shard_index(output_dir)['vid_0000_S0']['shard'] + '/vid_0000_S0.mp4'
@@ -0,0 +1,36 @@
+import pytest
+
+from talkinghead.estimate import estimate_stage_seconds, estimate_video_bytes, estimate_wall_seconds
+from talkinghead.probe import ProbeCache
+
+PROFILE = {'download_bytes_per_second': 100.0, 'split_bytes_per_second': 1000.0, 'encode_frames_per_second': 10.0,
+           'cleanup_seconds': 0.5}
+
+
+def test_stage_seconds():
+    assert estimate_stage_seconds(1000, 50, PROFILE) == {'download': 10.0, 'split': 1.0, 'crop': 5.0, 'cleanup': 0.5}
+    assert estimate_stage_seconds(None, 50, PROFILE) is None
+    assert estimate_stage_seconds(1000, 50, dict(PROFILE, encode_frames_per_second=None)) is None
+
+
+def test_wall_seconds():
+    stage_times = [{'download': 10.0, 'split': 1.0, 'crop': 5.0, 'cleanup': 0.5},
+                   {'download': 2.0, 'split': 1.0, 'crop': 20.0, 'cleanup': 0.5},
+                   {'download': 30.0, 'split': 1.0, 'crop': 5.0, 'cleanup': 0.5}]
+    # prefetch가 없으면 모든 단계를 더한다
+    assert estimate_wall_seconds(stage_times) == pytest.approx(76.5)
+    # prefetch가 있으면 첫 다운로드 + 비디오마다 (처리, 다음 다운로드) 중 긴 쪽
+    assert estimate_wall_seconds(stage_times, prefetch_videos=1) == pytest.approx(10.0 + 6.5 + 30.0 + 6.5)
+
+
+def test_video_bytes_from_probe_cache():
+    tubes = ['vid_0000, 720, 1280, 0, 10, 0, 0, 100, 100', 'vid_0002, 720, 1280, 0, 10, 0, 0, 100, 100']
+    probe_cache = ProbeCache()
+    probe_cache.entries['vid_0000.mp4'] = {'name': 'vid_0000.mp4', 'size': 1000, 'info': {}}
+    probe_cache.entries['vid_0001.mp4'] = {'name': 'vid_0001.mp4', 'size': 2000, 'info': {}}
+    # 캐시에 없는 세그먼트(vid_0002)는 평균 세그먼트 크기로 추정하고, 그 크기를 모르면 None
+    assert estimate_video_bytes('vid', tubes, probe_cache, segment_bytes=500.5) == 3500
+    assert estimate_video_bytes('vid', tubes, probe_cache) is None
+    assert estimate_video_bytes('vid', tubes[:1], probe_cache) == 1000
+    # 마지막 tube가 있는 세그먼트까지만 센다
+    assert estimate_video_bytes('vid', tubes, segment_bytes=100) == 300
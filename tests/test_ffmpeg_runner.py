@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from talkinghead import ffmpeg_runner
+from talkinghead.ffmpeg_runner import FFmpegTimeout, FrameProgress, ProgressReader, run_ffmpeg
+
+
+def feed_lines(reader, text):
+    for line in text.strip().splitlines():
+        reader.feed((line + '\n').encode('utf-8'))
+
+
+def test_progress_reader_parses_blocks():
+    reader = ProgressReader(os.getpid())
+    feed_lines(reader, '''
+frame=120
+fps=143.2
+bitrate=N/A
+speed=4.77x
+progress=continue
+''')
+    assert reader.progress['frames'] == 120
+    assert reader.progress['fps'] == 143.2
+    assert reader.progress['speed'] == 4.77
+    assert reader.reported == 120
+    feed_lines(reader, '''
+frame=272
+fps=150.0
+speed=5.1x
+progress=end
+''')
+    assert reader.progress['frames'] == 272
+    assert reader.reported == 272
+    # 진행 상황을 받을 때마다 프로세스의 RSS와 CPU 시간을 읽는다
+    assert reader.progress['peak_rss'] > 0
+
+
+def test_progress_reader_ignores_na_values():
+    # 시작 직후에는 fps와 speed가 'N/A'로 온다
+    reader = ProgressReader(os.getpid())
+    feed_lines(reader, '''
+frame=0
+fps=N/A
+speed=N/A
+progress=continue
+''')
+    assert reader.progress['frames'] == 0
+    assert reader.progress['fps'] == 0.0
+    assert reader.progress['speed'] == 0.0
+
+
+def make_test_stream(output_filepath, seconds, realtime=False):
+    # lavfi testsrc를 seconds초 인코딩하는 ffmpeg 스트림 (realtime이면 -re로 실제 시간만큼 걸린다)
+    import ffmpeg
+
+    kwargs = {'re': None} if realtime else {}
+    stream = ffmpeg.input('testsrc=size=64x64:rate=10:duration=%g' % (seconds), format='lavfi', **kwargs)
+    return stream.output(output_filepath, vcodec='libx264')
+
+
+def test_run_ffmpeg_fast_command_within_timeout(tmp_path):
+    output_filepath = str(tmp_path / 'out.mp4')
+    progress = run_ffmpeg(make_test_stream(output_filepath, 0.5), timeout=30)
+    assert progress['frames'] == 5
+    assert os.path.getsize(output_filepath) > 0
+
+
+def test_run_ffmpeg_timeout_kills(tmp_path):
+    with pytest.raises(FFmpegTimeout):
+        run_ffmpeg(make_test_stream(str(tmp_path / 'out.mp4'), 30, realtime=True), timeout=0.5)
+
+
+def test_run_ffmpeg_watchdog_firing_after_exit_is_not_a_timeout(tmp_path, monkeypatch):
+    # 타이머가 ffmpeg가 끝난 직후, cancel() 전에 울리는 경우를 재현한다
+    class LateTimer:
+        def __init__(self, interval, function):
+            self.function = function
+            self.daemon = False
+
+        def start(self):
+            pass
+
+        def cancel(self):
+            self.function()
+
+    monkeypatch.setattr(ffmpeg_runner.threading, 'Timer', LateTimer)
+    output_filepath = str(tmp_path / 'out.mp4')
+    progress = run_ffmpeg(make_test_stream(output_filepath, 0.5), timeout=0.1)
+    assert progress['frames'] == 5
+
+
+def test_timeout_reports_frames_already_counted(tmp_path, monkeypatch):
+    # 제한 시간을 넘긴 ffmpeg가 그 전까지 공유 카운터에 더한 프레임 수를 예외에 담는다
+    progress = FrameProgress(1000)
+    monkeypatch.setattr(ffmpeg_runner, '_progress_counter', progress.counter)
+    with pytest.raises(FFmpegTimeout) as excinfo:
+        run_ffmpeg(make_test_stream(str(tmp_path / 'out.mp4'), 30, realtime=True), timeout=1.5)
+    assert excinfo.value.reported_frames == progress.counter.value
+
+
+def test_frame_progress_counts_failed_tube_frames_once():
+    progress = FrameProgress(300)
+    # 실패한 tube는 카운터에 이미 더한 40프레임을 빼고 나머지만 더한다
+    progress.counter.value = 40
+    progress.tube_done({'status': 'timeout', 'frames': 100, 'reported_frames': 40})
+    assert progress.counter.value + progress.skipped_frames == 100
+    # 건너뛴 tube는 카운터에 더한 프레임이 없다
+    progress.tube_done({'status': 'skipped', 'frames': 100})
+    assert progress.counter.value + progress.skipped_frames == 200
+    # 성공한 tube는 ffmpeg가 알려주지 않은 나머지 프레임만 더한다
+    progress.counter.value += 50
+    progress.tube_done({'status': 'ok', 'frames': 100, 'output_frames': 50})
+    assert progress.counter.value + progress.skipped_frames == 300
@@ -0,0 +1,32 @@
+from talkinghead.frame_reader import KeyframeIndex
+
+
+def make_index(frames):
+    return {'width': 4, 'height': 4, 'frames': frames, 'times': [i / 25 for i in range(frames)], 'keyframes': [0]}
+
+
+def test_keyframe_index_reopen(tmp_path):
+    path = str(tmp_path / 'keyframes.jsonl')
+    index = KeyframeIndex(path)
+    index.put('a', 100, make_index(3))
+    reopened = KeyframeIndex(path)
+    assert reopened.get('a', 100) == make_index(3)
+    # 클립 크기가 달라지면 다시 만들어야 한다
+    assert reopened.get('a', 101) is None
+    assert reopened.get('b', 100) is None
+
+
+def test_keyframe_index_put_after_torn_line(tmp_path):
+    path = str(tmp_path / 'keyframes.jsonl')
+    KeyframeIndex(path).put('a', 100, make_index(3))
+    # 중단된 put: 마지막 줄이 줄바꿈 없이 잘렸다
+    with open(path, 'a') as fout:
+        fout.write('{"key": "half')
+
+    index = KeyframeIndex(path)
+    assert list(index.entries) == ['a']
+    index.put('b', 200, make_index(5))
+    # 잘린 줄 뒤에 추가한 entry도 다시 열었을 때 읽힌다
+    reopened = KeyframeIndex(path)
+    assert list(reopened.entries) == ['a', 'b']
+    assert reopened.get('b', 200) == make_index(5)
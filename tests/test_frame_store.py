@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from talkinghead.frame_store import STORE_INDEX_FILENAME, FrameStore
+
+
+def make_frames(num_frames, value, height=4, width=6):
+    return np.full((num_frames, height, width, 3), value, dtype=np.uint8)
+
+
+def test_append_and_get(tmp_path):
+    store = FrameStore(str(tmp_path), height=4, width=6)
+    store.append('a', make_frames(3, 1))
+    store.append('b', make_frames(5, 2).tobytes())
+    assert len(store) == 2 and 'a' in store and store.keys() == ['a', 'b']
+    assert store.get('a').shape == (3, 4, 6, 3)
+    assert (store.get('b') == 2).all()
+    assert (store.get_frame('a', 2) == 1).all()
+    with pytest.raises(IndexError):
+        store.get_frame('a', 3)
+
+    # 다시 열면 저장된 크기와 인덱스를 그대로 읽는다
+    reopened = FrameStore(str(tmp_path))
+    assert (reopened.height, reopened.width) == (4, 6)
+    assert reopened.index['b'] == {'key': 'b', 'shard': 'frames-000000.u8', 'start': 3, 'frames': 5}
+    with pytest.raises(ValueError):
+        FrameStore(str(tmp_path), height=8, width=8)
+
+
+def test_append_rejects_duplicates_and_partial_frames(tmp_path):
+    store = FrameStore(str(tmp_path), height=4, width=6)
+    store.append('a', make_frames(1, 1))
+    with pytest.raises(ValueError):
+        store.append('a', make_frames(1, 1))
+    with pytest.raises(ValueError):
+        store.append('b', make_frames(1, 1).tobytes()[:-1])
+    with pytest.raises(ValueError):
+        store.append('c', b'')
+
+
+def test_append_truncates_unindexed_tail(tmp_path):
+    store = FrameStore(str(tmp_path), height=4, width=6)
+    store.append('a', make_frames(2, 1))
+    shard_path = os.path.join(str(tmp_path), 'frames-000000.u8')
+    # 중단된 append: 프레임은 일부 쓰였지만 인덱스에는 없다
+    with open(shard_path, 'ab') as fout:
+        fout.write(make_frames(3, 9).tobytes()[:100])
+    with open(os.path.join(str(tmp_path), STORE_INDEX_FILENAME), 'a') as fout:
+        fout.write('{"key": "half')
+
+    store = FrameStore(str(tmp_path))
+    assert store.keys() == ['a']
+    entry = store.append('b', make_frames(2, 2))
+    assert entry['start'] == 2
+    assert os.path.getsize(shard_path) == 4 * store.frame_bytes
+    assert (store.get('a') == 1).all() and (store.get('b') == 2).all()
+    # 잘린 인덱스 줄 뒤에 추가한 entry도 다시 열었을 때 읽힌다
+    assert FrameStore(str(tmp_path)).keys() == ['a', 'b']
+
+
+def test_shards_roll_over(tmp_path):
+    store = FrameStore(str(tmp_path), height=4, width=6, max_shard_frames=4)
+    for i, num_frames in enumerate([3, 2, 6, 1]):
+        store.append('clip%d' % i, make_frames(num_frames, i))
+    shards = [store.index['clip%d' % i]['shard'] for i in range(4)]
+    # 비어 있는 shard에는 크기와 관계없이 클립 하나를 넣고, max_shard_frames를 넘으면 다음 클립부터 새 shard에 쓴다
+    assert shards == ['frames-000000.u8', 'frames-000000.u8', 'frames-000001.u8', 'frames-000002.u8']
+    for i in range(4):
+        assert (store.get('clip%d' % i) == i).all()
@@ -0,0 +1,18 @@
+import pytest
+
+from talkinghead.plan import parse_output_size
+
+
+def test_parse_output_size():
+    assert parse_output_size(None) is None
+    assert parse_output_size('') is None
+    assert parse_output_size('256') == [256, 256]
+    assert parse_output_size(256) == [256, 256]
+    assert parse_output_size('512x288') == [512, 288]
+    assert parse_output_size([512, 288]) == [512, 288]
+
+
+@pytest.mark.parametrize('output_size', ['0', '512x0', '-256', 'abc', '512x', '1x2x3'])
+def test_parse_output_size_invalid(output_size):
+    with pytest.raises(ValueError):
+        parse_output_size(output_size)
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from talkinghead.quality import collect_quality_stats, get_stats_filepath, read_frame_stats, summarize_frame_stats
+
+# metadata=print가 쓰는 형식의 프레임 3개 (signalstats의 다른 키와 처음 보는 키는 무시한다)
+SAMPLE_STATS = '''frame:0    pts:0       pts_time:0
+lavfi.signalstats.YMIN=16
+lavfi.signalstats.YLOW=40
+lavfi.signalstats.YAVG=100
+lavfi.signalstats.YHIGH=200
+lavfi.signalstats.SATAVG=10
+lavfi.signalstats.YDIF=0
+lavfi.blur=2
+frame:1    pts:512     pts_time:0.04
+lavfi.signalstats.YLOW=50
+lavfi.signalstats.YAVG=110
+lavfi.signalstats.YHIGH=210
+lavfi.signalstats.SATAVG=20
+lavfi.signalstats.YDIF=0.25
+lavfi.blur=4
+frame:2    pts:1024    pts_time:0.08
+lavfi.signalstats.YLOW=30
+lavfi.signalstats.YAVG=90
+lavfi.signalstats.YHIGH=150
+lavfi.signalstats.SATAVG=30
+lavfi.signalstats.YDIF=3.75
+lavfi.blur=3
+'''
+
+
+def write_stats(path):
+    with open(path, 'w') as fout:
+        fout.write(SAMPLE_STATS)
+
+
+def test_read_frame_stats(tmp_path):
+    path = str(tmp_path / 'clip.stats')
+    write_stats(path)
+    frames = read_frame_stats(path)
+    assert len(frames) == 3
+    assert frames[0] == {'y_low': 40.0, 'y_avg': 100.0, 'y_high': 200.0, 'sat_avg': 10.0, 'y_dif': 0.0, 'blur': 2.0}
+    assert frames[2]['y_dif'] == 3.75
+
+
+def test_summarize_frame_stats(tmp_path):
+    path = str(tmp_path / 'clip.stats')
+    write_stats(path)
+    summary = summarize_frame_stats(read_frame_stats(path))
+    assert summary == {'frames': 3, 'brightness': 100.0, 'brightness_min': 90.0, 'contrast': pytest.approx(146.6667),
+                       'saturation': 20.0, 'blur': 3.0, 'blur_max': 4.0, 'motion': 2.0, 'static_ratio': 0.5}
+    # 첫 프레임의 YDIF는 사용하지 않으므로 프레임 하나이면 움직임을 알 수 없다
+    single = summarize_frame_stats(read_frame_stats(path)[:1])
+    assert single['motion'] is None and single['static_ratio'] is None
+    assert summarize_frame_stats([]) is None
+
+
+def test_collect_quality_stats(tmp_path):
+    output_filepath = str(tmp_path / 'clip.mp4')
+    stats_filepath = get_stats_filepath(output_filepath)
+    assert os.path.basename(stats_filepath) == '.clip.part.stats'
+    write_stats(stats_filepath)
+    record = {'output_filepath': output_filepath, 'chunks': [{'start': 0, 'frames': 2}, {'start': 2, 'frames': 1}]}
+    collect_quality_stats(record)
+    assert record['quality']['frames'] == 3
+    assert [chunk['quality']['frames'] for chunk in record['chunks']] == [2, 1]
+    assert record['chunks'][1]['quality']['brightness'] == 90.0
+    assert not os.path.exists(stats_filepath)
+    # 통계 파일이 없으면 None
+    collect_quality_stats(record)
+    assert record['quality'] is None
@@ -0,0 +1,30 @@
+from talkinghead.rate_control import DEFAULT_MIN_BITRATE, get_encoder_kwargs, get_quality_kwargs
+
+
+def test_quality_kwargs():
+    assert get_quality_kwargs('libx264') == {'crf': 18}
+    assert get_quality_kwargs('libx265', 28) == {'crf': 28}
+    # libopenh264는 CRF가 없으므로 QP를 고정한다
+    assert get_quality_kwargs('libopenh264') == {'rc_mode': 'quality', 'qmin': 24, 'qmax': 24}
+    assert get_quality_kwargs('mpeg4') is None
+
+
+def test_encoder_kwargs_source_and_area():
+    assert get_encoder_kwargs('libx264', 2423000, 288 * 288, 1280 * 720) == {'b:v': '2423000'}
+    assert get_encoder_kwargs('libx264', 2423000, 288 * 288, 1280 * 720, 'area') == {'b:v': '218070'}
+    # crop이 아주 작으면 최소 비트레이트를 사용하고, 원본보다 큰 비율은 1로 자른다
+    assert get_encoder_kwargs('libx264', 2423000, 16 * 16, 1280 * 720, 'area') == {'b:v': str(DEFAULT_MIN_BITRATE)}
+    assert get_encoder_kwargs('libx264', 2423000, 16 * 16, 1280 * 720, 'area', min_bitrate=1000) == {'b:v': '1000'}
+    assert get_encoder_kwargs('libx264', 2423000, 2000 * 2000, 1280 * 720, 'area') == {'b:v': '2423000'}
+
+
+def test_encoder_kwargs_quality():
+    assert get_encoder_kwargs('libx264', 2423000, 288 * 288, 1280 * 720, 'quality') == {'crf': 18}
+    assert get_encoder_kwargs('libx264', None, 288 * 288, 1280 * 720, 'quality', quality=23) == {'crf': 23}
+    # 품질 목표를 지원하지 않는 코덱은 area 정책으로 처리한다
+    assert get_encoder_kwargs('mpeg4', 2423000, 288 * 288, 1280 * 720, 'quality') == {'b:v': '218070'}
+
+
+def test_encoder_kwargs_unknown_bitrate():
+    assert get_encoder_kwargs('libx264', None, 288 * 288, 1280 * 720, 'area') == {'crf': 18}
+    assert get_encoder_kwargs('libopenh264', None, 288 * 288, 1280 * 720) == {}
@@ -0,0 +1,47 @@
+from talkinghead.scheduler import CropScheduler, get_median_resolution
+
+
+def test_fixed_and_heuristic():
+    scheduler = CropScheduler('fixed', 6, threads=3, num_cpus=16)
+    assert not scheduler.calibrating
+    assert scheduler.current() == {'num_workers': 6, 'threads': 3, 'filter_threads': 3}
+    # 1080p 원본이면 ffmpeg 하나당 4 스레드, 워커 수는 CPU 수 / 스레드 수
+    scheduler = CropScheduler('heuristic', 6, height=1080, width=1920, num_cpus=16)
+    assert scheduler.current() == {'num_workers': 4, 'threads': 4, 'filter_threads': 4}
+    # CPU 수보다 많은 스레드는 사용하지 않는다
+    scheduler = CropScheduler('heuristic', 6, height=2160, width=3840, num_cpus=2)
+    assert scheduler.current() == {'num_workers': 1, 'threads': 2, 'filter_threads': 2}
+
+
+def test_auto_candidates():
+    scheduler = CropScheduler('auto', 6, num_cpus=16)
+    assert scheduler.candidates == [(16, 1), (8, 2), (4, 4), (2, 8)]
+    # CPU 수보다 큰 스레드 후보는 뺀다
+    assert CropScheduler('auto', 6, num_cpus=3).candidates == [(3, 1), (1, 2)]
+
+
+def test_auto_selects_fastest_after_report(capsys):
+    scheduler = CropScheduler('auto', 6, num_cpus=8)
+    assert scheduler.candidates == [(8, 1), (4, 2), (2, 4), (1, 8)]
+    seen = []
+    for frames in [1000, 3000, 2000, 500]:
+        assert scheduler.calibrating
+        seen.append(scheduler.current()['num_workers'])
+        assert scheduler.calibration_size() == seen[-1] * 2
+        scheduler.report(frames, 10.0)
+    assert seen == [8, 4, 2, 1]
+    assert not scheduler.calibrating
+    assert scheduler.results[(4, 2)] == 300.0
+    assert scheduler.current() == {'num_workers': 4, 'threads': 2, 'filter_threads': 2}
+    # 선택한 후에는 report()를 무시한다
+    scheduler.report(100000, 1.0)
+    assert scheduler.current()['num_workers'] == 4
+    assert 'Selected 4 workers x 2 threads' in capsys.readouterr().out
+
+
+def test_median_resolution():
+    tubes = ['a_0000, 720, 1280, 0, 10, 0, 0, 100, 100',
+             'b_0000, 1080, 1920, 0, 10, 0, 0, 100, 100',
+             'c_0000, 360, 640, 0, 10, 0, 0, 100, 100']
+    assert get_median_resolution(tubes) == (720, 1280)
+    assert get_median_resolution([]) == (720, 1280)
@@ -0,0 +1,60 @@
+import json
+import os
+import tarfile
+
+from talkinghead.clip_output import ShardWriter, load_shard_index, read_shard_member
+
+
+def make_record(output_dir, key, data):
+    # trim_and_crop_min_size()가 반환하는 record 중 clip_output이 사용하는 항목만 채운다
+    output_filepath = os.path.join(output_dir, key + '.mp4')
+    with open(output_filepath, 'wb') as fout:
+        fout.write(data)
+    return {'output_filepath': output_filepath, 'video_name': key.split('_S')[0], 'H': 720, 'W': 1280,
+            'S': 0, 'E': 99, 'L': 0, 'T': 0, 'R': 256, 'B': 256, 'crop': [0, 0, 256, 256], 'fps': 30.0,
+            'frames': 100, 'duration': 100 / 30.0}
+
+
+def test_shard_offsets_and_index_round_trip(tmp_path):
+    output_dir = str(tmp_path)
+    writer = ShardWriter(output_dir, max_shard_bytes=4096)
+    clips = {'vid_0000_S%d' % i: bytes([i]) * (700 + 300 * i) for i in range(4)}
+    for key, data in clips.items():
+        writer.add(make_record(output_dir, key, data))
+        # shard에 추가한 원본 파일은 지운다
+        assert not os.path.exists(os.path.join(output_dir, key + '.mp4'))
+    # 인덱스는 shard가 닫힐 때만 기록된다
+    assert set(load_shard_index(output_dir)) < set(clips)
+    writer.close()
+
+    index = load_shard_index(output_dir)
+    assert set(index) == set(clips)
+    # 크기 제한 때문에 shard가 여러 개로 나뉜다
+    assert len({entry['shard'] for entry in index.values()}) > 1
+    for key, data in clips.items():
+        entry = index[key]
+        assert read_shard_member(output_dir, entry) == data
+        meta = json.loads(read_shard_member(output_dir, entry, 'json'))
+        assert meta['video_name'] == 'vid_0000'
+        # offset은 tar의 member 데이터 위치와 같다 (스트리밍 reader와 random access가 같은 데이터를 본다)
+        with tarfile.open(os.path.join(output_dir, entry['shard'])) as tar:
+            member = tar.getmember(key + '.mp4')
+            assert (member.offset_data, member.size) == (entry['mp4_offset'], entry['mp4_size'])
+            assert tar.extractfile(member).read() == data
+
+
+def test_shard_writer_resumes_after_last_indexed_shard(tmp_path):
+    output_dir = str(tmp_path)
+    writer = ShardWriter(output_dir)
+    writer.add(make_record(output_dir, 'vid_0000_S0', b'a' * 100))
+    writer.close()
+    # 인덱스에 없는 shard(중단된 실행)는 다음 실행에서 같은 번호로 덮어쓴다
+    writer = ShardWriter(output_dir)
+    writer.add(make_record(output_dir, 'vid_0000_S1', b'b' * 100))
+    writer = ShardWriter(output_dir)
+    assert writer.done == {'vid_0000_S0'}
+    writer.add(make_record(output_dir, 'vid_0000_S1', b'c' * 100))
+    writer.close()
+    index = load_shard_index(output_dir)
+    assert index['vid_0000_S0']['shard'] != index['vid_0000_S1']['shard']
+    assert read_shard_member(output_dir, index['vid_0000_S1']) == b'c' * 100
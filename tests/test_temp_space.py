@@ -0,0 +1,108 @@
+import threading
+import time
+
+from talkinghead.estimate import estimate_peak_temp_bytes
+from talkinghead.temp_space import DownloadPrefetcher, TempSpace
+
+
+def start_reserve(temp_space, video_id, nbytes=None):
+    # 다른 스레드에서 reserve()를 호출하고, 끝나면 done이 설정된다
+    done = threading.Event()
+
+    def run():
+        temp_space.reserve(video_id, nbytes)
+        done.set()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, done
+
+
+def test_reserve_and_record():
+    temp_space = TempSpace(budget_bytes=1000, default_video_bytes=100)
+    # 크기를 모르면 예상 크기의 원본 + 세그먼트(2배)를 잡는다
+    assert temp_space.reserve('a') == 200
+    assert temp_space.reserve('b', 150) == 300
+    assert temp_space.used == 500
+    temp_space.record('a', 300)
+    assert temp_space.in_flight['a'] == 600 and temp_space.expected_bytes == 300
+    # 세그먼트를 staging 디렉토리에 만들면 원본만 기록한다
+    temp_space.record('b', 150, staged=True)
+    assert temp_space.in_flight['b'] == 150
+    temp_space.release('a')
+    temp_space.release('b')
+    assert temp_space.used == 0
+    # 지금까지 받은 가장 큰 비디오로 예상한다
+    assert temp_space.reserve('c') == 600
+
+
+def test_reserve_waits_for_release():
+    temp_space = TempSpace(budget_bytes=1000, default_video_bytes=400)
+    temp_space.reserve('a')
+    thread, done = start_reserve(temp_space, 'b')
+    assert not done.wait(0.2)
+    assert 'b' not in temp_space.in_flight
+    temp_space.release('a')
+    thread.join(5)
+    assert done.is_set() and temp_space.in_flight == {'b': 800}
+    assert temp_space.wait_seconds > 0
+
+
+def test_reserve_wakes_up_on_smaller_record():
+    temp_space = TempSpace(budget_bytes=1000, default_video_bytes=300)
+    temp_space.reserve('a')
+    thread, done = start_reserve(temp_space, 'b', 250)
+    assert not done.wait(0.2)
+    # 실제 크기가 예상보다 작거나 staging되면 기다리던 reserve()가 진행한다
+    temp_space.record('a', 300, staged=True)
+    thread.join(5)
+    assert done.is_set() and temp_space.used == 800
+
+
+def test_concurrent_reserves_stay_within_budget():
+    temp_space = TempSpace(budget_bytes=1000, default_video_bytes=200)
+    threads = [start_reserve(temp_space, 'v%d' % (i))[0] for i in range(6)]
+    peak = 0
+    while any(thread.is_alive() for thread in threads):
+        peak = max(peak, temp_space.used)
+        with temp_space._cond:
+            video_ids = list(temp_space.in_flight)
+        if video_ids:
+            time.sleep(0.01)
+            temp_space.release(video_ids[0])
+    # 400씩 잡으므로 동시에 두 개까지만 들어간다
+    assert peak <= 1000
+
+
+def test_no_budget_and_oversized_video():
+    assert TempSpace().reserve('a', 10 ** 12) == 2 * 10 ** 12
+    # 처리 중인 비디오가 없으면 예산보다 큰 비디오도 진행한다
+    temp_space = TempSpace(budget_bytes=100)
+    assert temp_space.reserve('a', 1000) == 2000
+
+
+def test_prefetcher_books_estimate(tmp_path):
+    video_path = tmp_path / 'a.mp4'
+    video_path.write_bytes(b'x' * 50)
+    temp_space = TempSpace(budget_bytes=1000, default_video_bytes=400)
+    booked = {}
+
+    def download(video_id):
+        booked[video_id] = temp_space.in_flight[video_id]
+        return str(video_path)
+
+    prefetcher = DownloadPrefetcher(['a'], download, temp_space, estimate_bytes=lambda video_id: 70)
+    assert prefetcher.get('a') == (True, str(video_path))
+    prefetcher.close()
+    assert booked == {'a': 140}
+    assert temp_space.in_flight == {'a': 100}
+
+
+def test_estimate_peak_temp_bytes():
+    assert estimate_peak_temp_bytes([100, 300, 200]) == 300
+    assert estimate_peak_temp_bytes([100, 300, 200], prefetch_videos=1) == 500
+    assert estimate_peak_temp_bytes([100, 300, 200], prefetch_videos=1, temp_budget_bytes=400) == 400
+    # 비디오 하나가 예산보다 크면 그 비디오만 진행한다
+    assert estimate_peak_temp_bytes([100, 900, 200], prefetch_videos=2, temp_budget_bytes=400) == 900
+    assert estimate_peak_temp_bytes([100, None]) is None
+    assert estimate_peak_temp_bytes([]) == 0
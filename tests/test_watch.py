@@ -0,0 +1,62 @@
+import os
+
+from talkinghead import watch
+from talkinghead.watch import DirectoryWatcher, iter_arrived_tubes
+
+
+def write_file(path, data=b'x'):
+    with open(path, 'ab') as fout:
+        fout.write(data)
+
+
+def test_poll_with_done_marker(tmp_path):
+    input_dir = str(tmp_path)
+    watcher = DirectoryWatcher(input_dir, done_marker='.done')
+    write_file(os.path.join(input_dir, 'b_0000.mp4'))
+    write_file(os.path.join(input_dir, 'a_0000.mp4'))
+    # 임시 파일은 완료 표시가 있어도 무시한다
+    write_file(os.path.join(input_dir, '.a_0001.part.mp4'))
+    write_file(os.path.join(input_dir, '.a_0001.part.mp4.done'))
+    assert watcher.poll() == []
+    write_file(os.path.join(input_dir, 'b_0000.mp4.done'))
+    write_file(os.path.join(input_dir, 'a_0000.mp4.done'))
+    assert watcher.poll() == [os.path.join(input_dir, 'a_0000.mp4'), os.path.join(input_dir, 'b_0000.mp4')]
+    # 한 번 돌려준 파일은 다시 돌려주지 않는다
+    assert watcher.poll() == []
+
+
+def test_poll_waits_for_stable_size(tmp_path, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(watch, 'timer', lambda: now[0])
+    input_dir = str(tmp_path)
+    filepath = os.path.join(input_dir, 'a_0000.mp4')
+    watcher = DirectoryWatcher(input_dir, stable_seconds=10.0)
+    write_file(filepath)
+    # 처음 본 파일은 상태만 기록한다
+    assert watcher.poll() == []
+    now[0] += 5.0
+    assert watcher.poll() == []
+    # 쓰는 중에 크기가 바뀌면 그 시각부터 다시 센다
+    write_file(filepath)
+    now[0] += 6.0
+    assert watcher.poll() == []
+    now[0] += 9.0
+    assert watcher.poll() == []
+    now[0] += 1.0
+    assert watcher.poll() == [filepath]
+    assert watcher.states == {}
+    now[0] += 20.0
+    assert watcher.poll() == []
+
+
+def test_iter_arrived_tubes(tmp_path, capsys):
+    input_dir = str(tmp_path)
+    tubes = ['a_0000, 720, 1280, 0, 10, 0, 0, 100, 100', 'a_0000, 720, 1280, 20, 30, 0, 0, 100, 100',
+             'b_0000, 720, 1280, 0, 10, 0, 0, 100, 100']
+    for name in ['a_0000.mp4', 'a_0000.mp4.done', 'c_0000.mp4', 'c_0000.mp4.done']:
+        write_file(os.path.join(input_dir, name))
+    watcher = DirectoryWatcher(input_dir, done_marker='.done')
+    # b_0000은 도착하지 않으므로 idle_timeout이 지나면 끝난다 (tube가 없는 c_0000은 무시한다)
+    batches = list(iter_arrived_tubes(tubes, watcher, poll_interval=0.01, idle_timeout=0.05))
+    assert batches == [tubes[:2]]
+    assert '1 segments never arrived' in capsys.readouterr().out
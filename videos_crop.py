@@ -3,530 +3,184 @@
 # This script is licensed under the MIT License.
 
 import argparse
-import multiprocessing as mp
 import os
+import shutil
 from functools import partial
 from time import time as timer
 
-import ffmpeg
-from tqdm import tqdm
-
-
-parser = argparse.ArgumentParser()
-parser.add_argument('--input_dir', type=str, required=True,
-                    help='Dir containing youtube clips.')
-parser.add_argument('--clip_info_file', type=str, required=True,
-                    help='File containing clip information.')
-parser.add_argument('--output_dir', type=str, required=True,
-                    help='Location to dump outputs.')
-parser.add_argument('--num_workers', type=int, default=32,
-                    help='How many multiprocessing workers?')
-parser.add_argument('--min_crop_width', type=int, default=256,
-                    help='Minimum crop width in pixels. Only videos with crop width >= this value will be processed.')
-parser.add_argument('--min_crop_height', type=int, default=256,
-                    help='Minimum crop height in pixels. Only videos with crop height >= this value will be processed.')
-parser.add_argument('--min_duration', type=float, default=0.0,
-                    help='Minimum video duration in seconds. Only videos with duration >= this value will be processed. Default is 0.0 (no minimum).')
-
-
-def get_h_w(filepath):
-    probe = ffmpeg.probe(filepath)
-    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
-    height = int(video_stream['height'])
-    width = int(video_stream['width'])
-    return height, width
-
-
-def get_fps(filepath):
-    # 비디오 파일의 fps(초당 프레임 수)를 가져온다
-    # ffmpeg.probe()로 비디오 파일의 메타데이터를 읽어온다
-    probe = ffmpeg.probe(filepath)
-    # 비디오 스트림을 찾는다
-    # codec_type이 'video'인 스트림을 찾아서 video_stream에 저장한다
-    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
-    # fps를 계산한다
-    # r_frame_rate는 "30/1" 같은 문자열 형식으로 저장되어 있다
-    # 이를 분자와 분모로 나눠서 실제 fps 값을 계산한다
-    # 예) "30/1" → 30.0, "29.97/1" → 29.97
-    r_frame_rate = video_stream['r_frame_rate']
-    num, den = map(int, r_frame_rate.split('/'))
-    fps = num / den if den > 0 else 30.0  # 분모가 0이면 기본값 30.0 사용
-    return fps
-
-
-def get_video_codec(filepath):
-    # 비디오 파일의 코덱 정보를 가져온다
-    # ffmpeg.probe()로 비디오 파일의 메타데이터를 읽어온다
-    probe = ffmpeg.probe(filepath)
-    # 비디오 스트림을 찾는다
-    # codec_type이 'video'인 스트림을 찾아서 video_stream에 저장한다
-    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
-    # 비디오 코덱 이름을 가져온다
-    # codec_name은 'h264', 'hevc', 'vp9' 등의 코덱 이름을 반환한다
-    # 예) 'h264'는 H.264 코덱을 의미한다
-    codec_name = video_stream.get('codec_name', 'libx264')
-    return codec_name
-
-
-def get_video_bitrate(filepath):
-    # 비디오 파일의 비트레이트를 가져온다
-    # ffmpeg.probe()로 비디오 파일의 메타데이터를 읽어온다
-    probe = ffmpeg.probe(filepath)
-    # 비디오 스트림을 찾는다
-    # codec_type이 'video'인 스트림을 찾아서 video_stream에 저장한다
-    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
-    # 비디오 비트레이트를 가져온다
-    # bit_rate는 문자열 형식으로 저장되어 있으므로 정수로 변환한다
-    # 비트레이트가 없으면 None을 반환한다
-    # 예) '2423000' → 2423000 (2423 kbps)
-    bitrate = video_stream.get('bit_rate')
-    if bitrate:
-        return int(bitrate)
-    # 비트레이트 정보가 없으면 전체 비트레이트에서 오디오 비트레이트를 빼서 계산한다
-    # format의 bit_rate는 전체 비트레이트이다
-    total_bitrate = probe.get('format', {}).get('bit_rate')
-    if total_bitrate:
-        # 오디오 스트림을 찾는다
-        audio_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'audio'), None)
-        audio_bitrate = int(audio_stream.get('bit_rate', 0)) if audio_stream else 0
-        return int(total_bitrate) - audio_bitrate
-    # 비트레이트 정보가 전혀 없으면 None을 반환한다
-    return None
-
-
-def trim_and_crop(input_dir, output_dir, clip_params, min_duration=0.0):
-    # 예시 clip_params: '--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351'
-    # 각 항목의 의미를 설명하면 아래와 같다:
-    #   video_name: '--Y9imYnfBw_0000'
-    #   H: 720          # 원본 영상의 height (세로 픽셀 수)
-    #   W: 1280         # 원본 영상의 width (가로 픽셀 수)
-    #   S: 0            # 시작 프레임 번호
-    #   E: 271          # 끝 프레임 번호
-    #   L: 504          # crop할 영역의 left 좌표 (픽셀, 원본 기준)
-    #   T: 63           # crop할 영역의 top 좌표 (픽셀, 원본 기준)
-    #   R: 792          # crop할 영역의 right 좌표 (픽셀, 원본 기준)
-    #   B: 351          # crop할 영역의 bottom 좌표 (픽셀, 원본 기준)
-    # min_duration: 최소 비디오 길이(초), 이 값 이상인 경우만 처리한다
-    
-    # clip_params 문자열(콤마로 구분된 값들)을 파싱해서 각각의 변수로 나눈다.
-    video_name, H, W, S, E, L, T, R, B = clip_params.strip().split(',')
-
-    # H, W, S, E, L, T, R, B를 문자열에서 정수(int)로 변환한다.
-    # 예) H=720, W=1280, S=0, E=271, L=504, T=63, R=792, B=351
-    H, W, S, E, L, T, R, B = int(H), int(W), int(S), int(E), int(L), int(T), int(R), int(B)
-    
-    # 출력 파일명을 지정한다.
-    # 예) '--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4'
-    output_filename = '{}_S{}_E{}_L{}_T{}_R{}_B{}.mp4'.format(video_name, S, E, L, T, R, B)
-    output_filepath = os.path.join(output_dir, output_filename)
-
-    # 만약 출력 파일이 이미 존재하면, 처리하지 않고 넘어간다(중복 방지).
-    if os.path.exists(output_filepath):
-        print('Output file %s exists, skipping' % (output_filepath))
-        return
-
-    # 입력 영상 파일 경로를 지정한다.
-    # 예) input_dir이 'small/1min_clips', video_name='--Y9imYnfBw_0000'이면
-    # 'small/1min_clips/--Y9imYnfBw_0000.mp4'가 input_filepath가 된다.
-    input_filepath = os.path.join(input_dir, video_name + '.mp4')
-
-    # 만약 입력 파일이 존재하지 않을 경우, 처리하지 않고 넘어간다.
-    if not os.path.exists(input_filepath):
-        print('Input file %s does not exist, skipping' % (input_filepath))
-        return
-
-    # 영상의 실제 height(h), width(w)를 ffmpeg.probe로 읽어온다.
-    # 실제 영상 크기가 crop 정보와 다를 수 있으니(리사이즈 등), crop 좌표 보정을 위해 필요함.
-    h, w = get_h_w(input_filepath)
-    # 예시: h=720, w=1280 (일치하거나 다를 수 있음)
-    # 비디오 파일의 fps(초당 프레임 수)를 가져온다
-    # 오디오를 동일한 시간 범위로 trim하기 위해 fps가 필요하다
-    # 예) fps=30이면 1초에 30프레임이다
-    fps = get_fps(input_filepath)
-    # 비디오 길이(초)를 계산한다
-    # duration = (E - S + 1) / fps는 비디오의 지속 시간(초)이다
-    # 예) S=0, E=271, fps=30이면 duration = (271-0+1)/30 = 272/30 = 9.07초
-    # min_duration보다 작으면 처리하지 않고 건너뛴다
-    duration = (E - S + 1) / fps
-    if min_duration > 0.0 and duration < min_duration:
-        # 비디오 길이가 min_duration보다 짧으면 건너뛴다
-        # print()를 사용하여 건너뛴다는 메시지를 출력한다
-        # %s는 문자열 포맷팅으로, video_name 값이 삽입된다
-        # %.2f는 소수점 둘째 자리까지 표시하는 포맷팅이다
-        print('Skipping %s: video duration (%.2f seconds) is shorter than %.2f seconds' % (video_name, duration, min_duration))
-        # 함수를 종료하고 다음 클립으로 넘어간다
-        return
-    # 원본 비디오의 코덱 정보를 가져온다
-    # get_video_codec() 함수는 ffmpeg.probe를 사용하여 비디오 파일의 코덱 이름을 가져온다
-    # 원본과 동일한 코덱을 사용하여 화질 손실을 최소화한다
-    # 예) 'h264', 'hevc', 'vp9' 등의 코덱 이름을 반환한다
-    original_codec = get_video_codec(input_filepath)
-    # 원본 비디오의 비트레이트를 가져온다
-    # get_video_bitrate() 함수는 ffmpeg.probe를 사용하여 비디오 파일의 비트레이트를 가져온다
-    # 원본과 동일한 비트레이트를 사용하여 화질 손실을 최소화한다
-    # 예) 2423000 (2423 kbps)
-    original_bitrate = get_video_bitrate(input_filepath)
-
-    # crop 좌표를 실제 프레임에 맞게 보정한다.
-    # 예) t = int(63 / 720 * 720) = 63
-    #     b = int(351 / 720 * 720) = 351
-    #     l = int(504 / 1280 * 1280) = 504
-    #     r = int(792 / 1280 * 1280) = 792
-    # (실제 h, w가 clip에서 온 H, W와 다르면 비례해서 변환)
-    t = int(T / H * h)   # top 좌표, 예: 63
-    b = int(B / H * h)   # bottom 좌표, 예: 351
-    l = int(L / W * w)   # left 좌표, 예: 504
-    r = int(R / W * w)   # right 좌표, 예: 792
-
-    # ffmpeg 입력 스트림 생성
-    # ffmpeg.input()은 비디오 파일을 입력 스트림으로 로드한다
-    # input_filepath에 지정된 비디오 파일을 읽어온다
-    input_stream = ffmpeg.input(input_filepath)
-    # 비디오와 오디오 스트림을 분리한다
-    # input_stream['v:0']은 첫 번째 비디오 스트림을 의미한다
-    # input_stream['a:0']은 첫 번째 오디오 스트림을 의미한다 (오디오가 없는 경우 None일 수 있음)
-    video = input_stream['v:0']
-    # 오디오 스트림이 있는지 확인한다
-    # try-except를 사용하여 오디오 스트림이 없을 경우를 처리한다
-    try:
-        audio = input_stream['a:0']
-        has_audio = True
-    except:
-        has_audio = False
-    
-    # 비디오 스트림에 특정 프레임 구간만 자르기(trim)
-    # ffmpeg.trim()의 start_frame/end_frame은 프레임 번호로 작동하지 않으므로 select 필터를 사용한다
-    # select 필터의 between(n,S,E)는 n번째 프레임이 S와 E 사이(포함)에 있으면 선택한다
-    # 예를 들어, S=1015, E=1107인 경우 1015~1107 프레임(총 93프레임)을 추출한다
-    # setpts=PTS-STARTPTS는 선택된 프레임들의 타임스탬프를 0부터 시작하도록 재설정한다
-    # stream = ffmpeg.trim(stream, start_frame=S, end_frame=E+1)  # 이 방법은 프레임 번호로 작동하지 않음
-    video = video.filter('select', f'between(n,{S},{E})').filter('setpts', 'PTS-STARTPTS')
-    # crop 적용 (좌상단 l,t, 너비 r-l, 높이 b-t로 자른다)
-    # 예) l=504, t=63, r-l=288, b-t=288
-    video = ffmpeg.crop(video, l, t, r-l, b-t)
-    
-    # 오디오 스트림도 동일한 시간 범위로 trim한다
-    # 프레임 번호를 시간(초)으로 변환한다
-    # start_time = S / fps는 시작 시간(초)이다
-    # 예) S=1015, fps=30이면 start_time = 1015/30 = 33.83초
-    # duration = (E - S + 1) / fps는 지속 시간(초)이다
-    # 예) S=1015, E=1107, fps=30이면 duration = (1107-1015+1)/30 = 93/30 = 3.1초
-    if has_audio:
-        start_time = S / fps
-        duration = (E - S + 1) / fps
-        # atrim 필터는 오디오를 특정 시간 범위로 자른다
-        # start=start_time은 시작 시간, duration=duration은 지속 시간이다
-        # asetpts=PTS-STARTPTS는 오디오 타임스탬프를 0부터 시작하도록 재설정한다
-        audio = audio.filter('atrim', start=start_time, duration=duration).filter('asetpts', 'PTS-STARTPTS')
-    
-    # 출력 파일로 저장할 스트림 설정
-    # ffmpeg.output()은 처리된 스트림을 파일로 출력하도록 설정한다
-    # output_filepath에 지정된 경로에 비디오 파일이 저장된다
-    # 오디오가 있으면 비디오와 오디오를 모두 포함하고, 없으면 비디오만 포함한다
-    # 원본 코덱을 사용하고 원본 비트레이트를 사용하여 화질 손실을 최소화한다
-    # vcodec은 비디오 코덱을 지정한다
-    # 원본 코덱이 'h264'인 경우 'libopenh264'를 사용한다 (libx264는 GPL 라이선스로 인해 사용 불가)
-    # 'hevc' 또는 'h265'인 경우 원본 코덱 그대로 사용한다 (libx265 인코더가 없을 수 있음)
-    # 'av1', 'vp9', 'vp8' 등 느린 코덱은 'libopenh264'로 변환한다 (인코딩 속도 향상, 화질은 원본 비트레이트 유지로 손실 최소화)
-    # 그 외는 원본 코덱 그대로 사용한다
-    if original_codec == 'h264':
-        # libopenh264는 CRF를 지원하지 않으므로 비트레이트를 사용한다
-        output_codec = 'libopenh264'
-    elif original_codec in ['hevc', 'h265']:
-        # HEVC는 libx265가 없을 수 있으므로 원본 코덱 그대로 사용한다
-        # 만약 인코딩이 실패하면 원본 코덱을 사용하는 것이 안전하다
-        output_codec = original_codec
-    elif original_codec in ['av1', 'vp9', 'vp8']:
-        # AV1, VP9, VP8은 인코딩이 매우 느리므로 H.264로 변환한다
-        # libopenh264는 사용 가능한 인코더이므로 이를 사용한다
-        # 원본 비트레이트를 유지하면 화질 손실을 최소화할 수 있다
-        output_codec = 'libopenh264'
-    else:
-        output_codec = original_codec
-    # ffmpeg.output()에 vcodec과 비트레이트 또는 CRF 파라미터를 추가하여 고화질로 인코딩한다
-    # vcodec=output_codec는 비디오 코덱을 지정한다
-    # 원본 비트레이트가 있으면 비트레이트를 사용하고, 없으면 CRF를 사용한다
-    # libopenh264는 CRF를 지원하지 않으므로 비트레이트를 사용해야 한다
-    # 비트레이트를 사용하면 원본과 동일한 화질을 유지할 수 있다
-    output_kwargs = {'vcodec': output_codec}
-    if original_bitrate:
-        # 비트레이트를 사용하여 원본과 동일한 화질을 유지한다
-        # b=original_bitrate는 비디오 비트레이트를 지정한다
-        output_kwargs['b:v'] = str(original_bitrate)
-    elif output_codec != 'libopenh264':
-        # CRF를 지원하는 코덱인 경우 CRF를 사용한다
-        # crf=18은 거의 무손실에 가까운 화질을 제공한다 (0이 완전 무손실, 23이 기본값, 51이 최저 화질)
-        output_kwargs['crf'] = 18
-    if has_audio:
-        # stream = ffmpeg.output(video, audio, output_filepath)  # 기존 코드: 화질 설정 없음
-        stream = ffmpeg.output(video, audio, output_filepath, **output_kwargs)
-    else:
-        # stream = ffmpeg.output(video, output_filepath)  # 기존 코드: 화질 설정 없음
-        stream = ffmpeg.output(video, output_filepath, **output_kwargs)
-    # 실제로 ffmpeg를 실행해 clip을 생성한다.
-    # ffmpeg.run()은 설정된 ffmpeg 파이프라인을 실행하여 비디오 처리를 수행한다
-    # 비디오가 성공적으로 생성되면 output_filepath에 파일이 저장된다
-    ffmpeg.run(stream)
-
-
-def trim_and_crop_min_size(input_dir, output_dir, clip_params, min_crop_width=512, min_crop_height=512, min_duration=0.0):
-    # trim_and_crop_min_size: 프레임 크기가 min_crop_width x min_crop_height 이상인 경우만 처리하는 함수
-    # 입력 인자는 trim_and_crop과 동일하다
-    # input_dir: 입력 비디오가 있는 디렉토리 경로
-    # output_dir: 출력 비디오를 저장할 디렉토리 경로
-    # clip_params: 비디오 클립 정보가 담긴 문자열 (콤마로 구분)
-    # min_crop_width: 최소 crop 너비(픽셀), 이 값 이상인 경우만 처리한다
-    # min_crop_height: 최소 crop 높이(픽셀), 이 값 이상인 경우만 처리한다
-    # min_duration: 최소 비디오 길이(초), 이 값 이상인 경우만 처리한다
-    
-    # 예시 clip_params: '--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351'
-    # 각 항목의 의미는 trim_and_crop 함수와 동일하다
-    #   video_name: '--Y9imYnfBw_0000'
-    #   H: 720          # 원본 영상의 height (세로 픽셀 수)
-    #   W: 1280         # 원본 영상의 width (가로 픽셀 수)
-    #   S: 0            # 시작 프레임 번호
-    #   E: 271          # 끝 프레임 번호
-    #   L: 504          # crop할 영역의 left 좌표 (픽셀, 원본 기준)
-    #   T: 63           # crop할 영역의 top 좌표 (픽셀, 원본 기준)
-    #   R: 792          # crop할 영역의 right 좌표 (픽셀, 원본 기준)
-    #   B: 351          # crop할 영역의 bottom 좌표 (픽셀, 원본 기준)
-    
-    # clip_params 문자열(콤마로 구분된 값들)을 파싱해서 각각의 변수로 나눈다
-    # strip()은 앞뒤 공백을 제거하고, split(',')은 콤마를 기준으로 문자열을 분리한다
-    # 예) '--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351' → 
-    #     ['--Y9imYnfBw_0000', ' 720', ' 1280', ' 0', ' 271', ' 504', ' 63', ' 792', ' 351']
-    video_name, H, W, S, E, L, T, R, B = clip_params.strip().split(',')
-
-    # H, W, S, E, L, T, R, B를 문자열에서 정수(int)로 변환한다
-    # 각 변수는 앞뒤 공백이 있을 수 있으므로 int() 변환 시 자동으로 처리된다
-    # 예) H=720, W=1280, S=0, E=271, L=504, T=63, R=792, B=351
-    H, W, S, E, L, T, R, B = int(H), int(W), int(S), int(E), int(L), int(T), int(R), int(B)
-    
-    # 출력 파일명을 지정한다
-    # format() 메서드를 사용하여 파일명에 각 파라미터 값을 삽입한다
-    # 예) '--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4'
-    output_filename = '{}_S{}_E{}_L{}_T{}_R{}_B{}.mp4'.format(video_name, S, E, L, T, R, B)
-    # os.path.join()을 사용하여 출력 디렉토리와 파일명을 결합한다
-    # 예) output_dir='small/cropped_clips', output_filename='--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4'
-    #     → 'small/cropped_clips/--Y9imYnfBw_0000_S0_E271_L504_T63_R792_B351.mp4'
-    output_filepath = os.path.join(output_dir, output_filename)
-
-    # 만약 출력 파일이 이미 존재하면, 처리하지 않고 넘어간다(중복 방지)
-    # os.path.exists()는 파일이나 디렉토리가 존재하는지 확인한다
-    # 이미 처리된 파일은 다시 처리하지 않아 시간을 절약한다
-    if os.path.exists(output_filepath):
-        # 출력 파일이 존재한다는 메시지를 출력한다
-        # %s는 문자열 포맷팅으로, output_filepath 값이 삽입된다
-        print('Output file %s exists, skipping' % (output_filepath))
-        # 함수를 종료하고 다음 클립으로 넘어간다
-        return
-
-    # 입력 영상 파일 경로를 지정한다
-    # os.path.join()을 사용하여 입력 디렉토리와 비디오 파일명을 결합한다
-    # video_name에 '.mp4' 확장자를 추가한다
-    # 예) input_dir이 'small/1min_clips', video_name='--Y9imYnfBw_0000'이면
-    #     'small/1min_clips/--Y9imYnfBw_0000.mp4'가 input_filepath가 된다
-    input_filepath = os.path.join(input_dir, video_name + '.mp4')
-
-    # 만약 입력 파일이 존재하지 않을 경우, 처리하지 않고 넘어간다
-    # not os.path.exists()는 파일이 존재하지 않으면 True를 반환한다
-    # 파일이 없으면 처리할 수 없으므로 건너뛴다
-    if not os.path.exists(input_filepath):
-        # 입력 파일이 존재하지 않는다는 메시지를 출력한다
-        # %s는 문자열 포맷팅으로, input_filepath 값이 삽입된다
-        print('Input file %s does not exist, skipping' % (input_filepath))
-        # 함수를 종료하고 다음 클립으로 넘어간다
-        return
-
-    # 영상의 실제 height(h), width(w)를 ffmpeg.probe로 읽어온다
-    # get_h_w() 함수는 ffmpeg.probe를 사용하여 비디오 파일의 실제 해상도를 가져온다
-    # 실제 영상 크기가 crop 정보와 다를 수 있으니(리사이즈 등), crop 좌표 보정을 위해 필요함
-    # 예시: h=720, w=1280 (일치하거나 다를 수 있음)
-    h, w = get_h_w(input_filepath)
-    # 비디오 파일의 fps(초당 프레임 수)를 가져온다
-    # 오디오를 동일한 시간 범위로 trim하기 위해 fps가 필요하다
-    # 예) fps=30이면 1초에 30프레임이다
-    fps = get_fps(input_filepath)
-    # 비디오 길이(초)를 계산한다
-    # duration = (E - S + 1) / fps는 비디오의 지속 시간(초)이다
-    # 예) S=0, E=271, fps=30이면 duration = (271-0+1)/30 = 272/30 = 9.07초
-    # min_duration보다 작으면 처리하지 않고 건너뛴다
-    duration = (E - S + 1) / fps
-    if min_duration > 0.0 and duration < min_duration:
-        # 비디오 길이가 min_duration보다 짧으면 건너뛴다
-        # print()를 사용하여 건너뛴다는 메시지를 출력한다
-        # %s는 문자열 포맷팅으로, video_name 값이 삽입된다
-        # %.2f는 소수점 둘째 자리까지 표시하는 포맷팅이다
-        print('Skipping %s: video duration (%.2f seconds) is shorter than %.2f seconds' % (video_name, duration, min_duration))
-        # 함수를 종료하고 다음 클립으로 넘어간다
-        return
-    # 원본 비디오의 코덱 정보를 가져온다
-    # get_video_codec() 함수는 ffmpeg.probe를 사용하여 비디오 파일의 코덱 이름을 가져온다
-    # 원본과 동일한 코덱을 사용하여 화질 손실을 최소화한다
-    # 예) 'h264', 'hevc', 'vp9' 등의 코덱 이름을 반환한다
-    original_codec = get_video_codec(input_filepath)
-    # 원본 비디오의 비트레이트를 가져온다
-    # get_video_bitrate() 함수는 ffmpeg.probe를 사용하여 비디오 파일의 비트레이트를 가져온다
-    # 원본과 동일한 비트레이트를 사용하여 화질 손실을 최소화한다
-    # 예) 2423000 (2423 kbps)
-    original_bitrate = get_video_bitrate(input_filepath)
-
-    # crop 좌표를 실제 프레임에 맞게 보정한다
-    # 원본 영상 크기(H, W)와 실제 영상 크기(h, w)가 다를 수 있으므로 비례 계산을 수행한다
-    # 예) T=63, H=720, h=720이면 t = int(63 / 720 * 720) = 63
-    #     B=351, H=720, h=720이면 b = int(351 / 720 * 720) = 351
-    #     L=504, W=1280, w=1280이면 l = int(504 / 1280 * 1280) = 504
-    #     R=792, W=1280, w=1280이면 r = int(792 / 1280 * 1280) = 792
-    # (실제 h, w가 clip에서 온 H, W와 다르면 비례해서 변환)
-    t = int(T / H * h)   # top 좌표를 실제 영상 크기에 맞게 보정, 예: 63
-    b = int(B / H * h)   # bottom 좌표를 실제 영상 크기에 맞게 보정, 예: 351
-    l = int(L / W * w)   # left 좌표를 실제 영상 크기에 맞게 보정, 예: 504
-    r = int(R / W * w)   # right 좌표를 실제 영상 크기에 맞게 보정, 예: 792
-
-    # crop된 영역의 너비와 높이를 계산한다
-    # r-l은 crop된 영역의 가로 너비(픽셀)이다
-    # 예) r=792, l=504이면 r-l=288 (가로 288픽셀)
-    crop_width = r - l
-    # b-t는 crop된 영역의 세로 높이(픽셀)이다
-    # 예) b=351, t=63이면 b-t=288 (세로 288픽셀)
-    crop_height = b - t
-
-    # crop된 영역의 크기가 min_crop_width x min_crop_height 이상인지 확인한다
-    # crop_width >= min_crop_width는 가로 너비가 min_crop_width픽셀 이상인지 확인한다
-    # crop_height >= min_crop_height는 세로 높이가 min_crop_height픽셀 이상인지 확인한다
-    # 두 조건을 모두 만족해야만 처리한다 (and 연산자 사용)
-    # 예) crop_width=288, crop_height=288, min_crop_width=512, min_crop_height=512이면 288 >= 512는 False이므로 건너뛴다
-    #     crop_width=600, crop_height=600, min_crop_width=512, min_crop_height=512이면 600 >= 512는 True이므로 처리한다
-    if crop_width >= min_crop_width and crop_height >= min_crop_height:
-        # ffmpeg 입력 스트림 생성
-        # ffmpeg.input()은 비디오 파일을 입력 스트림으로 로드한다
-        # input_filepath에 지정된 비디오 파일을 읽어온다
-        input_stream = ffmpeg.input(input_filepath)
-        # 비디오와 오디오 스트림을 분리한다
-        # input_stream['v:0']은 첫 번째 비디오 스트림을 의미한다
-        # input_stream['a:0']은 첫 번째 오디오 스트림을 의미한다 (오디오가 없는 경우 None일 수 있음)
-        video = input_stream['v:0']
-        # 오디오 스트림이 있는지 확인한다
-        # try-except를 사용하여 오디오 스트림이 없을 경우를 처리한다
-        try:
-            audio = input_stream['a:0']
-            has_audio = True
-        except:
-            has_audio = False
-        
-        # 비디오 스트림에 특정 프레임 구간만 자르기(trim)
-        # ffmpeg.trim()의 start_frame/end_frame은 프레임 번호로 작동하지 않으므로 select 필터를 사용한다
-        # select 필터의 between(n,S,E)는 n번째 프레임이 S와 E 사이(포함)에 있으면 선택한다
-        # 예를 들어, S=1015, E=1107인 경우 1015~1107 프레임(총 93프레임)을 추출한다
-        # setpts=PTS-STARTPTS는 선택된 프레임들의 타임스탬프를 0부터 시작하도록 재설정한다
-        # stream = ffmpeg.trim(stream, start_frame=S, end_frame=E+1)  # 이 방법은 프레임 번호로 작동하지 않음
-        video = video.filter('select', f'between(n,{S},{E})').filter('setpts', 'PTS-STARTPTS')
-        # crop 적용 (좌상단 l,t, 너비 crop_width, 높이 crop_height로 자른다)
-        # ffmpeg.crop()은 비디오에서 특정 영역만 잘라낸다
-        # 첫 번째 인자 l은 왼쪽 시작 좌표, 두 번째 인자 t는 위쪽 시작 좌표이다
-        # 세 번째 인자 crop_width는 잘라낼 가로 너비, 네 번째 인자 crop_height는 잘라낼 세로 높이이다
-        # 예) l=504, t=63, crop_width=288, crop_height=288이면
-        #     (504, 63) 위치에서 288x288 크기의 영역을 잘라낸다
-        video = ffmpeg.crop(video, l, t, crop_width, crop_height)
-        
-        # 오디오 스트림도 동일한 시간 범위로 trim한다
-        # 프레임 번호를 시간(초)으로 변환한다
-        # start_time = S / fps는 시작 시간(초)이다
-        # 예) S=1015, fps=30이면 start_time = 1015/30 = 33.83초
-        # duration = (E - S + 1) / fps는 지속 시간(초)이다
-        # 예) S=1015, E=1107, fps=30이면 duration = (1107-1015+1)/30 = 93/30 = 3.1초
-        if has_audio:
-            start_time = S / fps
-            duration = (E - S + 1) / fps
-            # atrim 필터는 오디오를 특정 시간 범위로 자른다
-            # start=start_time은 시작 시간, duration=duration은 지속 시간이다
-            # asetpts=PTS-STARTPTS는 오디오 타임스탬프를 0부터 시작하도록 재설정한다
-            audio = audio.filter('atrim', start=start_time, duration=duration).filter('asetpts', 'PTS-STARTPTS')
-        
-        # 출력 파일로 저장할 스트림 설정
-        # ffmpeg.output()은 처리된 스트림을 파일로 출력하도록 설정한다
-        # output_filepath에 지정된 경로에 비디오 파일이 저장된다
-        # 오디오가 있으면 비디오와 오디오를 모두 포함하고, 없으면 비디오만 포함한다
-        # 원본 코덱을 사용하고 원본 비트레이트를 사용하여 화질 손실을 최소화한다
-        # vcodec은 비디오 코덱을 지정한다
-        # 원본 코덱이 'h264'인 경우 'libopenh264'를 사용한다 (libx264는 GPL 라이선스로 인해 사용 불가)
-        # 'hevc' 또는 'h265'인 경우 원본 코덱 그대로 사용한다 (libx265 인코더가 없을 수 있음)
-        # 'av1', 'vp9', 'vp8' 등 느린 코덱은 'libopenh264'로 변환한다 (인코딩 속도 향상, 화질은 원본 비트레이트 유지로 손실 최소화)
-        # 그 외는 원본 코덱 그대로 사용한다
-        if original_codec == 'h264':
-            # libopenh264는 CRF를 지원하지 않으므로 비트레이트를 사용한다
-            output_codec = 'libopenh264'
-        elif original_codec in ['hevc', 'h265']:
-            # HEVC는 libx265가 없을 수 있으므로 원본 코덱 그대로 사용한다
-            # 만약 인코딩이 실패하면 원본 코덱을 사용하는 것이 안전하다
-            output_codec = original_codec
-        elif original_codec in ['av1', 'vp9', 'vp8']:
-            # AV1, VP9, VP8은 인코딩이 매우 느리므로 H.264로 변환한다
-            # libopenh264는 사용 가능한 인코더이므로 이를 사용한다
-            # 원본 비트레이트를 유지하면 화질 손실을 최소화할 수 있다
-            output_codec = 'libopenh264'
-        else:
-            output_codec = original_codec
-        # ffmpeg.output()에 vcodec과 비트레이트 또는 CRF 파라미터를 추가하여 고화질로 인코딩한다
-        # vcodec=output_codec는 비디오 코덱을 지정한다
-        # 원본 비트레이트가 있으면 비트레이트를 사용하고, 없으면 CRF를 사용한다
-        # libopenh264는 CRF를 지원하지 않으므로 비트레이트를 사용해야 한다
-        # 비트레이트를 사용하면 원본과 동일한 화질을 유지할 수 있다
-        output_kwargs = {'vcodec': output_codec}
-        if original_bitrate:
-            # 비트레이트를 사용하여 원본과 동일한 화질을 유지한다
-            # b=original_bitrate는 비디오 비트레이트를 지정한다
-            output_kwargs['b:v'] = str(original_bitrate)
-        elif output_codec != 'libopenh264':
-            # CRF를 지원하는 코덱인 경우 CRF를 사용한다
-            # crf=18은 거의 무손실에 가까운 화질을 제공한다 (0이 완전 무손실, 23이 기본값, 51이 최저 화질)
-            output_kwargs['crf'] = 18
-        if has_audio:
-            # stream = ffmpeg.output(video, audio, output_filepath)  # 기존 코드: 화질 설정 없음
-            stream = ffmpeg.output(video, audio, output_filepath, **output_kwargs)
-        else:
-            # stream = ffmpeg.output(video, output_filepath)  # 기존 코드: 화질 설정 없음
-            stream = ffmpeg.output(video, output_filepath, **output_kwargs)
-        # 실제로 ffmpeg를 실행해 clip을 생성한다
-        # ffmpeg.run()은 설정된 ffmpeg 파이프라인을 실행하여 비디오 처리를 수행한다
-        # 비디오가 성공적으로 생성되면 output_filepath에 파일이 저장된다
-        ffmpeg.run(stream)
-    else:
-        # crop된 영역의 크기가 min_crop_width x min_crop_height 미만인 경우 건너뛴다
-        # print()를 사용하여 건너뛴다는 메시지를 출력한다
-        # %s는 문자열 포맷팅으로, video_name 값이 삽입된다
-        # crop_width와 crop_height 값도 함께 출력하여 디버깅에 도움이 되도록 한다
-        print('Skipping %s: crop size (%dx%d) is smaller than %dx%d' % (video_name, crop_width, crop_height, min_crop_width, min_crop_height))
-        # 함수를 종료하고 다음 클립으로 넘어간다
-        return
+from talkinghead.rate_control import DEFAULT_MIN_BITRATE, RATE_CONTROL_POLICIES
+from talkinghead.clip_output import RETRY_FILENAME, Manifest, ShardWriter, append_retry_tube, store_clip, sweep_temp_files
+from talkinghead.ffmpeg_runner import FrameProgress
+from talkinghead.admission import AdmissionController
+from talkinghead.scheduler import SCHEDULE_MODES, CropScheduler, get_median_resolution
+# 크롭 작업은 talkinghead 패키지에 있고, 이 스크립트는 명령줄 인자를 읽어서 풀을 실행하기만 한다
+from talkinghead.audio import extract_audio_group, extract_audio_group_async
+from talkinghead.crop import run_crop_pool, run_plan_row, trim_and_crop_min_size
+from talkinghead.plan import (build_plan, get_clip_params, get_output_filepaths, get_rows_outside_dir, get_tube_frames,
+                              get_tube_key, parse_output_size, read_plan, summarize_plan, write_plan)
+from talkinghead.probe import ProbeCache
+from talkinghead.watch import DEFAULT_POLL_INTERVAL, DEFAULT_STABLE_SECONDS, DirectoryWatcher, iter_arrived_tubes
+
+
+def build_parser():
+    # 명령줄 인자 parser를 만드는 함수
+    # 모듈을 import할 때(spawn 방식의 풀 워커, 벤치마크 등)는 parser를 만들지 않도록 함수 안에서 만든다
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input_dir', type=str, default=None,
+                        help='Dir containing youtube clips. Required unless --plan_in is given (plan rows carry their input paths).')
+    parser.add_argument('--clip_info_file', type=str, default=None,
+                        help='File containing clip information. Required unless --plan_in is given.')
+    parser.add_argument('--output_dir', type=str, required=True,
+                        help='Location to dump outputs.')
+    parser.add_argument('--num_workers', type=int, default=32,
+                        help='How many multiprocessing workers?')
+    parser.add_argument('--min_crop_width', type=int, default=256,
+                        help='Minimum crop width in pixels. Only videos with crop width >= this value will be processed.')
+    parser.add_argument('--min_crop_height', type=int, default=256,
+                        help='Minimum crop height in pixels. Only videos with crop height >= this value will be processed.')
+    parser.add_argument('--min_duration', type=float, default=0.0,
+                        help='Minimum video duration in seconds. Only videos with duration >= this value will be processed. Default is 0.0 (no minimum).')
+    parser.add_argument('--output_format', type=str, default='files', choices=['files', 'tar'],
+                        help='files: write each clip as its own mp4 in output_dir. tar: pack clips with a sidecar JSON into size-bounded tar shards (WebDataset layout) plus a shard index.')
+    parser.add_argument('--max_shard_size_mb', type=int, default=1024,
+                        help='Maximum size of each tar shard in MB when --output_format tar. Default: 1024')
+    parser.add_argument('--output_layout', type=str, default='flat', choices=['flat', 'hashed'],
+                        help='flat: all clips directly in output_dir. hashed: two-level fan-out directories (e.g. output_dir/3f/a9/) derived from the clip name hash.')
+    parser.add_argument('--manifest', type=str, default='off', choices=['on', 'off'],
+                        help='Whether to record finished clips in output_dir/manifest.jsonl and use it (instead of stat calls) to skip already processed tubes. Default: off')
+    parser.add_argument('--rate_control', type=str, default='source', choices=RATE_CONTROL_POLICIES,
+                        help='source: reuse the full-frame source bitrate. area: scale the source bitrate by crop area / frame area. quality: per-codec CRF/QP target. Default: source')
+    parser.add_argument('--quality', type=int, default=None,
+                        help='CRF/QP value for --rate_control quality. Default: per-codec value in rate_control.DEFAULT_QUALITY')
+    parser.add_argument('--min_bitrate', type=int, default=DEFAULT_MIN_BITRATE,
+                        help='Lower bound in bps for --rate_control area. Default: %d' % DEFAULT_MIN_BITRATE)
+    parser.add_argument('--vcodec', type=str, default=None,
+                        help='Force the output video encoder (e.g. libopenh264, libx264). Default: chosen from the source codec.')
+    parser.add_argument('--preset', type=str, default=None,
+                        help='Encoder preset passed to ffmpeg (e.g. ultrafast, veryfast, medium for libx264). Default: encoder default.')
+    parser.add_argument('--tube_timeout', type=float, default=120.0,
+                        help='Base wall-clock budget in seconds for one tube (probe + encode). ffprobe/ffmpeg is killed when the budget runs out and the tube is recorded as timed out. 0 disables. Default: 120')
+    parser.add_argument('--tube_timeout_per_frame', type=float, default=0.5,
+                        help='Extra budget in seconds per tube frame, added to --tube_timeout. Default: 0.5')
+    parser.add_argument('--retry_file', type=str, default=None,
+                        help='Append tubes that failed or timed out to this file, in the same format as --clip_info_file, so it can be fed back in directly. Default: output_dir/retry_tubes.txt')
+    parser.add_argument('--max_tasks_per_child', type=int, default=100,
+                        help='Recycle each pool worker after this many tubes (0: never). Default: 100')
+    parser.add_argument('--schedule', type=str, default='fixed', choices=SCHEDULE_MODES,
+                        help='fixed: use --num_workers and --ffmpeg_threads as given. heuristic: pick ffmpeg threads from the median source resolution and fill the available CPUs with workers. auto: time each workers x threads candidate on the first tubes and keep the fastest. Default: fixed')
+    parser.add_argument('--ffmpeg_threads', type=int, default=0,
+                        help='Decoder/encoder/filter threads per ffmpeg process with --schedule fixed (0: ffmpeg default). Default: 0')
+    parser.add_argument('--executor', type=str, default='process', choices=['process', 'async'],
+                        help='process: one Python pool worker per concurrent tube, each blocking on its ffmpeg. async: run ffprobe/ffmpeg directly from one asyncio event loop in the main process, --num_workers at a time (no per-worker interpreter). Default: process')
+    parser.add_argument('--affinity', type=str, default='off', choices=['on', 'off'],
+                        help='Whether to hand all tubes of the same 1-min segment to one worker back-to-back (in start frame order) and prefetch the next segment with posix_fadvise(WILLNEED) while the current one encodes. Helps page-cache locality on spinning disks and NFS. Default: off')
+    parser.add_argument('--admission', type=str, default='off', choices=['on', 'off'],
+                        help='Whether to start a tube only while memory (MemAvailable vs. expected ffmpeg RSS by source resolution) and CPU (1-min load average) headroom exists, largest tubes (H x W x frames) first. The pool size stays the upper bound. Default: off')
+    parser.add_argument('--memory_reserve_mb', type=int, default=1024,
+                        help='Memory in MB to always leave free with --admission on. Default: 1024')
+    parser.add_argument('--max_load', type=float, default=0,
+                        help='Do not start new tubes while the 1-min load average is at or above this with --admission on (0: number of available CPUs). Default: 0')
+    parser.add_argument('--chunk_frames', type=int, default=0,
+                        help='Write each tube as consecutive clips of this many frames instead of one clip, from the same decode pass. Each chunk starts on a keyframe (-g is set to the chunk length) and is recorded in the manifest with its position in the tube (0: one clip per tube). Default: 0')
+    parser.add_argument('--chunk_overlap', type=int, default=0,
+                        help='Frames shared by consecutive chunks with --chunk_frames. Default: 0')
+    parser.add_argument('--output_size', type=str, default=None,
+                        help='Resize every cropped clip to this size in the same ffmpeg filter graph, as N for an N x N square or WxH (e.g. 256 or 512x512). Default: keep the crop size')
+    parser.add_argument('--output_fps', type=float, default=0,
+                        help='Resample every cropped clip to this frame rate in the same filter graph; the audio is trimmed to the resampled video length and --chunk_frames still counts source frames (0: keep the source frame rate). Default: 0')
+    parser.add_argument('--scaler', type=str, default='bicubic',
+                        choices=['fast_bilinear', 'bilinear', 'bicubic', 'neighbor', 'area', 'lanczos', 'spline'],
+                        help='Scaling algorithm used for --output_size. Default: bicubic')
+    parser.add_argument('--quality_stats', type=str, default='off', choices=['on', 'off'],
+                        help='Also run signalstats and blurdetect on the cropped frames in the same ffmpeg filter graph and record per-clip brightness, contrast, saturation, blur and motion summaries in the manifest (and tar sidecar JSON), so blurry, dark or static clips can be filtered without decoding them again. Default: off')
+    parser.add_argument('--audio_only', type=str, default='off', choices=['off', 'wav', 'flac'],
+                        help='Write only the audio of each tube (a:0 trimmed to the tube span) as wav or flac instead of a cropped mp4. All tubes of a segment are cut in one ffmpeg run that never decodes video. Not supported with --output_format tar, --chunk_frames or plan files. Default: off')
+    parser.add_argument('--sample_rate', type=int, default=16000,
+                        help='Output sample rate in Hz with --audio_only. Default: 16000')
+    parser.add_argument('--audio_channels', type=int, default=1,
+                        help='Output channel count with --audio_only (0: keep the source layout). Default: 1')
+    parser.add_argument('--watch', type=str, default='off', choices=['on', 'off'],
+                        help='Keep polling --input_dir and queue the tubes of each segment as soon as the segment file is complete (see --done_marker and --stable_seconds) onto one long-lived pool, instead of requiring every segment up front. Exits once every segment in --clip_info_file has arrived or after --idle_timeout. Not supported with plan files, --schedule auto or --admission on. Default: off')
+    parser.add_argument('--poll_interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='Seconds between directory scans with --watch on. Default: %.0f' % (DEFAULT_POLL_INTERVAL))
+    parser.add_argument('--stable_seconds', type=float, default=DEFAULT_STABLE_SECONDS,
+                        help='Without --done_marker, treat a segment as complete once its size and mtime have not changed for this many seconds. Default: %.0f' % (DEFAULT_STABLE_SECONDS))
+    parser.add_argument('--done_marker', type=str, default='',
+                        help='With --watch on, treat a segment as complete once a file named <segment><suffix> exists (e.g. .done, as written by videos_split.py --done_marker .done). Default: none (use --stable_seconds)')
+    parser.add_argument('--idle_timeout', type=float, default=0,
+                        help='With --watch on, stop waiting after this many seconds without a new segment and finish the queued tubes (0: wait until every segment has arrived). Default: 0')
+    parser.add_argument('--plan_out', type=str, default=None,
+                        help='Probe every segment once, resolve each tube (size/duration filters, crop box, codec and bitrate) and write the result to this JSONL plan file, then exit without encoding.')
+    parser.add_argument('--plan_in', type=str, default=None,
+                        help='Execute a plan file written by --plan_out instead of reading --clip_info_file. Workers only run ffmpeg; rows already skipped or failed while planning are reported as is.')
+    parser.add_argument('--probe_cache', type=str, default=None,
+                        help='JSONL file caching ffprobe results per segment file name, reused across --plan_out runs. Default: no cache')
+    parser.add_argument('--probe_workers', type=int, default=8,
+                        help='How many ffprobe processes to run at once with --plan_out. Default: 8')
+    return parser
+
+
+def print_plan_summary(summary):
+    # summarize_plan()의 결과를 출력하는 함수
+    print('Plan: %d tubes, %d planned over %d segments (%d frames to encode, %d frames to decode)' % (
+        summary['tubes'], summary['planned'], summary['segments'], summary['encode_frames'], summary['decode_frames']))
+    print('Skipped: %s' % (', '.join('%s: %d' % (reason, count) for reason, count in sorted(summary['skipped'].items())) or 'none'))
+    print('Probe failed: %d, probe timed out: %d' % (summary['failed'], summary['timeouts']))
 
 
 if __name__ == '__main__':
     # 명령줄 인자를 파싱한다
-    # parser.parse_args()는 명령줄에서 전달된 인자를 파싱하여 args 객체를 반환한다
+    # build_parser().parse_args()는 명령줄에서 전달된 인자를 파싱하여 args 객체를 반환한다
     # 이 코드는 스크립트가 직접 실행될 때만 실행되고, 다른 모듈에서 import할 때는 실행되지 않는다
+    parser = build_parser()
     args = parser.parse_args()
+    if args.plan_in is None and (args.clip_info_file is None or args.input_dir is None):
+        parser.error('--clip_info_file and --input_dir are required unless --plan_in is given')
+    if args.chunk_frames and not 0 <= args.chunk_overlap < args.chunk_frames:
+        parser.error('--chunk_overlap must be smaller than --chunk_frames')
+    if args.output_fps < 0:
+        parser.error('--output_fps must not be negative')
+    try:
+        parse_output_size(args.output_size)
+    except ValueError:
+        parser.error('--output_size must be N or WxH with positive integers')
+    if args.audio_only != 'off' and (args.output_format == 'tar' or args.chunk_frames or args.plan_in or args.plan_out
+                                     or args.quality_stats == 'on'):
+        parser.error('--audio_only does not support --output_format tar, --chunk_frames, --quality_stats, --plan_in or --plan_out')
+    if args.watch == 'on' and (args.plan_in or args.plan_out or args.schedule == 'auto' or args.admission == 'on'):
+        parser.error('--watch does not support --plan_in, --plan_out, --schedule auto or --admission on')
     
     # Read list of videos.
     # clip_info는 비디오 클립 정보를 저장할 리스트이다
     # 빈 리스트로 초기화한다
     clip_info = []
+    # --plan_in이면 클립 정보 파일 대신 plan 파일의 row를 읽는다 (아래에서 tube 정보 문자열 대신 row를 처리한다)
+    plan_rows = read_plan(args.plan_in) if args.plan_in else None
+    if plan_rows is not None:
+        # plan row의 출력 경로는 --plan_out을 실행할 때 정해지므로 --output_dir(tar 출력이면 staging) 아래에 있어야 한다
+        # 다르면 --output_dir이 무시되고 manifest의 클립 경로가 '../'로 시작하게 된다
+        plan_output_dir = os.path.join(args.output_dir, 'staging') if args.output_format == 'tar' else args.output_dir
+        outside = get_rows_outside_dir(plan_rows, plan_output_dir)
+        if outside:
+            parser.error('%d plan rows write outside %s (e.g. %s); re-run --plan_out with the same --output_dir and --output_format' % (
+                len(outside), plan_output_dir, get_output_filepaths(outside[0])[0]))
     # 클립 정보 파일을 읽어온다
     # open()은 파일을 열고, args.clip_info_file에 지정된 파일 경로를 사용한다
     # with 문을 사용하면 파일 읽기가 끝나면 자동으로 파일을 닫는다
     # 'r' 모드는 기본값이므로 생략 가능하다 (읽기 모드)
-    with open(args.clip_info_file) as fin:
-        # 파일의 각 줄을 순회한다
-        # for 루프는 파일의 각 줄을 한 번에 하나씩 읽어온다
-        for line in fin:
-            # 각 줄의 앞뒤 공백을 제거하고 clip_info 리스트에 추가한다
-            # strip()은 줄바꿈 문자(\n)와 앞뒤 공백을 제거한다
-            # append()는 리스트의 끝에 새로운 요소를 추가한다
-            # 예) 파일에 '--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351'이 있으면
-            #     이 문자열이 공백 제거 후 clip_info 리스트에 추가된다
-            # 실제 비디오 파일 크기는 다를 수 있으므로(리사이즈 등), 여기서는 모든 줄을 읽고
-            # 나중에 trim_and_crop_min_size 함수에서 실제 파일 크기를 확인한 후 필터링한다
-            clip_info.append(line.strip())
+    if plan_rows is None:
+        with open(args.clip_info_file) as fin:
+            # 파일의 각 줄을 순회한다
+            # for 루프는 파일의 각 줄을 한 번에 하나씩 읽어온다
+            for line in fin:
+                # 각 줄의 앞뒤 공백을 제거하고 clip_info 리스트에 추가한다
+                # strip()은 줄바꿈 문자(\n)와 앞뒤 공백을 제거한다
+                # append()는 리스트의 끝에 새로운 요소를 추가한다
+                # 예) 파일에 '--Y9imYnfBw_0000, 720, 1280, 0, 271, 504, 63, 792, 351'이 있으면
+                #     이 문자열이 공백 제거 후 clip_info 리스트에 추가된다
+                # 실제 비디오 파일 크기는 다를 수 있으므로(리사이즈 등), 여기서는 모든 줄을 읽고
+                # 나중에 trim_and_crop_min_size 함수에서 실제 파일 크기를 확인한 후 필터링한다
+                clip_info.append(line.strip())
 
     # Create output folder.
     # os.makedirs()는 출력 디렉토리를 생성한다
@@ -534,6 +188,62 @@ if __name__ == '__main__':
     # 예) args.output_dir이 'small/cropped_clips'이면 이 경로가 생성된다
     os.makedirs(args.output_dir, exist_ok=True)
 
+    # tar 출력 모드인 경우 shard writer를 준비한다
+    # 워커는 staging 디렉토리에 mp4를 쓰고, 메인 프로세스가 완성된 클립을 받는 즉시 shard에 추가한다
+    crop_output_dir = args.output_dir
+    shard_writer = None
+    if args.output_format == 'tar':
+        shard_writer = ShardWriter(args.output_dir, max_shard_bytes=args.max_shard_size_mb * 1024 * 1024)
+        crop_output_dir = os.path.join(args.output_dir, 'staging')
+        # 이전 실행에서 shard에 추가되지 못하고 남은 staging 파일은 완성 여부를 알 수 없으므로 지운다
+        # hashed 레이아웃에서는 하위 디렉토리가 남아 있으므로 디렉토리를 통째로 지우고 다시 만든다
+        if os.path.isdir(crop_output_dir):
+            shutil.rmtree(crop_output_dir)
+        os.makedirs(crop_output_dir, exist_ok=True)
+    manifest = Manifest(args.output_dir) if args.manifest == 'on' else None
+    # 이전 실행에서 중단된 인코딩의 임시 파일을 정리한다
+    # 최종 파일은 항상 rename으로만 생기므로, 이후 os.path.exists() skip 체크는 별도의 검증 없이 신뢰할 수 있다
+    print('Removed %d stale temporary files' % (sweep_temp_files(crop_output_dir)))
+    # 실패하거나 제한 시간을 넘긴 tube를 기록할 재시도 파일이다 (--clip_info_file로 그대로 다시 사용할 수 있다)
+    retry_file = args.retry_file if args.retry_file else os.path.join(args.output_dir, RETRY_FILENAME)
+
+    # 이미 shard 인덱스나 manifest에 있는 tube는 워커에 보내지 않는다 (stat 호출 없이 메모리에서 skip 체크)
+    # 이 경우 워커에서의 os.path.exists() 체크도 생략한다
+    check_exists = shard_writer is None and manifest is None
+    if not check_exists:
+        # tar 출력 모드에서는 shard 인덱스에 기록된 클립만 완료로 본다 (인덱스에 없는 shard는 다음 실행에서 덮어쓴다)
+        done = shard_writer.done if shard_writer is not None else manifest.done
+        if plan_rows is not None:
+            num_total = len(plan_rows)
+            # plan row는 계획할 때 정한 출력 파일(chunk로 나눴으면 마지막 chunk)의 key로 확인한다
+            plan_rows = [r for r in plan_rows
+                         if os.path.splitext(os.path.basename(get_output_filepaths(r)[-1]))[0] not in done]
+            print('Skipping %d tubes already processed' % (num_total - len(plan_rows)))
+        else:
+            num_total = len(clip_info)
+            clip_info = [c for c in clip_info if get_tube_key(c, args.chunk_frames, args.chunk_overlap) not in done]
+            print('Skipping %d tubes already processed' % (num_total - len(clip_info)))
+
+    # --plan_out이면 워커를 실행하지 않고 모든 tube의 crop 계획만 정해서 plan 파일로 저장하고 끝낸다
+    # 세그먼트마다 ffprobe를 한 번만 실행하고(--probe_cache가 있으면 이전 실행의 결과를 재사용한다),
+    # size/duration 필터, crop 좌표 보정, 코덱/비트레이트 선택을 여기서 끝내서 --plan_in의 워커는 ffmpeg만 실행한다
+    if args.plan_out:
+        probe_cache = ProbeCache(args.probe_cache)
+        plan_rows = build_plan(clip_info, args.input_dir, crop_output_dir, probe_cache=probe_cache,
+                               output_layout=args.output_layout, check_exists=check_exists,
+                               probe_workers=args.probe_workers, probe_timeout=args.tube_timeout or None,
+                               chunk_frames=args.chunk_frames, chunk_overlap=args.chunk_overlap,
+                               min_crop_width=args.min_crop_width, min_crop_height=args.min_crop_height,
+                               min_duration=args.min_duration, rate_control=args.rate_control, quality=args.quality,
+                               min_bitrate=args.min_bitrate, vcodec=args.vcodec, preset=args.preset,
+                               output_size=args.output_size, output_fps=args.output_fps or None, scaler=args.scaler,
+                               quality_stats=args.quality_stats == 'on')
+        write_plan(args.plan_out, plan_rows)
+        print_plan_summary(summarize_plan(plan_rows))
+        print('Probe cache: %d hits, %d misses' % (probe_cache.hits, probe_cache.misses))
+        print('Plan saved to: %s' % (args.plan_out))
+        exit(0)
+
     # Download videos.
     # trim_and_crop_min_size 함수를 사용하여 downloader를 생성한다
     # partial()은 함수의 일부 인자를 고정하여 새로운 함수를 만드는 함수이다
@@ -543,36 +253,96 @@ if __name__ == '__main__':
     # trim_and_crop_min_size는 실제 비디오 파일 크기를 확인한 후 min_crop_width x min_crop_height 이상인 경우만 처리한다
     # 실제 파일 크기가 다를 수 있으므로(리사이즈 등), 함수 내에서 실제 크기를 확인하는 것이 더 정확하다
     # 또한 비디오 길이가 min_duration 이상인 경우만 처리한다
-    downloader = partial(trim_and_crop_min_size, args.input_dir, args.output_dir, min_crop_width=args.min_crop_width, min_crop_height=args.min_crop_height, min_duration=args.min_duration)
+    counts = {}
+    # group_worker: 워커가 세그먼트별 tube 묶음을 받는지, async_worker: --executor async일 때 실행할 asyncio 버전
+    # (크롭 워커는 run_crop_pool()이 asyncio 버전을 찾으므로 None으로 둔다)
+    group_worker = False
+    async_worker = None
+    if plan_rows is not None:
+        # --plan_in이면 계획할 때 정한 값으로 ffmpeg만 실행하는 run_plan_row를 워커로 사용한다
+        # 계획할 때 이미 건너뛰었거나 probe에 실패한 row는 워커에 보내지 않고 바로 집계한다
+        for row in plan_rows:
+            if row['status'] == 'planned':
+                continue
+            counts[row['status']] = counts.get(row['status'], 0) + 1
+            if row['status'] in ['failed', 'timeout']:
+                append_retry_tube(retry_file, row['clip_params'])
+        clip_info = [row for row in plan_rows if row['status'] == 'planned']
+        downloader = partial(run_plan_row, check_exists=check_exists, tube_timeout=args.tube_timeout,
+                             tube_timeout_per_frame=args.tube_timeout_per_frame)
+    elif args.audio_only != 'off':
+        # --audio_only이면 세그먼트별로 묶은 tube를 ffmpeg 한 번으로 오디오 파일로 자른다 (비디오는 디코딩하지 않는다)
+        group_worker = True
+        async_worker = extract_audio_group_async
+        downloader = partial(extract_audio_group, args.input_dir, crop_output_dir, audio_format=args.audio_only,
+                             sample_rate=args.sample_rate, audio_channels=args.audio_channels,
+                             min_duration=args.min_duration, output_layout=args.output_layout,
+                             check_exists=check_exists, tube_timeout=args.tube_timeout,
+                             tube_timeout_per_frame=args.tube_timeout_per_frame)
+    else:
+        downloader = partial(trim_and_crop_min_size, args.input_dir, crop_output_dir, min_crop_width=args.min_crop_width, min_crop_height=args.min_crop_height, min_duration=args.min_duration,
+                             output_layout=args.output_layout, check_exists=check_exists,
+                             rate_control=args.rate_control, quality=args.quality, min_bitrate=args.min_bitrate,
+                             vcodec=args.vcodec, preset=args.preset, tube_timeout=args.tube_timeout,
+                             tube_timeout_per_frame=args.tube_timeout_per_frame, chunk_frames=args.chunk_frames,
+                             chunk_overlap=args.chunk_overlap, output_size=args.output_size,
+                             output_fps=args.output_fps or None, scaler=args.scaler,
+                             quality_stats=args.quality_stats == 'on')
 
     # 시작 시간을 기록한다
     # timer()는 현재 시간을 초 단위로 반환한다
     # 처리 시간을 측정하기 위해 시작 시점의 시간을 저장한다
     start = timer()
-    # 멀티프로세싱 풀 크기를 설정한다
-    # args.num_workers는 명령줄 인자로 전달된 워커 수이다 (기본값 8)
-    # pool_size는 동시에 실행될 프로세스의 개수를 의미한다
-    # 예) pool_size=8이면 8개의 프로세스가 동시에 작업을 처리한다
-    pool_size = args.num_workers
-    # 사용할 풀 크기를 출력한다
-    # print()를 사용하여 현재 사용 중인 워커 수를 표시한다
-    # %d는 정수 포맷팅으로, pool_size 값이 삽입된다
-    print('Using pool size of %d' % (pool_size))
+    # 멀티프로세싱 풀 크기와 ffmpeg 하나당 스레드 수를 정한다
+    # --schedule fixed이면 args.num_workers와 args.ffmpeg_threads를 그대로 사용한다 (기존 방식)
+    # heuristic/auto이면 CPU 수와 tube 원본 해상도의 중앙값으로 워커 수 x 스레드 수가 CPU 수에 맞도록 정한다
+    # 예) CPU 32개, 1080p 원본이면 heuristic은 8 워커 x 4 스레드를 사용한다
+    height, width = get_median_resolution(clip_info)
+    scheduler = CropScheduler(args.schedule, args.num_workers, threads=args.ffmpeg_threads, height=height, width=width)
     # 멀티프로세싱 풀을 생성하고 작업을 실행한다
-    # mp.Pool()은 프로세스 풀을 생성한다
-    # processes=pool_size는 풀에 포함될 프로세스의 개수를 지정한다
-    # with 문을 사용하면 작업이 끝나면 자동으로 풀을 종료한다
-    with mp.Pool(processes=pool_size) as p:
-        # imap_unordered()는 각 클립 정보를 downloader 함수에 전달하여 비동기적으로 실행한다
-        # imap_unordered는 결과를 순서와 관계없이 반환한다 (처리 순서가 중요하지 않을 때 사용)
-        # downloader는 각 clip_params를 받아서 trim_and_crop_min_size 함수를 실행한다
-        # tqdm()은 진행률 표시줄을 보여준다
-        # total=len(clip_info)는 전체 작업 개수를 지정하여 진행률을 정확히 계산한다
-        # list()로 감싸면 모든 작업이 완료될 때까지 대기한다
-        # _는 반환값을 사용하지 않는다는 의미이다 (결과 리스트를 저장하지 않음)
-        _ = list(tqdm(p.imap_unordered(downloader, clip_info), total=len(clip_info)))
+    # run_crop_pool()은 scheduler가 정한 크기의 mp.Pool을 만들어서 tube를 처리한다
+    # auto 모드에서는 처음 몇 개의 tube를 후보 조합별 풀로 나누어 처리하면서 가장 빠른 조합을 고른다
+    # 모든 워커의 인코딩 프레임 수를 합쳐서 하나의 진행률 표시줄(frames/s, ETA)로 보여준다
+    # 워커는 initializer로 공유 카운터를 받아서 run_ffmpeg()에서 프레임 수를 더한다
+    # maxtasksperchild: 워커가 이 개수만큼 tube를 처리하면 새 프로세스로 교체한다
+    #                   (kill된 ffmpeg 등으로 워커 상태가 오염되어도 오래 남지 않는다)
+    # --admission on이면 메모리와 load를 보면서 동시에 실행하는 tube 수를 풀 크기 이하로 조절한다
+    admission = None
+    if args.admission == 'on':
+        admission = AdmissionController(args.num_workers, memory_reserve=args.memory_reserve_mb * 1024 * 1024,
+                                        max_load=args.max_load or None)
+    progress = FrameProgress(sum(get_tube_frames(get_clip_params(c)) for c in clip_info))
+    # --watch이면 tube 리스트 대신 세그먼트 파일이 완성되는 대로 그 세그먼트의 tube를 돌려주는 제너레이터를 넘긴다
+    # run_crop_pool()은 풀을 한 번만 만들고 새로 도착한 tube를 같은 풀에 계속 넣는다
+    tubes = clip_info
+    if args.watch == 'on':
+        watcher = DirectoryWatcher(args.input_dir, done_marker=args.done_marker, stable_seconds=args.stable_seconds)
+        tubes = iter_arrived_tubes(clip_info, watcher, poll_interval=args.poll_interval, idle_timeout=args.idle_timeout)
+    try:
+        with progress:
+            # 결과는 처리 순서와 관계없이 끝난 순서대로 받는다 (imap_unordered)
+            # 완성된 클립(status가 'ok'인 경우)은 바로 manifest에 기록하거나 shard에 추가한다
+            # 실패하거나 제한 시간을 넘긴 tube는 재시도 파일에 추가하고 계속 진행한다
+            for record in run_crop_pool(downloader, tubes, scheduler, progress, args.max_tasks_per_child, admission,
+                                        args.executor, args.affinity == 'on', group_worker, async_worker):
+                progress.tube_done(record)
+                counts[record['status']] = counts.get(record['status'], 0) + 1
+                if record['status'] == 'ok':
+                    store_clip(record, args.output_dir, shard_writer, manifest)
+                elif record['status'] in ['failed', 'timeout']:
+                    append_retry_tube(retry_file, record['clip_params'])
+    finally:
+        # 마지막 shard를 닫고 인덱스에 기록한다 (중단된 경우에도 이미 shard에 쓴 클립은 인덱스에 남는다)
+        if shard_writer is not None:
+            shard_writer.close()
     # 경과 시간을 출력한다
     # timer() - start는 현재 시간에서 시작 시간을 빼서 경과 시간을 계산한다
     # %.2f는 소수점 둘째 자리까지 표시하는 포맷팅이다
     # 예) 123.45초가 걸렸으면 "Elapsed time: 123.45"가 출력된다
     print('Elapsed time: %.2f' % (timer() - start))
+    # 상태별 tube 수를 출력한다 (예: "ok: 120, skipped: 30, failed: 2")
+    print(', '.join('%s: %d' % (status, count) for status, count in sorted(counts.items())))
+    if admission is not None:
+        print('Admission waited %d times for memory and %d times for CPU load' % (admission.memory_waits, admission.load_waits))
+    if counts.get('failed', 0) + counts.get('timeout', 0) > 0:
+        print('Failed or timed out tubes were appended to %s' % (retry_file))
@@ -0,0 +1,99 @@
+# Copyright (c) 2022, NVIDIA CORPORATION. All rights reserved.
+#
+# This script is licensed under the MIT License.
+
+import argparse
+import collections
+import os
+from concurrent.futures import ThreadPoolExecutor
+from time import time as timer
+
+from talkinghead.clip_output import list_output_clips
+from talkinghead.ffmpeg_runner import FFmpegTimeout, get_error_message
+from talkinghead.frame_store import DEFAULT_SHARD_FRAMES, FrameStore, decode_output_clip
+from talkinghead.plan import parse_output_size
+
+
+def build_parser():
+    # 명령줄 인자 parser를 만드는 함수 (import할 때는 명령줄 인자를 읽지 않는다)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clips_dir', type=str, required=True,
+                        help='Output dir of videos_crop.py or videos_process_train.py (manifest, tar shards or clip files).')
+    parser.add_argument('--store_dir', type=str, required=True,
+                        help='Frame store dir. Created if missing; clips already in it are skipped, new clips are appended.')
+    parser.add_argument('--size', type=str, default=None,
+                        help='Frame size of a new store, as N for an N x N square or WxH (e.g. 256 or 512x512). Required for a new store; an existing store keeps its size.')
+    parser.add_argument('--scaler', type=str, default='bicubic',
+                        choices=['fast_bilinear', 'bilinear', 'bicubic', 'neighbor', 'area', 'lanczos', 'spline'],
+                        help='Scaling algorithm used to resize clips to --size. Default: bicubic')
+    parser.add_argument('--num_workers', type=int, default=4,
+                        help='How many clips to decode at once. Frames are appended to the store in clip order. Default: 4')
+    parser.add_argument('--decode_timeout', type=float, default=120.0,
+                        help='Seconds after which decoding one clip is killed and counted as a timeout (0: no limit). Default: 120')
+    parser.add_argument('--max_shard_frames', type=int, default=DEFAULT_SHARD_FRAMES,
+                        help='Start a new frames-NNNNNN.u8 file once the current one holds this many frames. Default: %d' % (DEFAULT_SHARD_FRAMES))
+    return parser
+
+
+if __name__ == '__main__':
+    # 크롭이 끝난 클립을 한 번만 디코딩해서 고정 크기 uint8 프레임으로 frame store에 추가한다
+    # 학습할 때는 talkinghead.frame_store.FrameStore로 클립의 프레임을 memmap 뷰로 바로 읽는다 (mp4를 다시 디코딩하지 않는다)
+    # 다시 실행하면 store에 없는 클립만 추가하므로 크롭 출력이 늘어날 때마다 실행하면 된다
+    parser = build_parser()
+    args = parser.parse_args()
+    try:
+        size = parse_output_size(args.size)
+    except ValueError:
+        parser.error('--size must be N or WxH with positive integers')
+    try:
+        store = FrameStore(args.store_dir, height=size[1] if size else None, width=size[0] if size else None,
+                           max_shard_frames=args.max_shard_frames)
+    except ValueError as e:
+        parser.error(str(e))
+    from tqdm import tqdm
+
+    clips = list_output_clips(args.clips_dir)
+    pending = [(key, location) for key, location in clips.items() if key not in store]
+    print('Skipping %d clips already in the frame store' % (len(clips) - len(pending)))
+
+    def decode(location):
+        return decode_output_clip(args.clips_dir, location, store.width, store.height, args.scaler,
+                                  timeout=args.decode_timeout or None)
+
+    # 디코딩은 스레드에서 동시에 하고(ffmpeg 프로세스), store에는 메인 스레드에서 클립 순서대로 추가한다
+    # 디코딩한 프레임을 메모리에 쌓아 두지 않도록 동시에 진행 중인 클립 수를 num_workers의 두 배로 제한한다
+    counts = collections.Counter()
+    num_frames = 0
+    start = timer()
+    with ThreadPoolExecutor(max_workers=max(1, args.num_workers)) as executor, \
+            tqdm(total=len(pending), desc='Exporting', unit='clip') as bar:
+        in_flight = collections.deque()
+
+        def store_next():
+            global num_frames
+            key, future = in_flight.popleft()
+            try:
+                frames = future.result()
+                store.append(key, frames)
+                counts['ok'] += 1
+                num_frames += len(frames)
+            except FFmpegTimeout as e:
+                print('Timeout %s: %s' % (key, e))
+                counts['timeout'] += 1
+            except Exception as e:
+                print('Failed %s: %s' % (key, get_error_message(e)))
+                counts['failed'] += 1
+            bar.update(1)
+
+        for key, location in pending:
+            in_flight.append((key, executor.submit(decode, location)))
+            if len(in_flight) >= 2 * max(1, args.num_workers):
+                store_next()
+        while in_flight:
+            store_next()
+
+    print('Elapsed time: %.2f' % (timer() - start))
+    for status in sorted(counts):
+        print('%s: %d' % (status, counts[status]))
+    print('Appended %d frames; store has %d clips of %dx%d' % (num_frames, len(store), store.width, store.height))
+    print('Frame store saved to: %s' % (args.store_dir))
@@ -20,44 +20,135 @@ python videos_process_train.py \
 import argparse
 import glob
 import os
-import subprocess
-import time
+import shutil
 from functools import partial
 from time import time as timer
 
-import ffmpeg
-from pytubefix import YouTube
-from tqdm import tqdm
-
-# videos_crop.py에서 필요한 함수들을 import
-from videos_crop import get_h_w, get_fps, trim_and_crop_min_size
-
-parser = argparse.ArgumentParser()
-parser.add_argument('--video_ids_file', type=str, required=True,
-                    help='File containing video IDs (one per line).')
-parser.add_argument('--tubes_file', type=str, required=True,
-                    help='File containing video tube information.')
-parser.add_argument('--output_dir', type=str, required=True,
-                    help='Directory to save cropped clips.')
-parser.add_argument('--temp_raw_dir', type=str, default='train/temp_raw_videos',
-                    help='Temporary directory for raw downloaded videos.')
-parser.add_argument('--temp_split_dir', type=str, default='train/temp_1min_clips',
-                    help='Temporary directory for 1-minute split videos.')
-parser.add_argument('--delete_temp', type=str, default='on', choices=['on', 'off'],
-                    help='Whether to delete temporary files (raw videos and 1-min clips) after cropping. Default: on')
-parser.add_argument('--min_crop_width', type=int, default=256,
-                    help='Minimum crop width in pixels. Only videos with crop width >= this value will be processed.')
-parser.add_argument('--min_crop_height', type=int, default=256,
-                    help='Minimum crop height in pixels. Only videos with crop height >= this value will be processed.')
-parser.add_argument('--min_duration', type=float, default=0.0,
-                    help='Minimum video duration in seconds. Only videos with duration >= this value will be processed. Default is 0.0 (no minimum).')
-parser.add_argument('--download_delay', type=float, default=2.0,
-                    help='Delay in seconds between video download requests. This helps avoid being blocked by YouTube. Default is 2.0 seconds.')
-parser.add_argument('--resume_from', type=str, default=None,
-                    help='Resume processing from a specific video ID. All videos before this ID will be skipped. Example: --resume_from "-qsTrNdfd1w"')
-parser.add_argument('--num_workers', type=int, default=8,
-                    help='How many multiprocessing workers for cropping?')
-args = parser.parse_args()
+from talkinghead.rate_control import DEFAULT_MIN_BITRATE, RATE_CONTROL_POLICIES
+from talkinghead.clip_output import (RETRY_FILENAME, Manifest, ShardWriter, append_retry_tube, load_shard_index, store_clip,
+                         sweep_temp_files)
+from talkinghead.pipeline_metrics import MetricsWriter
+from talkinghead.ffmpeg_runner import FrameProgress
+from talkinghead.admission import AdmissionController
+from talkinghead.scheduler import SCHEDULE_MODES, CropScheduler, get_median_resolution
+from talkinghead.temp_space import DownloadPrefetcher, TempSpace, choose_split_dir
+from talkinghead.crop import run_crop_pool, run_plan_row, trim_and_crop_min_size
+from talkinghead.download import copy_local_video, download_video, get_local_video_size, get_video_size
+from talkinghead.estimate import estimate_run, load_throughput_profile
+from talkinghead.plan import build_plan, get_clip_params, get_tube_frames, get_tube_key, parse_output_size
+from talkinghead.probe import ProbeCache
+from talkinghead.split import split_video
+
+def build_parser():
+    # 명령줄 인자 parser를 만드는 함수
+    # 모듈을 import할 때(spawn 방식의 풀 워커, 벤치마크 등)는 parser를 만들지 않도록 함수 안에서 만든다
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--video_ids_file', type=str, required=True,
+                        help='File containing video IDs (one per line).')
+    parser.add_argument('--tubes_file', type=str, required=True,
+                        help='File containing video tube information.')
+    parser.add_argument('--output_dir', type=str, required=True,
+                        help='Directory to save cropped clips.')
+    parser.add_argument('--temp_raw_dir', type=str, default='train/temp_raw_videos',
+                        help='Temporary directory for raw downloaded videos.')
+    parser.add_argument('--temp_split_dir', type=str, default='train/temp_1min_clips',
+                        help='Temporary directory for 1-minute split videos.')
+    parser.add_argument('--delete_temp', type=str, default='on', choices=['on', 'off'],
+                        help='Whether to delete temporary files (raw videos and 1-min clips) after cropping. Default: on')
+    parser.add_argument('--min_crop_width', type=int, default=256,
+                        help='Minimum crop width in pixels. Only videos with crop width >= this value will be processed.')
+    parser.add_argument('--min_crop_height', type=int, default=256,
+                        help='Minimum crop height in pixels. Only videos with crop height >= this value will be processed.')
+    parser.add_argument('--min_duration', type=float, default=0.0,
+                        help='Minimum video duration in seconds. Only videos with duration >= this value will be processed. Default is 0.0 (no minimum).')
+    parser.add_argument('--download_delay', type=float, default=2.0,
+                        help='Delay in seconds between video download requests. This helps avoid being blocked by YouTube. Default is 2.0 seconds.')
+    parser.add_argument('--resume_from', type=str, default=None,
+                        help='Resume processing from a specific video ID. All videos before this ID will be skipped. Example: --resume_from "-qsTrNdfd1w"')
+    parser.add_argument('--num_workers', type=int, default=8,
+                        help='How many multiprocessing workers for cropping?')
+    parser.add_argument('--output_format', type=str, default='files', choices=['files', 'tar'],
+                        help='files: write each clip as its own mp4 in output_dir. tar: pack clips with a sidecar JSON into size-bounded tar shards (WebDataset layout) plus a shard index.')
+    parser.add_argument('--max_shard_size_mb', type=int, default=1024,
+                        help='Maximum size of each tar shard in MB when --output_format tar. Default: 1024')
+    parser.add_argument('--output_layout', type=str, default='flat', choices=['flat', 'hashed'],
+                        help='flat: all clips directly in output_dir. hashed: two-level fan-out directories (e.g. output_dir/3f/a9/) derived from the clip name hash.')
+    parser.add_argument('--manifest', type=str, default='off', choices=['on', 'off'],
+                        help='Whether to record finished clips in output_dir/manifest.jsonl and use it (instead of stat calls) to skip already processed tubes. Default: off')
+    parser.add_argument('--rate_control', type=str, default='source', choices=RATE_CONTROL_POLICIES,
+                        help='source: reuse the full-frame source bitrate. area: scale the source bitrate by crop area / frame area. quality: per-codec CRF/QP target. Default: source')
+    parser.add_argument('--quality', type=int, default=None,
+                        help='CRF/QP value for --rate_control quality. Default: per-codec value in rate_control.DEFAULT_QUALITY')
+    parser.add_argument('--min_bitrate', type=int, default=DEFAULT_MIN_BITRATE,
+                        help='Lower bound in bps for --rate_control area. Default: %d' % DEFAULT_MIN_BITRATE)
+    parser.add_argument('--vcodec', type=str, default=None,
+                        help='Force the output video encoder (e.g. libopenh264, libx264). Default: chosen from the source codec.')
+    parser.add_argument('--preset', type=str, default=None,
+                        help='Encoder preset passed to ffmpeg (e.g. ultrafast, veryfast, medium for libx264). Default: encoder default.')
+    parser.add_argument('--tube_timeout', type=float, default=120.0,
+                        help='Base wall-clock budget in seconds for one tube (probe + encode). ffprobe/ffmpeg is killed when the budget runs out and the tube is recorded as timed out. 0 disables. Default: 120')
+    parser.add_argument('--tube_timeout_per_frame', type=float, default=0.5,
+                        help='Extra budget in seconds per tube frame, added to --tube_timeout. Default: 0.5')
+    parser.add_argument('--retry_file', type=str, default=None,
+                        help='Append tubes that failed, timed out, or belong to videos that failed to download/split to this file, in the same format as --tubes_file, so it can be fed back in directly. Default: output_dir/retry_tubes.txt')
+    parser.add_argument('--max_tasks_per_child', type=int, default=100,
+                        help='Recycle each crop pool worker after this many tubes (0: never). Default: 100')
+    parser.add_argument('--schedule', type=str, default='fixed', choices=SCHEDULE_MODES,
+                        help='fixed: use --num_workers and --ffmpeg_threads as given. heuristic: pick ffmpeg threads from the median source resolution and fill the available CPUs with workers. auto: time each workers x threads candidate on the first tubes (across videos) and keep the fastest. Default: fixed')
+    parser.add_argument('--ffmpeg_threads', type=int, default=0,
+                        help='Decoder/encoder/filter threads per ffmpeg process with --schedule fixed (0: ffmpeg default). Default: 0')
+    parser.add_argument('--executor', type=str, default='process', choices=['process', 'async'],
+                        help='process: one Python pool worker per concurrent tube, each blocking on its ffmpeg. async: run ffprobe/ffmpeg directly from one asyncio event loop in the main process, --num_workers at a time (no per-worker interpreter). Default: process')
+    parser.add_argument('--affinity', type=str, default='off', choices=['on', 'off'],
+                        help='Whether to hand all tubes of the same 1-min segment to one crop worker back-to-back (in start frame order) and prefetch the next segment with posix_fadvise(WILLNEED) while the current one encodes. Helps page-cache locality on spinning disks and NFS. Default: off')
+    parser.add_argument('--admission', type=str, default='off', choices=['on', 'off'],
+                        help='Whether to start a tube only while memory (MemAvailable vs. expected ffmpeg RSS by source resolution) and CPU (1-min load average) headroom exists, largest tubes (H x W x frames) first. The pool size stays the upper bound. Default: off')
+    parser.add_argument('--memory_reserve_mb', type=int, default=1024,
+                        help='Memory in MB to always leave free with --admission on. Default: 1024')
+    parser.add_argument('--max_load', type=float, default=0,
+                        help='Do not start new tubes while the 1-min load average is at or above this with --admission on (0: number of available CPUs). Default: 0')
+    parser.add_argument('--temp_budget_gb', type=float, default=0,
+                        help='Byte budget in GB for raw videos plus split segments of in-flight videos (each counted as 2x its download size, or 1x when the segments are staged on --staging_dir). Every download first books its size known from yt-dlp metadata (or --expected_video_mb) and waits until enough earlier videos are cleaned up (0: unlimited). Default: 0')
+    parser.add_argument('--expected_video_mb', type=int, default=500,
+                        help='Size in MB booked against --temp_budget_gb for a video whose size is unknown before download (yt-dlp reports neither filesize nor filesize_approx). Larger videos already downloaded raise this estimate. Default: 500')
+    parser.add_argument('--prefetch_videos', type=int, default=0,
+                        help='Download up to this many upcoming videos in a background thread while the current one is split and cropped (0: download each video right before processing it). Default: 0')
+    parser.add_argument('--staging_dir', type=str, default=None,
+                        help='Split segments into a per-video directory under this RAM-backed path (e.g. /dev/shm/talkinghead) when it has room for them, falling back to --temp_split_dir. Only used with --delete_temp on. Default: None')
+    parser.add_argument('--staging_reserve_mb', type=int, default=512,
+                        help='Free space in MB to always leave on --staging_dir. Default: 512')
+    parser.add_argument('--chunk_frames', type=int, default=0,
+                        help='Write each tube as consecutive clips of this many frames instead of one clip, from the same decode pass. Each chunk starts on a keyframe (-g is set to the chunk length) and is recorded in the manifest with its position in the tube (0: one clip per tube). Default: 0')
+    parser.add_argument('--chunk_overlap', type=int, default=0,
+                        help='Frames shared by consecutive chunks with --chunk_frames. Default: 0')
+    parser.add_argument('--output_size', type=str, default=None,
+                        help='Resize every cropped clip to this size in the same ffmpeg filter graph, as N for an N x N square or WxH (e.g. 256 or 512x512). Default: keep the crop size')
+    parser.add_argument('--output_fps', type=float, default=0,
+                        help='Resample every cropped clip to this frame rate in the same filter graph; the audio is trimmed to the resampled video length and --chunk_frames still counts source frames (0: keep the source frame rate). Default: 0')
+    parser.add_argument('--scaler', type=str, default='bicubic',
+                        choices=['fast_bilinear', 'bilinear', 'bicubic', 'neighbor', 'area', 'lanczos', 'spline'],
+                        help='Scaling algorithm used for --output_size. Default: bicubic')
+    parser.add_argument('--quality_stats', type=str, default='off', choices=['on', 'off'],
+                        help='Also run signalstats and blurdetect on the cropped frames in the same ffmpeg filter graph and record per-clip brightness, contrast, saturation, blur and motion summaries in the manifest (and tar sidecar JSON), so blurry, dark or static clips can be filtered without decoding them again. Default: off')
+    parser.add_argument('--plan', type=str, default='off', choices=['on', 'off'],
+                        help='Whether to probe each split segment once in the main process and resolve every tube (size/duration filters, crop box, codec and bitrate) before starting the crop pool, so workers only run ffmpeg. Default: off')
+    parser.add_argument('--probe_cache', type=str, default=None,
+                        help='JSONL file caching ffprobe results per segment file name across runs with --plan on. Default: no cache')
+    parser.add_argument('--dry_run', type=str, default='off', choices=['on', 'off'],
+                        help='Whether to only estimate the run without downloading anything: tubes kept and dropped by each filter, decoded and encoded frames, output bytes under --rate_control, peak temp disk and projected wall time. Uses --probe_cache for segments probed before and the tubes file otherwise. Default: off')
+    parser.add_argument('--throughput_profile', type=str, default=None,
+                        help='Measured throughput for --dry_run: a --metrics_file JSONL or a benchmarks.bench_pipeline --output_json file from an earlier run on the same machine and settings. Without it no wall time is projected.')
+    parser.add_argument('--assume_fps', type=float, default=30.0,
+                        help='Frame rate assumed by --dry_run for segments missing from --probe_cache. Default: 30')
+    parser.add_argument('--downloader', type=str, default='yt-dlp', choices=['yt-dlp', 'local'],
+                        help='yt-dlp: download from YouTube. local: copy {video_id}.mp4 from --local_source_dir instead (for benchmarking without network).')
+    parser.add_argument('--local_source_dir', type=str, default=None,
+                        help='Directory with {video_id}.mp4 files used by --downloader local.')
+    parser.add_argument('--metrics_file', type=str, default=None,
+                        help='Append per-video and per-tube metrics (stage timings, bytes, frames, skip reasons) to this JSONL file.')
+    parser.add_argument('--prometheus_file', type=str, default=None,
+                        help='Write a Prometheus textfile snapshot of cumulative metrics here after each video (e.g. for node_exporter textfile collector).')
+    return parser
 
 
 # def download_video(output_dir, video_id):
@@ -372,125 +463,7 @@ args = parser.parse_args()
 #         return None
 
 # ====================================================================================================
-
-import os
-import subprocess
-
-def download_video(output_dir, video_id, delay=2.0):
-    """
-    output_dir: 저장할 디렉토리
-    video_id: YouTube video id (예: "--Y9imYnfBw")
-    delay: 다운로드 전 대기 시간(초), YouTube 봇 차단을 피하기 위해 사용한다
-    반환: 성공 시 mp4 파일 경로, 실패 시 None
-    """
-    os.makedirs(output_dir, exist_ok=True)
-
-    video_path = os.path.join(output_dir, video_id + ".mp4")
-
-    # 이미 존재하면 스킵
-    if os.path.isfile(video_path):
-        print(f"File exists: {video_path}")
-        return video_path
-
-    # 다운로드 전 딜레이를 추가한다
-    # YouTube가 봇으로 인식하지 않도록 요청 간 간격을 둔다
-    # delay가 0보다 크면 해당 시간만큼 대기한다
-    # 예) delay=2.0이면 2초 대기한다
-    if delay > 0:
-        time.sleep(delay)
-
-    # yt-dlp를 이용해 최고 화질 mp4 + 오디오 통합본을 받는다.
-    # - f "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"
-    #   -> mp4 비디오+오디오 조합이 되면 그걸, 안 되면 best mp4 하나, 그것도 안 되면 best 전체
-    url = f"https://www.youtube.com/watch?v={video_id}"
-
-    cmd = [
-        "yt-dlp",
-        "-f", "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
-        "-o", video_path,
-        "--cookies", "./www.youtube.com_cookies.txt",
-        url,
-    ]
-
-    print("Running:", " ".join(cmd))
-
-    try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-        )
-    except FileNotFoundError:
-        print("yt-dlp 실행 파일을 찾을 수 없다. yt-dlp를 설치했는지 확인해라.")
-        return None
-
-    if result.returncode != 0:
-        print(f"yt-dlp failed for {video_id}")
-        print("stderr:", result.stderr)
-        return None
-
-    if os.path.isfile(video_path):
-        print(f"Downloaded: {video_path}")
-        return video_path
-    else:
-        print(f"yt-dlp reported success but file not found: {video_path}")
-        return None
-
-def split_video(input_file, output_dir):
-    # 비디오를 1분 단위로 분할하는 함수
-    # input_file: 입력 비디오 파일 경로
-    # output_dir: 분할된 비디오를 저장할 디렉토리 경로
-    # 반환값: 성공 시 True, 실패 시 False
-    
-    # 파일 경로에서 파일명만 추출하고 확장자를 제거한다
-    # os.path.basename()은 경로에서 마지막 부분(파일명)만 추출한다
-    # 예) "train/temp_raw_videos/--Y9imYnfBw.mp4" → "--Y9imYnfBw.mp4"
-    # os.path.splitext()는 파일명과 확장자를 분리한다
-    # 예) "--Y9imYnfBw.mp4" → ("--Y9imYnfBw", ".mp4")
-    # [0]은 파일명 부분만 가져온다 → "--Y9imYnfBw"
-    filename_without_ext = os.path.splitext(os.path.basename(input_file))[0]
-    
-    # 출력 파일명 패턴을 생성한다
-    # os.path.join()은 경로를 올바르게 결합한다
-    # 예) output_dir="train/temp_1min_clips", filename_without_ext="--Y9imYnfBw"이면
-    #     "train/temp_1min_clips/--Y9imYnfBw_%04d.mp4"가 된다
-    # %04d는 ffmpeg의 segment 포맷에서 사용하는 4자리 숫자 자동 증가 패턴이다 (0000, 0001, 0002, ...)
-    output_pattern = os.path.join(output_dir, f'{filename_without_ext}_%04d.mp4')
-    
-    # ffmpeg 명령어를 실행하여 비디오를 1분 단위로 분할한다
-    # subprocess.run()은 외부 명령어를 실행한다
-    # -i: 입력 파일을 지정한다
-    # -c copy: 비디오/오디오 코덱을 재인코딩하지 않고 복사한다 (빠르고 품질 손실 없음)
-    # -map 0: 입력 파일의 모든 스트림(비디오, 오디오 등)을 매핑한다
-    # -segment_time 00:01:00: 각 세그먼트의 길이를 1분(00:01:00)으로 설정한다
-    # -f segment: 세그먼트 포맷으로 출력한다 (여러 파일로 분할)
-    # output_pattern: 출력 파일명 패턴을 지정한다
-    # 예를 들어, --Y9imYnfBw.mp4가 3분 길이면 --Y9imYnfBw_0000.mp4, --Y9imYnfBw_0001.mp4, --Y9imYnfBw_0002.mp4가 생성된다
-    try:
-        result = subprocess.run([
-            'ffmpeg',
-            '-i', input_file,
-            '-c', 'copy',
-            '-map', '0',
-            '-segment_time', '00:01:00',
-            '-f', 'segment',
-            output_pattern
-        ], check=False, capture_output=True, text=True)  # check=False는 오류가 발생해도 예외를 발생시키지 않는다
-        # capture_output=True는 stdout과 stderr를 캡처한다
-        # text=True는 출력을 문자열로 받는다
-        
-        # ffmpeg가 성공적으로 실행되었는지 확인한다
-        # returncode가 0이면 성공이다
-        if result.returncode == 0:
-            print('Split video: %s' % (os.path.basename(input_file)))
-            return True
-        else:
-            print('Failed to split video: %s' % (os.path.basename(input_file)))
-            print(result.stderr)
-            return False
-    except Exception as e:
-        print('Error splitting video %s: %s' % (os.path.basename(input_file), str(e)))
-        return False
+# download_video()와 copy_local_video()는 talkinghead/download.py로, split_video()는 talkinghead/split.py로 옮겼다
 
 
 def get_tubes_for_video(tubes_file, video_id):
@@ -579,7 +552,371 @@ def delete_split_clips(split_dir, video_id):
     return deleted_count
 
 
+def create_scheduler(args):
+    # 명령줄 인자로 크롭 풀의 scheduler를 만드는 함수
+    # heuristic/auto 모드는 tubes_file 전체의 원본 해상도 중앙값을 기준으로 ffmpeg 스레드 수를 정한다
+    # 반환값: scheduler.CropScheduler
+    tubes = []
+    if args.schedule != 'fixed':
+        with open(args.tubes_file, 'r') as fin:
+            tubes = [line.strip() for line in fin if line.strip()]
+    height, width = get_median_resolution(tubes)
+    return CropScheduler(args.schedule, args.num_workers, threads=args.ffmpeg_threads, height=height, width=width)
+
+
+def create_admission(args):
+    # 명령줄 인자로 AdmissionController를 만드는 함수
+    # 반환값: --admission on이면 AdmissionController, 아니면 None
+    #         비디오가 바뀌어도 같은 객체를 사용하므로 측정한 ffmpeg 메모리 사용량이 이어진다
+    if args.admission != 'on':
+        return None
+    return AdmissionController(args.num_workers, memory_reserve=args.memory_reserve_mb * 1024 * 1024,
+                               max_load=args.max_load or None)
+
+
+def get_pending_tubes(args, video_id, shard_writer=None, manifest=None):
+    # 비디오의 tube 중 아직 처리하지 않은 tube를 반환하는 함수
+    # shard 인덱스나 manifest에 이미 기록된 tube는 제외한다
+    # tar 출력 모드에서는 shard 인덱스만 확인한다 (인덱스에 없는 shard는 다음 실행에서 덮어쓰므로 다시 처리해야 한다)
+    # 반환값: (남은 tube 리스트, tubes 파일에서 찾은 tube 수)
+    tubes = get_tubes_for_video(args.tubes_file, video_id)
+    num_found = len(tubes)
+    if shard_writer is not None:
+        tubes = [tube for tube in tubes if get_tube_key(tube, args.chunk_frames, args.chunk_overlap) not in shard_writer.done]
+    elif manifest is not None:
+        tubes = [tube for tube in tubes if get_tube_key(tube, args.chunk_frames, args.chunk_overlap) not in manifest.done]
+    return tubes, num_found
+
+
+def fetch_video(args, video_id):
+    # --downloader에 따라 비디오를 temp_raw_dir에 받는 함수 (DownloadPrefetcher의 download로도 사용한다)
+    # 반환값: 받은 파일 경로, 실패하면 None
+    if args.downloader == 'local':
+        return copy_local_video(args.local_source_dir, args.temp_raw_dir, video_id)
+    return download_video(args.temp_raw_dir, video_id, delay=args.download_delay)
+
+
+def estimate_download_bytes(args, video_id):
+    # 다운로드 전에 비디오 크기(바이트)를 알아내는 함수 (TempSpace.reserve()에 넘긴다)
+    # --downloader local이면 원본 파일 크기, youtube이면 yt-dlp 메타데이터의 filesize/filesize_approx
+    # --temp_budget_gb가 0이면 기다리지 않으므로 yt-dlp를 한 번 더 실행하지 않는다
+    # 반환값: 크기, 모르면 None (TempSpace가 --expected_video_mb 또는 지금까지 받은 가장 큰 비디오 크기를 사용한다)
+    if not args.temp_budget_gb:
+        return None
+    if args.downloader == 'local':
+        return get_local_video_size(args.local_source_dir, video_id)
+    return get_video_size(video_id)
+
+
+def create_temp_space(args):
+    # 명령줄 인자로 TempSpace를 만드는 함수 (--temp_budget_gb가 0이면 크기만 집계하고 기다리지 않는다)
+    return TempSpace(int(args.temp_budget_gb * 1024 ** 3), default_video_bytes=args.expected_video_mb * 1024 ** 2)
+
+
+def read_tubes_by_video(tubes_file):
+    # tubes 파일 전체를 한 번 읽어서 비디오 ID별 tube 정보 리스트를 만드는 함수
+    # --dry_run은 모든 비디오를 한 번에 보므로 get_tubes_for_video()처럼 비디오마다 파일을 다시 읽지 않는다
+    # tube의 비디오명은 '{video_id}_{세그먼트 번호}'이다 (예: '--Y9imYnfBw_0000' → '--Y9imYnfBw')
+    tubes_by_video = {}
+    with open(tubes_file, 'r') as fin:
+        for line in fin:
+            line = line.strip()
+            if not line:
+                continue
+            video_id = line.split(',')[0].strip().rsplit('_', 1)[0]
+            tubes_by_video.setdefault(video_id, []).append(line)
+    return tubes_by_video
+
+
+def run_dry_run(args, video_ids):
+    # --dry_run: 아무것도 받지 않고 실행 전체의 작업량, 출력 크기, 임시 공간, 시간을 추정하는 함수
+    # 이미 shard 인덱스나 manifest에 있는 tube와 출력 파일이 있는 tube는 실제 실행과 같이 건너뛴 것으로 센다
+    # 반환값: talkinghead.estimate.estimate_run()의 결과에 probe 캐시와 처리 속도 측정값을 더한 딕셔너리
+    done = set()
+    if args.output_format == 'tar':
+        done |= set(load_shard_index(args.output_dir))
+    if args.manifest == 'on':
+        done |= Manifest(args.output_dir).done
+    check_exists = args.output_format != 'tar' and args.manifest != 'on'
+    crop_output_dir = args.output_dir if args.output_format != 'tar' else os.path.join(args.output_dir, 'staging')
+    tubes_by_video = read_tubes_by_video(args.tubes_file)
+    videos = []
+    for video_id in video_ids:
+        tubes = tubes_by_video.get(video_id, [])
+        pending = [tube for tube in tubes if get_tube_key(tube, args.chunk_frames, args.chunk_overlap) not in done]
+        videos.append((video_id, pending, len(tubes) - len(pending)))
+    probe_cache = ProbeCache(args.probe_cache) if args.probe_cache else None
+    profile = load_throughput_profile(args.throughput_profile) if args.throughput_profile else None
+    report = estimate_run(videos, crop_output_dir, probe_cache=probe_cache, profile=profile,
+                          prefetch_videos=args.prefetch_videos, temp_budget_bytes=int(args.temp_budget_gb * 1024 ** 3),
+                          output_layout=args.output_layout, check_exists=check_exists, assume_fps=args.assume_fps,
+                          chunk_frames=args.chunk_frames, chunk_overlap=args.chunk_overlap,
+                          min_crop_width=args.min_crop_width, min_crop_height=args.min_crop_height,
+                          min_duration=args.min_duration, rate_control=args.rate_control, quality=args.quality,
+                          min_bitrate=args.min_bitrate, vcodec=args.vcodec, preset=args.preset,
+                          output_size=args.output_size, output_fps=args.output_fps or None, scaler=args.scaler)
+    report['cached_segments'] = len(probe_cache.entries) if probe_cache is not None else 0
+    report['profile'] = profile
+    return report
+
+
+def print_estimate(report):
+    # run_dry_run()의 결과를 출력하는 함수
+    def gigabytes(nbytes):
+        if nbytes is None:
+            return 'unknown'
+        if nbytes < 1024 ** 3:
+            return '%.1f MB' % (nbytes / 1024 ** 2)
+        return '%.2f GB' % (nbytes / 1024 ** 3)
+
+    def hours(seconds):
+        if seconds < 3600.0:
+            return '%.1f min' % (seconds / 60.0)
+        return '%.1f h' % (seconds / 3600.0)
+
+    print('\n=== Dry run estimate ===')
+    print('Videos to download: %d' % (report['videos']))
+    print('Tubes: %d, kept: %d, dropped: %s' % (report['tubes'], report['planned'], ', '.join(
+        '%s: %d' % (reason, count) for reason, count in sorted(report['skipped'].items())) or 'none'))
+    print('Tubes planned from cached probes: %d (%d segments in cache), the rest assume tubes file size and fps' % (
+        report['probed_tubes'], report['cached_segments']))
+    print('Frames to encode: %d, frames to decode: %d' % (report['encode_frames'], report['decode_frames']))
+    print('Output: %s%s' % (gigabytes(report['output_bytes']), ' (+%d tubes without a bitrate, pass --throughput_profile)' % (
+        report['unknown_output_tubes']) if report['unknown_output_tubes'] else ''))
+    print('Download: %s, peak temp disk: %s' % (gigabytes(report['download_bytes']), gigabytes(report['peak_temp_bytes'])))
+    if report['seconds'] is None or report['profile'] is None:
+        print('Wall time: unknown (pass --throughput_profile from an earlier run)')
+        return
+    print('Wall time: %s (%s), from %d profiled videos' % (hours(report['seconds']), ', '.join(
+        '%s %s' % (stage, hours(seconds)) for stage, seconds in report['stage_seconds'].items()),
+        report['profile']['videos']))
+
+
+def process_video(video_id, args, crop_output_dir, shard_writer=None, manifest=None, check_exists=True, metrics=None,
+                  retry_file=None, scheduler=None, admission=None, temp_space=None, prefetcher=None, probe_cache=None):
+    # 비디오 하나를 tube 조회 → 다운로드 → 분할 → 크롭 → 임시 파일 삭제 순서로 처리하는 함수
+    # video_id: YouTube 비디오 ID (예: '--Y9imYnfBw')
+    # args: parser.parse_args()의 결과 (명령줄 인자)
+    # crop_output_dir: 워커가 클립을 쓸 디렉토리 (tar 출력 모드에서는 staging 디렉토리)
+    # shard_writer: tar 출력 모드이면 ShardWriter, 아니면 None
+    # manifest: manifest를 사용하면 Manifest, 아니면 None
+    # check_exists: 워커에서 출력 파일 존재 여부를 확인할지 여부
+    # metrics: MetricsWriter이면 tube마다 메트릭을 기록한다, None이면 기록하지 않는다
+    # retry_file: 처리하지 못한 tube(실패, 제한 시간 초과, 다운로드/분할 실패)를 기록할 파일, None이면 기록하지 않는다
+    # scheduler: 크롭 풀의 워커 수와 ffmpeg 스레드 수를 정하는 CropScheduler, None이면 args.num_workers와 args.ffmpeg_threads를 사용한다
+    #            비디오가 바뀌어도 같은 scheduler를 넘기면 auto 모드의 측정 결과가 이어진다
+    # admission: AdmissionController이면 메모리/CPU 여유가 있을 때만 tube를 풀에 넣는다, None이면 모두 바로 넣는다
+    # temp_space: TempSpace이면 이 비디오의 임시 파일 크기를 기록한다 (비디오 처리가 끝난 후 호출한 쪽에서 release()한다)
+    # prefetcher: DownloadPrefetcher이면 미리 받아 둔 비디오를 사용한다, None이거나 미리 받지 않은 비디오이면 여기서 받는다
+    # probe_cache: --plan on에서 사용할 ProbeCache, None이면 비디오마다 새로 만든다
+    # 반환값: 단계별 소요 시간(초)과 처리 개수를 담은 딕셔너리
+    #         예) {'video_id': '--Y9imYnfBw', 'status': 'ok', 'download': 3.2, 'split': 0.4, 'probe': 1.1, 'crop': 12.5, 'cleanup': 0.01, ...}
+    #         skipped는 건너뛴 사유별 tube 수이다 (예: {'too_small': 3, 'done': 5})
+    #         timeouts는 제한 시간을 넘겨서 kill된 tube 수, failed는 ffprobe/ffmpeg 오류로 실패한 tube 수이다
+    stats = {'video_id': video_id, 'status': 'ok', 'download': 0.0, 'download_bytes': 0, 'split': 0.0,
+             'probe': 0.0, 'probe_count': 0, 'crop': 0.0, 'crop_cpu': 0.0, 'cleanup': 0.0,
+             'tubes': 0, 'clips': 0, 'tube_frames': 0, 'output_bytes': 0, 'skipped': {}, 'timeouts': 0, 'failed': 0,
+             'prefetched': False, 'staged': False, 'segments': 0}
+
+    # 1. 해당 비디오의 tube 정보를 가져온다
+    # 다운로드 전에 먼저 확인해서 처리할 tube가 없는 비디오(모든 tube가 이미 처리된 비디오 포함)는 다운로드하지 않는다
+    # get_tubes_for_video() 함수를 호출하여 해당 비디오 ID로 시작하는 모든 tube 정보를 가져온다
+    # 예) video_id='--Y9imYnfBw'이면 '--Y9imYnfBw_0000', '--Y9imYnfBw_0001' 등의 tube 정보를 가져온다
+    # 이미 shard 인덱스나 manifest에 기록된 tube는 크롭하지 않는다
+    tubes, num_found = get_pending_tubes(args, video_id, shard_writer, manifest)
+
+    # tube 정보가 없으면 크롭할 것이 없으므로 다음 비디오로 넘어간다
+    if not num_found:
+        print('No tubes found for video %s' % (video_id))
+        stats['status'] = 'no_tubes'
+        return stats
+
+    print('Found %d tubes for video %s' % (num_found, video_id))
+    stats['tubes'] = len(tubes)
+    if num_found > len(tubes):
+        stats['skipped']['done'] = num_found - len(tubes)
+        if metrics is not None:
+            metrics.skip_tubes(video_id, 'done', num_found - len(tubes))
+    if not tubes:
+        print('All tubes of video %s are already processed' % (video_id))
+        stats['status'] = 'done'
+        return stats
+
+    # 2. 비디오 다운로드
+    # download_video() 함수를 호출하여 비디오를 다운로드한다
+    # temp_raw_dir에 원본 비디오가 저장된다
+    # delay 파라미터를 전달하여 YouTube 봇 차단을 피한다
+    # --downloader local이면 YouTube 대신 local_source_dir에서 파일을 복사한다 (벤치마크용)
+    # prefetcher가 이미 받아 두었으면 다운로드 시간은 받아 둔 비디오를 기다린 시간이다
+    stage_start = timer()
+    prefetched, video_path = prefetcher.get(video_id) if prefetcher is not None else (False, None)
+    if not prefetched:
+        # 직접 받는 경우에도 --temp_budget_gb 안에 들어올 때까지 기다린다 (prefetch 스레드가 받은 비디오와 함께 집계한다)
+        if temp_space is not None:
+            temp_space.reserve(video_id, estimate_download_bytes(args, video_id))
+        video_path = fetch_video(args, video_id)
+    stats['prefetched'] = prefetched
+    stats['download'] = timer() - stage_start
+
+    # 다운로드가 실패하면 다음 비디오로 넘어간다
+    # video_path가 None이면 다운로드 실패를 의미한다
+    if video_path is None:
+        print('Skipping video %s due to download failure' % (video_id))
+        stats['status'] = 'download_failed'
+        # 이 비디오의 tube는 모두 처리하지 못했으므로 재시도 파일에 기록한다
+        if retry_file is not None:
+            for tube in tubes:
+                append_retry_tube(retry_file, tube)
+        return stats
+    stats['download_bytes'] = os.path.getsize(video_path)
+
+    # 3. 비디오를 1분 단위로 분할
+    # split_video() 함수를 호출하여 비디오를 1분 단위로 분할한다
+    # temp_split_dir에 분할된 비디오들이 저장된다
+    # --staging_dir에 세그먼트가 들어갈 공간이 있으면 그 아래의 비디오별 디렉토리(RAM 디스크)에 저장한다
+    # 세그먼트는 크롭이 끝나면 지우므로 --delete_temp on일 때만 사용한다
+    staging_dir = args.staging_dir if args.delete_temp == 'on' else None
+    split_dir, staged = choose_split_dir(args.temp_split_dir, staging_dir, video_id, stats['download_bytes'],
+                                         reserve_bytes=args.staging_reserve_mb * 1024 * 1024)
+    stats['staged'] = staged
+    # 원본 비디오와 분할된 세그먼트(원본과 거의 같은 크기)를 합쳐서 원본 크기의 2배를 임시 공간으로 기록한다
+    # 세그먼트를 staging 디렉토리(RAM 디스크)에 만들면 디스크에는 원본만 남는다
+    if temp_space is not None:
+        temp_space.record(video_id, stats['download_bytes'], staged)
+    stage_start = timer()
+    split_ok = split_video(video_path, split_dir)
+    stats['split'] = timer() - stage_start
+    stats['segments'] = len(glob.glob(os.path.join(split_dir, f'{video_id}_*.mp4')))
+    if not split_ok:
+        print('Skipping video %s due to split failure' % (video_id))
+        # 분할 실패 시 원본 비디오를 삭제할지 결정한다
+        # delete_temp가 'on'이면 원본 비디오도 삭제한다
+        if args.delete_temp == 'on':
+            delete_video_files(video_path)
+        if staged:
+            shutil.rmtree(split_dir, ignore_errors=True)
+        stats['status'] = 'split_failed'
+        if retry_file is not None:
+            for tube in tubes:
+                append_retry_tube(retry_file, tube)
+        return stats
+
+    # 4. 크롭 작업을 수행한다
+    # tube 하나의 처리 결과를 통계, 메트릭, 출력(manifest/shard), 재시도 파일에 반영하는 함수
+    def add_record(record):
+        if metrics is not None:
+            metrics.write_tube(video_id, record)
+        # probe/CPU 시간은 워커들이 사용한 시간의 합이다 (크롭 시간은 벽시계 시간)
+        stats['probe'] += record['probe_seconds']
+        stats['probe_count'] += record['probe_count']
+        stats['crop_cpu'] += record['cpu_seconds']
+        if record['status'] == 'ok':
+            store_clip(record, args.output_dir, shard_writer, manifest)
+            stats['clips'] += 1
+            stats['tube_frames'] += record['frames']
+            stats['output_bytes'] += record['output_bytes']
+        elif record['status'] in ['failed', 'timeout']:
+            # 실패하거나 제한 시간을 넘긴 tube는 재시도 파일에 기록하고 나머지 tube를 계속 처리한다
+            stats['timeouts' if record['status'] == 'timeout' else 'failed'] += 1
+            if retry_file is not None:
+                append_retry_tube(retry_file, record['clip_params'])
+        else:
+            stats['skipped'][record['reason']] = stats['skipped'].get(record['reason'], 0) + 1
+
+    if args.plan == 'on':
+        # --plan on이면 세그먼트마다 ffprobe를 한 번만 실행해서(세그먼트끼리는 동시에) 모든 tube의 crop 계획을 먼저 정하고,
+        # 워커는 run_plan_row로 ffmpeg만 실행한다
+        # 계획할 때 이미 건너뛰었거나 probe에 실패한 tube는 워커에 보내지 않고 바로 반영한다
+        if probe_cache is None:
+            probe_cache = ProbeCache()
+        stage_start = timer()
+        misses = probe_cache.misses
+        plan_rows = build_plan(tubes, split_dir, crop_output_dir, probe_cache=probe_cache,
+                               output_layout=args.output_layout, check_exists=check_exists,
+                               probe_workers=max(1, args.num_workers), probe_timeout=args.tube_timeout or None,
+                               chunk_frames=args.chunk_frames, chunk_overlap=args.chunk_overlap,
+                               min_crop_width=args.min_crop_width, min_crop_height=args.min_crop_height,
+                               min_duration=args.min_duration, rate_control=args.rate_control, quality=args.quality,
+                               min_bitrate=args.min_bitrate, vcodec=args.vcodec, preset=args.preset,
+                               output_size=args.output_size, output_fps=args.output_fps or None, scaler=args.scaler,
+                               quality_stats=args.quality_stats == 'on')
+        for row in plan_rows:
+            if row['status'] != 'planned':
+                add_record(row)
+        tubes = [row for row in plan_rows if row['status'] == 'planned']
+        stats['probe'] += timer() - stage_start
+        stats['probe_count'] += probe_cache.misses - misses
+        cropper = partial(run_plan_row, check_exists=check_exists, tube_timeout=args.tube_timeout,
+                          tube_timeout_per_frame=args.tube_timeout_per_frame)
+    else:
+        # trim_and_crop_min_size 함수를 사용하여 크롭 작업을 수행한다
+        # partial()은 함수의 일부 인자를 고정하여 새로운 함수를 만드는 함수이다
+        # trim_and_crop_min_size 함수의 첫 번째, 두 번째, 네 번째, 다섯 번째, 여섯 번째 인자(input_dir, output_dir, min_crop_width, min_crop_height, min_duration)를 고정하고
+        # 세 번째 인자(clip_params)만 받는 새로운 함수를 만든다
+        # 이렇게 하면 multiprocessing에서 각 tube 정보만 전달하면 된다
+        # 또한 비디오 길이가 min_duration 이상인 경우만 처리한다
+        cropper = partial(trim_and_crop_min_size, split_dir, crop_output_dir,
+                          min_crop_width=args.min_crop_width, min_crop_height=args.min_crop_height, min_duration=args.min_duration,
+                          output_layout=args.output_layout, check_exists=check_exists,
+                          rate_control=args.rate_control, quality=args.quality, min_bitrate=args.min_bitrate,
+                          vcodec=args.vcodec, preset=args.preset, tube_timeout=args.tube_timeout,
+                          tube_timeout_per_frame=args.tube_timeout_per_frame, chunk_frames=args.chunk_frames,
+                          chunk_overlap=args.chunk_overlap, output_size=args.output_size,
+                          output_fps=args.output_fps or None, scaler=args.scaler,
+                          quality_stats=args.quality_stats == 'on')
+
+    # 멀티프로세싱을 사용하여 크롭 작업을 수행한다
+    # run_crop_pool()은 scheduler가 정한 워커 수와 ffmpeg 스레드 수로 mp.Pool을 만들어서 tube를 처리한다
+    # 워커들의 인코딩 프레임 수를 합쳐서 이 비디오의 크롭 진행률(frames/s, ETA)을 하나의 표시줄로 보여준다
+    if scheduler is None:
+        scheduler = CropScheduler('fixed', args.num_workers, threads=args.ffmpeg_threads)
+    stage_start = timer()
+    progress = FrameProgress(sum(get_tube_frames(get_clip_params(tube)) for tube in tubes), desc='Cropping %s' % (video_id), leave=False)
+    # 워커는 max_tasks_per_child개의 tube를 처리하면 새 프로세스로 교체된다
+    with progress:
+        # 결과는 처리 순서와 관계없이 끝난 순서대로 받는다 (imap_unordered)
+        # 완성된 클립은 바로 manifest에 기록하거나 shard에 추가한다
+        for record in run_crop_pool(cropper, tubes, scheduler, progress, args.max_tasks_per_child, admission,
+                                    args.executor, args.affinity == 'on'):
+            progress.tube_done(record)
+            add_record(record)
+    stats['crop'] = timer() - stage_start
+
+    print('Cropped %d clips for video %s' % (stats['clips'], video_id))
+
+    # 5. 임시 파일 삭제 (delete_temp가 'on'인 경우)
+    # delete_temp가 'on'이면 원본 비디오와 분할된 클립들을 삭제한다
+    stage_start = timer()
+    if args.delete_temp == 'on':
+        # 원본 비디오를 삭제한다
+        delete_video_files(video_path)
+        # 분할된 클립들을 삭제한다 (staging 디렉토리는 비디오별 디렉토리이므로 통째로 지운다)
+        if staged:
+            deleted_count = len(os.listdir(split_dir))
+            shutil.rmtree(split_dir, ignore_errors=True)
+        else:
+            deleted_count = delete_split_clips(split_dir, video_id)
+        print('Deleted %d temporary files for video %s' % (deleted_count + 1, video_id))
+    stats['cleanup'] = timer() - stage_start
+    return stats
+
+
 if __name__ == '__main__':
+    # 명령줄 인자를 파싱한다
+    # 모듈을 import할 때(벤치마크 등)는 파싱하지 않도록 __main__ 안에서만 실행한다
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.chunk_frames and not 0 <= args.chunk_overlap < args.chunk_frames:
+        parser.error('--chunk_overlap must be smaller than --chunk_frames')
+    if args.output_fps < 0:
+        parser.error('--output_fps must not be negative')
+    try:
+        parse_output_size(args.output_size)
+    except ValueError:
+        parser.error('--output_size must be N or WxH with positive integers')
+    # tqdm은 비디오 진행률 표시에만 사용하므로 명령줄에서 실행할 때만 import한다
+    from tqdm import tqdm
+
     # 비디오 ID 리스트를 읽어온다
     # video_ids는 비디오 ID를 저장할 리스트이다
     # 빈 리스트로 초기화한다
@@ -617,12 +954,56 @@ if __name__ == '__main__':
             # resume_from ID가 리스트에 없으면 경고 메시지를 출력하고 처음부터 시작한다
             print('Warning: Resume video ID "%s" not found in video_ids_file. Starting from the beginning.' % (resume_id))
     
+    # --dry_run on이면 아무것도 받거나 만들지 않고 실행 전체의 추정치만 출력하고 끝낸다
+    if args.dry_run == 'on':
+        print_estimate(run_dry_run(args, video_ids))
+        exit(0)
+
     # 출력 디렉토리와 임시 디렉토리들을 생성한다
     # os.makedirs()는 디렉토리를 생성한다
     # exist_ok=True는 디렉토리가 이미 존재해도 오류를 발생시키지 않는다
     os.makedirs(args.output_dir, exist_ok=True)
     os.makedirs(args.temp_raw_dir, exist_ok=True)
     os.makedirs(args.temp_split_dir, exist_ok=True)
+
+    # tar 출력 모드인 경우 shard writer를 준비한다
+    # 워커는 staging 디렉토리에 mp4를 쓰고, 메인 프로세스가 완성된 클립을 shard에 추가한다
+    # shard writer는 모든 비디오에 걸쳐 하나만 사용하므로 shard 크기가 비디오 단위로 쪼개지지 않는다
+    crop_output_dir = args.output_dir
+    shard_writer = None
+    if args.output_format == 'tar':
+        shard_writer = ShardWriter(args.output_dir, max_shard_bytes=args.max_shard_size_mb * 1024 * 1024)
+        crop_output_dir = os.path.join(args.output_dir, 'staging')
+        # 이전 실행에서 shard에 추가되지 못하고 남은 staging 파일은 완성 여부를 알 수 없으므로 지운다
+        # hashed 레이아웃에서는 하위 디렉토리가 남아 있으므로 디렉토리를 통째로 지우고 다시 만든다
+        if os.path.isdir(crop_output_dir):
+            shutil.rmtree(crop_output_dir)
+        os.makedirs(crop_output_dir, exist_ok=True)
+    manifest = Manifest(args.output_dir) if args.manifest == 'on' else None
+    # 이전 실행에서 중단된 인코딩의 임시 파일을 정리한다
+    # 최종 파일은 항상 rename으로만 생기므로, 이후 os.path.exists() skip 체크는 별도의 검증 없이 신뢰할 수 있다
+    print('Removed %d stale temporary files' % (sweep_temp_files(crop_output_dir)))
+    # shard 인덱스나 manifest를 사용하면 skip 체크를 메모리에서 수행하므로 워커의 os.path.exists() 체크를 생략한다
+    check_exists = shard_writer is None and manifest is None
+    # 메트릭 기록기를 준비한다 (--metrics_file/--prometheus_file이 없으면 아무것도 기록하지 않는다)
+    metrics = MetricsWriter(args.metrics_file, args.prometheus_file)
+    # 처리하지 못한 tube를 기록할 재시도 파일이다 (--tubes_file로 그대로 다시 사용할 수 있다)
+    retry_file = args.retry_file if args.retry_file else os.path.join(args.output_dir, RETRY_FILENAME)
+    # 크롭 풀의 워커 수와 ffmpeg 스레드 수를 정하는 scheduler이다 (모든 비디오에 걸쳐 하나만 사용한다)
+    scheduler = create_scheduler(args)
+    # --admission on이면 메모리와 load를 보면서 동시에 실행하는 tube 수를 풀 크기 이하로 조절한다
+    admission = create_admission(args)
+    # 처리 중인 비디오의 임시 파일(원본 + 세그먼트) 크기를 --temp_budget_gb 안으로 제한한다
+    temp_space = create_temp_space(args)
+    # --prefetch_videos가 1 이상이면 현재 비디오를 크롭하는 동안 다음 비디오를 백그라운드에서 미리 받는다
+    # 처리할 tube가 없는 비디오는 받지 않는다
+    # --plan on이면 세그먼트의 ffprobe 결과를 --probe_cache 파일에 저장해서 재실행할 때 다시 probe하지 않는다
+    probe_cache = ProbeCache(args.probe_cache) if args.plan == 'on' else None
+    prefetcher = None
+    if args.prefetch_videos > 0:
+        prefetcher = DownloadPrefetcher(video_ids, partial(fetch_video, args), temp_space,
+                                        needs_download=lambda video_id: bool(get_pending_tubes(args, video_id, shard_writer, manifest)[0]),
+                                        max_ahead=args.prefetch_videos, estimate_bytes=partial(estimate_download_bytes, args))
     
     # 전체 시작 시간을 기록한다
     # timer()는 현재 시간을 초 단위로 반환한다
@@ -631,90 +1012,36 @@ if __name__ == '__main__':
     # 각 비디오에 대해 순차적으로 처리한다
     # tqdm()은 진행률 표시줄을 보여준다
     # total=len(video_ids)는 전체 작업 개수를 지정하여 진행률을 정확히 계산한다
-    for video_id in tqdm(video_ids, desc='Processing videos'):
-        # 현재 비디오의 시작 시간을 기록한다
-        video_start = timer()
-        
-        print('\n=== Processing video: %s ===' % (video_id))
-        
-        # 1. 비디오 다운로드
-        # download_video() 함수를 호출하여 비디오를 다운로드한다
-        # temp_raw_dir에 원본 비디오가 저장된다
-        # delay 파라미터를 전달하여 YouTube 봇 차단을 피한다
-        video_path = download_video(args.temp_raw_dir, video_id, delay=args.download_delay)
-        
-        # 다운로드가 실패하면 다음 비디오로 넘어간다
-        # video_path가 None이면 다운로드 실패를 의미한다
-        if video_path is None:
-            print('Skipping video %s due to download failure' % (video_id))
-            continue
-        
-        # 2. 비디오를 1분 단위로 분할
-        # split_video() 함수를 호출하여 비디오를 1분 단위로 분할한다
-        # temp_split_dir에 분할된 비디오들이 저장된다
-        if not split_video(video_path, args.temp_split_dir):
-            print('Skipping video %s due to split failure' % (video_id))
-            # 분할 실패 시 원본 비디오를 삭제할지 결정한다
-            # delete_temp가 'on'이면 원본 비디오도 삭제한다
-            if args.delete_temp == 'on':
-                delete_video_files(video_path)
-            continue
-        
-        # 3. 해당 비디오의 tube 정보를 가져온다
-        # get_tubes_for_video() 함수를 호출하여 해당 비디오 ID로 시작하는 모든 tube 정보를 가져온다
-        # 예) video_id='--Y9imYnfBw'이면 '--Y9imYnfBw_0000', '--Y9imYnfBw_0001' 등의 tube 정보를 가져온다
-        tubes = get_tubes_for_video(args.tubes_file, video_id)
-        
-        # tube 정보가 없으면 크롭할 것이 없으므로 다음 비디오로 넘어간다
-        if not tubes:
-            print('No tubes found for video %s' % (video_id))
-            # delete_temp가 'on'이면 임시 파일들을 삭제한다
-            if args.delete_temp == 'on':
-                delete_video_files(video_path)
-                delete_split_clips(args.temp_split_dir, video_id)
-            continue
-        
-        print('Found %d tubes for video %s' % (len(tubes), video_id))
-        
-        # 4. 크롭 작업을 수행한다
-        # trim_and_crop_min_size 함수를 사용하여 크롭 작업을 수행한다
-        # partial()은 함수의 일부 인자를 고정하여 새로운 함수를 만드는 함수이다
-        # trim_and_crop_min_size 함수의 첫 번째, 두 번째, 네 번째, 다섯 번째, 여섯 번째 인자(input_dir, output_dir, min_crop_width, min_crop_height, min_duration)를 고정하고
-        # 세 번째 인자(clip_params)만 받는 새로운 함수를 만든다
-        # 이렇게 하면 multiprocessing에서 각 tube 정보만 전달하면 된다
-        # 또한 비디오 길이가 min_duration 이상인 경우만 처리한다
-        cropper = partial(trim_and_crop_min_size, args.temp_split_dir, args.output_dir, 
-                         min_crop_width=args.min_crop_width, min_crop_height=args.min_crop_height, min_duration=args.min_duration)
-        
-        # 멀티프로세싱을 사용하여 크롭 작업을 수행한다
-        # mp.Pool()은 프로세스 풀을 생성한다
-        # processes=args.num_workers는 풀에 포함될 프로세스의 개수를 지정한다
-        # with 문을 사용하면 작업이 끝나면 자동으로 풀을 종료한다
-        import multiprocessing as mp
-        with mp.Pool(processes=args.num_workers) as p:
-            # imap_unordered()는 각 tube 정보를 cropper 함수에 전달하여 비동기적으로 실행한다
-            # imap_unordered는 결과를 순서와 관계없이 반환한다 (처리 순서가 중요하지 않을 때 사용)
-            # cropper는 각 tube 정보를 받아서 trim_and_crop_min_size 함수를 실행한다
-            # list()로 감싸면 모든 작업이 완료될 때까지 대기한다
-            _ = list(p.imap_unordered(cropper, tubes))
-        
-        print('Cropped %d clips for video %s' % (len(tubes), video_id))
+    try:
+        for video_id in tqdm(video_ids, desc='Processing videos'):
+            # 현재 비디오의 시작 시간을 기록한다
+            video_start = timer()
         
-        # 5. 임시 파일 삭제 (delete_temp가 'on'인 경우)
-        # delete_temp가 'on'이면 원본 비디오와 분할된 클립들을 삭제한다
-        if args.delete_temp == 'on':
-            # 원본 비디오를 삭제한다
-            delete_video_files(video_path)
-            # 분할된 클립들을 삭제한다
-            deleted_count = delete_split_clips(args.temp_split_dir, video_id)
-            print('Deleted %d temporary files for video %s' % (deleted_count + 1, video_id))
+            print('\n=== Processing video: %s ===' % (video_id))
+            # process_video()는 다운로드, 분할, 크롭, 임시 파일 삭제를 순서대로 수행한다
+            stats = process_video(video_id, args, crop_output_dir, shard_writer=shard_writer, manifest=manifest,
+                                  check_exists=check_exists, metrics=metrics, retry_file=retry_file, scheduler=scheduler,
+                                  admission=admission, temp_space=temp_space, prefetcher=prefetcher, probe_cache=probe_cache)
+            # 비디오 처리가 끝났으므로 임시 공간 예산을 돌려준다 (기다리던 prefetch 다운로드가 시작된다)
+            temp_space.release(video_id)
         
-        # 현재 비디오 처리 시간을 출력한다
-        # timer() - video_start는 현재 시간에서 비디오 시작 시간을 빼서 경과 시간을 계산한다
-        # %.2f는 소수점 둘째 자리까지 표시하는 포맷팅이다
-        video_elapsed = timer() - video_start
-        print('Completed video %s in %.2f seconds' % (video_id, video_elapsed))
+            # 현재 비디오 처리 시간을 출력한다
+            # timer() - video_start는 현재 시간에서 비디오 시작 시간을 빼서 경과 시간을 계산한다
+            # %.2f는 소수점 둘째 자리까지 표시하는 포맷팅이다
+            video_elapsed = timer() - video_start
+            stats['elapsed'] = video_elapsed
+            # 비디오 단위 메트릭을 기록하고 Prometheus textfile을 갱신한다
+            metrics.write_video(stats)
+            print('Completed video %s in %.2f seconds (download %.2f, split %.2f, crop %.2f, cleanup %.2f)' % (
+                video_id, video_elapsed, stats['download'], stats['split'], stats['crop'], stats['cleanup']))
     
+        if prefetcher is not None:
+            prefetcher.close()
+    finally:
+        # 마지막 shard를 닫고 인덱스에 기록한다 (중단된 경우에도 이미 shard에 쓴 클립은 인덱스에 남는다)
+        if shard_writer is not None:
+            shard_writer.close()
+
     # 전체 처리 시간을 출력한다
     # timer() - total_start는 현재 시간에서 전체 시작 시간을 빼서 경과 시간을 계산한다
     total_elapsed = timer() - total_start
@@ -1,22 +1,73 @@
 import argparse
 import glob
 import os
-import subprocess
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--input_dir', type=str, required=True,
-                    help='Directory containing input videos.')
-parser.add_argument('--output_dir', type=str, required=True,
-                    help='Directory to save split videos.')
-args = parser.parse_args()
+from talkinghead.split import get_segment_filepaths, get_split_done_filepath, split_video
+from talkinghead.watch import DEFAULT_POLL_INTERVAL, DEFAULT_STABLE_SECONDS, DirectoryWatcher
+
+
+def build_parser():
+    # 명령줄 인자 parser를 만드는 함수 (import할 때는 명령줄 인자를 읽지 않는다)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input_dir', type=str, required=True,
+                        help='Directory containing input videos.')
+    parser.add_argument('--output_dir', type=str, required=True,
+                        help='Directory to save split videos.')
+    parser.add_argument('--watch', type=str, default='off', choices=['on', 'off'],
+                        help='Keep polling --input_dir and split each video as soon as it is complete (see --done_marker and --stable_seconds) instead of splitting the videos present at start and exiting. Videos already split by an earlier run (marked by a .<video>.split_done file in --output_dir) are skipped; interrupted splits are redone. Default: off')
+    parser.add_argument('--poll_interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='Seconds between directory scans with --watch on. Default: %.0f' % (DEFAULT_POLL_INTERVAL))
+    parser.add_argument('--stable_seconds', type=float, default=DEFAULT_STABLE_SECONDS,
+                        help='Without --done_marker, treat a video as complete once its size and mtime have not changed for this many seconds. Default: %.0f' % (DEFAULT_STABLE_SECONDS))
+    parser.add_argument('--done_marker', type=str, default='',
+                        help='With --watch on, treat a video as complete once a file named <video><suffix> exists (e.g. .done for video.mp4.done), and write the same marker next to every segment after a successful split so a watching videos_crop.py can use it. Default: none (use --stable_seconds)')
+    parser.add_argument('--idle_timeout', type=float, default=0,
+                        help='With --watch on, exit after this many seconds without a new video (0: run until interrupted). Default: 0')
+    return parser
+
+
+def split_new_videos(input_files, output_dir, done_marker=''):
+    # watch 모드에서 새로 완성된 비디오들을 분할하는 함수
+    # 분할 완료 표시 파일이 있는 비디오는 이전 실행에서 분할한 것이므로 건너뛴다 (다시 분할하면 크롭 중인 세그먼트를 덮어쓴다)
+    # 표시 파일 없이 세그먼트만 있으면 분할 중에 중단된 것이므로 남은 세그먼트를 지우고 다시 분할한다
+    # done_marker가 있으면 분할에 성공한 비디오의 세그먼트마다 완료 표시 파일을 만든다 (videos_crop.py --watch가 읽는다)
+    for input_file in input_files:
+        split_done_filepath = get_split_done_filepath(input_file, output_dir)
+        if os.path.exists(split_done_filepath):
+            print('Skipping %s: already split' % (os.path.basename(input_file)))
+            continue
+        segment_filepaths = get_segment_filepaths(input_file, output_dir)
+        if segment_filepaths:
+            print('Re-splitting %s: removing %d segments left by an interrupted split' % (os.path.basename(input_file), len(segment_filepaths)))
+            for segment_filepath in segment_filepaths:
+                os.remove(segment_filepath)
+        if not split_video(input_file, output_dir):
+            continue
+        if done_marker:
+            for segment_filepath in get_segment_filepaths(input_file, output_dir):
+                open(segment_filepath + done_marker, 'w').close()
+        # 세그먼트와 완료 표시 파일을 모두 만든 후에 분할 완료를 기록한다
+        open(split_done_filepath, 'w').close()
 
 
 if __name__ == '__main__':
+    args = build_parser().parse_args()
+
     # Create output directory
     # 출력 디렉토리를 생성한다
     # os.makedirs는 디렉토리가 이미 존재해도 오류를 발생시키지 않는다 (exist_ok=True)
     # 예를 들어, output_dir이 "small/1min_clips"이면 이 경로가 생성된다
     os.makedirs(args.output_dir, exist_ok=True)
+
+    # watch 모드: 다운로드가 끝나는 대로 비디오를 분할한다 (다른 머신에서 input_dir에 비디오를 쓰는 경우)
+    # 새 비디오가 완성되었는지는 --done_marker 파일 또는 크기가 --stable_seconds 동안 바뀌지 않는지로 판단한다
+    if args.watch == 'on':
+        watcher = DirectoryWatcher(args.input_dir, done_marker=args.done_marker, stable_seconds=args.stable_seconds)
+        print('Watching %s for new videos' % (args.input_dir))
+        for input_files in watcher.watch(args.poll_interval, args.idle_timeout):
+            split_new_videos(input_files, args.output_dir, args.done_marker)
+        print('No new videos for %.0f seconds, exiting' % (args.idle_timeout))
+        exit(0)
     
     # Get all .mp4 files in input directory
     # 입력 디렉토리 내의 모든 .mp4 파일을 찾는다
@@ -29,40 +80,7 @@ if __name__ == '__main__':
     # 각 비디오 파일에 대해 반복한다
     # for 루프를 사용하여 mp4_files 리스트의 각 파일을 처리한다
     for input_file in mp4_files:
-        # Extract filename without extension
-        # 파일 경로에서 파일명만 추출하고 확장자를 제거한다
-        # os.path.basename()은 경로에서 마지막 부분(파일명)만 추출한다
-        # 예를 들어, "small/raw_videos/video1.mp4" → "video1.mp4"
-        # os.path.splitext()는 파일명과 확장자를 분리한다
-        # 예를 들어, "video1.mp4" → ("video1", ".mp4")
-        # [0]은 파일명 부분만 가져온다 → "video1"
-        filename_without_ext = os.path.splitext(os.path.basename(input_file))[0]
-        
-        # Construct output file pattern
-        # 출력 파일명 패턴을 생성한다
-        # os.path.join()은 경로를 올바르게 결합한다
-        # 예를 들어, output_dir="small/1min_clips", filename_without_ext="video1"이면
-        # "small/1min_clips/video1_%04d.mp4"가 된다
-        # %04d는 ffmpeg의 segment 포맷에서 사용하는 4자리 숫자 자동 증가 패턴이다 (0000, 0001, 0002, ...)
-        output_pattern = os.path.join(args.output_dir, f'{filename_without_ext}_%04d.mp4')
-        
-        # Run ffmpeg command to split video into 1-minute segments
-        # ffmpeg 명령어를 실행하여 비디오를 1분 단위로 분할한다
-        # subprocess.run()은 외부 명령어를 실행한다
-        # -i: 입력 파일을 지정한다
-        # -c copy: 비디오/오디오 코덱을 재인코딩하지 않고 복사한다 (빠르고 품질 손실 없음)
-        # -map 0: 입력 파일의 모든 스트림(비디오, 오디오 등)을 매핑한다
-        # -segment_time 00:01:00: 각 세그먼트의 길이를 1분(00:01:00)으로 설정한다
-        # -f segment: 세그먼트 포맷으로 출력한다 (여러 파일로 분할)
-        # output_pattern: 출력 파일명 패턴을 지정한다
+        # Split into 1-minute segments
+        # split_video()는 ffmpeg segment 포맷으로 비디오를 1분 단위로 분할한다 (재인코딩 없이 -c copy)
         # 예를 들어, video1.mp4가 3분 길이면 video1_0000.mp4, video1_0001.mp4, video1_0002.mp4가 생성된다
-        subprocess.run([
-            'ffmpeg',
-            '-i', input_file,
-            '-c', 'copy',
-            '-map', '0',
-            '-segment_time', '00:01:00',
-            '-f', 'segment',
-            output_pattern
-        ], check=False)  # check=False는 ffmpeg 오류가 발생해도 스크립트가 계속 진행되도록 한다
-
+        split_video(input_file, args.output_dir)